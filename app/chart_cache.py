@@ -0,0 +1,136 @@
+"""
+Cache de gráficos dos relatórios PDF.
+
+Endereçado pelo conteúdo: a chave é o hash (SHA-256) do tipo do gráfico e das
+entradas que o definem. Gráficos idênticos (relatórios repetidos, veículos com os
+mesmos números, consolidado e por veículo) são montados uma única vez por
+processo e compartilhados entre as gerações de PDF. Drawings do ReportLab ficam
+guardados já expandidos: os widgets (eixos, barras, rótulos) viram formas simples
+e o doc.build só desenha, sem recalcular o layout do gráfico. Memória LRU
+limitada pelo tamanho estimado das entradas (CHART_CACHE_MB).
+"""
+
+import copy
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+from reportlab.graphics.shapes import Drawing, Group, UserNode
+
+# Tamanho máximo (estimado) dos gráficos mantidos em memória
+CHART_CACHE_MAX_BYTES = int(os.environ.get('CHART_CACHE_MB', '32')) * 1024 * 1024
+
+
+def chart_key(tipo: str, spec: Any) -> str:
+    """Hash do tipo do gráfico e das suas entradas (JSON canônico)"""
+    conteudo = json.dumps([tipo, spec], sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+
+def expand_drawing(drawing: Drawing) -> Drawing:
+    """Converte todos os widgets do Drawing, em qualquer nível, nas formas que eles desenham"""
+    def expandir(node):
+        while isinstance(node, UserNode):
+            node = node.provideNode()
+        if isinstance(node, Group):
+            node.contents = [expandir(filho) for filho in node.contents]
+        return node
+
+    return expandir(drawing.expandUserNodes())
+
+
+def estimated_size(value: Any) -> int:
+    """Memória aproximada de um valor em cache (bytes; formas percorridas pelos atributos)"""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+
+    total, pilha, vistos = 0, [value], set()
+    while pilha:
+        obj = pilha.pop()
+        if id(obj) in vistos:
+            continue
+        vistos.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            pilha.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            pilha.extend(obj)
+        elif hasattr(obj, '__dict__'):
+            pilha.append(obj.__dict__)
+    return total
+
+
+class ChartCache:
+    """LRU de gráficos renderizados, limitada pela soma dos tamanhos estimados"""
+
+    def __init__(self, max_bytes: int = CHART_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, Tuple[Any, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_render(self, tipo: str, spec: Any, render: Callable[[], Optional[Any]]) -> Optional[Any]:
+        """
+        Gráfico das entradas `spec` (em cache ou renderizado agora com render()).
+        Drawings são expandidos antes de guardar e cada chamada recebe uma cópia
+        rasa: o platypus grava atributos no flowable durante o build, e gerações
+        simultâneas não podem dividir o mesmo objeto. None não é guardado.
+        """
+        key = chart_key(tipo, spec)
+        with self._lock:
+            entrada = self._entries.get(key)
+            if entrada is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if entrada is not None:
+            return self._copy(entrada[0])
+
+        value = render()
+        if value is None:
+            return None
+        if isinstance(value, Drawing):
+            value = expand_drawing(value)
+        self._remember(key, value, estimated_size(value))
+        return self._copy(value)
+
+    @staticmethod
+    def _copy(value: Any) -> Any:
+        return copy.copy(value) if isinstance(value, Drawing) else value
+
+    def _remember(self, key: str, value: Any, tamanho: int) -> None:
+        if tamanho > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._entries.pop(key, None)
+            if anterior is not None:
+                self.size_bytes -= anterior[1]
+            self._entries[key] = (value, tamanho)
+            self.size_bytes += tamanho
+            # Descarta os menos usados até caber no limite
+            while self.size_bytes > self.max_bytes:
+                _, (_, removido) = self._entries.popitem(last=False)
+                self.size_bytes -= removido
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+
+_cache = ChartCache(CHART_CACHE_MAX_BYTES)
+
+
+def get_chart_cache() -> ChartCache:
+    """Cache de gráficos do processo (compartilhado pelas gerações de PDF)"""
+    return _cache
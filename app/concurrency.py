@@ -0,0 +1,54 @@
+"""
+Execução de trabalho bloqueante fora do event loop.
+
+Os handlers da API fazem consultas SQLAlchemy síncronas, processamento pandas e
+renderização Plotly/Folium. Executados direto em um `async def`, bloqueiam o event
+loop e serializam todas as requisições. Aqui eles rodam em threads, com dois
+limites independentes: consultas leves (listas, CRUD, dashboard) e trabalho
+pesado (análises, mapas, limpeza do banco). Uma análise longa não ocupa as vagas das
+consultas leves.
+"""
+
+import asyncio
+import functools
+import os
+import weakref
+from typing import Any, Callable, TypeVar
+
+import anyio
+from anyio import to_thread
+
+# Threads simultâneas por classe de trabalho
+BLOCKING_LIGHT_WORKERS = int(os.environ.get('BLOCKING_LIGHT_WORKERS', '16'))
+BLOCKING_HEAVY_WORKERS = int(os.environ.get('BLOCKING_HEAVY_WORKERS', '4'))
+
+# Limites por event loop (um CapacityLimiter pertence ao loop em que é usado)
+_limiters: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]' = weakref.WeakKeyDictionary()
+
+T = TypeVar('T')
+
+
+def _limiter(heavy: bool) -> anyio.CapacityLimiter:
+    # Criados sob demanda, dentro do event loop em execução
+    limites = _limiters.setdefault(asyncio.get_running_loop(), {})
+    if heavy not in limites:
+        limites[heavy] = anyio.CapacityLimiter(BLOCKING_HEAVY_WORKERS if heavy else BLOCKING_LIGHT_WORKERS)
+    return limites[heavy]
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, heavy: bool = False, **kwargs: Any) -> T:
+    """Executa func(*args, **kwargs) em uma thread do limite leve ou pesado e aguarda o resultado"""
+    return await to_thread.run_sync(functools.partial(func, *args, **kwargs), limiter=_limiter(heavy))
+
+
+def offload(heavy: bool = False) -> Callable[[Callable[..., T]], Callable[..., Any]]:
+    """
+    Decorador para handlers síncronos: o FastAPI enxerga a mesma assinatura, mas o
+    corpo roda em run_blocking (heavy=True para análises e mapas).
+    """
+    def decorator(func: Callable[..., T]) -> Callable[..., Any]:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            return await run_blocking(func, *args, heavy=heavy, **kwargs)
+        return wrapper
+    return decorator
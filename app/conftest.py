@@ -0,0 +1,14 @@
+# Fixtures compartilhadas pelos testes de app/
+# - temp_db: banco SQLite isolado por teste (DATABASE_URL apontando para tmp_path)
+
+import pytest
+
+from app.models import Base, create_database_engine
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Banco SQLite isolado por teste; retorna o diretório temporário do banco."""
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'telemetria_test.db'}")
+    Base.metadata.create_all(create_database_engine())
+    yield tmp_path
@@ -0,0 +1,126 @@
+"""
+Redução de séries temporais para gráficos (NumPy).
+
+Largest-Triangle-Three-Buckets (LTTB): divide a série em baldes e mantém, em cada
+um, o ponto que forma o maior triângulo com o ponto escolhido no balde anterior e
+a média do balde seguinte. Preserva a forma da curva com poucos pontos; em cada
+balde com trechos acima do limite de velocidade, o ponto mantido é o maior pico.
+"""
+
+import numpy as np
+from typing import Optional
+
+
+def _bucket_edges(n: int, n_out: int) -> np.ndarray:
+    """Limites dos n_out - 2 baldes do LTTB sobre os pontos internos [1, n - 1)"""
+    return np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+
+
+def lttb_indices(x, y, n_out: int) -> np.ndarray:
+    """
+    Índices (crescentes) dos n_out pontos escolhidos pelo LTTB; o primeiro e o
+    último ponto são sempre mantidos. Com n_out >= len(x) retorna todos.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1][:max(n_out, 0)], dtype=np.int64)
+
+    edges = _bucket_edges(n, n_out)
+    # Média de cada balde (e do último ponto, que serve de "próximo" ao último balde)
+    starts = np.append(edges[:-1], n - 1)
+    counts = np.diff(np.append(starts, n))
+    avg_x = np.add.reduceat(x, starts) / counts
+    avg_y = np.add.reduceat(y, starts) / counts
+
+    selecionados = np.empty(n_out, dtype=np.int64)
+    selecionados[0] = 0
+    selecionados[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        xs, ys = x[start:end], y[start:end]
+        # Dobro da área do triângulo (ponto anterior, candidato, média do próximo balde)
+        area = np.abs((x[a] - avg_x[i + 1]) * (ys - y[a]) - (x[a] - xs) * (avg_y[i + 1] - y[a]))
+        a = start + int(np.argmax(area))
+        selecionados[i + 1] = a
+    return selecionados
+
+
+def excursion_peaks(y, limite: float) -> np.ndarray:
+    """Índice do pico de cada trecho contíguo acima de `limite`"""
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    acima = y > limite
+    if not acima.any():
+        return np.array([], dtype=np.int64)
+
+    posicoes = np.flatnonzero(acima)
+    # Um novo trecho começa onde a posição anterior acima do limite não é vizinha
+    trecho = np.concatenate(([0], np.cumsum(np.diff(posicoes) > 1)))
+    # Maior valor de cada trecho (em empate, o primeiro)
+    ordem = np.lexsort((posicoes, -y[posicoes], trecho))
+    primeiros = np.concatenate(([True], np.diff(trecho[ordem]) > 0))
+    return np.sort(posicoes[ordem][primeiros])
+
+
+def downsample_indices(x, y, max_points: int, limite: Optional[float] = None) -> np.ndarray:
+    """
+    Índices (crescentes) dos pontos a plotar, no máximo max_points: LTTB, com o
+    ponto de cada balde trocado pelo maior pico do balde quando ele tem o máximo
+    global ou o pico de um trecho acima de `limite`. Trechos que dividem um balde
+    aparecem pelo mais alto. max_points <= 0 ou uma série já curta retornam todos
+    os índices.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if max_points <= 0 or n <= max_points:
+        return np.arange(n)
+
+    selecionados = lttb_indices(x, y, max_points)
+    if max_points < 3:
+        return selecionados
+
+    picos = [[int(np.nanargmax(y))] if np.isfinite(y).any() else []]
+    if limite is not None:
+        picos.append(excursion_peaks(y, limite))
+    picos = np.unique(np.concatenate(picos).astype(np.int64))
+    # O primeiro e o último ponto já são mantidos
+    picos = picos[(picos > 0) & (picos < n - 1)]
+    if len(picos) == 0:
+        return selecionados
+
+    # Balde de cada pico (posição 1 de selecionados = primeiro balde) e o mais alto por balde
+    balde = np.searchsorted(_bucket_edges(n, max_points), picos, side='right')
+    valores = np.nan_to_num(y[picos], nan=-np.inf)
+    ordem = np.lexsort((-valores, balde))
+    primeiros = np.concatenate(([True], np.diff(balde[ordem]) > 0))
+    balde, picos = balde[ordem][primeiros], picos[ordem][primeiros]
+
+    troca = valores[ordem][primeiros] >= np.nan_to_num(y[selecionados[balde]], nan=-np.inf)
+    selecionados = selecionados.copy()
+    selecionados[balde[troca]] = picos[troca]
+    return selecionados
+
+
+def merge_peaks(selecionados, picos, n: int) -> np.ndarray:
+    """
+    Troca o ponto de cada balde de `selecionados` (saída de lttb_indices ou de
+    downsample_indices sobre n pontos) pelo índice de `picos` que cai nele. Os picos
+    vêm em ordem de prioridade: num mesmo balde vale o primeiro. O primeiro e o
+    último ponto são sempre mantidos e a saída não cresce.
+    """
+    selecionados = np.asarray(selecionados, dtype=np.int64)
+    n_out = len(selecionados)
+    picos = np.asarray(picos, dtype=np.int64)
+    picos = picos[(picos > 0) & (picos < n - 1)]
+    if n_out < 3 or n_out >= n or len(picos) == 0:
+        return selecionados
+
+    balde = np.searchsorted(_bucket_edges(n, n_out), picos, side='right')
+    _, primeiros = np.unique(balde, return_index=True)
+    selecionados = selecionados.copy()
+    selecionados[balde[primeiros]] = picos[primeiros]
+    return selecionados
@@ -0,0 +1,177 @@
+"""
+Cálculos geográficos vetorizados (NumPy) para séries de posições de telemetria.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+EARTH_RADIUS_KM = 6371.0  # raio médio da Terra em km
+
+# Elipsoide WGS-84 (o mesmo usado por geopy.distance.geodesic)
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Distância haversine em km entre arrays de pontos (NaN se alguma coordenada faltar)
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def geodesic_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Distância elipsoidal (WGS-84) em km pela fórmula de Lambert.
+    Para os deslocamentos curtos entre posições a diferença para o geodésico exato é de milímetros.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+
+    # Latitudes reduzidas
+    beta1 = np.arctan((1 - WGS84_F) * np.tan(lat1))
+    beta2 = np.arctan((1 - WGS84_F) * np.tan(lat2))
+
+    # Ângulo central entre as latitudes reduzidas
+    a = np.sin((beta2 - beta1) / 2) ** 2 + np.cos(beta1) * np.cos(beta2) * np.sin((lon2 - lon1) / 2) ** 2
+    sigma = 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    p = (beta1 + beta2) / 2
+    q = (beta2 - beta1) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = (sigma - np.sin(sigma)) * np.sin(p) ** 2 * np.cos(q) ** 2 / np.cos(sigma / 2) ** 2
+        y = (sigma + np.sin(sigma)) * np.cos(p) ** 2 * np.sin(q) ** 2 / np.sin(sigma / 2) ** 2
+        distance = WGS84_A_KM * (sigma - WGS84_F / 2 * (x + y))
+
+    # Pontos coincidentes geram 0/0 no termo de correção
+    return np.where(sigma == 0, 0.0, distance)
+
+
+def consecutive_distances(lat, lon, groups=None, method: str = 'haversine') -> np.ndarray:
+    """
+    Distância em km entre cada ponto e o anterior (o primeiro ponto recebe 0).
+
+    Pares com coordenada ausente recebem 0. Se `groups` for informado (ex.: placas),
+    a distância é zerada na primeira linha de cada grupo; as linhas de um mesmo grupo
+    devem estar contíguas e em ordem cronológica.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    distances = np.zeros(len(lat))
+    if len(lat) < 2:
+        return distances
+
+    kernel = geodesic_km if method == 'geodesic' else haversine_km
+    segment = kernel(lat[:-1], lon[:-1], lat[1:], lon[1:])
+
+    if groups is not None:
+        groups = np.asarray(groups)
+        segment = np.where(groups[1:] == groups[:-1], segment, 0.0)
+
+    distances[1:] = np.nan_to_num(segment, nan=0.0)
+    return distances
+
+
+def path_length_by_group(df: pd.DataFrame, group_col: str, lat_col: str = 'lat',
+                         lon_col: str = 'lon', time_col: Optional[str] = None,
+                         method: str = 'haversine') -> pd.Series:
+    """
+    Distância percorrida (km) por grupo, ex.: por placa, somando os trechos consecutivos.
+    Ordena por grupo (e por `time_col`, se informado) antes do cálculo.
+    """
+    sort_cols = [group_col] + ([time_col] if time_col else [])
+    ordered = df.sort_values(sort_cols, kind='stable')
+    distances = consecutive_distances(
+        ordered[lat_col].to_numpy(), ordered[lon_col].to_numpy(),
+        groups=ordered[group_col].to_numpy(), method=method
+    )
+    return pd.Series(distances, index=ordered.index).groupby(ordered[group_col]).sum()
+
+
+def detect_gps_jumps(lat, lon, timestamps, max_distance_km: float = 500,
+                     max_window_h: float = 1, max_implied_speed_kmh: Optional[float] = None,
+                     groups=None) -> np.ndarray:
+    """
+    Marca pontos que "saltam" em relação ao anterior:
+    - deslocamento > `max_distance_km` em menos de `max_window_h` horas; ou
+    - velocidade implícita (distância / Δt) > `max_implied_speed_kmh`, se informada.
+    Pares com coordenada ou horário ausente nunca são marcados.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    jumps = np.zeros(len(lat), dtype=bool)
+    if len(lat) < 2:
+        return jumps
+
+    distance = haversine_km(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    delta_t_hours = pd.Series(pd.to_datetime(timestamps)).diff().dt.total_seconds().to_numpy()[1:] / 3600
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        segment = (distance > max_distance_km) & (delta_t_hours < max_window_h)
+        if max_implied_speed_kmh is not None:
+            segment |= (delta_t_hours > 0) & (distance / delta_t_hours > max_implied_speed_kmh)
+
+    if groups is not None:
+        groups = np.asarray(groups)
+        segment &= groups[1:] == groups[:-1]
+
+    jumps[1:] = segment
+    return jumps
+
+
+def simplify_route(lat, lon, tolerance_deg: float) -> np.ndarray:
+    """
+    Índices (crescentes) dos pontos mantidos pelo Douglas-Peucker: nenhum ponto
+    descartado fica a mais de `tolerance_deg` (em graus de latitude) do trecho
+    simplificado. A longitude é escalada por cos(latitude média), para que a
+    tolerância valha igualmente nas duas direções. Extremos sempre mantidos.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    n = len(lat)
+    if n <= 2 or tolerance_deg <= 0:
+        return np.arange(n)
+
+    x = lon * np.cos(np.radians(np.nanmean(lat)))
+    y = lat
+    manter = np.zeros(n, dtype=bool)
+    manter[[0, -1]] = True
+
+    pilha = [(0, n - 1)]
+    while pilha:
+        a, b = pilha.pop()
+        if b - a < 2:
+            continue
+        px, py = x[a + 1:b], y[a + 1:b]
+        dx, dy = x[b] - x[a], y[b] - y[a]
+        comprimento2 = dx * dx + dy * dy
+        # Distância ao segmento (não à reta): trajetos que voltam ao ponto de partida
+        if comprimento2 > 0:
+            t = np.clip(((px - x[a]) * dx + (py - y[a]) * dy) / comprimento2, 0.0, 1.0)
+        else:
+            t = 0.0
+        distancia = np.hypot(px - (x[a] + t * dx), py - (y[a] + t * dy))
+        i = int(np.argmax(distancia))
+        if distancia[i] > tolerance_deg:
+            meio = a + 1 + i
+            manter[meio] = True
+            pilha.append((a, meio))
+            pilha.append((meio, b))
+
+    return np.flatnonzero(manter)
+
+
+def route_tolerance(lat, lon, resolution: float) -> float:
+    """
+    Tolerância de simplificação proporcional à extensão da rota: a diagonal do
+    retângulo envolvente dividida por `resolution` (aprox. pixels visíveis)
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    if len(lat) == 0 or resolution <= 0:
+        return 0.0
+    escala = np.cos(np.radians(np.nanmean(lat)))
+    altura = np.nanmax(lat) - np.nanmin(lat)
+    largura = (np.nanmax(lon) - np.nanmin(lon)) * escala
+    return float(np.hypot(altura, largura) / resolution)
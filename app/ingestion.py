@@ -0,0 +1,239 @@
+"""
+Ingestão assíncrona de arquivos CSV enviados pela API.
+
+O upload é copiado para data/uploads em blocos (aiofiles), sem bloquear o event
+loop, e cada arquivo vira uma tarefa em um pool próprio (INGEST_WORKERS): vários
+arquivos são lidos e limpos em paralelo. A gravação no banco passa por uma trava
+única, o que evita bloqueios do SQLite e corridas na criação de clientes e
+veículos. Os arquivos de um mesmo envio formam um lote; o andamento por arquivo
+(registros lidos e gravados) é consultado em GET /api/uploads/{lote_id} ou
+acompanhado por SSE em GET /api/uploads/{lote_id}/eventos.
+"""
+
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import aiofiles
+from fastapi import UploadFile
+
+from .jobs import CONCLUIDO, ERRO, EXECUTANDO, PENDENTE, Job, JobQueue, JobQueueFull
+from .utils import CSVProcessor, PartialIngestError, convert_numpy_types
+
+# Arquivos processados ao mesmo tempo, arquivos aguardando e lotes mantidos para consulta
+INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', '4'))
+INGEST_MAX_PENDING = int(os.environ.get('INGEST_MAX_PENDING', '200'))
+INGEST_BATCH_HISTORY = int(os.environ.get('INGEST_BATCH_HISTORY', '100'))
+
+# Tamanho dos blocos na cópia do upload para o disco
+UPLOAD_CHUNK_BYTES = int(os.environ.get('UPLOAD_CHUNK_KB', '1024')) * 1024
+
+# Intervalo entre eventos SSE de andamento
+INGEST_EVENT_INTERVAL_S = float(os.environ.get('INGEST_EVENT_INTERVAL_S', '0.5'))
+
+# Uma gravação por vez, compartilhada por todos os arquivos em processamento
+_write_lock = threading.Lock()
+
+# O lote guarda suas tarefas: o histórico da fila não limita a consulta do lote
+_queue = JobQueue(max_workers=INGEST_WORKERS, max_pending=INGEST_MAX_PENDING,
+                  history=INGEST_MAX_PENDING, nome='ingestao', etapa_inicial='Processando')
+
+
+def get_ingest_queue() -> JobQueue:
+    """Fila de ingestão do processo"""
+    return _queue
+
+
+class UploadBatch:
+    """Arquivos de um mesmo envio e o andamento de cada um"""
+
+    def __init__(self, cliente_nome: str):
+        self.id = uuid.uuid4().hex
+        self.cliente_nome = cliente_nome
+        self.criado_em = datetime.now()
+        self.arquivos: List[Dict[str, Any]] = []  # {'arquivo', 'job'} ou {'arquivo', 'erro'}
+        self.ignorados: List[str] = []
+
+    @property
+    def finished(self) -> bool:
+        return all(item.get('job') is None or item['job'].finished for item in self.arquivos)
+
+    def _arquivo(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        job: Optional[Job] = item.get('job')
+        if job is None:
+            return {'arquivo': item['arquivo'], 'status': ERRO, 'progresso': 0, 'etapa': 'Recusado',
+                    'registros_lidos': 0, 'registros_gravados': 0, 'erro': item['erro']}
+
+        estado = {
+            'arquivo': item['arquivo'],
+            'job_id': job.id,
+            'status': job.status,
+            'progresso': job.progresso,
+            'etapa': job.etapa,
+            'registros_lidos': job.detalhes.get('registros_lidos', 0),
+            'registros_gravados': job.detalhes.get('registros_gravados', 0),
+        }
+        if job.status == CONCLUIDO:
+            estado['resultado'] = job.resultado
+        if job.status == ERRO:
+            estado['erro'] = job.erro
+            if 'ingestao_parcial' in job.detalhes:
+                estado['parcial'] = job.detalhes['ingestao_parcial']
+        return estado
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Estado do lote para a API (totais e andamento por arquivo)"""
+        arquivos = [self._arquivo(item) for item in self.arquivos]
+        status_arquivos = [a['status'] for a in arquivos]
+
+        if self.finished:
+            status = CONCLUIDO
+        elif all(s == PENDENTE for s in status_arquivos if s != ERRO):
+            status = PENDENTE
+        else:
+            status = EXECUTANDO
+
+        return convert_numpy_types({
+            'lote_id': self.id,
+            'cliente_nome': self.cliente_nome,
+            'status': status,
+            'progresso': round(sum(a['progresso'] if a['status'] != ERRO else 100 for a in arquivos)
+                               / len(arquivos)) if arquivos else 100,
+            'criado_em': self.criado_em.isoformat(),
+            'total_arquivos': len(arquivos),
+            'concluidos': status_arquivos.count(CONCLUIDO),
+            'com_erro': status_arquivos.count(ERRO),
+            'registros_lidos': sum(a['registros_lidos'] for a in arquivos),
+            'registros_gravados': sum(a['registros_gravados'] for a in arquivos),
+            'arquivos': arquivos,
+            'ignorados': list(self.ignorados),
+        })
+
+
+_batches: 'OrderedDict[str, UploadBatch]' = OrderedDict()
+_batches_lock = threading.Lock()
+
+
+def _register_batch(lote: UploadBatch) -> None:
+    with _batches_lock:
+        _batches[lote.id] = lote
+        # Descarta os lotes concluídos mais antigos além do histórico
+        excedente = len(_batches) - INGEST_BATCH_HISTORY
+        for lote_id in list(_batches):
+            if excedente <= 0:
+                break
+            if _batches[lote_id].finished:
+                del _batches[lote_id]
+                excedente -= 1
+
+
+def get_upload_batch(lote_id: str) -> Optional[UploadBatch]:
+    """Lote pelo id (None se desconhecido ou já descartado do histórico)"""
+    with _batches_lock:
+        return _batches.get(lote_id)
+
+
+async def save_upload(upload: UploadFile, destino: Path, chunk_bytes: int = UPLOAD_CHUNK_BYTES) -> int:
+    """Copia o upload para destino em blocos, sem bloquear o event loop; retorna o tamanho em bytes"""
+    total = 0
+    async with aiofiles.open(destino, 'wb') as arquivo:
+        while True:
+            bloco = await upload.read(chunk_bytes)
+            if not bloco:
+                break
+            await arquivo.write(bloco)
+            total += len(bloco)
+    return total
+
+
+def ingest_file(job: Job, caminho: Path, cliente_nome: str, streaming_threshold: int) -> Dict:
+    """
+    Lê, limpa e grava um arquivo já salvo em disco, atualizando job.detalhes com
+    os registros lidos e gravados. O arquivo é removido ao final.
+    """
+    processor = CSVProcessor()
+    processor.write_lock = _write_lock
+    detalhes = job.detalhes
+    detalhes.update({'registros_lidos': 0, 'registros_gravados': 0})
+
+    try:
+        if caminho.stat().st_size > streaming_threshold:
+            # Arquivo grande: lê, limpa e grava bloco a bloco
+            job.set_progress(10, 'Processando em blocos')
+
+            def progresso(stats: Dict) -> None:
+                detalhes['registros_lidos'] = stats['rows_read']
+                detalhes['registros_gravados'] = stats['rows_written']
+                detalhes['blocos'] = stats['chunks']
+
+            try:
+                stats = processor.process_csv_streaming(str(caminho), cliente_nome, on_progress=progresso)
+            except PartialIngestError as e:
+                # Blocos anteriores ficam gravados: o lote informa até onde o arquivo entrou
+                detalhes['ingestao_parcial'] = {
+                    'registros_gravados': e.stats['rows_written'],
+                    'bloco_falha': e.stats['failed_chunk'],
+                    'linha_falha': e.stats['failed_row'],
+                }
+                raise
+            return {'success': True, 'records_processed': stats['rows_written'], 'streaming': stats}
+
+        job.set_progress(10, 'Lendo arquivo')
+        df = processor.read_csv_file(str(caminho))
+        detalhes['registros_lidos'] = int(len(df))
+
+        job.set_progress(40, 'Limpando dados')
+        df_clean = processor.clean_and_parse_data(df)
+        metrics = processor.calculate_metrics(df_clean)
+
+        job.set_progress(70, 'Gravando no banco')
+        if not processor.save_to_database(df_clean, cliente_nome):
+            return {'success': False, 'error': 'Falha ao gravar os registros no banco de dados'}
+        detalhes['registros_gravados'] = processor.last_save_stats.get('rows', 0)
+
+        return {
+            'success': True,
+            'records_processed': int(len(df_clean)),
+            'metrics': convert_numpy_types(metrics)
+        }
+    finally:
+        if caminho.exists():
+            caminho.unlink()
+
+
+async def start_upload_batch(files: List[UploadFile], cliente_nome: str, upload_dir: Path,
+                             streaming_threshold: int) -> UploadBatch:
+    """
+    Salva os arquivos CSV enviados em upload_dir e enfileira a ingestão de cada um.
+    Arquivos que não são CSV vão para `ignorados`; com a fila cheia, o arquivo é
+    recusado e registrado com erro no lote.
+    """
+    lote = UploadBatch(cliente_nome)
+
+    for indice, upload in enumerate(files):
+        nome = Path(upload.filename or '').name
+        if not nome.endswith('.csv'):
+            lote.ignorados.append(nome)
+            continue
+
+        # Prefixo do lote: envios simultâneos com o mesmo nome de arquivo não colidem
+        caminho = upload_dir / f"{lote.id}_{indice}_{nome}"
+        await save_upload(upload, caminho)
+
+        try:
+            job = _queue.submit('ingestao_csv', (lote.id, indice),
+                                partial(ingest_file, caminho=caminho, cliente_nome=cliente_nome,
+                                        streaming_threshold=streaming_threshold))
+        except JobQueueFull as e:
+            caminho.unlink()
+            lote.arquivos.append({'arquivo': nome, 'erro': str(e)})
+            continue
+        lote.arquivos.append({'arquivo': nome, 'job': job})
+
+    _register_batch(lote)
+    return lote
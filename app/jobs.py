@@ -0,0 +1,181 @@
+"""
+Fila de tarefas em segundo plano para a geração de relatórios PDF.
+
+Os endpoints enfileiram a geração e respondem na hora com o id da tarefa; um pool
+de threads limitado (REPORT_JOB_WORKERS) executa o pipeline (consulta, pandas,
+ReportLab) fora do event loop. Pedidos idênticos ainda em andamento reutilizam a
+mesma tarefa. O andamento é consultado em GET /api/jobs/{id}.
+
+JobQueue também serve à ingestão de CSV (app/ingestion.py), com pool próprio.
+"""
+
+import os
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# Tarefas executadas ao mesmo tempo, tarefas aguardando e tarefas concluídas mantidas para consulta
+REPORT_JOB_WORKERS = int(os.environ.get('REPORT_JOB_WORKERS', '2'))
+REPORT_JOB_MAX_PENDING = int(os.environ.get('REPORT_JOB_MAX_PENDING', '50'))
+REPORT_JOB_HISTORY = int(os.environ.get('REPORT_JOB_HISTORY', '500'))
+
+# Estados de uma tarefa
+PENDENTE = 'pendente'
+EXECUTANDO = 'executando'
+CONCLUIDO = 'concluido'
+ERRO = 'erro'
+
+
+class JobQueueFull(Exception):
+    """Fila de tarefas cheia (max_pending tarefas aguardando)"""
+
+
+class Job:
+    """Uma geração de relatório enfileirada"""
+
+    def __init__(self, tipo: str, chave: Hashable):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.chave = chave
+        self.status = PENDENTE
+        self.progresso = 0
+        self.etapa = 'Na fila'
+        self.resultado: Optional[Dict] = None
+        self.detalhes: Dict[str, Any] = {}  # contadores específicos da tarefa (ex.: registros lidos)
+        self.erro: Optional[str] = None
+        self.criado_em = datetime.now()
+        self.iniciado_em: Optional[datetime] = None
+        self.concluido_em: Optional[datetime] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (CONCLUIDO, ERRO)
+
+    def set_progress(self, progresso: int, etapa: Optional[str] = None) -> None:
+        """Atualiza o andamento (0-100) e a descrição da etapa atual"""
+        self.progresso = max(0, min(100, int(progresso)))
+        if etapa:
+            self.etapa = etapa
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Estado da tarefa para a API"""
+        dados = {
+            'job_id': self.id,
+            'tipo': self.tipo,
+            'status': self.status,
+            'progresso': self.progresso,
+            'etapa': self.etapa,
+            'criado_em': self.criado_em.isoformat(),
+            'iniciado_em': self.iniciado_em.isoformat() if self.iniciado_em else None,
+            'concluido_em': self.concluido_em.isoformat() if self.concluido_em else None,
+        }
+        if self.detalhes:
+            dados['detalhes'] = dict(self.detalhes)
+        if self.status == CONCLUIDO:
+            dados['resultado'] = self.resultado
+            if isinstance(self.resultado, dict) and self.resultado.get('download_url'):
+                dados['download_url'] = self.resultado['download_url']
+        if self.status == ERRO:
+            dados['erro'] = self.erro
+        return dados
+
+
+class JobQueue:
+    """Pool de threads limitado com deduplicação de pedidos idênticos em andamento"""
+
+    def __init__(self, max_workers: int = REPORT_JOB_WORKERS, max_pending: int = REPORT_JOB_MAX_PENDING,
+                 history: int = REPORT_JOB_HISTORY, nome: str = 'relatorio',
+                 etapa_inicial: str = 'Gerando relatório'):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.history = history
+        self.nome = nome
+        self.etapa_inicial = etapa_inicial
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._em_andamento: Dict[Hashable, Job] = {}
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.nome)
+        return self._executor
+
+    def submit(self, tipo: str, chave: Hashable, func: Callable[[Job], Dict]) -> Job:
+        """
+        Enfileira func(job) e retorna a tarefa. Se já houver uma tarefa com a mesma
+        chave pendente ou executando, ela é retornada no lugar de uma nova.
+        Levanta JobQueueFull quando há max_pending tarefas aguardando.
+        """
+        with self._lock:
+            existente = self._em_andamento.get(chave)
+            if existente is not None:
+                return existente
+
+            pendentes = sum(1 for job in self._em_andamento.values() if job.status == PENDENTE)
+            if pendentes >= self.max_pending:
+                raise JobQueueFull(f"{pendentes} tarefas aguardando na fila; tente novamente em instantes")
+
+            job = Job(tipo, chave)
+            self._jobs[job.id] = job
+            self._em_andamento[chave] = job
+            self._trim_history()
+            self._pool().submit(self._run, job, func)
+        return job
+
+    def _run(self, job: Job, func: Callable[[Job], Dict]) -> None:
+        job.status = EXECUTANDO
+        job.iniciado_em = datetime.now()
+        job.set_progress(5, self.etapa_inicial)
+        try:
+            resultado = func(job)
+            if isinstance(resultado, dict) and resultado.get('success') is False:
+                job.erro = resultado.get('error') or resultado.get('message') or 'Erro ao gerar relatório'
+                job.status = ERRO
+            else:
+                job.resultado = resultado
+                job.set_progress(100, 'Concluído')
+                job.status = CONCLUIDO
+        except Exception as e:
+            print(f"Erro na tarefa {job.id} ({job.tipo}): {e}")
+            print(traceback.format_exc())
+            job.erro = str(e)
+            job.status = ERRO
+        finally:
+            job.concluido_em = datetime.now()
+            with self._lock:
+                if self._em_andamento.get(job.chave) is job:
+                    del self._em_andamento[job.chave]
+
+    def _trim_history(self) -> None:
+        # Descarta as tarefas concluídas mais antigas além do histórico
+        excedente = len(self._jobs) - self.history
+        for job_id in list(self._jobs):
+            if excedente <= 0:
+                break
+            if self._jobs[job_id].finished:
+                del self._jobs[job_id]
+                excedente -= 1
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Tarefa pelo id (None se desconhecida ou já descartada do histórico)"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Encerra o pool (tarefas pendentes são concluídas se wait=True)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+_queue = JobQueue()
+
+
+def get_job_queue() -> JobQueue:
+    """Fila de relatórios do processo"""
+    return _queue
@@ -3,20 +3,30 @@ API FastAPI principal para o sistema de relatórios de telemetria veicular.
 """
 
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, Query
-from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.requests import Request
+from starlette.middleware.gzip import GZipMiddleware
 from datetime import datetime, timedelta, time
 from typing import Optional, List
+import asyncio
+import json
 import os
-import shutil
 import tempfile
 from pathlib import Path
 
 from .models import init_database, get_session, Cliente, Veiculo, PosicaoHistorica, RelatorioGerado, PerfilHorario
 from .utils import CSVProcessor, convert_numpy_types
-from .services import ReportGenerator, TelemetryAnalyzer
+from .periods import ANALYZER_CLASSIFIER, invalidate_period_cache
+from .result_cache import cached_result, invalidate_results
+from .jobs import JobQueueFull, get_job_queue
+from .ingestion import INGEST_EVENT_INTERVAL_S, get_ingest_queue, get_upload_batch, start_upload_batch
+from .concurrency import offload
+from .services import (CHART_FORMATS, CHART_MAX_POINTS, PLOTLY_JS_FILENAME, ROUTE_SIMPLIFY_RESOLUTION, ReportGenerator,
+                       TelemetryAnalyzer, plotly_js_bundle, shutdown_fleet_pool)
+from .geo import route_tolerance
+from .route_geometry import GEOMETRY_FORMATS, PERIOD_COLORS, ROUTE_PAGE_HOURS, route_geometry
 from .reports import generate_consolidated_vehicle_report
 # Removed old generate_vehicle_report - now uses standardized consolidated generation
 
@@ -27,13 +37,33 @@ app = FastAPI(
     version="1.0.0"
 )
 
+class CompressionMiddleware(GZipMiddleware):
+    """
+    GZip nas respostas (JSON das análises, plotly.js), exceto eventos SSE, que
+    precisam chegar um a um, e downloads de PDF, já comprimidos
+    """
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "") if scope["type"] == "http" else ""
+        if path.endswith("/eventos") or path.startswith("/api/download/"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+app.add_middleware(CompressionMiddleware, minimum_size=1024, compresslevel=6)
+
 # Configuração de diretórios
 BASE_DIR = Path(__file__).parent.parent
 STATIC_DIR = BASE_DIR / "frontend" / "static"
+# plotly.js servido da memória (nada é gravado na árvore do projeto); o nome com a
+# versão invalida o cache do navegador na atualização
+PLOTLY_JS_URL = f"/vendor/{PLOTLY_JS_FILENAME}"
 TEMPLATES_DIR = BASE_DIR / "frontend" / "templates"
 UPLOAD_DIR = BASE_DIR / "data" / "uploads"
 REPORTS_DIR = BASE_DIR / "reports"
 
+# Arquivos acima deste tamanho são processados em blocos (memória limitada)
+STREAMING_UPLOAD_THRESHOLD_BYTES = int(os.environ.get('STREAMING_UPLOAD_THRESHOLD_MB', '50')) * 1024 * 1024
+
 # Cria diretórios necessários
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 REPORTS_DIR.mkdir(parents=True, exist_ok=True)
@@ -47,18 +77,34 @@ templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
 # Inicialização do banco de dados
 @app.on_event("startup")
 async def startup_event():
-    """Inicializa o banco de dados na inicialização da aplicação"""
+    """Inicializa o banco de dados"""
     try:
         init_database()
         print("✅ Banco de dados inicializado com sucesso!")
     except Exception as e:
         print(f"❌ Erro ao inicializar banco de dados: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Encerra os pools da fila de relatórios, da ingestão de CSV e da frota"""
+    get_job_queue().shutdown(wait=False)
+    get_ingest_queue().shutdown(wait=False)
+    shutdown_fleet_pool()
+
 # Rotas principais
+# Handlers com trabalho bloqueante (SQLAlchemy, pandas, arquivos, Plotly/Folium) são
+# síncronos e decorados com @offload: rodam em threads limitadas (app/concurrency.py),
+# fora do event loop; heavy=True separa análises e mapas das consultas leves
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
     """Página inicial da aplicação"""
-    return templates.TemplateResponse("index.html", {"request": request})
+    return templates.TemplateResponse("index.html", {"request": request, "plotly_js_url": PLOTLY_JS_URL})
+
+@app.get(PLOTLY_JS_URL)
+def plotly_js():
+    """plotly.js da versão instalada, com cache permanente no navegador"""
+    return Response(plotly_js_bundle(), media_type="application/javascript",
+                    headers={"Cache-Control": "public, max-age=31536000, immutable"})
 
 @app.get("/health")
 async def health_check():
@@ -71,7 +117,8 @@ async def health_check():
 
 # Rotas para gerenciamento de clientes
 @app.get("/api/clientes")
-async def listar_clientes():
+@offload()
+def listar_clientes():
     """Lista todos os clientes cadastrados"""
     session = get_session()
     try:
@@ -90,7 +137,8 @@ async def listar_clientes():
         session.close()
 
 @app.post("/api/clientes")
-async def criar_cliente(
+@offload()
+def criar_cliente(
     nome: str = Form(...),
     consumo_medio_kmL: float = Form(12.0),
     limite_velocidade: int = Form(80)
@@ -125,7 +173,8 @@ async def criar_cliente(
 
 # Rotas para gerenciamento de veículos
 @app.get("/api/veiculos")
-async def listar_veiculos():
+@offload()
+def listar_veiculos():
     """Lista todos os veículos cadastrados"""
     session = get_session()
     try:
@@ -145,7 +194,8 @@ async def listar_veiculos():
         session.close()
 
 @app.get("/api/veiculos/{placa}")
-async def obter_veiculo(placa: str):
+@offload()
+def obter_veiculo(placa: str):
     """Obtém informações de um veículo específico"""
     session = get_session()
     try:
@@ -164,77 +214,205 @@ async def obter_veiculo(placa: str):
     finally:
         session.close()
 
+@app.get("/api/posicoes/{posicao_id}")
+@offload()
+def obter_posicao(posicao_id: int):
+    """Detalhes de uma posição para o popup dos mapas (carregado ao abrir o popup do marcador)"""
+    session = get_session()
+    try:
+        posicao = session.get(PosicaoHistorica, posicao_id)
+        if not posicao:
+            raise HTTPException(status_code=404, detail="Posição não encontrada")
+        
+        endereco = str(posicao.endereco or 'N/A')
+        return {
+            "id": posicao.id,
+            "placa": posicao.veiculo.placa,
+            "data_hora": posicao.data_evento.strftime('%d/%m/%Y %H:%M'),
+            "velocidade_kmh": posicao.velocidade_kmh,
+            "periodo_operacional": ANALYZER_CLASSIFIER.classify_one(posicao.data_evento),
+            "ignicao": posicao.ignicao,
+            "endereco": endereco if len(endereco) <= 50 else endereco[:50] + '...'
+        }
+    finally:
+        session.close()
+
 # Endpoint removido por questões de segurança
 # Operações de limpeza de banco devem ser feitas via admin/CLI com autenticação apropriada
 
 # Rotas para upload e processamento de CSV
-@app.post("/api/upload-csv")
+@app.post("/api/upload-csv", status_code=202)
 async def upload_csv(
     files: List[UploadFile] = File(...),
     cliente_nome: Optional[str] = Form(None)
 ):
-    """Upload e processamento de arquivos CSV"""
+    """
+    Upload de arquivos CSV: salva cada arquivo e enfileira sua ingestão (vários em paralelo).
+    Responde com o id do lote; andamento por arquivo em GET /api/uploads/{lote_id}
+    (ou por SSE em /api/uploads/{lote_id}/eventos).
+    """
     try:
-        processor = CSVProcessor()
-        results = {}
+        lote = await start_upload_batch(files, cliente_nome or "Cliente Padrão", UPLOAD_DIR,
+                                        STREAMING_UPLOAD_THRESHOLD_BYTES)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if lote.arquivos and all(item.get('job') is None for item in lote.arquivos):
+        # Nenhum arquivo aceito: fila de ingestão cheia
+        raise HTTPException(status_code=503, detail=lote.arquivos[0]['erro'])
+
+    estado = lote.to_dict()
+    return {
+        "success": True,
+        "message": f"{estado['total_arquivos']} arquivo(s) em processamento",
+        "lote_id": lote.id,
+        "status": estado['status'],
+        "status_url": f"/api/uploads/{lote.id}",
+        "eventos_url": f"/api/uploads/{lote.id}/eventos",
+        "arquivos": [arquivo['arquivo'] for arquivo in estado['arquivos']],
+        "ignorados": estado['ignorados']
+    }
+
+@app.get("/api/uploads/{lote_id}")
+async def consultar_upload(lote_id: str):
+    """Andamento da ingestão de um lote de arquivos (status, registros lidos e gravados por arquivo)"""
+    lote = get_upload_batch(lote_id)
+    if lote is None:
+        raise HTTPException(status_code=404, detail="Lote de upload não encontrado")
+    return lote.to_dict()
+
+@app.get("/api/uploads/{lote_id}/eventos")
+async def acompanhar_upload(lote_id: str):
+    """Andamento da ingestão como Server-Sent Events; o fluxo termina quando o lote conclui"""
+    lote = get_upload_batch(lote_id)
+    if lote is None:
+        raise HTTPException(status_code=404, detail="Lote de upload não encontrado")
+    
+    async def eventos():
+        anterior = None
+        while True:
+            concluido = lote.finished
+            dados = json.dumps(lote.to_dict(), ensure_ascii=False)
+            if dados != anterior:
+                yield f"data: {dados}\n\n"
+                anterior = dados
+            if concluido:
+                break
+            await asyncio.sleep(INGEST_EVENT_INTERVAL_S)
+    
+    return StreamingResponse(eventos(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+# Rotas para análise e relatórios
+@app.get("/api/analise/{placa}/rota")
+@offload(heavy=True)
+def obter_rota(
+    placa: str,
+    data_inicio: str,
+    data_fim: str,
+    formato: str = Query('polyline', description="Geometria: polyline (polilinhas codificadas) ou geojson"),
+    janela_horas: int = Query(ROUTE_PAGE_HOURS, ge=1, description="Duração de cada página da rota"),
+    resolucao: float = Query(ROUTE_SIMPLIFY_RESOLUTION, gt=0, description="Extensão da rota / tolerância da simplificação"),
+    tolerancia: Optional[float] = Query(None, ge=0, description="Tolerância da simplificação (graus); padrão: calculada sobre todo o período pedido")
+):
+    """
+    Geometria da rota em trechos por período operacional, uma página por janela de
+    tempo a partir de data_inicio; `proxima_pagina` traz as datas e a tolerância da
+    página seguinte (null na última). Todas as páginas usam a tolerância calculada
+    sobre o período inteiro da primeira, e o último trecho de cada página termina no
+    primeiro ponto da seguinte. Para o mapa Leaflet do navegador, no lugar do HTML do Folium.
+    """
+    try:
+        if not placa or not placa.strip():
+            raise HTTPException(status_code=400, detail="Placa é obrigatória")
+        if formato not in GEOMETRY_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Formato de geometria inválido: {formato} (use {', '.join(GEOMETRY_FORMATS)})")
         
-        for file in files:
-            if not file.filename.endswith('.csv'):
-                continue
-            
-            # Salva arquivo temporariamente
-            temp_path = UPLOAD_DIR / file.filename
-            with open(temp_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
+        try:
+            dt_inicio = datetime.fromisoformat(data_inicio.replace('Z', '+00:00'))
+            dt_fim = datetime.fromisoformat(data_fim.replace('Z', '+00:00'))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Formato de data inválido: {str(e)}")
+        
+        if dt_inicio >= dt_fim:
+            raise HTTPException(status_code=400, detail="Data de início deve ser anterior à data de fim")
+        # Mesmo dia: até o fim do dia, como nas análises
+        if dt_inicio.date() == dt_fim.date():
+            dt_fim = dt_fim.replace(hour=23, minute=59, second=59, microsecond=999999)
+        
+        session = get_session()
+        try:
+            veiculo = session.query(Veiculo).filter(Veiculo.placa == placa.upper()).first()
+            if not veiculo:
+                raise HTTPException(status_code=404, detail=f"Veículo com placa {placa} não encontrado")
+        finally:
+            session.close()
+        
+        fim_pagina = min(dt_inicio + timedelta(hours=janela_horas), dt_fim)
+        ultima = fim_pagina >= dt_fim
+        # Páginas semiabertas [início, fim); a última inclui data_fim
+        limite = fim_pagina + timedelta(microseconds=1) if ultima else fim_pagina
+        fim_rota = dt_fim + timedelta(microseconds=1)
+        
+        if tolerancia is None:
+            # Mesma tolerância para todas as páginas: extensão do período inteiro
+            analyzer = TelemetryAnalyzer()
             try:
-                # Processa arquivo
-                df = processor.read_csv_file(str(temp_path))
-                df_clean = processor.clean_and_parse_data(df)
-                
-                # Calcula métricas
-                metrics = processor.calculate_metrics(df_clean)
-                
-                # Salva no banco
-                success = processor.save_to_database(df_clean, cliente_nome or "Cliente Padrão")
-                
-                results[file.filename] = {
-                    "success": success,
-                    "records_processed": int(len(df_clean)),
-                    "metrics": convert_numpy_types(metrics)
-                }
-                
-            except Exception as e:
-                results[file.filename] = {
-                    "success": False,
-                    "error": str(e)
-                }
+                extensao = analyzer.get_route_extent(placa.upper(), dt_inicio, fim_rota)
             finally:
-                # Remove arquivo temporário
-                if temp_path.exists():
-                    temp_path.unlink()
+                analyzer.session.close()
+            tolerancia = route_tolerance(*extensao, resolucao) if extensao else 0.0
         
-        return convert_numpy_types({
-            "success": True,
-            "message": f"Processados {len(files)} arquivos",
-            "results": results
-        })
+        def _gerar_rota():
+            analyzer = TelemetryAnalyzer()
+            try:
+                df = analyzer.get_route_points(placa.upper(), dt_inicio, limite)
+                # Primeiro ponto da página seguinte, para a linha continuar entre páginas
+                ligacao = None if ultima else analyzer.get_first_route_point(placa.upper(), limite, fim_rota)
+            finally:
+                analyzer.session.close()
+            return convert_numpy_types({
+                'success': True,
+                'placa': placa.upper(),
+                'formato': formato,
+                'data_inicio': dt_inicio.isoformat(),
+                'data_fim': fim_pagina.isoformat(),
+                'periodos': PERIOD_COLORS,
+                **route_geometry(df, formato, resolucao, tolerancia, ligacao),
+                'proxima_pagina': None if ultima else {
+                    'data_inicio': fim_pagina.isoformat(),
+                    'data_fim': dt_fim.isoformat(),
+                    'tolerancia': tolerancia
+                }
+            })
         
+        # Cada página fica em cache enquanto dados e perfis do veículo não mudarem
+        return cached_result(f'rota_{formato}_{tolerancia!r}_{dt_fim.isoformat()}', placa.upper(),
+                             dt_inicio, limite, _gerar_rota)
+        
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        import traceback
+        print(f"Erro na geração da geometria da rota: {str(e)}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
 
-# Rotas para análise e relatórios
 @app.get("/api/analise/{placa}/mapa-detalhado")
-async def gerar_mapa_detalhado(
+@offload(heavy=True)
+def gerar_mapa_detalhado(
     placa: str,
     data_inicio: str,
-    data_fim: str
+    data_fim: str,
+    graficos: str = Query('json', description="Saída dos gráficos Plotly: json, div ou html"),
+    mapas: bool = Query(True, description="Inclui os mapas Folium em HTML (false: usar GET /api/analise/{placa}/rota)")
 ):
     """Gera mapa detalhado de rotas com dados operacionais"""
     try:
         # Validação de entrada
         if not placa or not placa.strip():
             raise HTTPException(status_code=400, detail="Placa é obrigatória")
+        if graficos not in CHART_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Formato de gráficos inválido: {graficos} (use {', '.join(CHART_FORMATS)})")
             
         # Converte datas
         try:
@@ -256,42 +434,46 @@ async def gerar_mapa_detalhado(
         finally:
             session.close()
         
-        # Gera análise com mapa detalhado
-        analyzer = TelemetryAnalyzer()
-        df = analyzer.get_vehicle_data(placa, dt_inicio, dt_fim)
-        
-        if df.empty:
-            return {
-                'success': False,
-                'message': 'Nenhum dado encontrado para o período especificado.'
+        def _gerar_mapa_detalhado():
+            # Gera análise com mapa detalhado
+            analyzer = TelemetryAnalyzer()
+            df = analyzer.get_vehicle_data(placa, dt_inicio, dt_fim, columns=analyzer.MAP_DATA_COLUMNS)
+            
+            if df.empty:
+                return {
+                    'success': False,
+                    'message': 'Nenhum dado encontrado para o período especificado.'
+                }
+            
+            # Gera métricas
+            metrics = analyzer.generate_summary_metrics(df, placa)
+            
+            # Gera gráficos adicionais
+            speed_chart = analyzer.create_speed_chart(df, graficos)
+            periods_chart = analyzer.create_operational_periods_chart(df, graficos)
+            ignition_chart = analyzer.create_ignition_status_chart(df, graficos)
+            
+            # Análise de combustível
+            fuel_analysis = analyzer.create_fuel_consumption_analysis(metrics)
+            
+            resultado = {
+                'success': True,
+                'metrics': convert_numpy_types(metrics),
+                'charts': {
+                    'speed_chart': speed_chart,
+                    'periods_chart': periods_chart,
+                    'ignition_chart': ignition_chart
+                },
+                'fuel_analysis': fuel_analysis,
+                'data_count': len(df)
             }
+            if mapas:
+                resultado['detailed_map'] = analyzer.create_detailed_route_map(df)
+                resultado['regular_map'] = analyzer.create_route_map(df)
+            return resultado
         
-        # Gera métricas e mapas
-        metrics = analyzer.generate_summary_metrics(df, placa)
-        detailed_map = analyzer.create_detailed_route_map(df)
-        regular_map = analyzer.create_route_map(df)
-        
-        # Gera gráficos adicionais
-        speed_chart = analyzer.create_speed_chart(df)
-        periods_chart = analyzer.create_operational_periods_chart(df)
-        ignition_chart = analyzer.create_ignition_status_chart(df)
-        
-        # Análise de combustível
-        fuel_analysis = analyzer.create_fuel_consumption_analysis(metrics)
-        
-        return {
-            'success': True,
-            'metrics': convert_numpy_types(metrics),
-            'detailed_map': detailed_map,
-            'regular_map': regular_map,
-            'charts': {
-                'speed_chart': speed_chart,
-                'periods_chart': periods_chart,
-                'ignition_chart': ignition_chart
-            },
-            'fuel_analysis': fuel_analysis,
-            'data_count': len(df)
-        }
+        # Reutiliza o resultado enquanto dados e perfis do veículo não mudarem
+        return cached_result(f'mapa_detalhado_{graficos}_{int(mapas)}', placa.upper(), dt_inicio, dt_fim, _gerar_mapa_detalhado)
         
     except HTTPException:
         raise  # Re-raise HTTP exceptions
@@ -303,16 +485,22 @@ async def gerar_mapa_detalhado(
         raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
 
 @app.get("/api/analise/{placa}")
-async def gerar_analise(
+@offload(heavy=True)
+def gerar_analise(
     placa: str,
     data_inicio: str = Query(..., description="Data inicial no formato YYYY-MM-DD ou ISO8601"),
-    data_fim: str = Query(..., description="Data final no formato YYYY-MM-DD ou ISO8601")
+    data_fim: str = Query(..., description="Data final no formato YYYY-MM-DD ou ISO8601"),
+    graficos: str = Query('json', description="Saída dos gráficos Plotly: json (figura), div (usa o plotly.js de /static) ou html (plotly.js embutido)"),
+    pontos: int = Query(CHART_MAX_POINTS, ge=0, description="Pontos do gráfico de velocidade após a redução LTTB (0 = todos)"),
+    mapa: bool = Query(True, description="Inclui o mapa Folium em HTML (false: usar GET /api/analise/{placa}/rota)")
 ):
     """Gera análise completa de um veículo"""
     try:
         # Validação de entrada
         if not placa or not placa.strip():
             raise HTTPException(status_code=400, detail="Placa é obrigatória")
+        if graficos not in CHART_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Formato de gráficos inválido: {graficos} (use {', '.join(CHART_FORMATS)})")
             
         # Converte datas de forma robusta (ISO ou YYYY-MM-DD)
         try:
@@ -349,10 +537,13 @@ async def gerar_analise(
         finally:
             session.close()
         
-        # Gera análise
-        generator = ReportGenerator()
-        result = generator.generate_complete_analysis(placa.upper(), dt_inicio, dt_fim)
-        return JSONResponse(content=convert_numpy_types(result))
+        # Gera análise (reutilizada enquanto dados e perfis do veículo não mudarem)
+        result = cached_result(
+            f'analise_{graficos}_{pontos}_{int(mapa)}', placa.upper(), dt_inicio, dt_fim,
+            lambda: convert_numpy_types(ReportGenerator().generate_complete_analysis(placa.upper(), dt_inicio, dt_fim,
+                                                                                   graficos, pontos, mapa))
+        )
+        return JSONResponse(content=result)
     except HTTPException:
         raise
     except Exception as e:
@@ -361,34 +552,45 @@ async def gerar_analise(
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
 
-@app.post("/api/relatorio/{placa}")
+@app.post("/api/relatorio/{placa}", status_code=202)
 async def gerar_relatorio_pdf(
     placa: str,
     data_inicio: str = Form(...),
     data_fim: str = Form(...)
 ):
-    """Gera relatório PDF padronizado para qualquer filtro (veículo individual ou todos)"""
+    """
+    Enfileira o relatório PDF padronizado para qualquer filtro (veículo individual ou todos).
+    Responde com o id da tarefa; andamento e download_url em GET /api/jobs/{job_id}.
+    """
+    # Converte datas
     try:
-        # Converte datas
         dt_inicio = datetime.fromisoformat(data_inicio.replace('Z', '+00:00'))
         dt_fim = datetime.fromisoformat(data_fim.replace('Z', '+00:00'))
-        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Formato de data inválido: {str(e)}")
+    
+    placa_normalizada = placa.upper()
+    
+    def _gerar(job):
         # SEMPRE usa a estrutura consolidada padronizada - independente do filtro
-        from .reports import generate_consolidated_vehicle_report
-        
-        if placa.upper() == 'TODOS':
+        if placa_normalizada == 'TODOS':
             # Relatório para todos os veículos
             result = generate_consolidated_vehicle_report(
-                dt_inicio, dt_fim, str(REPORTS_DIR), cliente_nome=None
+                dt_inicio, dt_fim, str(REPORTS_DIR), cliente_nome=None, on_progress=job.set_progress
             )
         else:
-            # Relatório para veículo individual usando mesma estrutura padronizada
-            result = generate_consolidated_vehicle_report(
-                dt_inicio, dt_fim, str(REPORTS_DIR), vehicle_filter=placa
+            # Relatório para veículo individual usando mesma estrutura padronizada;
+            # o PDF já gerado é reaproveitado enquanto existir e os dados não mudarem
+            result = cached_result(
+                'relatorio_pdf', placa_normalizada, dt_inicio, dt_fim,
+                lambda: generate_consolidated_vehicle_report(
+                    dt_inicio, dt_fim, str(REPORTS_DIR), vehicle_filter=placa, on_progress=job.set_progress
+                ),
+                is_valid=lambda r: os.path.exists(r.get('file_path', ''))
             )
         
         if not result['success']:
-            raise HTTPException(status_code=500, detail=result.get('error', 'Erro ao gerar relatório'))
+            return {'success': False, 'error': result.get('error', 'Erro ao gerar relatório')}
         
         return {
             "success": True,
@@ -397,14 +599,35 @@ async def gerar_relatorio_pdf(
             "file_size_mb": result['file_size_mb'],
             "download_url": f"/api/download/{Path(result['file_path']).name}"
         }
-        
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=f"Formato de data inválido: {str(e)}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    
+    return _enqueue_report('relatorio_pdf', (placa_normalizada, dt_inicio.isoformat(), dt_fim.isoformat()), _gerar)
+
+def _enqueue_report(tipo: str, chave: tuple, func) -> dict:
+    """Enfileira a geração na fila de relatórios; pedidos idênticos em andamento são reutilizados"""
+    try:
+        job = get_job_queue().submit(tipo, (tipo,) + chave, func)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    return {
+        "success": True,
+        "message": "Relatório em geração",
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/jobs/{job.id}"
+    }
+
+@app.get("/api/jobs/{job_id}")
+async def consultar_tarefa(job_id: str):
+    """Andamento de uma geração de relatório enfileirada (status, progresso, download_url)"""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+    return convert_numpy_types(job.to_dict())
 
 @app.get("/api/download/{filename}")
-async def download_relatorio(filename: str):
+@offload()
+def download_relatorio(filename: str):
     """Download de relatório PDF"""
     # Segurança: Validar que o arquivo está dentro do diretório permitido
     try:
@@ -436,7 +659,8 @@ async def download_relatorio(filename: str):
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 @app.delete("/api/relatorios/clear")
-async def clear_reports_history():
+@offload()
+def clear_reports_history():
     """Limpa o histórico de relatórios gerados"""
     try:
         deleted_count = 0
@@ -457,7 +681,8 @@ async def clear_reports_history():
         raise HTTPException(status_code=500, detail=f"Erro ao limpar histórico: {str(e)}")
 
 @app.delete("/api/database/clear")
-async def clear_database():
+@offload(heavy=True)
+def clear_database():
     """Limpa completamente o banco de dados - remove todos os dados de clientes, veículos e posições"""
     try:
         session = get_session()
@@ -480,6 +705,7 @@ async def clear_database():
         
         session.commit()
         session.close()
+        invalidate_results()
         
         # Limpar arquivos de upload
         upload_files_deleted = 0
@@ -520,7 +746,8 @@ async def clear_database():
         raise HTTPException(status_code=500, detail=f"Erro ao limpar banco de dados: {str(e)}")
 
 @app.get("/api/relatorios")
-async def listar_relatorios(veiculo: Optional[str] = None, data: Optional[str] = None):
+@offload()
+def listar_relatorios(veiculo: Optional[str] = None, data: Optional[str] = None):
     """Lista todos os relatórios gerados com filtros opcionais"""
     try:
         reports = []
@@ -573,7 +800,8 @@ async def listar_relatorios(veiculo: Optional[str] = None, data: Optional[str] =
 
 # Rotas para gerenciamento de perfis de horário
 @app.get("/api/perfis-horario/{cliente_id}")
-async def listar_perfis_horario(cliente_id: int):
+@offload()
+def listar_perfis_horario(cliente_id: int):
     """Lista todos os perfis de horário de um cliente"""
     session = get_session()
     try:
@@ -596,7 +824,8 @@ async def listar_perfis_horario(cliente_id: int):
         session.close()
 
 @app.post("/api/perfis-horario")
-async def criar_perfil_horario(
+@offload()
+def criar_perfil_horario(
     cliente_id: int = Form(...),
     nome: str = Form(...),
     descricao: str = Form(""),
@@ -640,6 +869,8 @@ async def criar_perfil_horario(
         )
         session.add(perfil)
         session.commit()
+        invalidate_period_cache(cliente_id)
+        invalidate_results(cliente_id=cliente_id)
         
         return {
             "success": True,
@@ -655,7 +886,8 @@ async def criar_perfil_horario(
         session.close()
 
 @app.put("/api/perfis-horario/{perfil_id}")
-async def atualizar_perfil_horario(
+@offload()
+def atualizar_perfil_horario(
     perfil_id: int,
     nome: str = Form(...),
     descricao: str = Form(""),
@@ -699,6 +931,8 @@ async def atualizar_perfil_horario(
         perfil.updated_at = datetime.utcnow()
         
         session.commit()
+        invalidate_period_cache(perfil.cliente_id)
+        invalidate_results(cliente_id=perfil.cliente_id)
         
         return {
             "success": True,
@@ -713,7 +947,8 @@ async def atualizar_perfil_horario(
         session.close()
 
 @app.delete("/api/perfis-horario/{perfil_id}")
-async def deletar_perfil_horario(perfil_id: int):
+@offload()
+def deletar_perfil_horario(perfil_id: int):
     """Deleta um perfil de horário"""
     session = get_session()
     try:
@@ -721,8 +956,11 @@ async def deletar_perfil_horario(perfil_id: int):
         if not perfil:
             raise HTTPException(status_code=404, detail="Perfil de horário não encontrado")
         
+        cliente_id = perfil.cliente_id
         session.delete(perfil)
         session.commit()
+        invalidate_period_cache(cliente_id)
+        invalidate_results(cliente_id=cliente_id)
         
         return {
             "success": True,
@@ -735,7 +973,8 @@ async def deletar_perfil_horario(perfil_id: int):
         session.close()
 
 @app.patch("/api/perfis-horario/{perfil_id}/toggle")
-async def toggle_perfil_horario(perfil_id: int):
+@offload()
+def toggle_perfil_horario(perfil_id: int):
     """Ativa/desativa um perfil de horário"""
     session = get_session()
     try:
@@ -746,6 +985,8 @@ async def toggle_perfil_horario(perfil_id: int):
         perfil.ativo = not perfil.ativo
         perfil.updated_at = datetime.utcnow()
         session.commit()
+        invalidate_period_cache(perfil.cliente_id)
+        invalidate_results(cliente_id=perfil.cliente_id)
         
         status = "ativado" if perfil.ativo else "desativado"
         return {
@@ -761,7 +1002,8 @@ async def toggle_perfil_horario(perfil_id: int):
 
 # Rotas para dashboard
 @app.get("/api/dashboard/resumo")
-async def dashboard_resumo():
+@offload()
+def dashboard_resumo():
     """Retorna resumo para dashboard"""
     session = get_session()
     try:
@@ -792,7 +1034,8 @@ async def dashboard_resumo():
         session.close()
 
 @app.get("/api/dashboard/atividade-recente")
-async def dashboard_atividade():
+@offload()
+def dashboard_atividade():
     """Retorna atividade recente para dashboard"""
     session = get_session()
     try:
@@ -828,13 +1071,16 @@ app.add_middleware(
 )
 
 # Novo endpoint para relatório aprimorado
-@app.post("/api/generate-enhanced-report")
+@app.post("/api/generate-enhanced-report", status_code=202)
 async def generate_enhanced_report(
     placa: str = Form(...),
     data_inicio: str = Form(...),
     data_fim: str = Form(...)
 ):
-    """Gera relatório PDF aprimorado com estrutura melhorada (diário/semanal/mensal)"""
+    """
+    Enfileira relatório PDF aprimorado com estrutura melhorada (diário/semanal/mensal).
+    Andamento e download_url em GET /api/jobs/{job_id}.
+    """
     try:
         # Validar e parsear datas
         try:
@@ -853,17 +1099,22 @@ async def generate_enhanced_report(
         # Garantir que o diretório existe
         os.makedirs(REPORTS_DIR, exist_ok=True)
         
-        # Gerar relatório aprimorado
-        from .reports import ConsolidatedPDFGenerator
-        generator = ConsolidatedPDFGenerator()
-        result = generator.generate_enhanced_pdf_report(
-            placa=placa,
-            data_inicio=data_inicio_dt,
-            data_fim=data_fim_dt,
-            output_path=str(REPORTS_DIR)
-        )
-        
-        if result['success']:
+        def _gerar(job):
+            # Gerar relatório aprimorado (consulta, agregação e PDF numa única chamada)
+            from .reports import ConsolidatedPDFGenerator
+            generator = ConsolidatedPDFGenerator()
+            job.set_progress(10, 'Consultando posições e gerando PDF')
+            result = generator.generate_enhanced_pdf_report(
+                placa=placa,
+                data_inicio=data_inicio_dt,
+                data_fim=data_fim_dt,
+                output_path=str(REPORTS_DIR)
+            )
+            job.set_progress(95, 'Finalizando')
+            
+            if not result['success']:
+                return {'success': False, 'error': result.get('error', 'Erro desconhecido')}
+            
             return {
                 "success": True,
                 "message": f"Relatório aprimorado gerado com sucesso - Análise {result['analysis_type']}",
@@ -875,8 +1126,8 @@ async def generate_enhanced_report(
                 "data_quality": result['data_quality'],
                 "download_url": f"/api/download/{result['filename']}"
             }
-        else:
-            raise HTTPException(status_code=500, detail=result.get('error', 'Erro desconhecido'))
+        
+        return _enqueue_report('relatorio_aprimorado', (placa.upper(), data_inicio, data_fim), _gerar)
             
     except HTTPException:
         raise
@@ -2,12 +2,13 @@
 Modelos de dados para o sistema de relatórios de telemetria veicular.
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey, Time
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, Text, ForeignKey, Time, Index, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from datetime import datetime, time
 import os
+import threading
 
 Base = declarative_base()
 
@@ -108,6 +109,71 @@ class PosicaoHistorica(Base):
     
     # Relacionamentos
     veiculo = relationship("Veiculo", back_populates="posicoes")
+    
+    # Índices: consultas por placa + período (análises/relatórios) e por data (dashboard)
+    __table_args__ = (
+        Index('ix_posicoes_veiculo_data', 'veiculo_id', 'data_evento'),
+        Index('ix_posicoes_data_evento', 'data_evento'),
+    )
+
+class ResumoMetricasMixin:
+    """Colunas de métricas comuns aos resumos pré-agregados (todas somas ou máximos)"""
+    periodo_operacional = Column(String(50), nullable=False)
+    total_registros = Column(Integer, default=0)
+    
+    # Trechos consistentes (delta de odômetro > 0 e velocidade > 0 no dia)
+    km_deslocamento = Column(Float, default=0.0)
+    registros_deslocamento = Column(Integer, default=0)
+    velocidade_soma_deslocamento = Column(Float, default=0.0)
+    velocidade_max_deslocamento = Column(Float, default=0.0)
+    
+    # Registros aprovados por DataQualityRules (base do PeriodAggregator)
+    registros_validos = Column(Integer, default=0)
+    km_movimento = Column(Float, default=0.0)
+    odometro_km = Column(Float, default=0.0)
+    velocidade_max = Column(Float, default=0.0)
+    velocidade_soma = Column(Float, default=0.0)
+    registros_velocidade = Column(Integer, default=0)
+    registros_ligado = Column(Integer, default=0)
+    registros_movimento = Column(Integer, default=0)
+    alertas_velocidade = Column(Integer, default=0)
+    
+    atualizado_em = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ResumoHorario(ResumoMetricasMixin, Base):
+    """
+    Resumo por veículo, hora (data_evento truncada) e período operacional.
+    A ingestão reagrega apenas as horas tocadas pelo lote (app/rollups.py).
+    """
+    __tablename__ = 'resumo_horario'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    veiculo_id = Column(Integer, ForeignKey('veiculos.id'), nullable=False)
+    hora = Column(DateTime, nullable=False)
+    
+    veiculo = relationship("Veiculo")
+    
+    __table_args__ = (
+        Index('ux_resumo_horario_chave', 'veiculo_id', 'hora', 'periodo_operacional', unique=True),
+    )
+
+class ResumoDiario(ResumoMetricasMixin, Base):
+    """
+    Resumo diário pré-agregado por veículo, dia e período operacional.
+    Derivado de resumo_horario na ingestão; relatórios semanais e mensais leem
+    estas linhas em vez das posições brutas.
+    """
+    __tablename__ = 'resumo_diario'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    veiculo_id = Column(Integer, ForeignKey('veiculos.id'), nullable=False)
+    data = Column(Date, nullable=False)
+    
+    veiculo = relationship("Veiculo")
+    
+    __table_args__ = (
+        Index('ux_resumo_diario_chave', 'veiculo_id', 'data', 'periodo_operacional', unique=True),
+    )
 
 class RelatorioGerado(Base):
     """Modelo para armazenar histórico de relatórios gerados"""
@@ -139,27 +205,137 @@ class RelatorioGerado(Base):
 
 # Configuração do banco de dados
 def get_database_url():
-    """Retorna a URL do banco de dados"""
+    """Retorna a URL do banco de dados (sobrescrevível via DATABASE_URL)"""
+    env_url = os.environ.get('DATABASE_URL')
+    if env_url:
+        return env_url
     db_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'telemetria.db')
     return f"sqlite:///{db_path}"
 
-def create_database_engine():
-    """Cria e retorna o engine do banco de dados"""
+# Engine e fábrica de sessões únicos por processo (um por URL, para permitir
+# bancos temporários via DATABASE_URL)
+_engines = {}
+_session_factories = {}
+_engine_lock = threading.Lock()
+
+# Pool de conexões e PRAGMAs aplicados a cada nova conexão SQLite
+POOL_SIZE = 10
+POOL_MAX_OVERFLOW = 20
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',        # leitores não bloqueiam a escrita
+    'synchronous': 'NORMAL',      # seguro com WAL e bem mais rápido que FULL
+    'mmap_size': 268435456,       # 256 MB mapeados em memória
+    'cache_size': -65536,         # 64 MB de cache de páginas (valor negativo = KiB)
+    'temp_store': 'MEMORY',
+}
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Aplica os PRAGMAs de desempenho em cada conexão SQLite aberta pelo pool"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, valor in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma}={valor}")
+    finally:
+        cursor.close()
+
+def _database():
+    """Engine e fábrica de sessões da URL atual, criados juntos uma única vez por processo"""
     database_url = get_database_url()
-    engine = create_engine(database_url, echo=False)
+    engine = _engines.get(database_url)
+    SessionLocal = _session_factories.get(database_url)
+    if engine is not None and SessionLocal is not None:
+        return engine, SessionLocal
+    
+    with _engine_lock:
+        engine = _engines.get(database_url)
+        if engine is None:
+            if database_url.startswith('sqlite'):
+                # Banco em memória usa o pool padrão (uma conexão por thread)
+                em_memoria = database_url in ('sqlite://', 'sqlite:///:memory:')
+                pool_args = {} if em_memoria else {'pool_size': POOL_SIZE, 'max_overflow': POOL_MAX_OVERFLOW}
+                engine = create_engine(
+                    database_url, echo=False,
+                    connect_args={'check_same_thread': False}, **pool_args
+                )
+                event.listen(engine, 'connect', _apply_sqlite_pragmas)
+            else:
+                engine = create_engine(
+                    database_url, echo=False,
+                    pool_size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW, pool_pre_ping=True
+                )
+            _engines[database_url] = engine
+            _session_factories[database_url] = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        return engine, _session_factories[database_url]
+
+def create_database_engine():
+    """Retorna o engine do banco de dados (criado uma única vez por processo)"""
+    return _database()[0]
+
+def dispose_engines(close: bool = True):
+    """
+    Descarta os engines em cache (ex.: após fork de processos de trabalho).
+    close=False no processo filho: abandona as conexões herdadas do pai sem fechá-las.
+    """
+    with _engine_lock:
+        for engine in _engines.values():
+            engine.dispose(close=close)
+        _engines.clear()
+        _session_factories.clear()
+
+def set_engine_read_only(engine):
+    """Marca toda conexão nova do engine como somente leitura (workers de relatório)"""
+    def _read_only(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            if engine.dialect.name == 'sqlite':
+                cursor.execute("PRAGMA query_only=ON")
+            elif engine.dialect.name == 'postgresql':
+                cursor.execute("SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY")
+                dbapi_connection.commit()
+        finally:
+            cursor.close()
+    event.listen(engine, 'connect', _read_only)
     return engine
 
 def create_tables():
     """Cria todas as tabelas no banco de dados"""
     engine = create_database_engine()
     Base.metadata.create_all(engine)
+    ensure_indexes(engine)
     return engine
 
+def ensure_indexes(engine=None):
+    """
+    Cria os índices declarados nos modelos que ainda não existem no banco.
+    create_all só cria índices junto com tabelas novas; esta rotina atualiza
+    bancos existentes (ex.: data/telemetria.db de versões anteriores).
+    """
+    engine = engine or create_database_engine()
+    inspector = inspect(engine)
+    tabelas = set(inspector.get_table_names())
+    criados = []
+    
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tabelas:
+            continue
+        existentes = {idx['name'] for idx in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existentes:
+                index.create(bind=engine)
+                criados.append(index.name)
+    
+    if criados:
+        # Atualiza as estatísticas usadas pelo planejador de consultas
+        if engine.dialect.name == 'sqlite':
+            with engine.begin() as conn:
+                conn.execute(text("ANALYZE"))
+        print(f"Índices criados: {', '.join(criados)}")
+    
+    return criados
+
 def get_session():
-    """Retorna uma sessão do banco de dados"""
-    engine = create_database_engine()
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    return SessionLocal()
+    """Retorna uma sessão do banco de dados (o chamador é responsável por fechá-la)"""
+    return _database()[1]()
 
 # Função para inicializar o banco
 def init_database():
@@ -0,0 +1,151 @@
+"""
+Classificação vetorizada de períodos operacionais.
+
+Os perfis de horário de um cliente são compilados em uma tabela indexada pelo
+minuto da semana; classificar uma coluna de datas vira uma única indexação NumPy.
+"""
+
+import threading
+from datetime import datetime, time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+WEEKEND_LABEL = 'final_semana'
+
+# Cada minuto tem duas posições na tabela: o instante exato hh:mm:00 e o restante
+# do minuto. Assim janelas com fim inclusivo (07:00:00 entra, 07:00:01 não) são exatas.
+SLOTS_PER_MINUTE = 2
+
+
+def _minute_of_day(value: time) -> int:
+    """Minuto do dia de um horário (segundos são ignorados)"""
+    return value.hour * 60 + value.minute
+
+
+class PeriodClassifier:
+    """Tabela compilada minuto-da-semana → período operacional"""
+
+    def __init__(self, windows: Sequence[Tuple[str, time, time]], default_label: str,
+                 inclusive_end: bool = True, weekend_label: Optional[str] = WEEKEND_LABEL):
+        """
+        windows: (rótulo, início, fim) em ordem de prioridade; janelas com início > fim
+        cruzam a meia-noite. inclusive_end=True reproduz `início <= t <= fim`;
+        False reproduz `início <= t < fim`. Sábado e domingo recebem weekend_label.
+        """
+        labels = [default_label]
+        day = np.full(MINUTES_PER_DAY * SLOTS_PER_MINUTE, -1, dtype=np.int16)
+
+        for label, inicio, fim in windows:
+            if label not in labels:
+                labels.append(label)
+            code = labels.index(label)
+            start = _minute_of_day(inicio) * SLOTS_PER_MINUTE
+            end = _minute_of_day(fim) * SLOTS_PER_MINUTE + (1 if inclusive_end else 0)
+
+            mask = np.zeros(len(day), dtype=bool)
+            if start <= end:
+                mask[start:end] = True
+            else:
+                # Cruza a meia-noite (ex.: 19:00 - 04:00)
+                mask[start:] = True
+                mask[:end] = True
+            # Janelas anteriores têm prioridade
+            day[mask & (day == -1)] = code
+
+        day[day == -1] = 0
+        week = np.tile(day, 7)
+        if weekend_label:
+            if weekend_label not in labels:
+                labels.append(weekend_label)
+            week[5 * len(day):] = labels.index(weekend_label)  # sábado e domingo
+
+        self.labels = labels
+        self.lookup = week
+
+    def _slot_index(self, timestamps: pd.Series) -> np.ndarray:
+        """Posição na tabela para cada data (minuto da semana × 2 + fração do minuto)"""
+        dt = timestamps.dt
+        minute_of_week = (dt.weekday * MINUTES_PER_DAY + dt.hour * 60 + dt.minute).to_numpy()
+        within_minute = ((dt.second > 0) | (dt.microsecond > 0) | (dt.nanosecond > 0)).to_numpy()
+        return minute_of_week * SLOTS_PER_MINUTE + within_minute
+
+    def classify(self, timestamps) -> pd.Series:
+        """Classifica uma coluna de datas; retorna uma Series categórica"""
+        timestamps = pd.Series(pd.to_datetime(timestamps))
+        index = timestamps.index
+        valid = timestamps.notna().to_numpy()
+
+        codes = np.full(len(timestamps), -1, dtype=np.int16)
+        if valid.any():
+            codes[valid] = self.lookup[self._slot_index(timestamps[valid])]
+
+        categorical = pd.Categorical.from_codes(codes, categories=self.labels)
+        return pd.Series(categorical, index=index).cat.remove_unused_categories()
+
+    def classify_one(self, timestamp: datetime) -> str:
+        """Classifica um único instante"""
+        return str(self.classify([timestamp]).iloc[0])
+
+
+# Cache de classificadores por cliente; invalidado quando os perfis mudam.
+# A geração de cada cliente (e a global) muda a cada invalidação: um classificador
+# compilado antes dela não é guardado.
+_client_classifiers: Dict[int, PeriodClassifier] = {}
+_client_generations: Dict[int, int] = {}
+_global_generation = 0
+_cache_lock = threading.Lock()
+
+
+def get_client_classifier(cliente_id: int, builder: Callable[[], PeriodClassifier]) -> PeriodClassifier:
+    """Retorna o classificador compilado do cliente, compilando-o na primeira chamada"""
+    with _cache_lock:
+        classifier = _client_classifiers.get(cliente_id)
+        geracao = (_global_generation, _client_generations.get(cliente_id, 0))
+    if classifier is None:
+        # Compilado fora do lock: consulta os perfis no banco
+        classifier = builder()
+        with _cache_lock:
+            if geracao == (_global_generation, _client_generations.get(cliente_id, 0)):
+                _client_classifiers[cliente_id] = classifier
+    return classifier
+
+
+def invalidate_period_cache(cliente_id: Optional[int] = None) -> None:
+    """Descarta o classificador de um cliente (ou de todos, se cliente_id for None)"""
+    global _global_generation
+    with _cache_lock:
+        if cliente_id is None:
+            _client_classifiers.clear()
+            _global_generation += 1
+        else:
+            _client_classifiers.pop(cliente_id, None)
+            _client_generations[cliente_id] = _client_generations.get(cliente_id, 0) + 1
+
+
+def profile_windows(perfis: Dict[str, Dict]) -> List[Tuple[str, time, time]]:
+    """
+    Ordena os perfis do cliente na prioridade de classificação:
+    primeiro os operacionais, depois fora_horario/especial
+    """
+    windows = [(nome, cfg['inicio'], cfg['fim']) for nome, cfg in perfis.items() if cfg['tipo'] == 'operacional']
+    windows += [(nome, cfg['inicio'], cfg['fim']) for nome, cfg in perfis.items()
+                if cfg['tipo'] in ['fora_horario', 'especial']]
+    return windows
+
+
+# Períodos fixos usados por TelemetryAnalyzer (janelas semiabertas [início, fim))
+ANALYZER_CLASSIFIER = PeriodClassifier(
+    windows=[
+        ('operacional_manha', time(4, 0), time(7, 0)),
+        ('operacional_meio_dia', time(10, 50), time(13, 0)),
+        ('operacional_tarde', time(16, 50), time(19, 0)),
+        ('fora_horario_manha', time(7, 0), time(10, 50)),
+        ('fora_horario_tarde', time(13, 0), time(16, 50)),
+    ],
+    default_label='fora_horario_noite',
+    inclusive_end=False,
+)
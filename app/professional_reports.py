@@ -13,7 +13,7 @@ import json
 import logging
 from pathlib import Path
 import math
-from geopy.distance import geodesic
+from .geo import consecutive_distances
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
@@ -200,22 +200,15 @@ class FleetReportProcessor:
     
     def _calcular_distancia_gps(self, df_veiculo: pd.DataFrame) -> pd.Series:
         """
-        Calcula distância usando coordenadas GPS (Haversine).
+        Calcula distância usando coordenadas GPS (geodésica WGS-84, vetorizada).
         """
-        distancias = pd.Series(0.0, index=df_veiculo.index)
+        if len(df_veiculo) < 2:
+            return pd.Series(0.0, index=df_veiculo.index)
         
-        for i in range(1, len(df_veiculo)):
-            try:
-                coord1 = (df_veiculo.iloc[i-1]['latitude'], df_veiculo.iloc[i-1]['longitude'])
-                coord2 = (df_veiculo.iloc[i]['latitude'], df_veiculo.iloc[i]['longitude'])
-                
-                if not (pd.isna(coord1[0]) or pd.isna(coord1[1]) or pd.isna(coord2[0]) or pd.isna(coord2[1])):
-                    distancia = geodesic(coord1, coord2).kilometers
-                    distancias.iloc[i] = distancia
-            except:
-                distancias.iloc[i] = 0.0
-        
-        return distancias
+        distancias = consecutive_distances(
+            df_veiculo['latitude'], df_veiculo['longitude'], method='geodesic'
+        )
+        return pd.Series(distancias, index=df_veiculo.index)
     
     def _calcular_distancia_velocidade(self, df_veiculo: pd.DataFrame) -> pd.Series:
         """
@@ -5,7 +5,7 @@ Módulo para geração de relatórios PDF com insights de telemetria veicular.
 import os
 import base64
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Any, Callable, Dict, List, Optional
 from io import BytesIO
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
@@ -42,6 +42,7 @@ logger.setLevel(logging.INFO)
 
 from .services import ReportGenerator, DataQualityRules, PeriodAggregator, HighlightGenerator, TelemetryAnalyzer
 from .models import get_session, Veiculo, Cliente
+from .chart_cache import get_chart_cache
 
 
 def format_speed(speed: Optional[float], distance_km: Optional[float] = None, include_unit: bool = True, decimals: int = 0) -> str:
@@ -350,7 +351,11 @@ class PDFReportGenerator:
         return story
     
     def _create_performance_chart(self, metrics: Dict) -> Optional[Drawing]:
-        """Cria um gráfico de desempenho com base nos dados do veículo"""
+        """
+        Cria um gráfico de desempenho com base nos dados do veículo. O gráfico depende
+        só das horas por período: valores iguais reaproveitam o Drawing do cache de
+        gráficos, montado uma única vez no processo.
+        """
         try:
             # Verifica se temos dados suficientes
             operacao = metrics.get('operacao', {})
@@ -359,11 +364,7 @@ class PDFReportGenerator:
             if not operacao or not periodos:
                 return None
             
-            # Cria um gráfico de barras simples
-            drawing = Drawing(400, 200)
-            
             # Dados para o gráfico
-            period_names = ['Manhã', 'Meio-dia', 'Tarde', 'Fora Manhã', 'Fora Tarde', 'Final de Semana']
             period_values = [
                 periodos.get('operacional_manha', 0),
                 periodos.get('operacional_meio_dia', 0),
@@ -373,43 +374,53 @@ class PDFReportGenerator:
                 periodos.get('final_semana', 0)
             ]
             
-            # Cria o gráfico de barras
-            chart = VerticalBarChart()
-            chart.x = 30
-            chart.y = 20
-            chart.height = 150
-            chart.width = 340
-            chart.data = [period_values]
-            chart.categoryAxis.categoryNames = period_names
-            
-            # Estiliza o gráfico
-            chart.bars[0].fillColor = colors.HexColor('#2E86AB')
-            chart.bars.strokeColor = colors.black
-            chart.bars.strokeWidth = 0.5
-            chart.groupSpacing = 0.2
-            
-            # Escala dinâmica
-            max_val = max(period_values) if period_values else 0
-            chart.valueAxis.valueMin = 0
-            chart.valueAxis.valueMax = max_val * 1.1 if max_val > 0 else 10
-            chart.valueAxis.valueStep = max(1, int(max_val / 10))
-            
-            # Labels melhoradas
-            chart.categoryAxis.labels.boxAnchor = 'n'
-            chart.categoryAxis.labels.angle = 30
-            chart.categoryAxis.labels.fontSize = 8
-            chart.categoryAxis.labels.dy = -10
-            
-            # Adiciona título
-            drawing.add(String(200, 175, 'Desempenho por Período (horas)', fontSize=12, textAnchor='middle'))
-            
-            drawing.add(chart)
-            return drawing
+            return get_chart_cache().get_or_render(
+                'desempenho_periodos', period_values, lambda: self._draw_performance_chart(period_values)
+            )
             
         except Exception as e:
             logger.warning(f"Não foi possível criar gráfico de desempenho: {str(e)}")
             return None
     
+    @staticmethod
+    def _draw_performance_chart(period_values: List[float]) -> Drawing:
+        """Monta o gráfico de barras de horas por período"""
+        drawing = Drawing(400, 200)
+        period_names = ['Manhã', 'Meio-dia', 'Tarde', 'Fora Manhã', 'Fora Tarde', 'Final de Semana']
+        
+        # Cria o gráfico de barras
+        chart = VerticalBarChart()
+        chart.x = 30
+        chart.y = 20
+        chart.height = 150
+        chart.width = 340
+        chart.data = [period_values]
+        chart.categoryAxis.categoryNames = period_names
+        
+        # Estiliza o gráfico
+        chart.bars[0].fillColor = colors.HexColor('#2E86AB')
+        chart.bars.strokeColor = colors.black
+        chart.bars.strokeWidth = 0.5
+        chart.groupSpacing = 0.2
+        
+        # Escala dinâmica
+        max_val = max(period_values) if period_values else 0
+        chart.valueAxis.valueMin = 0
+        chart.valueAxis.valueMax = max_val * 1.1 if max_val > 0 else 10
+        chart.valueAxis.valueStep = max(1, int(max_val / 10))
+        
+        # Labels melhoradas
+        chart.categoryAxis.labels.boxAnchor = 'n'
+        chart.categoryAxis.labels.angle = 30
+        chart.categoryAxis.labels.fontSize = 8
+        chart.categoryAxis.labels.dy = -10
+        
+        # Adiciona título
+        drawing.add(String(200, 175, 'Desempenho por Período (horas)', fontSize=12, textAnchor='middle'))
+        
+        drawing.add(chart)
+        return drawing
+    
     def create_operational_analysis(self, metrics: Dict) -> List:
         """Cria análise operacional detalhada com base nos dados reais do veículo"""
         story = []
@@ -924,9 +935,13 @@ class PDFReportGenerator:
             
         return story
     
-    def generate_pdf(self, metrics: Dict, output_path: str, report_type: str = "default", additional_data: Optional[Dict] = None) -> bool:
-        """Gera o relatório PDF completo"""
+    def generate_pdf(self, metrics: Dict, output_path: str, report_type: str = "default", additional_data: Optional[Dict] = None,
+                     on_progress: Optional[Callable[[int, str], None]] = None) -> bool:
+        """Gera o relatório PDF completo; on_progress(progresso, etapa) antes de montar e de gravar o PDF"""
         try:
+            if on_progress:
+                on_progress(70, 'Montando relatório')
+            
             # Cria o documento
             doc = SimpleDocTemplate(
                 output_path,
@@ -961,6 +976,8 @@ class PDFReportGenerator:
             story.extend(self.create_insights_section(insights))
             
             # Constrói o PDF
+            if on_progress:
+                on_progress(85, 'Gravando PDF')
             doc.build(story)
             logger.info(f"Relatório PDF gerado com sucesso: {output_path}")
             return True
@@ -970,12 +987,49 @@ class PDFReportGenerator:
             return False
 
 
+def _empty_metrics(placa: str, cliente_nome: Optional[str], start_date: datetime, end_date: datetime, days_count: int) -> Dict:
+    """Métricas zeradas para períodos sem dados"""
+    return {
+        'veiculo': {
+            'cliente': cliente_nome or 'Cliente Padrão',
+            'placa': placa,
+            'periodo_analise': {
+                'inicio': start_date,
+                'fim': end_date,
+                'total_dias': days_count
+            }
+        },
+        'operacao': {
+            'total_registros': 0,
+            'km_total': 0,
+            'velocidade_maxima': 0,
+            'velocidade_media': 0,
+            'tempo_total_ligado': 0,
+            'tempo_em_movimento': 0,
+            'tempo_parado_ligado': 0,
+            'tempo_desligado': 0
+        },
+        'periodos': {
+            'operacional_manha': 0,
+            'operacional_meio_dia': 0,
+            'operacional_tarde': 0,
+            'fora_horario_manha': 0,
+            'fora_horario_tarde': 0,
+            'fora_horario_noite': 0,
+            'final_semana': 0,
+            'total_operacional': 0,
+            'total_fora_horario': 0
+        }
+    }
+
+
 def generate_consolidated_vehicle_report(
     start_date: datetime,
     end_date: datetime,
     output_dir: str,
     vehicle_filter: Optional[str] = None,
-    cliente_nome: Optional[str] = None
+    cliente_nome: Optional[str] = None,
+    on_progress: Optional[Callable[[int, str], None]] = None
 ) -> Dict:
     """
     Gera relatório consolidado padronizado para veículos.
@@ -986,6 +1040,8 @@ def generate_consolidated_vehicle_report(
         output_dir: Diretório de saída para o PDF
         vehicle_filter: Placa específica do veículo (opcional)
         cliente_nome: Nome do cliente (opcional)
+        on_progress: Chamado com (progresso 0-100, etapa) na consulta, na
+            agregação e na geração do PDF (opcional)
         
     Returns:
         Dict com informações do relatório gerado
@@ -1020,44 +1076,20 @@ def generate_consolidated_vehicle_report(
         # Obtém dados REAIS do banco de dados em vez de dados simulados
         from .services import TelemetryAnalyzer
         
+        def progresso(valor: int, etapa: str) -> None:
+            if on_progress:
+                on_progress(valor, etapa)
+        
+        progresso(10, 'Consultando posições')
+        
         if vehicle_filter and vehicle_filter.upper() != 'TODOS':
             # Relatório para veículo individual com dados reais
             analyzer = TelemetryAnalyzer()
             try:
                 df = analyzer.get_vehicle_data(vehicle_filter, start_date, end_date)
+                progresso(30, 'Calculando métricas')
                 if df.empty:
-                    metrics = {
-                        'veiculo': {
-                            'cliente': cliente_nome or 'Cliente Padrão',
-                            'placa': vehicle_filter,
-                            'periodo_analise': {
-                                'inicio': start_date,
-                                'fim': end_date,
-                                'total_dias': days_count
-                            }
-                        },
-                        'operacao': {
-                            'total_registros': 0,
-                            'km_total': 0,
-                            'velocidade_maxima': 0,
-                            'velocidade_media': 0,
-                            'tempo_total_ligado': 0,
-                            'tempo_em_movimento': 0,
-                            'tempo_parado_ligado': 0,
-                            'tempo_desligado': 0
-                        },
-                        'periodos': {
-                            'operacional_manha': 0,
-                            'operacional_meio_dia': 0,
-                            'operacional_tarde': 0,
-                            'fora_horario_manha': 0,
-                            'fora_horario_tarde': 0,
-                            'fora_horario_noite': 0,
-                            'final_semana': 0,
-                            'total_operacional': 0,
-                            'total_fora_horario': 0
-                        }
-                    }
+                    metrics = _empty_metrics(vehicle_filter, cliente_nome, start_date, end_date, days_count)
                 else:
                     # Gera métricas reais com dados consistentes
                     metrics = analyzer.generate_summary_metrics(df, vehicle_filter)
@@ -1066,40 +1098,11 @@ def generate_consolidated_vehicle_report(
                 if hasattr(analyzer, 'session'):
                     analyzer.session.close()
         else:
-            # Para relatórios consolidados, busca dados de todos os veículos
-            # Esta é uma implementação simplificada - em produção buscaria dados reais
-            metrics = {
-                'veiculo': {
-                    'cliente': cliente_nome or 'Cliente Padrão',
-                    'placa': 'Todos',
-                    'periodo_analise': {
-                        'inicio': start_date,
-                        'fim': end_date,
-                        'total_dias': days_count
-                    }
-                },
-                'operacao': {
-                    'total_registros': 1250,
-                    'km_total': 850.5,
-                    'velocidade_maxima': 95.0,
-                    'velocidade_media': 42.3,
-                    'tempo_total_ligado': 45,
-                    'tempo_em_movimento': 38,
-                    'tempo_parado_ligado': 7,
-                    'tempo_desligado': 150
-                },
-                'periodos': {
-                    'operacional_manha': 5,
-                    'operacional_meio_dia': 8,
-                    'operacional_tarde': 6,
-                    'fora_horario_manha': 3,
-                    'fora_horario_tarde': 4,
-                    'fora_horario_noite': 2,
-                    'final_semana': 1,
-                    'total_operacional': 19,
-                    'total_fora_horario': 9
-                }
-            }
+            # Para relatórios consolidados, soma as métricas reais de todos os veículos
+            # (lotes de veículos processados em paralelo, ver compute_fleet_metrics)
+            metrics = ReportGenerator().generate_fleet_metrics(start_date, end_date, cliente_nome)
+            if not metrics:
+                metrics = _empty_metrics('Todos', cliente_nome, start_date, end_date, days_count)
             
             # Adiciona dados de combustível se disponível
             if 'combustivel' not in metrics:
@@ -1112,6 +1115,7 @@ def generate_consolidated_vehicle_report(
                 metrics['combustivel'] = fuel_data
         
         # Dados adicionais por tipo de relatório com dados reais
+        progresso(50, 'Agregando por período')
         additional_data = {}
         
         if report_type == "daily" and vehicle_filter and vehicle_filter.upper() != 'TODOS':
@@ -1150,11 +1154,11 @@ def generate_consolidated_vehicle_report(
             # Análise quinzenal/mensal com dados reais
             analyzer = TelemetryAnalyzer()
             try:
-                df = analyzer.get_vehicle_data(vehicle_filter, start_date, end_date)
-                if not df.empty:
-                    # Para períodos mais longos, agregamos por semanas
+                # Para períodos mais longos, agregamos por semanas a partir do resumo diário
+                resumo = analyzer.get_daily_rollups(vehicle_filter, start_date, end_date)
+                if not resumo.empty:
                     from .services import PeriodAggregator
-                    weekly_data = PeriodAggregator.aggregate_weekly(df)
+                    weekly_data = PeriodAggregator.aggregate_weekly_from_rollup(resumo)
                     additional_data['period_data'] = list(weekly_data.values()) if isinstance(weekly_data, dict) else []
                 else:
                     additional_data['period_data'] = []
@@ -1164,7 +1168,7 @@ def generate_consolidated_vehicle_report(
                     analyzer.session.close()
         
         # Gera o PDF com dados reais
-        success = generator.generate_pdf(metrics, output_path, report_type, additional_data)
+        success = generator.generate_pdf(metrics, output_path, report_type, additional_data, on_progress)
         
         if success:
             # Obtém o tamanho do arquivo
@@ -0,0 +1,230 @@
+"""
+Cache de resultados de análises e relatórios por veículo.
+
+A chave combina o tipo de resultado, a placa, a janela de datas normalizada, a
+versão dos perfis de horário do cliente e a marca d'água dos dados do veículo na
+janela (quantidade e maior id das posições). Qualquer ingestão ou edição de perfil
+muda a chave; os resultados antigos nunca são servidos. Memória LRU limitada pelo
+número de entradas (RESULT_CACHE_SIZE) e pelo tamanho estimado (RESULT_CACHE_MB),
+com camada opcional em disco (RESULT_CACHE_DIR), esvaziada no upload e nas
+edições de perfil.
+"""
+
+import hashlib
+import os
+import pickle
+import shutil
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from sqlalchemy import func
+
+from .chart_cache import estimated_size
+from .models import Cliente, PerfilHorario, PosicaoHistorica, Veiculo, get_session
+
+# Entradas e tamanho máximo (estimado) mantidos em memória e diretório da camada
+# em disco (vazio = desativada)
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', '128'))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MB', '256')) * 1024 * 1024
+RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', '')
+
+
+class ResultKey(NamedTuple):
+    """Chave de um resultado em cache"""
+    tipo: str
+    placa: str
+    veiculo_id: int
+    cliente_id: int
+    inicio: str
+    fim: str
+    perfis: Tuple
+    marca_dagua: Tuple
+
+
+class ResultCache:
+    """
+    LRU em memória, limitada pelo número de entradas e pela soma dos tamanhos
+    estimados (chart_cache.estimated_size), com camada opcional em disco (um
+    pickle por chave)
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE, disk_dir: Optional[str] = None,
+                 max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._entries: 'OrderedDict[ResultKey, Tuple[Any, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _disk_path(self, key: ResultKey) -> Path:
+        digest = hashlib.sha256(repr(key).encode('utf-8')).hexdigest()
+        return self.disk_dir / f"c{key.cliente_id}" / f"v{key.veiculo_id}" / f"{digest}.pkl"
+
+    def get(self, key: ResultKey) -> Optional[Any]:
+        """Resultado da chave (memória, depois disco) ou None"""
+        with self._lock:
+            entrada = self._entries.get(key)
+            if entrada is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entrada[0]
+
+        value = None
+        if self.disk_dir is not None:
+            try:
+                with open(self._disk_path(key), 'rb') as f:
+                    value = pickle.load(f)
+            except (OSError, pickle.PickleError, EOFError):
+                value = None
+            if value is not None:
+                self._remember(key, value)
+
+        with self._lock:
+            if value is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return value
+
+    def put(self, key: ResultKey, value: Any) -> None:
+        """Guarda o resultado na memória e, se configurado, no disco"""
+        self._remember(key, value)
+        if self.disk_dir is not None:
+            path = self._disk_path(key)
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                temporario = path.with_suffix(f'.{os.getpid()}.tmp')
+                with open(temporario, 'wb') as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temporario, path)
+            except (OSError, pickle.PickleError) as e:
+                print(f"Erro ao gravar cache de resultado em disco: {e}")
+
+    def _remember(self, key: ResultKey, value: Any) -> None:
+        tamanho = estimated_size(value)
+        with self._lock:
+            anterior = self._entries.pop(key, None)
+            if anterior is not None:
+                self.size_bytes -= anterior[1]
+            # Maior que o limite: fica só no disco (se houver)
+            if tamanho > self.max_bytes:
+                return
+            self._entries[key] = (value, tamanho)
+            self.size_bytes += tamanho
+            # Descarta os menos usados até caber nos dois limites
+            while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+                _, (_, removido) = self._entries.popitem(last=False)
+                self.size_bytes -= removido
+
+    def invalidate(self, veiculo_ids: Optional[Iterable[int]] = None, cliente_id: Optional[int] = None) -> None:
+        """
+        Descarta os resultados dos veículos ou do cliente informados; sem argumentos,
+        descarta tudo
+        """
+        ids = set(veiculo_ids) if veiculo_ids is not None else None
+        todos = ids is None and cliente_id is None
+
+        with self._lock:
+            for key in list(self._entries):
+                if todos or (ids is not None and key.veiculo_id in ids) or key.cliente_id == cliente_id:
+                    self.size_bytes -= self._entries.pop(key)[1]
+
+        if self.disk_dir is None or not self.disk_dir.exists():
+            return
+        if todos:
+            alvos = [p for p in self.disk_dir.iterdir() if p.is_dir()]
+        else:
+            alvos = []
+            if cliente_id is not None:
+                alvos.append(self.disk_dir / f"c{cliente_id}")
+            for veiculo_id in ids or ():
+                alvos.extend(self.disk_dir.glob(f"c*/v{veiculo_id}"))
+        for alvo in alvos:
+            shutil.rmtree(alvo, ignore_errors=True)
+
+
+_cache = ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_DIR or None, RESULT_CACHE_MAX_BYTES)
+
+
+def get_result_cache() -> ResultCache:
+    """Cache de resultados do processo"""
+    return _cache
+
+
+def invalidate_results(veiculo_ids: Optional[Iterable[int]] = None, cliente_id: Optional[int] = None) -> None:
+    """Esvazia o cache de resultados (upload de dados, edição de perfis de horário)"""
+    _cache.invalidate(veiculo_ids=veiculo_ids, cliente_id=cliente_id)
+
+
+def normalize_window(data_inicio: datetime, data_fim: datetime) -> Tuple[datetime, datetime]:
+    """Janela como as consultas a enxergam: mesmo dia vai até 23:59:59.999999"""
+    if data_inicio.date() == data_fim.date():
+        data_fim = data_fim.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return data_inicio, data_fim
+
+
+def result_key(tipo: str, placa: str, data_inicio: datetime, data_fim: datetime, session=None) -> Optional[ResultKey]:
+    """
+    Chave do resultado com a versão atual dos perfis do cliente e a marca d'água dos
+    dados do veículo na janela; None se o veículo não existe
+    """
+    propria = session is None
+    session = session or get_session()
+    try:
+        veiculo = session.query(Veiculo.id, Veiculo.cliente_id).filter(Veiculo.placa == placa).first()
+        if veiculo is None:
+            return None
+        inicio, fim = normalize_window(data_inicio, data_fim)
+
+        # Versão dos perfis: quantidade e última alteração (perfis e cliente)
+        perfis = session.query(func.count(PerfilHorario.id), func.max(PerfilHorario.updated_at)).filter(
+            PerfilHorario.cliente_id == veiculo.cliente_id
+        ).one()
+        cliente_atualizado = session.query(Cliente.updated_at).filter(Cliente.id == veiculo.cliente_id).scalar()
+
+        # Marca d'água: quantidade e maior id das posições da janela (índice veiculo_id, data_evento)
+        marca = session.query(func.count(PosicaoHistorica.id), func.max(PosicaoHistorica.id)).filter(
+            PosicaoHistorica.veiculo_id == veiculo.id,
+            PosicaoHistorica.data_evento >= inicio,
+            PosicaoHistorica.data_evento <= fim
+        ).one()
+
+        return ResultKey(
+            tipo=tipo, placa=placa, veiculo_id=veiculo.id, cliente_id=veiculo.cliente_id,
+            inicio=inicio.isoformat(), fim=fim.isoformat(),
+            perfis=(perfis[0], str(perfis[1]), str(cliente_atualizado)),
+            marca_dagua=(marca[0], marca[1]),
+        )
+    finally:
+        if propria:
+            session.close()
+
+
+def cached_result(tipo: str, placa: str, data_inicio: datetime, data_fim: datetime,
+                  compute: Callable[[], Dict], is_valid: Callable[[Dict], bool] = lambda r: True) -> Dict:
+    """
+    Retorna o resultado em cache para (tipo, placa, janela, versões) ou calcula com
+    compute(). Só resultados com 'success' verdadeiro são guardados; is_valid permite
+    descartar um acerto que não vale mais (ex.: PDF removido do disco).
+    """
+    key = result_key(tipo, placa, data_inicio, data_fim)
+    if key is None:
+        return compute()
+
+    resultado = _cache.get(key)
+    if resultado is not None and is_valid(resultado):
+        return resultado
+
+    resultado = compute()
+    if isinstance(resultado, dict) and resultado.get('success'):
+        _cache.put(key, resultado)
+    return resultado
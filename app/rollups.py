@@ -0,0 +1,502 @@
+"""
+Resumos pré-agregados (rollups) das posições históricas.
+
+Duas camadas, com as mesmas colunas de métricas (somas e máximos):
+- resumo_horario: por veículo, hora e período operacional. A ingestão reagrega
+  apenas as horas tocadas pelo lote (inclusive horas antigas recebidas com
+  atraso via GPRS), mais a hora seguinte do mesmo dia, cujo primeiro delta de
+  odômetro depende da última posição da hora tocada.
+- resumo_diario: por veículo, dia e período operacional, obtido somando as
+  linhas horárias dos dias tocados.
+
+Ambas podem ser reconstruídas do zero com:
+
+    python -m app.rollups rebuild [--placa ABC-1234]
+"""
+
+import argparse
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import and_, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from .models import PosicaoHistorica, ResumoDiario, ResumoHorario, Veiculo, get_session
+from .periods import ANALYZER_CLASSIFIER
+
+logger = logging.getLogger(__name__)
+
+# Colunas de posicoes_historicas necessárias para calcular um resumo
+ROLLUP_SOURCE_COLUMNS = ['veiculo_id', 'data_evento', 'velocidade_kmh', 'ignicao',
+                         'latitude', 'longitude', 'odometro_periodo_km']
+
+ROLLUP_KEY = ['veiculo_id', 'data', 'periodo_operacional']
+HOURLY_ROLLUP_KEY = ['veiculo_id', 'hora', 'periodo_operacional']
+ROLLUP_VALUE_COLUMNS = [
+    'total_registros',
+    'km_deslocamento', 'registros_deslocamento', 'velocidade_soma_deslocamento', 'velocidade_max_deslocamento',
+    'registros_validos', 'km_movimento', 'odometro_km', 'velocidade_max', 'velocidade_soma',
+    'registros_velocidade', 'registros_ligado', 'registros_movimento', 'alertas_velocidade',
+]
+_MAX_COLUMNS = ['velocidade_max_deslocamento', 'velocidade_max']
+
+# Mesmo limite usado pelo PeriodAggregator para alertas de velocidade
+SPEED_ALERT_KMH = 80
+
+# Janela de leitura usada na reconstrução (limita a memória por veículo)
+REBUILD_WINDOW_DAYS = 31
+
+ONE_HOUR = timedelta(hours=1)
+
+
+def empty_daily_rollup() -> pd.DataFrame:
+    """DataFrame vazio com o layout de resumo_diario"""
+    return pd.DataFrame(columns=ROLLUP_KEY + ROLLUP_VALUE_COLUMNS)
+
+
+def empty_hourly_rollup() -> pd.DataFrame:
+    """DataFrame vazio com o layout de resumo_horario"""
+    return pd.DataFrame(columns=HOURLY_ROLLUP_KEY + ROLLUP_VALUE_COLUMNS)
+
+
+def _rollup_base(posicoes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Colunas por posição que, somadas (ou maximizadas), formam qualquer resumo.
+
+    Reproduz as duas semânticas usadas nos relatórios:
+    - trechos consistentes de generate_complete_analysis (delta de odômetro > 0
+      e velocidade > 0, deltas calculados dentro do dia);
+    - registros aprovados pelas regras 1-3 de DataQualityRules, base do PeriodAggregator.
+    """
+    df = posicoes.sort_values(['veiculo_id', 'data_evento'], kind='stable')
+    data_evento = pd.to_datetime(df['data_evento'])
+    velocidade = pd.to_numeric(df['velocidade_kmh'], errors='coerce').fillna(0.0)
+    odometro = pd.to_numeric(df['odometro_periodo_km'], errors='coerce').fillna(0.0)
+    ignicao = df['ignicao']
+    em_movimento = ignicao.isin(['LM'])
+    ligado = ignicao.isin(['L', 'LP', 'LM'])
+    dia = data_evento.dt.normalize()
+
+    # Deltas de odômetro dentro de cada (veículo, dia)
+    deltas = odometro.groupby([df['veiculo_id'], dia], sort=False).diff().fillna(0).clip(lower=0)
+    deslocamento = (deltas > 0) & (velocidade > 0)
+
+    # Regras 1-3 de DataQualityRules.validate_telemetry_consistency
+    latitude = pd.to_numeric(df['latitude'], errors='coerce')
+    longitude = pd.to_numeric(df['longitude'], errors='coerce')
+    valido = ~(
+        ((odometro > 0) & (velocidade == 0)) |
+        ((velocidade > 0) & (odometro == 0) & em_movimento) |
+        ((latitude == 0) & (longitude == 0))
+    )
+    em_velocidade = valido & (velocidade > 0)
+
+    return pd.DataFrame({
+        'veiculo_id': df['veiculo_id'].astype('int64'),
+        'data': dia.dt.date,
+        'hora': data_evento.dt.floor('h'),
+        'periodo_operacional': ANALYZER_CLASSIFIER.classify(data_evento).astype(str),
+        'total_registros': 1,
+        'km_deslocamento': deltas.where(deslocamento, 0.0),
+        'registros_deslocamento': deslocamento.astype(int),
+        'velocidade_soma_deslocamento': velocidade.where(deslocamento, 0.0),
+        'velocidade_max_deslocamento': velocidade.where(deslocamento, 0.0),
+        'registros_validos': valido.astype(int),
+        'km_movimento': odometro.where(em_velocidade, 0.0),
+        'odometro_km': odometro.where(valido, 0.0),
+        'velocidade_max': velocidade.where(valido, 0.0),
+        'velocidade_soma': velocidade.where(em_velocidade, 0.0),
+        'registros_velocidade': em_velocidade.astype(int),
+        'registros_ligado': (valido & ligado).astype(int),
+        'registros_movimento': (valido & em_movimento).astype(int),
+        'alertas_velocidade': (valido & (velocidade > SPEED_ALERT_KMH)).astype(int),
+    }, index=df.index)
+
+
+def _group_rollup(base: pd.DataFrame, key: List[str]) -> pd.DataFrame:
+    """Soma (ou maximiza) as colunas de métricas por chave"""
+    agregacoes = {col: ('max' if col in _MAX_COLUMNS else 'sum') for col in ROLLUP_VALUE_COLUMNS}
+    return base.groupby(key, sort=True)[ROLLUP_VALUE_COLUMNS].agg(agregacoes).reset_index()
+
+
+def compute_daily_rollup(posicoes: pd.DataFrame) -> pd.DataFrame:
+    """Agrega posições brutas em linhas (veiculo_id, data, periodo_operacional)"""
+    if posicoes.empty:
+        return empty_daily_rollup()
+    return _group_rollup(_rollup_base(posicoes), ROLLUP_KEY)
+
+
+def compute_hourly_rollup(posicoes: pd.DataFrame) -> pd.DataFrame:
+    """Agrega posições brutas em linhas (veiculo_id, hora, periodo_operacional)"""
+    if posicoes.empty:
+        return empty_hourly_rollup()
+    return _group_rollup(_rollup_base(posicoes), HOURLY_ROLLUP_KEY)
+
+
+def daily_from_hourly(resumo_horario: pd.DataFrame) -> pd.DataFrame:
+    """Soma linhas horárias em linhas diárias (os deltas já são calculados por dia)"""
+    if resumo_horario.empty:
+        return empty_daily_rollup()
+    base = resumo_horario.assign(data=pd.to_datetime(resumo_horario['hora']).dt.date)
+    return _group_rollup(base, ROLLUP_KEY)
+
+
+def _read_positions(session: Session, veiculo_id: int, inicio: datetime, fim: datetime,
+                    inclusive_end: bool = False) -> pd.DataFrame:
+    """Posições de um veículo em [inicio, fim) (ou [inicio, fim] com inclusive_end)"""
+    tabela = PosicaoHistorica.__table__
+    limite_fim = tabela.c.data_evento <= fim if inclusive_end else tabela.c.data_evento < fim
+    query = select(*[tabela.c[c] for c in ROLLUP_SOURCE_COLUMNS]).where(
+        and_(tabela.c.veiculo_id == veiculo_id, tabela.c.data_evento >= inicio, limite_fim)
+    ).order_by(tabela.c.data_evento)
+    result = session.execute(query)
+    return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+
+def _read_rollup_rows(session: Session, modelo, coluna_tempo: str, veiculo_id: int,
+                      inicio, fim) -> pd.DataFrame:
+    """Linhas de um resumo (modelo) de um veículo com coluna_tempo em [inicio, fim)"""
+    tabela = modelo.__table__
+    colunas = ['veiculo_id', coluna_tempo, 'periodo_operacional'] + ROLLUP_VALUE_COLUMNS
+    query = select(*[tabela.c[c] for c in colunas]).where(and_(
+        tabela.c.veiculo_id == veiculo_id, tabela.c[coluna_tempo] >= inicio, tabela.c[coluna_tempo] < fim
+    )).order_by(tabela.c[coluna_tempo], tabela.c.periodo_operacional)
+    result = session.execute(query)
+    return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+
+def _day_start(valor) -> datetime:
+    return pd.Timestamp(valor).normalize().to_pydatetime()
+
+
+def _insert_rollups(session: Session, modelo, resumo: pd.DataFrame) -> int:
+    if resumo.empty:
+        return 0
+    # Colunas convertidas de uma vez para tipos Python (o driver não aceita tipos NumPy)
+    colunas = list(resumo.columns) + ['atualizado_em']
+    valores = [resumo[c].tolist() for c in resumo.columns] + [[datetime.utcnow()] * len(resumo)]
+    registros = [dict(zip(colunas, linha)) for linha in zip(*valores)]
+    session.execute(insert(modelo), registros)
+    return len(registros)
+
+
+def touched_hours(veiculo_ids: Iterable, datas_evento: Iterable) -> pd.DataFrame:
+    """Pares (veiculo_id, hora) distintos de um lote de posições"""
+    chaves = pd.DataFrame({
+        'veiculo_id': pd.Series(list(veiculo_ids), dtype='int64'),
+        'hora': pd.to_datetime(pd.Series(list(datas_evento))).dt.floor('h'),
+    })
+    return chaves.dropna().drop_duplicates()
+
+
+def _clusters(horas: List[pd.Timestamp]) -> List[List[pd.Timestamp]]:
+    """Agrupa horas ordenadas em blocos de dias consecutivos (uma leitura por bloco)"""
+    blocos = [[horas[0]]]
+    for hora in horas[1:]:
+        if (hora.normalize() - blocos[-1][-1].normalize()).days > 1:
+            blocos.append([hora])
+        else:
+            blocos[-1].append(hora)
+    return blocos
+
+
+def _run_ends(horas: List[pd.Timestamp]) -> List[pd.Timestamp]:
+    """Fim (exclusivo) de cada sequência de horas consecutivas"""
+    return [hora + ONE_HOUR for hora, seguinte in zip(horas, horas[1:] + [None])
+            if seguinte is None or seguinte - hora > ONE_HOUR]
+
+
+def refresh_hourly_rollups(session: Session, chaves: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reagrega apenas as horas informadas (veiculo_id, hora) e, em cada dia, a
+    primeira hora com dados depois de cada sequência tocada (o delta de odômetro
+    da sua primeira posição depende da posição anterior).
+
+    Não faz commit. Retorna as chaves (veiculo_id, hora) regravadas.
+    """
+    tabela = PosicaoHistorica.__table__
+    lotes = []
+    regravadas = []
+    for veiculo_id, grupo in chaves.groupby('veiculo_id'):
+        veiculo_id = int(veiculo_id)
+        for bloco in _clusters(sorted(set(pd.to_datetime(grupo['hora'])))):
+            inicio, fim = bloco[0].to_pydatetime(), (bloco[-1] + ONE_HOUR).to_pydatetime()
+
+            # Hora seguinte (mesmo dia) depois da última hora tocada
+            proxima = session.execute(select(func.min(tabela.c.data_evento)).where(and_(
+                tabela.c.veiculo_id == veiculo_id, tabela.c.data_evento >= fim,
+                tabela.c.data_evento < _day_start(bloco[-1]) + timedelta(days=1)
+            ))).scalar()
+            leitura_fim = fim if proxima is None else (pd.Timestamp(proxima).floor('h') + ONE_HOUR).to_pydatetime()
+
+            # Posição anterior no mesmo dia: contexto para o delta da primeira posição
+            anterior = session.execute(
+                select(*[tabela.c[c] for c in ROLLUP_SOURCE_COLUMNS]).where(and_(
+                    tabela.c.veiculo_id == veiculo_id, tabela.c.data_evento < inicio,
+                    tabela.c.data_evento >= _day_start(inicio)
+                )).order_by(tabela.c.data_evento.desc()).limit(1)
+            ).fetchall()
+
+            posicoes = _read_positions(session, veiculo_id, inicio, leitura_fim)
+            if anterior:
+                posicoes = pd.concat([pd.DataFrame(anterior, columns=ROLLUP_SOURCE_COLUMNS), posicoes],
+                                     ignore_index=True)
+            lotes.append(posicoes)
+
+            afetadas = set(bloco)
+            instantes = pd.to_datetime(posicoes['data_evento']).sort_values().reset_index(drop=True) \
+                if not posicoes.empty else pd.Series(dtype='datetime64[ns]')
+            for fim_sequencia in _run_ends(bloco):
+                posicao = instantes.searchsorted(fim_sequencia)
+                if posicao < len(instantes) and \
+                        instantes[posicao].normalize() == (fim_sequencia - ONE_HOUR).normalize():
+                    afetadas.add(instantes[posicao].floor('h'))
+
+            horas = sorted(afetadas)
+            # Lotes para respeitar o limite de parâmetros do SQLite
+            for start in range(0, len(horas), 500):
+                session.execute(delete(ResumoHorario).where(and_(
+                    ResumoHorario.veiculo_id == veiculo_id,
+                    ResumoHorario.hora.in_([h.to_pydatetime() for h in horas[start:start + 500]])
+                )))
+            regravadas.extend((veiculo_id, hora) for hora in horas)
+
+    regravadas = pd.DataFrame(regravadas, columns=['veiculo_id', 'hora'])
+    lotes = [lote for lote in lotes if not lote.empty]
+    if lotes:
+        # Uma única agregação para todos os veículos (blocos não compartilham dias)
+        base = _rollup_base(pd.concat(lotes, ignore_index=True))
+        chave = pd.MultiIndex.from_arrays([base['veiculo_id'], base['hora']])
+        base = base[chave.isin(pd.MultiIndex.from_frame(regravadas))]
+        _insert_rollups(session, ResumoHorario, _group_rollup(base, HOURLY_ROLLUP_KEY))
+    return regravadas
+
+
+def refresh_daily_rollups(session: Session, chaves: pd.DataFrame) -> int:
+    """
+    Recalcula os resumos diários dos (veiculo_id, data) informados somando as
+    linhas de resumo_horario. Não faz commit; retorna as linhas gravadas.
+    """
+    if chaves.empty:
+        return 0
+
+    chaves = chaves[['veiculo_id', 'data']].drop_duplicates()
+    lotes = []
+    for veiculo_id, grupo in chaves.groupby('veiculo_id'):
+        veiculo_id = int(veiculo_id)
+        dias = sorted(set(grupo['data']))
+        session.execute(delete(ResumoDiario).where(and_(
+            ResumoDiario.veiculo_id == veiculo_id, ResumoDiario.data.in_(dias)
+        )))
+        horario = _read_rollup_rows(session, ResumoHorario, 'hora', veiculo_id,
+                                    _day_start(dias[0]), _day_start(dias[-1]) + timedelta(days=1))
+        if not horario.empty:
+            lotes.append(horario[pd.to_datetime(horario['hora']).dt.date.isin(dias)])
+
+    lotes = [lote for lote in lotes if not lote.empty]
+    if not lotes:
+        return 0
+    return _insert_rollups(session, ResumoDiario, daily_from_hourly(pd.concat(lotes, ignore_index=True)))
+
+
+def refresh_rollups(session: Session, veiculo_ids: Iterable, datas_evento: Iterable) -> Dict[str, int]:
+    """
+    Atualiza resumo_horario e resumo_diario para um lote recém-gravado de posições
+    (chamado dentro da transação da ingestão, antes do commit)
+    """
+    horas = refresh_hourly_rollups(session, touched_hours(veiculo_ids, datas_evento))
+    if horas.empty:
+        return {'horas': 0, 'dias': 0}
+    dias = horas.assign(data=pd.to_datetime(horas['hora']).dt.date)
+    refresh_daily_rollups(session, dias)
+    return {'horas': len(horas), 'dias': len(dias[['veiculo_id', 'data']].drop_duplicates())}
+
+
+def rebuild_daily_rollups(session: Optional[Session] = None, placa: Optional[str] = None) -> int:
+    """
+    Reconstrói resumo_horario e resumo_diario a partir de posicoes_historicas
+    (todos os veículos ou apenas a placa informada). Retorna o número de linhas
+    diárias gravadas.
+    """
+    own_session = session is None
+    session = session or get_session()
+    try:
+        query = session.query(Veiculo.id)
+        if placa:
+            query = query.filter(Veiculo.placa == placa)
+        veiculo_ids = [veiculo_id for (veiculo_id,) in query.order_by(Veiculo.id)]
+
+        total = 0
+        for veiculo_id in veiculo_ids:
+            session.execute(delete(ResumoHorario).where(ResumoHorario.veiculo_id == veiculo_id))
+            session.execute(delete(ResumoDiario).where(ResumoDiario.veiculo_id == veiculo_id))
+            primeiro, ultimo = session.query(
+                func.min(PosicaoHistorica.data_evento), func.max(PosicaoHistorica.data_evento)
+            ).filter(PosicaoHistorica.veiculo_id == veiculo_id).one()
+            if primeiro is None:
+                continue
+
+            # Janelas alinhadas em dias inteiros: cada dia é agregado uma única vez
+            inicio = _day_start(primeiro)
+            fim = _day_start(ultimo) + timedelta(days=1)
+            while inicio < fim:
+                proximo = min(inicio + timedelta(days=REBUILD_WINDOW_DAYS), fim)
+                horario = compute_hourly_rollup(_read_positions(session, veiculo_id, inicio, proximo))
+                _insert_rollups(session, ResumoHorario, horario)
+                total += _insert_rollups(session, ResumoDiario, daily_from_hourly(horario))
+                inicio = proximo
+
+        if own_session:
+            session.commit()
+        logger.info(f"Resumos reconstruídos: {total} linhas diárias para {len(veiculo_ids)} veículo(s)")
+        return total
+    except Exception:
+        if own_session:
+            session.rollback()
+        raise
+    finally:
+        if own_session:
+            session.close()
+
+
+def _split_window(data_inicio: datetime, data_fim: datetime, freq: str) -> Tuple[Optional[Tuple[datetime, datetime]], List[Tuple[datetime, datetime]]]:
+    """
+    Separa a janela fechada [data_inicio, data_fim] em unidades inteiras ('D' ou 'h'),
+    lidas do resumo, e trechos parciais nas bordas, agregados a partir das posições.
+    Retorna ((início, fim exclusivo) das unidades inteiras ou None, trechos parciais).
+    """
+    primeiro = pd.Timestamp(data_inicio).ceil(freq).to_pydatetime()
+    # A última unidade é inteira se a janela vai até o seu último segundo
+    depois = (pd.Timestamp(data_fim) + pd.Timedelta(seconds=1)).floor(freq).to_pydatetime()
+
+    if primeiro >= depois:
+        return None, [(data_inicio, data_fim)]
+
+    parciais = []
+    if data_inicio < primeiro:
+        parciais.append((data_inicio, primeiro - timedelta(microseconds=1)))
+    if data_fim >= depois:
+        parciais.append((depois, data_fim))
+    return (primeiro, depois), parciais
+
+
+def _load_rollups(placa: str, data_inicio: datetime, data_fim: datetime, session: Optional[Session],
+                  modelo, coluna_tempo: str, freq: str, compute, vazio) -> pd.DataFrame:
+    """Leitura comum de resumo_diario/resumo_horario com bordas parciais e conferência de cobertura"""
+    if data_inicio.date() == data_fim.date():
+        data_fim = data_fim.replace(hour=23, minute=59, second=59, microsecond=999999)
+
+    own_session = session is None
+    session = session or get_session()
+    try:
+        veiculo_id = session.query(Veiculo.id).filter(Veiculo.placa == placa).scalar()
+        if veiculo_id is None:
+            return vazio()
+
+        inteiras, parciais = _split_window(data_inicio, data_fim, freq)
+        partes = []
+
+        if inteiras:
+            inicio, fim = inteiras
+            limites = (inicio.date(), fim.date()) if coluna_tempo == 'data' else (inicio, fim)
+            resumo = _read_rollup_rows(session, modelo, coluna_tempo, veiculo_id, *limites)
+
+            # Confere a cobertura: o resumo precisa contar todas as posições do intervalo
+            posicoes_no_periodo = session.query(func.count(PosicaoHistorica.id)).filter(
+                PosicaoHistorica.veiculo_id == veiculo_id,
+                PosicaoHistorica.data_evento >= inicio,
+                PosicaoHistorica.data_evento < fim,
+            ).scalar() or 0
+            registros_resumo = int(resumo['total_registros'].sum()) if not resumo.empty else 0
+
+            if registros_resumo != posicoes_no_periodo:
+                logger.warning(f"{modelo.__tablename__} incompleto para {placa} ({registros_resumo} de "
+                               f"{posicoes_no_periodo} registros); agregando das posições. "
+                               f"Execute 'python -m app.rollups rebuild'.")
+                resumo = compute(_read_positions(session, veiculo_id, inicio, fim))
+            partes.append(resumo)
+
+        for inicio, fim in parciais:
+            partes.append(compute(_read_positions(session, veiculo_id, inicio, fim, inclusive_end=True)))
+
+        partes = [parte for parte in partes if not parte.empty]
+        if not partes:
+            return vazio()
+        resumo = pd.concat(partes, ignore_index=True)
+        return resumo.sort_values([coluna_tempo, 'periodo_operacional'], kind='stable').reset_index(drop=True)
+    finally:
+        if own_session:
+            session.close()
+
+
+def load_daily_rollups(placa: str, data_inicio: datetime, data_fim: datetime,
+                       session: Optional[Session] = None) -> pd.DataFrame:
+    """
+    Resumo diário de um veículo na janela [data_inicio, data_fim] (mesma regra de
+    janela de TelemetryAnalyzer.get_vehicle_data).
+
+    Dias inteiros vêm de resumo_diario; bordas parciais da janela são agregadas
+    na hora a partir das posições. Se o resumo estiver incompleto (ex.: banco
+    anterior à tabela), os dias inteiros também são agregados das posições.
+    """
+    return _load_rollups(placa, data_inicio, data_fim, session, ResumoDiario, 'data', 'D',
+                         compute_daily_rollup, empty_daily_rollup)
+
+
+def _stats_from_rollups(resumo: pd.DataFrame, coluna_tempo: str) -> List[dict]:
+    """km e velocidade média/máxima dos trechos consistentes por unidade de tempo"""
+    if resumo.empty:
+        return []
+    agrupado = resumo.groupby(coluna_tempo, sort=True).agg(
+        km=('km_deslocamento', 'sum'),
+        registros=('registros_deslocamento', 'sum'),
+        velocidade_soma=('velocidade_soma_deslocamento', 'sum'),
+        velocidade_max=('velocidade_max_deslocamento', 'max'),
+    )
+    return [
+        {
+            'km': float(row['km']),
+            'avg_speed': float(row['velocidade_soma'] / row['registros']) if row['registros'] > 0 else 0.0,
+            'max_speed': float(row['velocidade_max']) if row['registros'] > 0 else 0.0,
+            '_instante': instante,
+        }
+        for instante, row in agrupado.iterrows()
+    ]
+
+
+def daily_stats_from_rollups(resumo: pd.DataFrame) -> List[dict]:
+    """Estatísticas diárias (km, velocidade média/máxima dos trechos consistentes)"""
+    stats = _stats_from_rollups(resumo, 'data')
+    return [{'date': s.pop('_instante').isoformat(), **s} for s in stats]
+
+
+def daily_stats_from_positions(posicoes: pd.DataFrame) -> List[dict]:
+    """
+    daily_stats direto das posições já carregadas de um veículo (mesmo resultado
+    de daily_stats_from_rollups sobre o resumo do período, sem reler o banco)
+    """
+    if posicoes.empty:
+        return []
+    if 'veiculo_id' not in posicoes.columns:
+        posicoes = posicoes.assign(veiculo_id=0)
+    return daily_stats_from_rollups(compute_daily_rollup(posicoes))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Manutenção dos resumos pré-agregados de telemetria')
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+    rebuild = subcomandos.add_parser('rebuild', help='Reconstrói resumo_horario e resumo_diario a partir das posições')
+    rebuild.add_argument('--placa', help='Reconstrói apenas o veículo informado')
+    args = parser.parse_args(argv)
+
+    if args.comando == 'rebuild':
+        from .models import create_tables
+        create_tables()
+        total = rebuild_daily_rollups(placa=args.placa)
+        print(f"Resumos reconstruídos: {total} linhas diárias")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+Geometria da rota para o mapa do navegador (Leaflet), sem HTML do Folium.
+
+A rota é dividida em trechos contíguos do mesmo período operacional, cada um
+simplificado por Douglas-Peucker (geo.simplify_route) e colorido pelo período.
+A saída é compacta: polilinhas codificadas (algoritmo do Google, 5 casas
+decimais) ou GeoJSON. O tamanho da resposta acompanha a geometria simplificada,
+não o número de posições; períodos longos são lidos em páginas por janela de tempo,
+todas simplificadas com a mesma tolerância e ligadas à página seguinte.
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .geo import route_tolerance, simplify_route
+
+# Saídas da geometria:
+# 'polyline': um trecho por item, com a polilinha codificada (L.polyline após decodificar)
+# 'geojson':  FeatureCollection de LineStrings (L.geoJSON)
+GEOMETRY_FORMATS = ('polyline', 'geojson')
+
+# Janela de tempo de cada página da rota
+ROUTE_PAGE_HOURS = int(os.environ.get('ROUTE_PAGE_HOURS', '24'))
+
+# Cores por período operacional (mapas Folium e API de geometria)
+PERIOD_COLORS = {
+    'operacional_manha': '#28a745',     # Verde
+    'operacional_meio_dia': '#17a2b8',  # Azul claro
+    'operacional_tarde': '#007bff',     # Azul
+    'fora_horario_manha': '#ffc107',    # Amarelo
+    'fora_horario_tarde': '#fd7e14',    # Laranja
+    'fora_horario_noite': '#6f42c1',    # Roxo
+    'final_semana': '#dc3545'           # Vermelho
+}
+OTHER_PERIOD_COLOR = 'gray'
+
+
+def encode_polyline(lat, lon, precision: int = 5) -> str:
+    """Codifica as coordenadas no formato de polilinha do Google (Encoded Polyline Algorithm)"""
+    fator = 10 ** precision
+    pontos = np.column_stack([
+        np.round(np.asarray(lat, dtype=float) * fator),
+        np.round(np.asarray(lon, dtype=float) * fator),
+    ]).astype(np.int64)
+    # Primeiro ponto absoluto, os demais como diferença para o anterior (lat, lon intercalados)
+    deltas = np.diff(pontos, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    # Sinal no bit menos significativo
+    valores = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    saida = []
+    for valor in valores.tolist():
+        # Blocos de 5 bits, do menos significativo; 0x20 indica que há outro bloco
+        while valor >= 0x20:
+            saida.append(chr((0x20 | (valor & 0x1f)) + 63))
+            valor >>= 5
+        saida.append(chr(valor + 63))
+    return ''.join(saida)
+
+
+def period_segments(df: pd.DataFrame, tolerancia: float,
+                    ligacao: Optional[Tuple[float, float]] = None) -> List[Dict[str, Any]]:
+    """
+    Trechos contíguos do mesmo período operacional, em ordem, com as coordenadas
+    simplificadas. Cada trecho termina no primeiro ponto do seguinte, para que a
+    linha desenhada seja contínua; `ligacao` (lat, lon) é o primeiro ponto depois
+    de df (página seguinte da rota), ao qual o último trecho é ligado. Espera
+    data_evento, latitude, longitude, velocidade_kmh e periodo_operacional,
+    ordenados por data_evento.
+    """
+    df = df.dropna(subset=['latitude', 'longitude'])
+    n = len(df)
+    if n == 0:
+        return []
+
+    lat = df['latitude'].to_numpy(dtype=float)
+    lon = df['longitude'].to_numpy(dtype=float)
+    periodo = df['periodo_operacional'].astype(str).to_numpy()
+    datas = df['data_evento'].to_numpy()
+    velocidade = df['velocidade_kmh'].fillna(0).to_numpy()
+
+    inicios = np.concatenate(([0], np.flatnonzero(periodo[1:] != periodo[:-1]) + 1))
+    fins = np.append(inicios[1:], n)
+    if ligacao is not None:
+        lat, lon = np.append(lat, ligacao[0]), np.append(lon, ligacao[1])
+
+    segmentos = []
+    for inicio, fim in zip(inicios.tolist(), fins.tolist()):
+        ate = min(fim + 1, len(lat))  # inclui o ponto de ligação com o próximo trecho
+        indices = inicio + simplify_route(lat[inicio:ate], lon[inicio:ate], tolerancia)
+        segmentos.append({
+            'periodo': periodo[inicio],
+            'cor': PERIOD_COLORS.get(periodo[inicio], OTHER_PERIOD_COLOR),
+            'inicio': pd.Timestamp(datas[inicio]).isoformat(),
+            'fim': pd.Timestamp(datas[fim - 1]).isoformat(),
+            'pontos': fim - inicio,
+            'velocidade_max': int(velocidade[inicio:fim].max()),
+            'lat': np.round(lat[indices], 5),
+            'lon': np.round(lon[indices], 5),
+        })
+    return segmentos
+
+
+def route_geometry(df: pd.DataFrame, formato: str, resolution: float, tolerancia: Optional[float] = None,
+                   ligacao: Optional[Tuple[float, float]] = None) -> Dict[str, Any]:
+    """
+    Geometria da rota no formato pedido (ver GEOMETRY_FORMATS). Sem `tolerancia`, a
+    simplificação é proporcional à extensão de df (geo.route_tolerance); páginas de
+    uma mesma rota devem receber a tolerância de todo o período. `ligacao`: ver
+    period_segments.
+    """
+    if formato not in GEOMETRY_FORMATS:
+        raise ValueError(f"Formato de geometria inválido: {formato}")
+
+    df = df.dropna(subset=['latitude', 'longitude'])
+    if tolerancia is None:
+        tolerancia = route_tolerance(df['latitude'], df['longitude'], resolution) if len(df) else 0.0
+    segmentos = period_segments(df, tolerancia, ligacao)
+
+    resultado = {
+        'pontos_originais': int(len(df)),
+        'pontos_simplificados': sum(len(s['lat']) for s in segmentos),
+        'tolerancia': tolerancia,
+    }
+    if formato == 'polyline':
+        resultado['segmentos'] = [
+            {**{k: v for k, v in s.items() if k not in ('lat', 'lon')},
+             'polyline': encode_polyline(s['lat'], s['lon'])}
+            for s in segmentos
+        ]
+        return resultado
+
+    features = []
+    for s in segmentos:
+        coordenadas = np.column_stack([s['lon'], s['lat']]).tolist()  # GeoJSON: [lon, lat]
+        # Trecho de uma única posição (fim da rota): ponto em vez de linha
+        geometria = ({'type': 'LineString', 'coordinates': coordenadas} if len(coordenadas) > 1
+                     else {'type': 'Point', 'coordinates': coordenadas[0]})
+        features.append({
+            'type': 'Feature',
+            'geometry': geometria,
+            'properties': {k: v for k, v in s.items() if k not in ('lat', 'lon')},
+        })
+    return {'type': 'FeatureCollection', 'features': features, **resultado}
@@ -2,21 +2,30 @@
 Serviços de análise e geração de insights para telemetria veicular.
 """
 
+import os
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from itertools import repeat
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta, time
 from typing import Dict, List, Tuple, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, and_, or_, select
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import seaborn as sns
+import plotly
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 import folium
 from folium import plugins
 import base64
+import json
 from io import BytesIO
 
 # ==============================
@@ -39,8 +48,93 @@ logger.setLevel(logging.INFO)
 # False -> comportamento legado (soma todo incremento de odômetro)
 CONSISTENT_SPEED_KM_ONLY = True
 
-from .models import Cliente, Veiculo, PosicaoHistorica, get_session
+from .models import (Cliente, Veiculo, PosicaoHistorica, get_session, create_database_engine,
+                     dispose_engines, get_database_url, set_engine_read_only)
 from .utils import get_fuel_consumption_estimate
+from .periods import ANALYZER_CLASSIFIER
+from .downsampling import downsample_indices, merge_peaks
+from .geo import route_tolerance, simplify_route
+from .route_geometry import OTHER_PERIOD_COLOR, PERIOD_COLORS
+from .rollups import daily_stats_from_positions, load_daily_rollups
+
+# Paralelismo do relatório consolidado da frota (opcional)
+# FLEET_REPORT_WORKERS: processos de trabalho (1 = tudo no próprio processo, padrão; 0 = um por núcleo)
+# FLEET_REPORT_BATCH: veículos por tarefa (limita o DataFrame em memória de cada worker)
+# FLEET_REPORT_START_METHOD: 'spawn' ou 'forkserver'. Nunca 'fork': os relatórios rodam em
+# threads do servidor, e um fork com travas seguras por outras threads (engines, logging,
+# pool do SQLAlchemy) pode deixar o processo filho travado.
+FLEET_REPORT_WORKERS = int(os.environ.get('FLEET_REPORT_WORKERS', '1'))
+FLEET_REPORT_BATCH = int(os.environ.get('FLEET_REPORT_BATCH', '25'))
+FLEET_REPORT_START_METHOD = os.environ.get('FLEET_REPORT_START_METHOD', 'spawn')
+
+# Saída dos gráficos Plotly
+# 'html': página completa com plotly.js embutido (~3,5 MB por gráfico; formato original)
+# 'div':  apenas o <div> e o script do gráfico; a página carrega plotly.js uma vez de /static
+# 'json': figura Plotly (data/layout) para Plotly.newPlot no navegador
+CHART_FORMATS = ('json', 'div', 'html')
+PLOTLY_JS_FILENAME = f"plotly-{plotly.__version__}.min.js"
+
+# Pontos por série nos gráficos de velocidade e semanal (LTTB; 0 = todos os pontos)
+CHART_MAX_POINTS = int(os.environ.get('CHART_MAX_POINTS', '2000'))
+SPEED_LIMIT_KMH = 80  # linha de limite do gráfico de velocidade
+
+# Mapas Folium: a rota é simplificada (Douglas-Peucker) com tolerância igual à extensão
+# da rota dividida por ROUTE_SIMPLIFY_RESOLUTION; 8000 equivale a cerca de 1 pixel três
+# níveis de zoom além da vista inicial (fit_bounds em ~1000 px). Nos níveis intermediários
+# o Leaflet simplifica a linha de novo no navegador (smoothFactor).
+ROUTE_SIMPLIFY_RESOLUTION = float(os.environ.get('ROUTE_SIMPLIFY_RESOLUTION', '8000'))
+
+# Marcador de posição desenhado no navegador (FastMarkerCluster). Cada linha é
+# [lat, lon, índice da cor, raio, velocidade, id da posição]; o popup completo é
+# buscado em /api/posicoes/{id} quando aberto pela primeira vez.
+_POSITION_MARKER_JS = """(function () {
+    var cores = __CORES__;
+    var esc = function (v) {
+        return String(v === null || v === undefined ? 'N/A' : v).replace(/[&<>"']/g, function (c) {
+            return '&#' + c.charCodeAt(0) + ';';
+        });
+    };
+    return function (row) {
+        var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+            radius: row[3], color: cores[row[2]], fill: true, fillColor: cores[row[2]],
+            fillOpacity: 0.7, weight: 2
+        });
+        marker.bindPopup('Velocidade: ' + row[4] + ' km/h', {maxWidth: 250});
+        if (row[5] !== null) {
+            marker.once('popupopen', function () {
+                fetch('/api/posicoes/' + row[5]).then(function (r) { return r.json(); }).then(function (p) {
+                    marker.setPopupContent('<div style="width: 200px;">'
+                        + '<b>Data/Hora:</b> ' + esc(p.data_hora) + '<br>'
+                        + '<b>Velocidade:</b> ' + esc(p.velocidade_kmh) + ' km/h<br>'
+                        + '<b>Período:</b> ' + esc(p.periodo_operacional) + '<br>'
+                        + '<b>Status:</b> ' + esc(p.ignicao) + '<br>'
+                        + '<b>Endereço:</b> ' + esc(p.endereco) + '</div>');
+                });
+            });
+        }
+        return marker;
+    };
+})()"""
+
+
+def render_figure(fig: go.Figure, div_id: str, formato: str = 'html'):
+    """
+    Converte a figura no formato de saída pedido (ver CHART_FORMATS): dict com
+    data/layout para 'json', HTML para 'div' e 'html'
+    """
+    if formato == 'json':
+        # to_json usa o codificador do Plotly (datas, arrays numpy compactos)
+        return json.loads(fig.to_json())
+    if formato == 'div':
+        return fig.to_html(full_html=False, include_plotlyjs=False, div_id=div_id)
+    return fig.to_html(include_plotlyjs='inline', div_id=div_id)
+
+
+@lru_cache(maxsize=1)
+def plotly_js_bundle() -> str:
+    """Código do plotly.js da versão instalada (lido uma vez; ver GET /vendor/plotly-*.min.js)"""
+    from plotly.offline import get_plotlyjs
+    return get_plotlyjs()
 
 
 # ==============================
@@ -86,7 +180,24 @@ class DataQualityRules:
             )
             df_clean = df_clean[~mask_invalid_speed_km]
         
-        # Regra 3: Valida dados de GPS/GPRS quando disponíveis\n        if 'latitude' in df_clean.columns and 'longitude' in df_clean.columns:\n            mask_invalid_coords = (\n                (df_clean['latitude'] == 0) & \n                (df_clean['longitude'] == 0)\n            )\n            df_clean = df_clean[~mask_invalid_coords]\n        \n        # Regra 4: Remove KM >0, speed >0, fuel ==0 se coluna existir\n        if 'combustivel_litros' in df_clean.columns:\n            mask_invalid_fuel = (\n                (df_clean['odometro_periodo_km'] > 0) & \n                (df_clean['velocidade_kmh'] > 0) &\n                (df_clean['combustivel_litros'] == 0)\n            )\n            df_clean = df_clean[~mask_invalid_fuel]\n        \n        removed_count = original_count - len(df_clean)
+        # Regra 3: Valida dados de GPS/GPRS quando disponíveis
+        if 'latitude' in df_clean.columns and 'longitude' in df_clean.columns:
+            mask_invalid_coords = (
+                (df_clean['latitude'] == 0) & 
+                (df_clean['longitude'] == 0)
+            )
+            df_clean = df_clean[~mask_invalid_coords]
+        
+        # Regra 4: Remove KM >0, speed >0, fuel ==0 se coluna existir
+        if 'combustivel_litros' in df_clean.columns:
+            mask_invalid_fuel = (
+                (df_clean['odometro_periodo_km'] > 0) & 
+                (df_clean['velocidade_kmh'] > 0) &
+                (df_clean['combustivel_litros'] == 0)
+            )
+            df_clean = df_clean[~mask_invalid_fuel]
+        
+        removed_count = original_count - len(df_clean)
         if removed_count > 0:
             logger.info(f"Removidos {removed_count} registros inconsistentes ({removed_count/original_count:.1%})")
         
@@ -114,102 +225,219 @@ class PeriodAggregator:
     Agregador de dados para diferentes períodos de análise
     """
     
+    # Especificação única das métricas calculadas em cada granularidade. Todas são
+    # somas/máximos, então a mesma agregação vale para posições e para resumo_diario
+    _METRIC_AGGREGATIONS = {
+        'total_registros': ('registros', 'sum'),
+        'km_total': ('km', 'sum'),
+        'velocidade_max': ('velocidade_kmh', 'max'),
+        'velocidade_soma': ('velocidade_soma', 'sum'),
+        'registros_velocidade': ('registros_velocidade', 'sum'),
+        'registros_ligado': ('ligado_n', 'sum'),
+        'registros_movimento': ('movimento_n', 'sum'),
+        'alertas_velocidade': ('alerta_n', 'sum'),
+        'dias_operacao': ('date', 'nunique'),
+    }
+    
     @staticmethod
-    def aggregate_daily(df: pd.DataFrame) -> Dict:
+    def prepare_metric_frame(df: pd.DataFrame) -> pd.DataFrame:
         """
-        Agrega dados por dia
+        Valida os dados uma única vez e pré-calcula as colunas-máscara usadas por
+        todas as agregações (km válido, velocidade em movimento, contadores)
         """
-        if df.empty:
-            return {}
-        
-        # Aplica validação de qualidade
         df_clean = DataQualityRules.validate_telemetry_consistency(df)
+        data_evento = pd.to_datetime(df_clean['data_evento'])
+        velocidade = df_clean['velocidade_kmh']
+        odometro = df_clean['odometro_periodo_km']
+        
+        return pd.DataFrame({
+            'data_evento': data_evento,
+            'date': data_evento.dt.date,
+            'hour': data_evento.dt.hour,
+            'weekday': data_evento.dt.weekday,
+            'week': data_evento.dt.to_period('W'),
+            'registros': 1,
+            'velocidade_kmh': velocidade,
+            'velocidade_soma': velocidade.where(velocidade > 0, 0),
+            'registros_velocidade': (velocidade > 0).astype(int),
+            'km': odometro.where(velocidade > 0, 0) if CONSISTENT_SPEED_KM_ONLY else odometro,
+            'odometro_periodo_km': odometro,
+            'ligado_n': (df_clean['ligado'] == True).astype(int),
+            'movimento_n': (df_clean['em_movimento'] == True).astype(int),
+            'alerta_n': (velocidade > 80).astype(int),
+            'periodo_operacional': df_clean['periodo_operacional'],
+        }, index=df_clean.index)
+    
+    @staticmethod
+    def rollup_metric_frame(resumo: pd.DataFrame) -> pd.DataFrame:
+        """
+        Monta a mesma base de prepare_metric_frame a partir das linhas de resumo_diario
+        (uma linha por dia e período operacional em vez de uma por posição)
+        """
+        resumo = resumo[resumo['registros_validos'] > 0]
+        data = pd.to_datetime(resumo['data'])
+        
+        return pd.DataFrame({
+            'data_evento': data,
+            'date': data.dt.date,
+            'hour': data.dt.hour,
+            'weekday': data.dt.weekday,
+            'week': data.dt.to_period('W'),
+            'registros': resumo['registros_validos'].astype(int),
+            'velocidade_kmh': resumo['velocidade_max'],
+            'velocidade_soma': resumo['velocidade_soma'],
+            'registros_velocidade': resumo['registros_velocidade'].astype(int),
+            'km': resumo['km_movimento'] if CONSISTENT_SPEED_KM_ONLY else resumo['odometro_km'],
+            'odometro_periodo_km': resumo['odometro_km'],
+            'ligado_n': resumo['registros_ligado'].astype(int),
+            'movimento_n': resumo['registros_movimento'].astype(int),
+            'alerta_n': resumo['alertas_velocidade'].astype(int),
+            'periodo_operacional': resumo['periodo_operacional'],
+        }, index=resumo.index)
+    
+    @staticmethod
+    def _aggregate_metrics(base: pd.DataFrame, keys) -> pd.DataFrame:
+        """Calcula todas as métricas de uma granularidade com um único groupby().agg()"""
+        grouped = base.groupby(keys, sort=True).agg(**PeriodAggregator._METRIC_AGGREGATIONS)
+        registros_velocidade = grouped.pop('registros_velocidade')
+        grouped['velocidade_media'] = (grouped.pop('velocidade_soma') / registros_velocidade.where(registros_velocidade > 0)).fillna(0)
+        grouped['tempo_ligado_horas'] = grouped['registros_ligado'] * 5 / 60  # 5min intervals
+        grouped['tempo_movimento_horas'] = grouped['registros_movimento'] * 5 / 60
+        return grouped
+    
+    @staticmethod
+    def _period_counts(base: pd.DataFrame, keys) -> Dict:
+        """Contagem de registros por período operacional para cada grupo"""
+        keys = keys if isinstance(keys, list) else [keys]
+        counts = base.groupby(keys + ['periodo_operacional'], sort=False, observed=True)['registros'].sum()
+        result = {}
+        for index, count in counts.sort_values(ascending=False, kind='stable').items():
+            group_key = index[0] if len(keys) == 1 else index[:-1]
+            result.setdefault(group_key, {})[index[-1]] = count
+        return result
+    
+    @staticmethod
+    def _breakdown(metrics: pd.DataFrame) -> Dict:
+        """Resumo compacto (km, velocidade média, alertas, horas em movimento) por linha"""
+        return {
+            key: {
+                'km': row['km_total'],
+                'avg_speed': row['velocidade_media'],
+                'alerts': int(row['alertas_velocidade']),
+                'movement_hours': row['tempo_movimento_horas']
+            }
+            for key, row in metrics.iterrows()
+        }
+    
+    @staticmethod
+    def _summary(row: pd.Series) -> Dict:
+        """Métricas comuns a todas as granularidades"""
+        return {
+            'total_registros': int(row['total_registros']),
+            'km_total': row['km_total'],
+            'velocidade_max': row['velocidade_max'],
+            'velocidade_media': row['velocidade_media'],
+            'tempo_ligado_horas': row['tempo_ligado_horas'],
+            'tempo_movimento_horas': row['tempo_movimento_horas'],
+            'alertas_velocidade': int(row['alertas_velocidade']),
+        }
+    
+    @staticmethod
+    def _daily_from_base(base: pd.DataFrame) -> Dict:
+        daily = PeriodAggregator._aggregate_metrics(base, 'date')
+        hourly = PeriodAggregator._aggregate_metrics(base, ['date', 'hour'])
+        periodos = PeriodAggregator._period_counts(base, 'date')
         
         daily_data = {}
-        df_clean['date'] = pd.to_datetime(df_clean['data_evento']).dt.date
-        
-        for date, day_df in df_clean.groupby('date'):
-            daily_data[date] = {
-                'total_registros': len(day_df),
-                'km_total': day_df[day_df['velocidade_kmh'] > 0]['odometro_periodo_km'].sum() if CONSISTENT_SPEED_KM_ONLY else day_df['odometro_periodo_km'].sum(),
-                'velocidade_max': day_df['velocidade_kmh'].max(),
-                'velocidade_media': day_df[day_df['velocidade_kmh'] > 0]['velocidade_kmh'].mean() if len(day_df[day_df['velocidade_kmh'] > 0]) > 0 else 0,
-                'tempo_ligado_horas': len(day_df[day_df['ligado'] == True]) * 5 / 60,  # 5min intervals
-                'tempo_movimento_horas': len(day_df[day_df['em_movimento'] == True]) * 5 / 60,
-                'alertas_velocidade': len(day_df[day_df['velocidade_kmh'] > 80]),
-                'periodos_operacionais': day_df['periodo_operacional'].value_counts().to_dict()
-            }
+        for date, row in daily.iterrows():
+            daily_data[date] = PeriodAggregator._summary(row)
+            daily_data[date]['periodos_operacionais'] = periodos.get(date, {})
             
             # Adiciona consumo de combustível validado
-            km = daily_data[date]['km_total']
-            speed_avg = daily_data[date]['velocidade_media']
-            movement_hours = daily_data[date]['tempo_movimento_horas']
             daily_data[date]['combustivel_estimado'] = DataQualityRules.calculate_fuel_consistency(
-                km, speed_avg, movement_hours
+                row['km_total'], row['velocidade_media'], row['tempo_movimento_horas']
             )
-
+            
             # Adiciona breakdown horário para maior granularidade
-            hourly_breakdown = {}
-            day_df['hour'] = pd.to_datetime(day_df['data_evento']).dt.hour
-            for hour, hour_df in day_df.groupby('hour'):
-                hourly_breakdown[hour] = {
-                    'km': hour_df[hour_df['velocidade_kmh'] > 0]['odometro_periodo_km'].sum() if CONSISTENT_SPEED_KM_ONLY else hour_df['odometro_periodo_km'].sum(),
-                    'avg_speed': hour_df[hour_df['velocidade_kmh'] > 0]['velocidade_kmh'].mean() if len(hour_df[hour_df['velocidade_kmh'] > 0]) > 0 else 0,
-                    'alerts': len(hour_df[hour_df['velocidade_kmh'] > 80]),
-                    'movement_hours': len(hour_df[hour_df['em_movimento'] == True]) * 5 / 60
-                }
-            daily_data[date]['hourly_breakdown'] = hourly_breakdown
+            daily_data[date]['hourly_breakdown'] = PeriodAggregator._breakdown(hourly.loc[date])
         
         return daily_data
     
-    @staticmethod  
-    def aggregate_weekly(df: pd.DataFrame) -> Dict:
-        """
-        Agrega dados por semana
-        """
-        if df.empty:
-            return {}
-        
-        df_clean = DataQualityRules.validate_telemetry_consistency(df)
-        
-        weekly_data = {}
-        df_clean['week'] = pd.to_datetime(df_clean['data_evento']).dt.to_period('W')
-        
-        for week, week_df in df_clean.groupby('week'):
+    @staticmethod
+    def _weekly_from_base(base: pd.DataFrame, extra_keys: Optional[List] = None) -> Dict:
+        """Agregação semanal; extra_keys permite particionar antes (ex.: por mês)"""
+        extra_keys = extra_keys or []
+        weekly = PeriodAggregator._aggregate_metrics(base, extra_keys + ['week'])
+        daily = PeriodAggregator._aggregate_metrics(base, extra_keys + ['week', 'date'])
+        periodos = PeriodAggregator._period_counts(base, extra_keys + ['week'])
+        
+        result = {}
+        for index, row in weekly.iterrows():
+            week = index[-1] if extra_keys else index
             week_start = week.start_time.date()
             week_end = week.end_time.date()
+            key = f"{week_start} a {week_end}"
             
-            weekly_data[f"{week_start} a {week_end}"] = {
-                'periodo': f"Semana de {week_start.strftime('%d/%m')} a {week_end.strftime('%d/%m')}",
-                'total_registros': len(week_df),
-                'km_total': week_df[week_df['velocidade_kmh'] > 0]['odometro_periodo_km'].sum() if CONSISTENT_SPEED_KM_ONLY else week_df['odometro_periodo_km'].sum(),
-                'velocidade_max': week_df['velocidade_kmh'].max(),
-                'velocidade_media': week_df[week_df['velocidade_kmh'] > 0]['velocidade_kmh'].mean() if len(week_df[week_df['velocidade_kmh'] > 0]) > 0 else 0,
-                'tempo_ligado_horas': len(week_df[week_df['ligado'] == True]) * 5 / 60,
-                'tempo_movimento_horas': len(week_df[week_df['em_movimento'] == True]) * 5 / 60,
-                'alertas_velocidade': len(week_df[week_df['velocidade_kmh'] > 80]),
-                'dias_operacao': pd.to_datetime(week_df['data_evento']).dt.date.nunique(),
-                'periodos_operacionais': week_df['periodo_operacional'].value_counts().to_dict()
-            }
+            data = {'periodo': f"Semana de {week_start.strftime('%d/%m')} a {week_end.strftime('%d/%m')}"}
+            data.update(PeriodAggregator._summary(row))
+            data['dias_operacao'] = int(row['dias_operacao'])
+            data['periodos_operacionais'] = periodos.get(index, {})
             
             # Adiciona análise de produtividade semanal
-            km = weekly_data[f"{week_start} a {week_end}"]['km_total']
-            days = weekly_data[f"{week_start} a {week_end}"]['dias_operacao']
-            weekly_data[f"{week_start} a {week_end}"]['produtividade_km_dia'] = km / days if days > 0 else 0
-
+            days = data['dias_operacao']
+            data['produtividade_km_dia'] = data['km_total'] / days if days > 0 else 0
+            
             # Adiciona breakdown diário para maior granularidade
-            daily_breakdown = {}
-            week_df['date'] = pd.to_datetime(week_df['data_evento']).dt.date
-            for date, day_df in week_df.groupby('date'):
-                daily_breakdown[date] = {
-                    'km': day_df[day_df['velocidade_kmh'] > 0]['odometro_periodo_km'].sum() if CONSISTENT_SPEED_KM_ONLY else day_df['odometro_periodo_km'].sum(),
-                    'avg_speed': day_df[day_df['velocidade_kmh'] > 0]['velocidade_kmh'].mean() if len(day_df[day_df['velocidade_kmh'] > 0]) > 0 else 0,
-                    'alerts': len(day_df[day_df['velocidade_kmh'] > 80]),
-                    'movement_hours': len(day_df[day_df['em_movimento'] == True]) * 5 / 60
-                }
-            weekly_data[f"{week_start} a {week_end}"]['daily_breakdown'] = daily_breakdown
+            data['daily_breakdown'] = PeriodAggregator._breakdown(daily.loc[index])
+            
+            if extra_keys:
+                result.setdefault(index[:-1] if len(extra_keys) > 1 else index[0], {})[key] = data
+            else:
+                result[key] = data
         
-        return weekly_data
+        return result
+    
+    @staticmethod
+    def aggregate_all(df: pd.DataFrame) -> Dict:
+        """
+        Agrega por dia, semana, quinzena e mês a partir de uma única validação
+        """
+        if df.empty:
+            return {'daily': {}, 'weekly': {}, 'biweekly': {}, 'monthly': {}}
+        
+        base = PeriodAggregator.prepare_metric_frame(df)
+        return {
+            'daily': PeriodAggregator._daily_from_base(base),
+            'weekly': PeriodAggregator._weekly_from_base(base),
+            'biweekly': PeriodAggregator._biweekly_from_base(base),
+            'monthly': PeriodAggregator._monthly_from_base(base),
+        }
+    
+    @staticmethod
+    def aggregate_weekly_from_rollup(resumo: pd.DataFrame) -> Dict:
+        """
+        Agrega por semana a partir de resumo_diario (ver rollups.load_daily_rollups)
+        """
+        base = PeriodAggregator.rollup_metric_frame(resumo) if not resumo.empty else resumo
+        return PeriodAggregator._weekly_from_base(base) if not base.empty else {}
+    
+    @staticmethod
+    def aggregate_daily(df: pd.DataFrame) -> Dict:
+        """
+        Agrega dados por dia
+        """
+        if df.empty:
+            return {}
+        return PeriodAggregator._daily_from_base(PeriodAggregator.prepare_metric_frame(df))
+    
+    @staticmethod  
+    def aggregate_weekly(df: pd.DataFrame) -> Dict:
+        """
+        Agrega dados por semana
+        """
+        if df.empty:
+            return {}
+        return PeriodAggregator._weekly_from_base(PeriodAggregator.prepare_metric_frame(df))
 
     @staticmethod
     def aggregate_biweekly(df: pd.DataFrame) -> Dict:
@@ -218,38 +446,34 @@ class PeriodAggregator:
         """
         if df.empty:
             return {}
-        
-        df_clean = DataQualityRules.validate_telemetry_consistency(df)
-        df_clean['data_evento'] = pd.to_datetime(df_clean['data_evento'])
+        return PeriodAggregator._biweekly_from_base(PeriodAggregator.prepare_metric_frame(df))
+    
+    @staticmethod
+    def _biweekly_from_base(base: pd.DataFrame) -> Dict:
+        grouper = pd.Grouper(key='data_evento', freq='2W')
+        biweekly = PeriodAggregator._aggregate_metrics(base, grouper)
+        periodos = PeriodAggregator._period_counts(base, [grouper])
+        # Padrão simples: dia da semana com mais km
+        weekday_km = base.groupby([grouper, 'weekday'])['odometro_periodo_km'].sum()
         
         biweekly_data = {}
-        for biweek, biweek_df in df_clean.groupby(pd.Grouper(key='data_evento', freq='2W')):
+        for biweek, row in biweekly.iterrows():
             biweek_end = biweek.date()
             biweek_start = biweek_end - timedelta(days=13)
             key = f"{biweek_start} a {biweek_end}"
             
-            biweekly_data[key] = {
-                'periodo': f"Quinzena de {biweek_start.strftime('%d/%m')} a {biweek_end.strftime('%d/%m')}",
-                'total_registros': len(biweek_df),
-                'km_total': biweek_df[biweek_df['velocidade_kmh'] > 0]['odometro_periodo_km'].sum() if CONSISTENT_SPEED_KM_ONLY else biweek_df['odometro_periodo_km'].sum(),
-                'velocidade_max': biweek_df['velocidade_kmh'].max(),
-                'velocidade_media': biweek_df[biweek_df['velocidade_kmh'] > 0]['velocidade_kmh'].mean() if len(biweek_df[biweek_df['velocidade_kmh'] > 0]) > 0 else 0,
-                'tempo_ligado_horas': len(biweek_df[biweek_df['ligado'] == True]) * 5 / 60,
-                'tempo_movimento_horas': len(biweek_df[biweek_df['em_movimento'] == True]) * 5 / 60,
-                'alertas_velocidade': len(biweek_df[biweek_df['velocidade_kmh'] > 80]),
-                'dias_operacao': pd.to_datetime(biweek_df['data_evento']).dt.date.nunique(),
-                'periodos_operacionais': biweek_df['periodo_operacional'].value_counts().to_dict()
-            }
+            data = {'periodo': f"Quinzena de {biweek_start.strftime('%d/%m')} a {biweek_end.strftime('%d/%m')}"}
+            data.update(PeriodAggregator._summary(row))
+            data['dias_operacao'] = int(row['dias_operacao'])
+            data['periodos_operacionais'] = periodos.get(biweek, {})
             
             # Análises gerais e padrões
-            km_total = biweekly_data[key]['km_total']
-            days = biweekly_data[key]['dias_operacao']
-            biweekly_data[key]['produtividade_km_dia'] = km_total / days if days > 0 else 0
-            biweekly_data[key]['taxa_utilizacao'] = days / 14 if days > 0 else 0
-            # Padrão simples: dia da semana com mais km
-            biweek_df['weekday'] = biweek_df['data_evento'].dt.weekday
-            weekday_km = biweek_df.groupby('weekday')['odometro_periodo_km'].sum()
-            biweekly_data[key]['peak_weekday'] = weekday_km.idxmax() if not weekday_km.empty else None
+            days = data['dias_operacao']
+            data['produtividade_km_dia'] = data['km_total'] / days if days > 0 else 0
+            data['taxa_utilizacao'] = days / 14 if days > 0 else 0
+            km_semana = weekday_km.loc[biweek] if biweek in weekday_km.index.get_level_values(0) else pd.Series(dtype=float)
+            data['peak_weekday'] = km_semana.idxmax() if not km_semana.empty else None
+            biweekly_data[key] = data
         
         return biweekly_data
 
@@ -260,45 +484,44 @@ class PeriodAggregator:
         """
         if df.empty:
             return {}
-        
-        df_clean = DataQualityRules.validate_telemetry_consistency(df)
-        df_clean['data_evento'] = pd.to_datetime(df_clean['data_evento'])
+        return PeriodAggregator._monthly_from_base(PeriodAggregator.prepare_metric_frame(df))
+    
+    @staticmethod
+    def _monthly_from_base(base: pd.DataFrame) -> Dict:
+        grouper = pd.Grouper(key='data_evento', freq='M')
+        monthly = PeriodAggregator._aggregate_metrics(base, grouper)
+        periodos = PeriodAggregator._period_counts(base, [grouper])
+        # Breakdown semanal de todos os meses em uma única agregação
+        base = base.assign(month=base['data_evento'].dt.to_period('M').dt.to_timestamp('M'))
+        weekly_by_month = PeriodAggregator._weekly_from_base(base, ['month'])
         
         monthly_data = {}
-        for month, month_df in df_clean.groupby(pd.Grouper(key='data_evento', freq='M')):
+        for month, row in monthly.iterrows():
             month_start = month.replace(day=1).date()
-            month_end = month.date()
             key = f"{month_start.strftime('%m/%Y')}"
             
-            monthly_data[key] = {
-                'periodo': f"Mês de {month_start.strftime('%B %Y')}",
-                'total_registros': len(month_df),
-                'km_total': month_df[month_df['velocidade_kmh'] > 0]['odometro_periodo_km'].sum() if CONSISTENT_SPEED_KM_ONLY else month_df['odometro_periodo_km'].sum(),
-                'velocidade_max': month_df['velocidade_kmh'].max(),
-                'velocidade_media': month_df[month_df['velocidade_kmh'] > 0]['velocidade_kmh'].mean() if len(month_df[month_df['velocidade_kmh'] > 0]) > 0 else 0,
-                'tempo_ligado_horas': len(month_df[month_df['ligado'] == True]) * 5 / 60,
-                'tempo_movimento_horas': len(month_df[month_df['em_movimento'] == True]) * 5 / 60,
-                'alertas_velocidade': len(month_df[month_df['velocidade_kmh'] > 80]),
-                'dias_operacao': pd.to_datetime(month_df['data_evento']).dt.date.nunique(),
-                'periodos_operacionais': month_df['periodo_operacional'].value_counts().to_dict()
-            }
+            data = {'periodo': f"Mês de {month_start.strftime('%B %Y')}"}
+            data.update(PeriodAggregator._summary(row))
+            data['dias_operacao'] = int(row['dias_operacao'])
+            data['periodos_operacionais'] = periodos.get(month, {})
             
             # Análises gerais e intervalos
-            days = monthly_data[key]['dias_operacao']
-            monthly_data[key]['produtividade_km_dia'] = monthly_data[key]['km_total'] / days if days > 0 else 0
+            days = data['dias_operacao']
+            data['produtividade_km_dia'] = data['km_total'] / days if days > 0 else 0
             # Breakdown em intervalos semanais
-            monthly_data[key]['weekly_breakdown'] = PeriodAggregator.aggregate_weekly(month_df)
+            data['weekly_breakdown'] = weekly_by_month.get(month.normalize(), {})
             
             # Dados para gráficos de desempenho (ex. km por semana)
-            graph_data = []
-            for week_key, week_data in monthly_data[key]['weekly_breakdown'].items():
-                graph_data.append({
+            data['performance_graph_data'] = [
+                {
                     'week': week_key,
                     'km': week_data['km_total'],
                     'avg_speed': week_data['velocidade_media'],
                     'alerts': week_data['alertas_velocidade']
-                })
-            monthly_data[key]['performance_graph_data'] = graph_data
+                }
+                for week_key, week_data in data['weekly_breakdown'].items()
+            ]
+            monthly_data[key] = data
         
         return monthly_data
     
@@ -532,9 +755,21 @@ class TelemetryAnalyzer:
         if hasattr(self, 'session'):
             self.session.close()
     
-    def get_vehicle_data(self, placa: str, data_inicio: datetime, data_fim: datetime) -> pd.DataFrame:
+    # Colunas de posicoes_historicas carregadas por padrão em get_vehicle_data
+    VEHICLE_DATA_COLUMNS = [
+        'data_evento', 'velocidade_kmh', 'ignicao', 'latitude', 'longitude',
+        'odometro_periodo_km', 'odometro_embarcado_km', 'bateria_pct', 'tensao_v',
+        'tipo_evento', 'gps_status', 'gprs_status'
+    ]
+    # Colunas das análises com mapa: as anteriores mais o id da posição (popups sob demanda)
+    MAP_DATA_COLUMNS = VEHICLE_DATA_COLUMNS + ['id']
+    
+    def get_vehicle_data(self, placa: str, data_inicio: datetime, data_fim: datetime,
+                         columns: Optional[List[str]] = None) -> pd.DataFrame:
         """
-        Busca dados de um veículo em um período específico
+        Busca dados de um veículo em um período específico.
+        Seleciona apenas as colunas pedidas (padrão: VEHICLE_DATA_COLUMNS) direto no SQL,
+        sem materializar objetos ORM; data_evento é sempre incluída.
         """
         try:
             # Handle same day periods - when start and end date are the same, 
@@ -545,117 +780,314 @@ class TelemetryAnalyzer:
             else:
                 adjusted_data_fim = data_fim
             
-            # Query para buscar dados
-            query = self.session.query(PosicaoHistorica).join(Veiculo).filter(
+            colunas = ['data_evento'] + [c for c in (columns or self.VEHICLE_DATA_COLUMNS) if c != 'data_evento']
+            tabela = PosicaoHistorica.__table__
+            desconhecidas = [c for c in colunas if c not in tabela.c]
+            if desconhecidas:
+                raise ValueError(f"Colunas inexistentes em posicoes_historicas: {desconhecidas}")
+            
+            # Query projetada: somente as colunas necessárias
+            query = select(*[tabela.c[c] for c in colunas]).join(
+                Veiculo, Veiculo.id == tabela.c.veiculo_id
+            ).where(
                 and_(
                     Veiculo.placa == placa,
-                    PosicaoHistorica.data_evento >= data_inicio,
-                    PosicaoHistorica.data_evento <= adjusted_data_fim
+                    tabela.c.data_evento >= data_inicio,
+                    tabela.c.data_evento <= adjusted_data_fim
                 )
-            ).order_by(PosicaoHistorica.data_evento)
-            
-            # Converte para DataFrame
-            dados = []
-            for registro in query.all():
-                dados.append({
-                    'data_evento': registro.data_evento,
-                    'velocidade_kmh': registro.velocidade_kmh,
-                    'ignicao': registro.ignicao,
-                    'latitude': registro.latitude,
-                    'longitude': registro.longitude,
-                    'endereco': registro.endereco,
-                    'odometro_periodo_km': registro.odometro_periodo_km,
-                    'odometro_embarcado_km': registro.odometro_embarcado_km,
-                    'bateria_pct': registro.bateria_pct,
-                    'tensao_v': registro.tensao_v,
-                    'tipo_evento': registro.tipo_evento,
-                    'gps_status': registro.gps_status,
-                    'gprs_status': registro.gprs_status
-                })
+            ).order_by(tabela.c.data_evento)
             
-            df = pd.DataFrame(dados)
+            # Converte para DataFrame direto das linhas do cursor
+            result = self.session.execute(query)
+            rows = result.fetchall()
+            df = pd.DataFrame(rows, columns=list(result.keys())) if rows else pd.DataFrame()
             
             if not df.empty:
                 # Adiciona colunas calculadas
-                df['periodo_operacional'] = df['data_evento'].apply(self._classify_operational_period)
-                df['em_movimento'] = df['ignicao'].isin(['LM'])
-                df['ligado'] = df['ignicao'].isin(['L', 'LP', 'LM'])
+                df['periodo_operacional'] = ANALYZER_CLASSIFIER.classify(df['data_evento'])
+                if 'ignicao' in df.columns:
+                    df['em_movimento'] = df['ignicao'].isin(['LM'])
+                    df['ligado'] = df['ignicao'].isin(['L', 'LP', 'LM'])
                 
             return df
             
         except Exception as e:
             print(f"Erro ao buscar dados do veículo: {str(e)}")
             return pd.DataFrame()
+
+    # Colunas da API de geometria da rota
+    ROUTE_POINT_COLUMNS = ['data_evento', 'latitude', 'longitude', 'velocidade_kmh']
+
+    def get_route_points(self, placa: str, inicio: datetime, fim: datetime) -> pd.DataFrame:
+        """
+        Posições com coordenadas em [inicio, fim), com o período operacional. O
+        intervalo é semiaberto e não é estendido ao fim do dia: páginas
+        consecutivas da rota não repetem nem perdem posições.
+        """
+        tabela = PosicaoHistorica.__table__
+        query = select(*[tabela.c[c] for c in self.ROUTE_POINT_COLUMNS]).join(
+            Veiculo, Veiculo.id == tabela.c.veiculo_id
+        ).where(self._route_filter(placa, inicio, fim)).order_by(tabela.c.data_evento)
+        
+        result = self.session.execute(query)
+        df = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+        if not df.empty:
+            df['periodo_operacional'] = ANALYZER_CLASSIFIER.classify(df['data_evento'])
+        return df
+
+    def _route_filter(self, placa: str, inicio: datetime, fim: datetime):
+        tabela = PosicaoHistorica.__table__
+        return and_(
+            Veiculo.placa == placa,
+            tabela.c.data_evento >= inicio,
+            tabela.c.data_evento < fim,
+            tabela.c.latitude.isnot(None),
+            tabela.c.longitude.isnot(None)
+        )
+
+    def get_route_extent(self, placa: str, inicio: datetime, fim: datetime) -> Optional[Tuple[List[float], List[float]]]:
+        """
+        Cantos do retângulo envolvente das posições em [inicio, fim) como
+        ([lat_min, lat_max], [lon_min, lon_max]), sem carregar as posições; None sem posições
+        """
+        tabela = PosicaoHistorica.__table__
+        query = select(
+            func.min(tabela.c.latitude), func.max(tabela.c.latitude),
+            func.min(tabela.c.longitude), func.max(tabela.c.longitude)
+        ).join(Veiculo, Veiculo.id == tabela.c.veiculo_id).where(self._route_filter(placa, inicio, fim))
+        lat_min, lat_max, lon_min, lon_max = self.session.execute(query).one()
+        if lat_min is None:
+            return None
+        return [lat_min, lat_max], [lon_min, lon_max]
+
+    def get_first_route_point(self, placa: str, inicio: datetime, fim: datetime) -> Optional[Tuple[float, float]]:
+        """(latitude, longitude) da primeira posição com coordenadas em [inicio, fim), ou None"""
+        tabela = PosicaoHistorica.__table__
+        query = select(tabela.c.latitude, tabela.c.longitude).join(
+            Veiculo, Veiculo.id == tabela.c.veiculo_id
+        ).where(self._route_filter(placa, inicio, fim)).order_by(tabela.c.data_evento).limit(1)
+        ponto = self.session.execute(query).first()
+        return (ponto[0], ponto[1]) if ponto else None
+
+    # Colunas carregadas por get_fleet_data (métricas do relatório consolidado)
+    FLEET_DATA_COLUMNS = ['data_evento', 'velocidade_kmh', 'odometro_periodo_km', 'ignicao']
+    # Tamanho do lote de ids no IN (limite de parâmetros do SQLite)
+    FLEET_QUERY_CHUNK = 500
+
+    def get_fleet_data(self, veiculo_ids: List[int], data_inicio: datetime, data_fim: datetime,
+                       columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Busca as posições de vários veículos no período em uma única consulta projetada
+        (lotes de FLEET_QUERY_CHUNK ids). Mesma janela e colunas calculadas de
+        get_vehicle_data, mais veiculo_id e placa; ordenado por veículo e data_evento.
+        """
+        try:
+            if data_inicio.date() == data_fim.date():
+                adjusted_data_fim = data_fim.replace(hour=23, minute=59, second=59, microsecond=999999)
+            else:
+                adjusted_data_fim = data_fim
+
+            colunas = ['data_evento'] + [c for c in (columns or self.FLEET_DATA_COLUMNS) if c != 'data_evento']
+            tabela = PosicaoHistorica.__table__
+            desconhecidas = [c for c in colunas if c not in tabela.c]
+            if desconhecidas:
+                raise ValueError(f"Colunas inexistentes em posicoes_historicas: {desconhecidas}")
+
+            ids = list(veiculo_ids)
+            linhas, nomes = [], ['veiculo_id', 'placa'] + colunas
+            for inicio in range(0, len(ids), self.FLEET_QUERY_CHUNK):
+                query = select(tabela.c.veiculo_id, Veiculo.placa, *[tabela.c[c] for c in colunas]).join(
+                    Veiculo, Veiculo.id == tabela.c.veiculo_id
+                ).where(
+                    and_(
+                        tabela.c.veiculo_id.in_(ids[inicio:inicio + self.FLEET_QUERY_CHUNK]),
+                        tabela.c.data_evento >= data_inicio,
+                        tabela.c.data_evento <= adjusted_data_fim
+                    )
+                ).order_by(tabela.c.veiculo_id, tabela.c.data_evento)
+                linhas.extend(self.session.execute(query).fetchall())
+
+            df = pd.DataFrame(linhas, columns=nomes) if linhas else pd.DataFrame()
+            if not df.empty:
+                df['periodo_operacional'] = ANALYZER_CLASSIFIER.classify(df['data_evento'])
+                if 'ignicao' in df.columns:
+                    df['em_movimento'] = df['ignicao'].isin(['LM'])
+                    df['ligado'] = df['ignicao'].isin(['L', 'LP', 'LM'])
+            return df
+
+        except Exception as e:
+            print(f"Erro ao buscar dados da frota: {str(e)}")
+            return pd.DataFrame()
+
+    def get_daily_rollups(self, placa: str, data_inicio: datetime, data_fim: datetime) -> pd.DataFrame:
+        """
+        Resumo diário (resumo_diario) de um veículo no período, por dia e período
+        operacional; mesma janela de get_vehicle_data
+        """
+        try:
+            return load_daily_rollups(placa, data_inicio, data_fim, session=self.session)
+        except Exception as e:
+            print(f"Erro ao buscar resumo diário do veículo: {str(e)}")
+            return pd.DataFrame()
     
     def _classify_operational_period(self, timestamp: datetime) -> str:
         """Classifica período operacional conforme definição do cliente"""
-        # Final de semana (Sábado e Domingo)
-        if timestamp.weekday() >= 5:  # 5=Sábado, 6=Domingo
-            return 'final_semana'
-        
-        current_time = timestamp.time()
-        
-        # Horários Operacionais
-        if time(4, 0) <= current_time < time(7, 0):  # 04:00 às 07:00
-            return 'operacional_manha'
-        elif time(10, 50) <= current_time < time(13, 0):  # 10:50 às 13:00
-            return 'operacional_meio_dia'
-        elif time(16, 50) <= current_time < time(19, 0):  # 16:50 às 19:00
-            return 'operacional_tarde'
-        
-        # Fora de Horário Operacional
-        elif time(7, 0) <= current_time < time(10, 50):  # 07:00 às 10:50
-            return 'fora_horario_manha'
-        elif time(13, 0) <= current_time < time(16, 50):  # 13:00 às 16:50
-            return 'fora_horario_tarde'
-        else:  # 19:00 às 04:00 (próximo dia)
-            return 'fora_horario_noite'
+        # Manhã 04:00-07:00, meio-dia 10:50-13:00, tarde 16:50-19:00; demais faixas
+        # são fora de horário; sábado e domingo são final de semana (ver periods.py)
+        return ANALYZER_CLASSIFIER.classify_one(timestamp)
+    
+    # Rótulos fixos de período usados nas contagens de generate_summary_metrics
+    PERIOD_LABELS = ANALYZER_CLASSIFIER.labels
+    OPERATIONAL_PERIODS = ['operacional_manha', 'operacional_meio_dia', 'operacional_tarde']
+    OFF_HOURS_PERIODS = ['fora_horario_manha', 'fora_horario_tarde', 'fora_horario_noite']
+    # Ordem de exibição dos períodos nas métricas
+    PERIOD_DISPLAY_ORDER = OPERATIONAL_PERIODS + OFF_HOURS_PERIODS + ['final_semana']
+    
+    def get_vehicle_info(self, placa: str) -> Dict:
+        """
+        Dados de veículo/cliente usados nas métricas (uma consulta). Passe o resultado
+        para generate_summary_metrics ao calcular métricas de vários grupos do mesmo veículo.
+        """
+        veiculo = self.session.query(Veiculo).filter_by(placa=placa).first()
+        cliente = veiculo.cliente if veiculo else None
+        return {
+            'cliente': cliente.nome if cliente else 'N/A',
+            'consumo_medio_kmL': cliente.consumo_medio_kmL if cliente else 12.0,
+        }
     
-    def generate_summary_metrics(self, df: pd.DataFrame, placa: str) -> Dict:
+    @staticmethod
+    def _period_counts(periodo: pd.Series) -> Dict[str, int]:
+        """Contagem por período operacional com um único bincount sobre os códigos categóricos"""
+        labels = TelemetryAnalyzer.PERIOD_LABELS
+        codes = pd.Categorical(periodo, categories=labels).codes
+        counts = np.bincount(codes[codes >= 0], minlength=len(labels))
+        return {label: int(count) for label, count in zip(labels, counts)}
+    
+    @staticmethod
+    def _ignition_state_counts(ligado: np.ndarray, em_movimento: np.ndarray) -> np.ndarray:
         """
-        Gera métricas resumidas dos dados
+        Contagem dos quatro estados (ligado, em movimento) em um único bincount:
+        índice 0 desligado/parado, 1 desligado/movimento, 2 ligado/parado, 3 ligado/movimento
+        """
+        return np.bincount(ligado.astype(np.int8) * 2 + em_movimento.astype(np.int8), minlength=4)
+
+    @staticmethod
+    def period_km_table(df: pd.DataFrame, keys: List[str], consistent: bool = True) -> pd.DataFrame:
+        """
+        km, velocidade máxima e registros por grupo (keys) em um único groupby.
+        Os incrementos de odômetro são calculados dentro de cada grupo, como ao filtrar
+        o grupo e chamar diff(); df deve estar em ordem de data_evento dentro do grupo.
+        consistent: só trechos com incremento de odômetro e velocidade > 0.
+        """
+        velocidade = pd.to_numeric(df['velocidade_kmh'], errors='coerce').fillna(0.0)
+        odometro = pd.to_numeric(df['odometro_periodo_km'], errors='coerce').fillna(0.0)
+        grupos = [df[k] for k in keys]
+
+        diffs = odometro.groupby(grupos, sort=False, observed=True).diff().fillna(0).clip(lower=0)
+        valid = (diffs > 0) & (velocidade > 0) if consistent else (diffs > 0)
+        partes = pd.DataFrame({'km': diffs.where(valid, 0.0), 'vel_max': velocidade.where(valid, 0.0)})
+        return partes.groupby(grupos, observed=True).agg(
+            km=('km', 'sum'), vel_max=('vel_max', 'max'), registros=('km', 'size')
+        )
+
+    def fleet_summary_metrics(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Métricas de operação e contagens por período de cada veículo de um DataFrame de
+        get_fleet_data (uma linha por placa). Mesmos valores de generate_summary_metrics
+        para km_total, velocidades, tempo_em_movimento e 'periodos'.
+        """
+        if df.empty:
+            return pd.DataFrame()
+
+        velocidade = pd.to_numeric(df['velocidade_kmh'], errors='coerce').fillna(0.0)
+        odometro = pd.to_numeric(df['odometro_periodo_km'], errors='coerce').fillna(0.0)
+        em_movimento = df['em_movimento'] if 'em_movimento' in df.columns else velocidade > 0
+        ligado = df['ligado'] if 'ligado' in df.columns else df['ignicao'].isin(['L', 'LP', 'LM'])
+        placa = df['placa']
+
+        odom_diff = odometro.groupby(placa, sort=False).diff().fillna(0).clip(lower=0)
+        if CONSISTENT_SPEED_KM_ONLY:
+            valid = (odom_diff > 0) & (velocidade > 0)
+        else:
+            valid = pd.Series(True, index=df.index)
+
+        partes = pd.DataFrame({
+            'placa': placa,
+            'km': odom_diff.where(valid, 0.0),
+            'vel': velocidade.where(valid),
+            'movimento': em_movimento.astype(np.int64),
+            'ligado': ligado.astype(np.int64),
+            'parado_ligado': (ligado & ~em_movimento).astype(np.int64),
+        })
+        g = partes.groupby('placa', sort=False)
+        resumo = pd.DataFrame({
+            'total_registros': g.size(),
+            'km_total': g['km'].sum(),
+            'velocidade_maxima': g['vel'].max().fillna(0.0),
+            'velocidade_media': g['vel'].mean().fillna(0.0),
+            # Soma e contagem das velocidades válidas (média da frota sem reler posições)
+            'velocidade_soma': g['vel'].sum(),
+            'registros_velocidade': g['vel'].count(),
+            'tempo_em_movimento': g['movimento'].sum(),
+            'tempo_total_ligado': g['ligado'].sum(),
+            'tempo_parado_ligado': g['parado_ligado'].sum(),
+        })
+        resumo['tempo_desligado'] = resumo['total_registros'] - resumo['tempo_total_ligado']
+        # Sem deslocamento válido as velocidades são zeradas (igual a generate_summary_metrics)
+        sem_km = resumo['km_total'] <= 0
+        resumo.loc[sem_km, ['velocidade_maxima', 'velocidade_media']] = 0.0
+
+        periodos = pd.crosstab(placa, pd.Categorical(df['periodo_operacional'], categories=self.PERIOD_LABELS),
+                               dropna=False).reindex(index=resumo.index, columns=self.PERIOD_LABELS, fill_value=0)
+        resumo[self.PERIOD_LABELS] = periodos.to_numpy()
+        return resumo
+
+    def generate_summary_metrics(self, df: pd.DataFrame, placa: str, vehicle_info: Optional[Dict] = None) -> Dict:
+        """
+        Gera métricas resumidas dos dados.
+        vehicle_info (ver get_vehicle_info) evita a consulta ao banco quando a função
+        é chamada para vários grupos (dias, semanas, meses) do mesmo veículo.
         """
         if df.empty:
             return {}
         
         # Busca dados do veículo e cliente
-        veiculo = self.session.query(Veiculo).filter_by(placa=placa).first()
-        cliente = veiculo.cliente if veiculo else None
+        if vehicle_info is None:
+            vehicle_info = self.get_vehicle_info(placa)
         
         # Garantir tipos numéricos corretos
-        df = df.copy()
-        df['velocidade_kmh'] = pd.to_numeric(df['velocidade_kmh'], errors='coerce').fillna(0.0)
-        df['odometro_periodo_km'] = pd.to_numeric(df['odometro_periodo_km'], errors='coerce').fillna(0.0)
+        velocidade = pd.to_numeric(df['velocidade_kmh'], errors='coerce').fillna(0.0)
+        odometro = pd.to_numeric(df['odometro_periodo_km'], errors='coerce').fillna(0.0)
         
         # Flags de estado
-        df['em_movimento'] = df.get('em_movimento', df['velocidade_kmh'] > 0)
-        df['ligado'] = df.get('ligado', df['ignicao'].isin(['L', 'LP', 'LM']))
+        em_movimento = df['em_movimento'] if 'em_movimento' in df.columns else velocidade > 0
+        ligado = df['ligado'] if 'ligado' in df.columns else df['ignicao'].isin(['L', 'LP', 'LM'])
         
         # Cálculo robusto de quilometragem: soma dos incrementos positivos do odômetro
-        odom_diff = df['odometro_periodo_km'].diff().fillna(0).clip(lower=0)
+        odom_diff = odometro.diff().fillna(0).clip(lower=0)
         
         # Validação aprimorada de dados relevantes
         # 1. Consistência: considerar deslocamento apenas quando há incremento de odômetro E velocidade > 0
-        valid_displacement_mask = (odom_diff > 0) & (df['velocidade_kmh'] > 0)
+        valid_displacement_mask = (odom_diff > 0) & (velocidade > 0)
         
         # 2. Filtrar dados irrelevantes: remover registros com KM mas sem velocidade
-        inconsistent_km_mask = (odom_diff > 0) & (df['velocidade_kmh'] <= 0)
+        inconsistent_km_mask = (odom_diff > 0) & (velocidade <= 0)
         
         # 3. Filtrar velocidades sem deslocamento real (possíveis erros de sensor)
-        speed_without_movement_mask = (df['velocidade_kmh'] > 5) & (odom_diff <= 0)
+        speed_without_movement_mask = (velocidade > 5) & (odom_diff <= 0)
         
         # Seleciona estratégia pelo feature flag (sempre usar modo consistente)
         if CONSISTENT_SPEED_KM_ONLY:
             km_total_calc = float(odom_diff[valid_displacement_mask].sum())
-            vel_validas = df.loc[valid_displacement_mask, 'velocidade_kmh']
+            vel_validas = velocidade[valid_displacement_mask]
             
-            # Filtrar dados para análise temporal (apenas registros válidos)
-            df_clean = df[valid_displacement_mask | ((df['velocidade_kmh'] == 0) & (odom_diff == 0))]
+            # Registros válidos para análise temporal
+            registros_validos = int((valid_displacement_mask | ((velocidade == 0) & (odom_diff == 0))).sum())
         else:
             # Modo legado: considera todos os incrementos de odômetro
             km_total_calc = float(odom_diff.sum())
-            vel_validas = df['velocidade_kmh']
-            df_clean = df
+            vel_validas = velocidade
+            registros_validos = int(len(df))
         
         velocidade_maxima_calc = float(vel_validas.max()) if not vel_validas.empty else 0.0
         velocidade_media_calc = float(vel_validas.mean()) if not vel_validas.empty else 0.0
@@ -664,19 +1096,23 @@ class TelemetryAnalyzer:
         inconsistentes_km = int(inconsistent_km_mask.sum())
         velocidades_sem_km = int(speed_without_movement_mask.sum())
         total_registros = int(len(df))
-        registros_validos = int(len(df_clean))
         deslocamentos_consistentes = int(valid_displacement_mask.sum())
         deslocamentos_totais = int((odom_diff > 0).sum())
         dados_filtrados = total_registros - registros_validos
         
+        # Contadores de estado e de período: um bincount cada
+        estados = self._ignition_state_counts(ligado.to_numpy(dtype=bool), em_movimento.to_numpy(dtype=bool))
+        periodos = self._period_counts(df['periodo_operacional'])
+        inicio, fim = df['data_evento'].min(), df['data_evento'].max()
+        
         # Log estruturado
         try:
             logger.info({
                 'event': 'summary_metrics_computed',
                 'placa': placa,
                 'periodo': {
-                    'inicio': str(df['data_evento'].min()),
-                    'fim': str(df['data_evento'].max())
+                    'inicio': str(inicio),
+                    'fim': str(fim)
                 },
                 'flags': {
                     'CONSISTENT_SPEED_KM_ONLY': CONSISTENT_SPEED_KM_ONLY
@@ -699,14 +1135,16 @@ class TelemetryAnalyzer:
         except Exception:
             pass
         
+        gps_ok, gprs_ok = df['gps_status'].sum(), df['gprs_status'].sum()
+        
         metrics = {
             'veiculo': {
                 'placa': placa,
-                'cliente': cliente.nome if cliente else 'N/A',
+                'cliente': vehicle_info['cliente'],
                 'periodo_analise': {
-                    'inicio': df['data_evento'].min(),
-                    'fim': df['data_evento'].max(),
-                    'total_dias': (df['data_evento'].max() - df['data_evento'].min()).days + 1
+                    'inicio': inicio,
+                    'fim': fim,
+                    'total_dias': (fim - inicio).days + 1
                 }
             },
             'operacao': {
@@ -714,35 +1152,35 @@ class TelemetryAnalyzer:
                 'km_total': km_total_calc,
                 'velocidade_maxima': velocidade_maxima_calc if km_total_calc > 0 else 0.0,
                 'velocidade_media': velocidade_media_calc if km_total_calc > 0 else 0.0,
-                'tempo_total_ligado': int(len(df[df['ligado']])),
-                'tempo_em_movimento': int(len(df[df['em_movimento']])),
+                'tempo_total_ligado': int(estados[2] + estados[3]),
+                'tempo_em_movimento': int(estados[1] + estados[3]),
                 # Tempo em movimento apenas em trechos consistentes
-                'tempo_em_movimento_consistente': int(valid_displacement_mask.sum()),
-                'tempo_parado_ligado': int(len(df[(df['ligado']) & (~df['em_movimento'])])),
-                'tempo_desligado': int(len(df[~df['ligado']]))
+                'tempo_em_movimento_consistente': deslocamentos_consistentes,
+                'tempo_parado_ligado': int(estados[2]),
+                'tempo_desligado': int(estados[0] + estados[1])
             },
             'periodos': {
                 # Horários Operacionais detalhados
-                'operacional_manha': int(len(df[df['periodo_operacional'] == 'operacional_manha'])),
-                'operacional_meio_dia': int(len(df[df['periodo_operacional'] == 'operacional_meio_dia'])),
-                'operacional_tarde': int(len(df[df['periodo_operacional'] == 'operacional_tarde'])),
+                'operacional_manha': periodos['operacional_manha'],
+                'operacional_meio_dia': periodos['operacional_meio_dia'],
+                'operacional_tarde': periodos['operacional_tarde'],
                 
                 # Fora de Horário Operacional detalhados
-                'fora_horario_manha': int(len(df[df['periodo_operacional'] == 'fora_horario_manha'])),
-                'fora_horario_tarde': int(len(df[df['periodo_operacional'] == 'fora_horario_tarde'])),
-                'fora_horario_noite': int(len(df[df['periodo_operacional'] == 'fora_horario_noite'])),
+                'fora_horario_manha': periodos['fora_horario_manha'],
+                'fora_horario_tarde': periodos['fora_horario_tarde'],
+                'fora_horario_noite': periodos['fora_horario_noite'],
                 
                 # Final de Semana
-                'final_semana': int(len(df[df['periodo_operacional'] == 'final_semana'])),
+                'final_semana': periodos['final_semana'],
                 
                 # Totais calculados
-                'total_operacional': int(len(df[df['periodo_operacional'].isin(['operacional_manha', 'operacional_meio_dia', 'operacional_tarde'])])),
-                'total_fora_horario': int(len(df[df['periodo_operacional'].isin(['fora_horario_manha', 'fora_horario_tarde', 'fora_horario_noite'])])),
+                'total_operacional': sum(periodos[p] for p in self.OPERATIONAL_PERIODS),
+                'total_fora_horario': sum(periodos[p] for p in self.OFF_HOURS_PERIODS),
             },
             'conectividade': {
-                'gps_ok': int(df['gps_status'].sum()),
-                'gprs_ok': int(df['gprs_status'].sum()),
-                'problemas_conexao': int(len(df) - min(df['gps_status'].sum(), df['gprs_status'].sum()))
+                'gps_ok': int(gps_ok),
+                'gprs_ok': int(gprs_ok),
+                'problemas_conexao': int(len(df) - min(gps_ok, gprs_ok))
             },
             'observabilidade': {
                 'consistencia': {
@@ -764,7 +1202,7 @@ class TelemetryAnalyzer:
             fuel_data = get_fuel_consumption_estimate(
                 metrics['operacao']['km_total'],
                 metrics['operacao']['velocidade_media'],
-                cliente.consumo_medio_kmL if cliente else 12.0
+                vehicle_info['consumo_medio_kmL']
             )
             metrics['combustivel'] = fuel_data
         
@@ -793,9 +1231,10 @@ class TelemetryAnalyzer:
         df_copy = df.copy()
         df_copy['data'] = pd.to_datetime(df_copy['data_evento']).dt.date
         
+        vehicle_info = self.get_vehicle_info(placa)
         daily_data = []
         for data, group in df_copy.groupby('data'):
-            day_metrics = self.generate_summary_metrics(group, placa)
+            day_metrics = self.generate_summary_metrics(group, placa, vehicle_info)
             day_metrics['data'] = data
             daily_data.append(day_metrics)
         
@@ -805,7 +1244,8 @@ class TelemetryAnalyzer:
             'daily_metrics': daily_data
         }
     
-    def generate_weekly_analysis(self, df: pd.DataFrame, placa: str) -> Dict:
+    def generate_weekly_analysis(self, df: pd.DataFrame, placa: str, formato: str = 'html',
+                                 max_points: Optional[int] = None) -> Dict:
         """
         Gera análise semanal com gráficos de desempenho
         """
@@ -818,16 +1258,17 @@ class TelemetryAnalyzer:
         df_copy['year'] = pd.to_datetime(df_copy['data_evento']).dt.year
         df_copy['year_week'] = df_copy['year'].astype(str) + '-W' + df_copy['week'].astype(str).str.zfill(2)
         
+        vehicle_info = self.get_vehicle_info(placa)
         weekly_data = []
         for week, group in df_copy.groupby('year_week'):
-            week_metrics = self.generate_summary_metrics(group, placa)
+            week_metrics = self.generate_summary_metrics(group, placa, vehicle_info)
             week_metrics['semana'] = week
             week_metrics['periodo_inicio'] = group['data_evento'].min()
             week_metrics['periodo_fim'] = group['data_evento'].max()
             weekly_data.append(week_metrics)
         
         # Criar gráfico de desempenho semanal
-        weekly_chart = self.create_weekly_performance_chart(weekly_data)
+        weekly_chart = self.create_weekly_performance_chart(weekly_data, formato, max_points)
         
         return {
             'period_type': 'weekly',
@@ -844,7 +1285,8 @@ class TelemetryAnalyzer:
             return {}
         
         # Análise geral do período completo
-        general_metrics = self.generate_summary_metrics(df, placa)
+        vehicle_info = self.get_vehicle_info(placa)
+        general_metrics = self.generate_summary_metrics(df, placa, vehicle_info)
         
         # Agrupar dados por mês para resumo
         df_copy = df.copy()
@@ -852,7 +1294,7 @@ class TelemetryAnalyzer:
         
         monthly_summary = []
         for month, group in df_copy.groupby('month'):
-            month_metrics = self.generate_summary_metrics(group, placa)
+            month_metrics = self.generate_summary_metrics(group, placa, vehicle_info)
             month_metrics['mes'] = str(month)
             monthly_summary.append(month_metrics)
         
@@ -862,9 +1304,11 @@ class TelemetryAnalyzer:
             'monthly_summary': monthly_summary
         }
     
-    def create_weekly_performance_chart(self, weekly_data: List[Dict]) -> str:
+    def create_weekly_performance_chart(self, weekly_data: List[Dict], formato: str = 'html',
+                                        max_points: Optional[int] = None):
         """
-        Cria gráfico de desempenho semanal com Plotly
+        Cria gráfico de desempenho semanal com Plotly (séries com mais de max_points
+        semanas passam pela mesma redução LTTB do gráfico de velocidade)
         """
         if not weekly_data:
             return ""
@@ -877,6 +1321,21 @@ class TelemetryAnalyzer:
         fuel_consumption = [w.get('combustivel', {}).get('fuel_consumed_liters', 0) for w in weekly_data]
         alerts = [w.get('operacao', {}).get('alertas', 0) for w in weekly_data]
         
+        # Semanas mantidas: LTTB sobre a quilometragem; o máximo de cada outra série
+        # entra no seu balde no lugar do ponto escolhido (no máximo max_points semanas)
+        max_points = CHART_MAX_POINTS if max_points is None else max_points
+        if 0 < max_points < len(weeks):
+            posicoes = np.arange(len(weeks))
+            series = [km_totals, max_speeds, avg_speeds, fuel_consumption, alerts]
+            indices = downsample_indices(posicoes, km_totals, max_points)
+            # O pico da quilometragem vem primeiro: seu balde não é trocado
+            picos = [int(np.nanargmax(np.asarray(serie, dtype=float))) for serie in series
+                     if np.isfinite(np.asarray(serie, dtype=float)).any()]
+            indices = merge_peaks(indices, picos, len(weeks))
+            weeks, km_totals, max_speeds, avg_speeds, fuel_consumption, alerts = (
+                [serie[i] for i in indices] for serie in [weeks] + series
+            )
+        
         # Criar subplots
         fig = make_subplots(
             rows=4, cols=1,
@@ -961,21 +1420,29 @@ class TelemetryAnalyzer:
         fig.update_yaxes(title_text="Litros", row=3, col=1)
         fig.update_yaxes(title_text="Quantidade", row=4, col=1)
         
-        return fig.to_html(include_plotlyjs='inline', div_id="weekly_performance_chart")
+        return render_figure(fig, "weekly_performance_chart", formato)
 
-    def create_speed_chart(self, df: pd.DataFrame) -> str:
+    def create_speed_chart(self, df: pd.DataFrame, formato: str = 'html', max_points: Optional[int] = None):
         """
-        Cria gráfico de velocidade ao longo do tempo
+        Cria gráfico de velocidade ao longo do tempo, reduzido a no máximo max_points
+        pontos (padrão CHART_MAX_POINTS) mantendo os picos acima do limite
         """
         if df.empty:
             return ""
         
+        # Redução LTTB da série; a média continua calculada sobre todos os pontos
+        max_points = CHART_MAX_POINTS if max_points is None else max_points
+        instantes = pd.to_datetime(df['data_evento']).to_numpy('datetime64[ns]').astype(np.int64)
+        indices = downsample_indices(instantes, df['velocidade_kmh'].to_numpy(dtype=float), max_points,
+                                     limite=SPEED_LIMIT_KMH)
+        serie = df.iloc[indices] if len(indices) < len(df) else df
+        
         fig = go.Figure()
         
         # Gráfico de velocidade com cores mais vibrantes e marcadores
         fig.add_trace(go.Scatter(
-            x=df['data_evento'],
-            y=df['velocidade_kmh'],
+            x=serie['data_evento'],
+            y=serie['velocidade_kmh'],
             mode='lines',
             name='Velocidade (km/h)',
             line=dict(color='#1E88E5', width=2),
@@ -984,23 +1451,16 @@ class TelemetryAnalyzer:
         ))
         
         # Linha de velocidade máxima permitida (80 km/h)
-        fig.add_hline(y=80, line_dash="dash", line_color="red", 
-                     annotation=dict(
-                         text="Limite de Velocidade",
-                         font=dict(color="red", size=14),
-                         xref="paper", x=0.02,
-                         yref="y", y=82
-                     ))
+        # (anotação separada: add_hline acrescenta " domain" ao xref, o que "paper" não aceita)
+        fig.add_hline(y=SPEED_LIMIT_KMH, line_dash="dash", line_color="red")
+        fig.add_annotation(text="Limite de Velocidade", font=dict(color="red", size=14),
+                           xref="paper", x=0.02, xanchor="left", yref="y", y=SPEED_LIMIT_KMH + 2, showarrow=False)
         
         # Linha de velocidade média
         avg_speed = df['velocidade_kmh'].mean()
-        fig.add_hline(y=avg_speed, line_dash="dot", line_color="green", 
-                     annotation=dict(
-                         text=f"Velocidade Média: {avg_speed:.1f} km/h",
-                         font=dict(color="green", size=14),
-                         xref="paper", x=0.02,
-                         yref="y", y=avg_speed + 2
-                     ))
+        fig.add_hline(y=avg_speed, line_dash="dot", line_color="green")
+        fig.add_annotation(text=f"Velocidade Média: {avg_speed:.1f} km/h", font=dict(color="green", size=14),
+                           xref="paper", x=0.02, xanchor="left", yref="y", y=avg_speed + 2, showarrow=False)
         
         fig.update_layout(
             title='Velocidade ao Longo do Tempo',
@@ -1027,9 +1487,9 @@ class TelemetryAnalyzer:
         )
         
         # Converte para HTML
-        return fig.to_html(include_plotlyjs='inline', div_id="speed_chart")
+        return render_figure(fig, "speed_chart", formato)
     
-    def create_operational_periods_chart(self, df: pd.DataFrame) -> str:
+    def create_operational_periods_chart(self, df: pd.DataFrame, formato: str = 'html'):
         """
         Cria gráfico de distribuição por períodos operacionais
         """
@@ -1062,9 +1522,9 @@ class TelemetryAnalyzer:
             )
         )
         
-        return fig.to_html(include_plotlyjs='inline', div_id="periods_chart")
+        return render_figure(fig, "periods_chart", formato)
     
-    def create_ignition_status_chart(self, df: pd.DataFrame) -> str:
+    def create_ignition_status_chart(self, df: pd.DataFrame, formato: str = 'html'):
         """
         Cria gráfico de status da ignição
         """
@@ -1128,7 +1588,7 @@ class TelemetryAnalyzer:
             plot_bgcolor='rgba(240, 240, 240, 0.8)'
         )
         
-        return fig.to_html(include_plotlyjs='inline', div_id="ignition_chart")
+        return render_figure(fig, "ignition_chart", formato)
         
         fig.update_layout(
             title='Distribuição do Status da Ignição',
@@ -1137,11 +1597,12 @@ class TelemetryAnalyzer:
             height=400
         )
         
-        return fig.to_html(include_plotlyjs='inline', div_id="ignition_chart")
+        return render_figure(fig, "ignition_chart", formato)
     
     def create_route_map(self, df: pd.DataFrame) -> str:
         """
-        Cria mapa interativo da rota percorrida
+        Cria mapa interativo da rota percorrida (rota simplificada, pontos de alta
+        velocidade agrupados)
         """
         if df.empty:
             return "<p>Dados de localização não disponíveis para gerar mapa.</p>"
@@ -1167,11 +1628,11 @@ class TelemetryAnalyzer:
             zoom_start=12,
             tiles='OpenStreetMap'
         )
+        tolerancia = self._fit_route(m, df_map)
         
-        # Adiciona rota
-        coords = df_map[['latitude', 'longitude']].values.tolist()
+        # Adiciona rota (simplificada)
         folium.PolyLine(
-            coords,
+            self._route_coords(df_map, tolerancia),
             color='blue',
             weight=3,
             opacity=0.8
@@ -1194,24 +1655,19 @@ class TelemetryAnalyzer:
                     icon=folium.Icon(color='red', icon='stop')
                 ).add_to(m)
         
-        # Adiciona pontos de velocidade alta (>80 km/h)
+        # Adiciona pontos de velocidade alta (>80 km/h), agrupados
         high_speed = df_map[df_map['velocidade_kmh'] > 80]
-        for _, point in high_speed.iterrows():
-            folium.CircleMarker(
-                [float(point['latitude']), float(point['longitude'])],
-                radius=5,
-                popup=f"Velocidade: {point['velocidade_kmh']} km/h",
-                color='red',
-                fill=True,
-                fillColor='red'
-            ).add_to(m)
+        if not high_speed.empty:
+            self._position_markers(high_speed, ['red'], np.zeros(len(high_speed), dtype=int),
+                                   np.full(len(high_speed), 5)).add_to(m)
         
         # Converte para HTML
         return m._repr_html_()
     
     def create_detailed_route_map(self, df: pd.DataFrame) -> str:
         """
-        Cria mapa detalhado de rotas com dados operacionais
+        Cria mapa detalhado de rotas com dados operacionais (rotas simplificadas por
+        período, pontos agrupados com popups carregados sob demanda)
         """
         if df.empty or df[['latitude', 'longitude']].isna().all().all():
             return "<p>Dados de localização não disponíveis para gerar mapa.</p>"
@@ -1232,23 +1688,13 @@ class TelemetryAnalyzer:
             zoom_start=12,
             tiles='OpenStreetMap'
         )
-        
-        # Cores por período operacional
-        period_colors = {
-            'operacional_manha': '#28a745',     # Verde
-            'operacional_meio_dia': '#17a2b8',  # Azul claro
-            'operacional_tarde': '#007bff',     # Azul
-            'fora_horario_manha': '#ffc107',    # Amarelo
-            'fora_horario_tarde': '#fd7e14',    # Laranja
-            'fora_horario_noite': '#6f42c1',    # Roxo
-            'final_semana': '#dc3545'           # Vermelho
-        }
+        tolerancia = self._fit_route(m, df_map)
         
         # Agrupa pontos por período para criar rotas coloridas
-        for periodo, color in period_colors.items():
+        for periodo, color in PERIOD_COLORS.items():
             periodo_data = df_map[df_map['periodo_operacional'] == periodo]
             if not periodo_data.empty:
-                coords = [[float(row['latitude']), float(row['longitude'])] for _, row in periodo_data.iterrows()]
+                coords = self._route_coords(periodo_data, tolerancia)
                 if len(coords) > 1:
                     folium.PolyLine(
                         coords,
@@ -1258,35 +1704,14 @@ class TelemetryAnalyzer:
                         popup=f'Período: {periodo}'
                     ).add_to(m)
         
-        # Adiciona pontos com informações detalhadas
-        for idx, point in df_map.iterrows():
-            periodo = point['periodo_operacional']
-            color = period_colors.get(str(periodo), 'gray')
-            
-            # Popup com informações detalhadas
-            popup_html = f"""
-            <div style="width: 200px;">
-                <b>Data/Hora:</b> {pd.to_datetime(point['data_evento']).strftime('%d/%m/%Y %H:%M')}<br>
-                <b>Velocidade:</b> {point['velocidade_kmh']} km/h<br>
-                <b>Período:</b> {periodo}<br>
-                <b>Status:</b> {point['ignicao']}<br>
-                <b>Endereço:</b> {str(point.get('endereco', 'N/A'))[:50]}...
-            </div>
-            """
-            
-            # Tamanho do marcador baseado na velocidade
-            radius = min(max(point['velocidade_kmh'] / 10, 3), 15)
-            
-            folium.CircleMarker(
-                [float(point['latitude']), float(point['longitude'])],
-                radius=radius,
-                popup=folium.Popup(popup_html, max_width=250),
-                color=color,
-                fill=True,
-                fillColor=color,
-                fillOpacity=0.7,
-                weight=2
-            ).add_to(m)
+        # Adiciona pontos agrupados (MarkerCluster desenhado no navegador); os detalhes de
+        # cada ponto vêm de /api/posicoes/{id} ao abrir o popup
+        cores = list(PERIOD_COLORS.values()) + [OTHER_PERIOD_COLOR]
+        indice_cor = {periodo: i for i, periodo in enumerate(PERIOD_COLORS)}
+        cor = df_map['periodo_operacional'].astype(str).map(indice_cor).fillna(len(cores) - 1).astype(int)
+        # Tamanho do marcador baseado na velocidade
+        raio = (df_map['velocidade_kmh'].fillna(0) / 10).clip(3, 15).round(1)
+        self._position_markers(df_map, cores, cor.to_numpy(), raio.to_numpy()).add_to(m)
         
         # Adiciona legenda
         legend_html = '''
@@ -1309,6 +1734,43 @@ class TelemetryAnalyzer:
         # Converte para HTML
         return m._repr_html_()
     
+    @staticmethod
+    def _fit_route(m: folium.Map, df_map: pd.DataFrame) -> float:
+        """Enquadra a rota no mapa e retorna a tolerância de simplificação para essa extensão"""
+        lat, lon = df_map['latitude'].astype(float), df_map['longitude'].astype(float)
+        m.fit_bounds([[lat.min(), lon.min()], [lat.max(), lon.max()]])
+        return route_tolerance(lat, lon, ROUTE_SIMPLIFY_RESOLUTION)
+    
+    @staticmethod
+    def _route_coords(pontos: pd.DataFrame, tolerancia: float) -> List[List[float]]:
+        """Coordenadas da rota simplificada por Douglas-Peucker (5 casas decimais, ~1 m)"""
+        coords = pontos[['latitude', 'longitude']].to_numpy(dtype=float)
+        indices = simplify_route(coords[:, 0], coords[:, 1], tolerancia)
+        return np.round(coords[indices], 5).tolist()
+    
+    @staticmethod
+    def _position_markers(pontos: pd.DataFrame, cores: List[str], indice_cor: np.ndarray,
+                          raio: np.ndarray) -> plugins.FastMarkerCluster:
+        """
+        Marcadores das posições em um FastMarkerCluster: cada ponto vai como uma linha
+        compacta de dados e o popup detalhado é carregado sob demanda
+        """
+        n = len(pontos)
+        ids = pontos['id'].tolist() if 'id' in pontos.columns else [None] * n
+        linhas = list(zip(
+            pontos['latitude'].astype(float).round(5).tolist(),
+            pontos['longitude'].astype(float).round(5).tolist(),
+            np.asarray(indice_cor).tolist(),
+            np.asarray(raio).tolist(),
+            pontos['velocidade_kmh'].tolist(),
+            ids,
+        ))
+        return plugins.FastMarkerCluster(
+            [list(linha) for linha in linhas],
+            callback=_POSITION_MARKER_JS.replace('__CORES__', json.dumps(cores)),
+            chunkedLoading=True,
+        )
+    
     def create_fuel_consumption_analysis(self, metrics: Dict) -> str:
         """
         Cria análise de consumo de combustível
@@ -1401,18 +1863,127 @@ class TelemetryAnalyzer:
         
         return insights
 
+def _index_period_table(tabela: pd.DataFrame) -> Dict:
+    """{(chave sem placa): {placa: (km, vel_max, registros)}} a partir de period_km_table"""
+    grupos = {}
+    for chave, km, vel_max, registros in zip(tabela.index, tabela['km'], tabela['vel_max'], tabela['registros']):
+        grupos.setdefault(chave[1:], {})[chave[0]] = (float(km), float(vel_max), int(registros))
+    return grupos
+
+def _init_fleet_worker():
+    """Inicializador dos workers: descarta engines herdados (se houver) e abre conexões somente leitura"""
+    dispose_engines(close=False)
+    set_engine_read_only(create_database_engine())
+
+def _fleet_batch_metrics(veiculo_ids: List[int], data_inicio: datetime, data_fim: datetime) -> Dict:
+    """
+    Métricas de um lote de veículos (uma tarefa do pool). Retorna apenas dicts e
+    tuplas compactos; o DataFrame de posições do lote não sai do worker.
+    """
+    analyzer = TelemetryAnalyzer()
+    try:
+        df = analyzer.get_fleet_data(veiculo_ids, data_inicio, data_fim)
+        if df.empty:
+            return {'veiculos': {}, 'por_dia': {}, 'por_periodo': {}}
+        
+        resumo = analyzer.fleet_summary_metrics(df)
+        df['data'] = df['data_evento'].dt.date
+        return {
+            'veiculos': resumo.to_dict('index'),
+            'por_dia': _index_period_table(
+                TelemetryAnalyzer.period_km_table(df, ['placa', 'data', 'periodo_operacional'])
+            ),
+            'por_periodo': _index_period_table(
+                TelemetryAnalyzer.period_km_table(df, ['placa', 'periodo_operacional'], consistent=CONSISTENT_SPEED_KM_ONLY)
+            ),
+        }
+    finally:
+        analyzer.session.close()
+
+_fleet_pool: Optional[ProcessPoolExecutor] = None
+_fleet_pool_key: Optional[Tuple[int, str]] = None
+_fleet_pool_lock = threading.Lock()
+
+def _get_fleet_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Pool de processos da frota, criado uma única vez e reaproveitado entre relatórios;
+    recriado só se o número de workers ou o banco de dados mudar
+    """
+    global _fleet_pool, _fleet_pool_key
+    chave = (workers, get_database_url())
+    with _fleet_pool_lock:
+        if _fleet_pool is None or _fleet_pool_key != chave:
+            if _fleet_pool is not None:
+                _fleet_pool.shutdown(wait=False)
+            _fleet_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context(FLEET_REPORT_START_METHOD),
+                initializer=_init_fleet_worker
+            )
+            _fleet_pool_key = chave
+        return _fleet_pool
+
+def shutdown_fleet_pool(wait: bool = False) -> None:
+    """Encerra o pool de processos da frota (desligamento da aplicação)"""
+    global _fleet_pool, _fleet_pool_key
+    with _fleet_pool_lock:
+        if _fleet_pool is not None:
+            _fleet_pool.shutdown(wait=wait)
+        _fleet_pool, _fleet_pool_key = None, None
+
+def compute_fleet_metrics(veiculo_ids: List[int], data_inicio: datetime, data_fim: datetime,
+                          workers: Optional[int] = None, batch_size: Optional[int] = None) -> Dict:
+    """
+    Métricas da frota por veículo, por (dia, período) e por período.
+    Os veículos são divididos em lotes de batch_size (FLEET_REPORT_BATCH). Por padrão
+    (FLEET_REPORT_WORKERS=1) os lotes rodam no próprio processo; com mais workers, vão
+    para um pool de processos único e duradouro (spawn/forkserver, ver
+    FLEET_REPORT_START_METHOD). Se o pool quebrar, o cálculo é refeito no processo.
+    O resultado segue a ordem de veiculo_ids, qualquer que seja o número de workers.
+    """
+    workers = FLEET_REPORT_WORKERS if workers is None else workers
+    workers = workers or os.cpu_count() or 1
+    batch_size = batch_size or FLEET_REPORT_BATCH
+    
+    ids = list(veiculo_ids)
+    lotes = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+    resultados = None
+    if workers > 1 and len(lotes) > 1:
+        try:
+            # map preserva a ordem dos lotes
+            resultados = list(_get_fleet_pool(workers).map(
+                _fleet_batch_metrics, lotes, repeat(data_inicio), repeat(data_fim)
+            ))
+        except BrokenProcessPool as e:
+            logger.warning(f"Pool de processos da frota indisponível ({e}); calculando no próprio processo")
+            shutdown_fleet_pool()
+    if resultados is None:
+        resultados = [_fleet_batch_metrics(lote, data_inicio, data_fim) for lote in lotes]
+    
+    fleet = {'veiculos': {}, 'por_dia': {}, 'por_periodo': {}}
+    for resultado in resultados:
+        fleet['veiculos'].update(resultado['veiculos'])
+        for parte in ('por_dia', 'por_periodo'):
+            for chave, linhas in resultado[parte].items():
+                fleet[parte].setdefault(chave, {}).update(linhas)
+    return fleet
+
 class ReportGenerator:
     """Classe para gerar relatórios completos"""
     
     def __init__(self):
         self.analyzer = TelemetryAnalyzer()
     
-    def generate_complete_analysis(self, placa: str, data_inicio: datetime, data_fim: datetime) -> Dict:
+    def generate_complete_analysis(self, placa: str, data_inicio: datetime, data_fim: datetime,
+                                   chart_format: str = 'html', max_points: Optional[int] = None,
+                                   include_map: bool = True) -> Dict:
         """
-        Gera análise completa de um veículo
+        Gera análise completa de um veículo; chart_format define a saída dos gráficos
+        Plotly (ver CHART_FORMATS) e max_points os pontos do gráfico de velocidade.
+        include_map=False omite o mapa Folium (o navegador usa a API de geometria da rota).
         """
-        # Busca dados
-        df = self.analyzer.get_vehicle_data(placa, data_inicio, data_fim)
+        # Busca dados (com o id das posições, usado pelos popups do mapa)
+        df = self.analyzer.get_vehicle_data(placa, data_inicio, data_fim, columns=self.analyzer.MAP_DATA_COLUMNS)
         
         if df.empty:
             return {
@@ -1423,31 +1994,19 @@ class ReportGenerator:
         # Gera métricas
         metrics = self.analyzer.generate_summary_metrics(df, placa)
         
-        # Estatísticas diárias para gráficos/tabelas agregadas (consistentes)
-        df_daily = df.copy()
-        df_daily['date'] = df_daily['data_evento'].dt.date
-        df_daily['velocidade_kmh'] = pd.to_numeric(df_daily['velocidade_kmh'], errors='coerce').fillna(0.0)
-        df_daily['odometro_periodo_km'] = pd.to_numeric(df_daily['odometro_periodo_km'], errors='coerce').fillna(0.0)
-        daily_stats = []
-        for day, g in df_daily.groupby('date'):
-            # Ordena e calcula deltas de odômetro
-            g = g.sort_values('data_evento').copy()
-            diffs = g['odometro_periodo_km'].diff().fillna(0).clip(lower=0)
-            # Máscara de consistência: deslocou (delta odômetro > 0) e registrou velocidade > 0
-            valid = (diffs > 0) & (g['velocidade_kmh'] > 0)
-            # Apenas trechos consistentes entram na conta diária
-            km_day = float(diffs[valid].sum())
-            avg_speed_day = float(g.loc[valid, 'velocidade_kmh'].mean()) if valid.any() else 0.0
-            max_speed_day = float(g.loc[valid, 'velocidade_kmh'].max()) if valid.any() else 0.0
-            daily_stats.append({'date': day.isoformat(), 'km': km_day, 'avg_speed': avg_speed_day, 'max_speed': max_speed_day})
+        # Estatísticas diárias para gráficos/tabelas agregadas (consistentes), das
+        # posições já carregadas; sem elas, use rollups.daily_stats_from_rollups
+        # sobre get_daily_rollups
+        daily_stats = daily_stats_from_positions(df)
 
-        # Gera gráficos (HTML) existentes
+        # Gera gráficos (Plotly no formato pedido; o mapa Folium, quando incluído, é HTML)
         charts = {
-            'speed_chart': self.analyzer.create_speed_chart(df),
-            'periods_chart': self.analyzer.create_operational_periods_chart(df),
-            'ignition_chart': self.analyzer.create_ignition_status_chart(df),
-            'route_map': self.analyzer.create_route_map(df)
+            'speed_chart': self.analyzer.create_speed_chart(df, chart_format, max_points),
+            'periods_chart': self.analyzer.create_operational_periods_chart(df, chart_format),
+            'ignition_chart': self.analyzer.create_ignition_status_chart(df, chart_format),
         }
+        if include_map:
+            charts['route_map'] = self.analyzer.create_route_map(df)
 
         # Gera análises especiais
         fuel_analysis = self.analyzer.create_fuel_consumption_analysis(metrics)
@@ -1463,6 +2022,77 @@ class ReportGenerator:
             'daily_stats': daily_stats
         }
 
+    def generate_fleet_metrics(self, data_inicio: datetime, data_fim: datetime, cliente_nome: Optional[str] = None) -> Dict:
+        """
+        Métricas somadas da frota (mesmo formato de generate_summary_metrics) para o
+        relatório consolidado "TODOS"; usa compute_fleet_metrics. Retorna {} sem dados.
+        """
+        if data_inicio.date() == data_fim.date():
+            data_fim = data_fim.replace(hour=23, minute=59, second=59, microsecond=999999)
+        
+        session = get_session()
+        try:
+            query = session.query(Veiculo).join(Cliente).options(joinedload(Veiculo.cliente)).order_by(Veiculo.id)
+            if cliente_nome and cliente_nome != 'TODOS':
+                query = query.filter(Cliente.nome.ilike(f"%{cliente_nome}%"))
+            vehicles = query.all()
+        finally:
+            session.close()
+        
+        fleet_metrics = compute_fleet_metrics([v.id for v in vehicles], data_inicio, data_fim)['veiculos']
+        if not fleet_metrics:
+            return {}
+        
+        linhas = list(fleet_metrics.values())
+        total = lambda campo: sum(linha[campo] for linha in linhas)
+        km_total = float(total('km_total'))
+        registros_velocidade = total('registros_velocidade')
+        velocidade_media = float(total('velocidade_soma') / registros_velocidade) if km_total > 0 and registros_velocidade else 0.0
+        periodos = {p: int(total(p)) for p in TelemetryAnalyzer.PERIOD_DISPLAY_ORDER}
+        
+        # Combustível: soma das estimativas de cada veículo com o consumo do seu cliente
+        combustivel = 0.0
+        for vehicle in vehicles:
+            linha = fleet_metrics.get(str(vehicle.placa))
+            if linha and linha['km_total'] > 0:
+                consumo = vehicle.cliente.consumo_medio_kmL if vehicle.cliente else 12.0
+                combustivel += get_fuel_consumption_estimate(linha['km_total'], linha['velocidade_media'], consumo)['fuel_consumed_liters']
+        
+        metrics = {
+            'veiculo': {
+                'placa': 'Todos',
+                'cliente': cliente_nome or 'Todos os Clientes',
+                'periodo_analise': {
+                    'inicio': data_inicio,
+                    'fim': data_fim,
+                    'total_dias': (data_fim.date() - data_inicio.date()).days + 1
+                }
+            },
+            'operacao': {
+                'total_registros': int(total('total_registros')),
+                'km_total': km_total,
+                'velocidade_maxima': float(max(linha['velocidade_maxima'] for linha in linhas)),
+                'velocidade_media': velocidade_media,
+                'tempo_total_ligado': int(total('tempo_total_ligado')),
+                'tempo_em_movimento': int(total('tempo_em_movimento')),
+                'tempo_parado_ligado': int(total('tempo_parado_ligado')),
+                'tempo_desligado': int(total('tempo_desligado'))
+            },
+            'periodos': {
+                **periodos,
+                'total_operacional': sum(periodos[p] for p in TelemetryAnalyzer.OPERATIONAL_PERIODS),
+                'total_fora_horario': sum(periodos[p] for p in TelemetryAnalyzer.OFF_HOURS_PERIODS),
+            }
+        }
+        if km_total > 0:
+            metrics['combustivel'] = {
+                'km_traveled': km_total,
+                'fuel_consumed_liters': round(combustivel, 2),
+                'efficiency_kmL': round(km_total / combustivel, 2) if combustivel > 0 else 0,
+                'avg_speed': velocidade_media
+            }
+        return metrics
+    
     def generate_consolidated_report(self, data_inicio: datetime, data_fim: datetime, cliente_nome: Optional[str] = None, reports_dir: Optional[str] = None, vehicle_filter: Optional[str] = None) -> Dict:
         """
         Gera relatório consolidado com foco no cliente e rankings custo/benefício
@@ -1480,7 +2110,7 @@ class ReportGenerator:
             session = get_session()
             
             # Constrói consulta base
-            query = session.query(Veiculo).join(Cliente)
+            query = session.query(Veiculo).join(Cliente).options(joinedload(Veiculo.cliente)).order_by(Veiculo.id)
             
             # Filtra por cliente se especificado
             if cliente_nome and cliente_nome != 'TODOS':
@@ -1549,74 +2179,83 @@ class ReportGenerator:
                 "detalhes_veiculos": []
             }
             
-            # Processamento de cada veículo
+            # Métricas da frota: uma consulta por lote de veículos e agregações por
+            # groupby (placa / placa+dia+período / placa+período); com FLEET_REPORT_WORKERS > 1
+            # os lotes vão para o pool de processos, que devolve só dicts compactos
+            fleet = compute_fleet_metrics([v.id for v in vehicles], data_inicio, adjusted_data_fim)
+            fleet_metrics = fleet['veiculos']
+            
             all_vehicles_data = []
             total_km = 0
             total_fuel = 0
             max_speed_fleet = 0
             
             for vehicle in vehicles:
+                placa = str(vehicle.placa)
+                if placa not in fleet_metrics:
+                    continue
                 try:
-                    # Gera análise individual using adjusted end date for same-day periods
-                    df = self.analyzer.get_vehicle_data(str(vehicle.placa), data_inicio, adjusted_data_fim)
+                    linha = fleet_metrics[placa]
+                    km_total_veh = float(linha['km_total'])
+                    vel_max_veh = float(linha['velocidade_maxima'])
+                    vel_media_veh = float(linha['velocidade_media'])
+                    
+                    # Estimativa de combustível com o consumo do cliente do veículo
+                    combustivel_veh = 0
+                    eficiencia_veh = 0
+                    if km_total_veh > 0:
+                        consumo = vehicle.cliente.consumo_medio_kmL if vehicle.cliente else 12.0
+                        combustivel_data = get_fuel_consumption_estimate(km_total_veh, vel_media_veh, consumo)
+                        combustivel_veh = combustivel_data['fuel_consumed_liters']
+                        eficiencia_veh = combustivel_data['efficiency_kmL']
+                    
+                    # Score custo/benefício (quanto maior, melhor)
+                    # Nova fórmula: Quilometragem (40%) + Combustível (40%) + Controle de velocidade (20%)
+                    # Penaliza proporcionalmente velocidades acima de 100 km/h
+                    
+                    # Normalizações para cálculos proporcionais
+                    km_norm = (km_total_veh / 100) * 0.4  # Quilometragem (40%)
                     
-                    if df.empty:
-                        continue
+                    # Combustível: inverte a lógica - menor consumo = melhor score
+                    # Normaliza com base em 50L como referência
+                    fuel_norm = (max(0, 50 - combustivel_veh) / 50) * 0.4  # Combustível (40%)
                     
-                    metrics = self.analyzer.generate_summary_metrics(df, str(vehicle.placa))
+                    # Controle de velocidade (20%)
+                    speed_control_norm = (max(0, 100 - vel_max_veh) / 100) * 0.2
                     
-                    if metrics:
-                        operacao = metrics.get('operacao', {})
-                        combustivel_data = metrics.get('combustivel', {})
-                        
-                        # Calcula score custo/benefício
-                        km_total_veh = operacao.get('km_total', 0)
-                        vel_max_veh = operacao.get('velocidade_maxima', 0)
-                        vel_media_veh = operacao.get('velocidade_media', 0)
-                        combustivel_veh = combustivel_data.get('fuel_consumed_liters', 0)
-                        eficiencia_veh = combustivel_data.get('efficiency_kmL', 0)
-                        
-                        # Score custo/benefício (quanto maior, melhor)
-                        # Nova fórmula: Quilometragem (40%) + Combustível (40%) + Controle de velocidade (20%)
-                        # Penaliza proporcionalmente velocidades acima de 100 km/h
-                        
-                        # Normalizações para cálculos proporcionais
-                        km_norm = (km_total_veh / 100) * 0.4  # Quilometragem (40%)
-                        
-                        # Combustível: inverte a lógica - menor consumo = melhor score
-                        # Normaliza com base em 50L como referência
-                        fuel_norm = (max(0, 50 - combustivel_veh) / 50) * 0.4  # Combustível (40%)
-                        
-                        # Controle de velocidade (20%)
-                        speed_control_norm = (max(0, 100 - vel_max_veh) / 100) * 0.2
-                        
-                        # Penalidade proporcional para velocidades > 100 km/h
-                        speed_penalty = 0
-                        if vel_max_veh > 100:
-                            # Penalidade proporcional: para cada km/h acima de 100, desconta 0.02 pontos
-                            excess_speed = vel_max_veh - 100
-                            speed_penalty = excess_speed * 0.02
-                        
-                        score_beneficio = km_norm + fuel_norm + speed_control_norm - speed_penalty
-                        
-                        vehicle_summary = {
-                            'placa': str(vehicle.placa),
-                            'km_total': km_total_veh,
-                            'velocidade_maxima': vel_max_veh,
-                            'velocidade_media': vel_media_veh,
-                            'tempo_movimento': operacao.get('tempo_em_movimento', 0),
-                            'combustivel': combustivel_veh,
-                            'eficiencia': eficiencia_veh,
-                            'score_custo_beneficio': score_beneficio,
-                            'dataframe': df,
-                            'periodos_detalhes': metrics.get('periodos', {})
+                    # Penalidade proporcional para velocidades > 100 km/h
+                    speed_penalty = 0
+                    if vel_max_veh > 100:
+                        # Penalidade proporcional: para cada km/h acima de 100, desconta 0.02 pontos
+                        excess_speed = vel_max_veh - 100
+                        speed_penalty = excess_speed * 0.02
+                    
+                    score_beneficio = km_norm + fuel_norm + speed_control_norm - speed_penalty
+                    
+                    periodos_veh = {p: int(linha[p]) for p in TelemetryAnalyzer.PERIOD_LABELS}
+                    periodos_veh['total_operacional'] = sum(periodos_veh[p] for p in TelemetryAnalyzer.OPERATIONAL_PERIODS)
+                    periodos_veh['total_fora_horario'] = sum(periodos_veh[p] for p in TelemetryAnalyzer.OFF_HOURS_PERIODS)
+                    
+                    vehicle_summary = {
+                        'placa': placa,
+                        'km_total': km_total_veh,
+                        'velocidade_maxima': vel_max_veh,
+                        'velocidade_media': vel_media_veh,
+                        'tempo_movimento': int(linha['tempo_em_movimento']),
+                        'combustivel': combustivel_veh,
+                        'eficiencia': eficiencia_veh,
+                        'score_custo_beneficio': score_beneficio,
+                        'periodos_detalhes': {
+                            p: periodos_veh[p] for p in
+                            TelemetryAnalyzer.PERIOD_DISPLAY_ORDER + ['total_operacional', 'total_fora_horario']
                         }
-                        
-                        all_vehicles_data.append(vehicle_summary)
-                        total_km += km_total_veh
-                        total_fuel += combustivel_veh
-                        max_speed_fleet = max(max_speed_fleet, vel_max_veh)
-                        
+                    }
+                    
+                    all_vehicles_data.append(vehicle_summary)
+                    total_km += km_total_veh
+                    total_fuel += combustivel_veh
+                    max_speed_fleet = max(max_speed_fleet, vel_max_veh)
+                    
                 except Exception as e:
                     print(f"Erro ao processar veículo {vehicle.placa}: {e}")
                     continue
@@ -1697,50 +2336,33 @@ class ReportGenerator:
             }
             
             # Organizar dados por DIA e depois por PERÍODO (nova estrutura)
-            all_dates = set()
-            daily_period_data = {}
+            # km, velocidade máxima e registros por (dia, período) e por período já vêm
+            # agregados de compute_fleet_metrics
+            def _period_summary(vehicle_data, grupo):
+                km_periodo, vel_max_periodo, registros_periodo = grupo
+                # Proporção de combustível permanece proporcional ao número de registros no período
+                return {
+                    'placa': vehicle_data['placa'],
+                    'km_periodo': km_periodo,
+                    'vel_max_periodo': vel_max_periodo,
+                    'combustivel_periodo': vehicle_data['combustivel'] * (registros_periodo / fleet_metrics[vehicle_data['placa']]['total_registros']),
+                    'eficiencia_periodo': vehicle_data['eficiencia']
+                }
             
-            for vehicle_data in all_vehicles_data:
-                df = vehicle_data['dataframe']
-                if not df.empty:
-                    dates = df['data_evento'].dt.date.unique()
-                    all_dates.update(dates)
+            por_dia = fleet['por_dia']
+            daily_period_data = {}
             
             # Para cada dia, organiza por período
-            for date in sorted(all_dates):
+            for date in sorted({chave[0] for chave in por_dia}):
                 date_str = date.strftime('%Y-%m-%d')
                 daily_period_data[date_str] = {}
                 
                 for period_key, period_info in periods_definition.items():
-                    period_vehicles = []
-                    
-                    for vehicle_data in all_vehicles_data:
-                        df = vehicle_data['dataframe']
-                        # Filtra por dia E por período
-                        daily_df = df[df['data_evento'].dt.date == date]
-                        period_df = daily_df[daily_df['periodo_operacional'] == period_key]
-                        
-                        if not period_df.empty:
-                            # Calcula métricas consistentes para o período: considerar apenas trechos com
-                            # incremento de odômetro (> 0) e velocidade > 0
-                            period_df_sorted = period_df.sort_values('data_evento').copy()
-                            period_df_sorted['velocidade_kmh'] = pd.to_numeric(period_df_sorted['velocidade_kmh'], errors='coerce').fillna(0.0)
-                            period_df_sorted['odometro_periodo_km'] = pd.to_numeric(period_df_sorted['odometro_periodo_km'], errors='coerce').fillna(0.0)
-                            diffs = period_df_sorted['odometro_periodo_km'].diff().fillna(0).clip(lower=0)
-                            valid = (diffs > 0) & (period_df_sorted['velocidade_kmh'] > 0)
-                            km_periodo_val = float(diffs[valid].sum())
-
-                            # Proporção de combustível permanece proporcional ao número de registros no período
-                            combustivel_periodo_calc = vehicle_data['combustivel'] * (len(period_df_sorted) / len(df)) if len(df) > 0 else 0
-
-                            period_summary = {
-                                'placa': vehicle_data['placa'],
-                                'km_periodo': km_periodo_val,
-                                'vel_max_periodo': float(period_df_sorted.loc[valid, 'velocidade_kmh'].max()) if valid.any() else 0.0,
-                                'combustivel_periodo': combustivel_periodo_calc,
-                                'eficiencia_periodo': vehicle_data['eficiencia']
-                            }
-                            period_vehicles.append(period_summary)
+                    linhas = por_dia.get((date, period_key), {})
+                    period_vehicles = [
+                        _period_summary(vehicle_data, linhas[vehicle_data['placa']])
+                        for vehicle_data in all_vehicles_data if vehicle_data['placa'] in linhas
+                    ]
                     
                     if period_vehicles:
                         daily_period_data[date_str][period_info['nome']] = {
@@ -1752,33 +2374,13 @@ class ReportGenerator:
             consolidated_data["periodos_diarios"] = daily_period_data
             
             # Mantém estrutura de períodos consolidados para compatibilidade
+            por_periodo = fleet['por_periodo']
             for period_key, period_info in periods_definition.items():
-                period_vehicles = []
-                
-                for vehicle_data in all_vehicles_data:
-                    df = vehicle_data['dataframe']
-                    period_df = df[df['periodo_operacional'] == period_key]
-                    
-                    if not period_df.empty:
-                        period_df_sorted = period_df.sort_values('data_evento').copy()
-                        period_df_sorted['velocidade_kmh'] = pd.to_numeric(period_df_sorted['velocidade_kmh'], errors='coerce').fillna(0.0)
-                        period_df_sorted['odometro_periodo_km'] = pd.to_numeric(period_df_sorted['odometro_periodo_km'], errors='coerce').fillna(0.0)
-                        diffs = period_df_sorted['odometro_periodo_km'].diff().fillna(0).clip(lower=0)
-                        if CONSISTENT_SPEED_KM_ONLY:
-                            valid = (diffs > 0) & (period_df_sorted['velocidade_kmh'] > 0)
-                        else:
-                            valid = (diffs > 0)
-                        km_periodo_val = float(diffs[valid].sum())
-                        vel_max_val = float(period_df_sorted.loc[valid, 'velocidade_kmh'].max()) if valid.any() else 0.0
-                        
-                        period_summary = {
-                            'placa': vehicle_data['placa'],
-                            'km_periodo': km_periodo_val,
-                            'vel_max_periodo': vel_max_val,
-                            'combustivel_periodo': vehicle_data['combustivel'] * (len(period_df_sorted) / len(df)) if len(df) > 0 else 0,
-                            'eficiencia_periodo': vehicle_data['eficiencia']
-                        }
-                        period_vehicles.append(period_summary)
+                linhas = por_periodo.get((period_key,), {})
+                period_vehicles = [
+                    _period_summary(vehicle_data, linhas[vehicle_data['placa']])
+                    for vehicle_data in all_vehicles_data if vehicle_data['placa'] in linhas
+                ]
                 
                 if period_vehicles:
                     consolidated_data["periodos"][period_info['nome']] = {
@@ -6,15 +6,17 @@ e mecanismos de fallback robustos.
 import pandas as pd
 import numpy as np
 from datetime import datetime, time, timezone
-from typing import Dict, List, Tuple, Optional, Any, Union
+from typing import Dict, List, Tuple, Optional, Any, Union, Iterator
 import re
 import os
 import json
 import logging
-from math import radians, sin, cos, asin, sqrt
 from sqlalchemy.orm import Session
 from .models import Cliente, Veiculo, PosicaoHistorica, get_session
-from .utils import CSVProcessor
+from .utils import CSVProcessor, detect_file_encoding
+from .geo import detect_gps_jumps
+from .rollups import refresh_rollups
+from .result_cache import invalidate_results
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
@@ -42,17 +44,6 @@ def convert_numpy_types(obj: Any) -> Any:
         return None
     return obj
 
-def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """
-    Calcula a distância entre dois pontos usando a fórmula de Haversine
-    """
-    R = 6371.0  # raio da Terra em km
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
-    c = 2 * asin(sqrt(a))
-    return R * c  # distância em km
-
 class TelemetryProcessor:
     """Classe para processar arquivos CSV de telemetria veicular com detecção automática de schema"""
     
@@ -69,7 +60,9 @@ class TelemetryProcessor:
         self.trip_speed_threshold = self.config.get('trip_speed_threshold', 3)  # km/h
         self.trip_min_duration_s = self.config.get('trip_min_duration_s', 60)  # segundos
         self.gps_jump_distance_km = self.config.get('gps_jump_distance_km', 500)  # km
+        self.gps_jump_max_implied_speed_kmh = self.config.get('gps_jump_max_implied_speed_kmh')  # km/h (None = desativado)
         self.aggregation_rule_days_for_summary = self.config.get('aggregation_rule_days_for_summary', 7)  # dias
+        self.csv_chunk_size = self.config.get('csv_chunk_size', 100000)  # linhas por bloco
         
         # Definição dos períodos operacionais
         self.periodos_operacionais = {
@@ -297,23 +290,15 @@ class TelemetryProcessor:
             quality_report['duplicates_removed'] += duplicates.sum()
             df_clean = df_clean[~duplicates]
         
-        # 3. deslocamento entre pontos > 500 km em Δt pequeno → possível salto GPS
+        # 3. deslocamento entre pontos > 500 km em Δt pequeno (ou velocidade implícita
+        #    acima do limite configurado) → possível salto GPS
         if 'lat' in df_clean.columns and 'lon' in df_clean.columns and 'timestamp' in df_clean.columns:
-            df_clean['gps_jump'] = False
-            for i in range(1, len(df_clean)):
-                lat1, lon1 = df_clean.iloc[i-1]['lat'], df_clean.iloc[i-1]['lon']
-                lat2, lon2 = df_clean.iloc[i]['lat'], df_clean.iloc[i]['lon']
-                timestamp1 = df_clean.iloc[i-1]['timestamp']
-                timestamp2 = df_clean.iloc[i]['timestamp']
-                
-                if all(pd.notna([lat1, lon1, lat2, lon2, timestamp1, timestamp2])):
-                    distance = haversine(lat1, lon1, lat2, lon2)
-                    delta_t_hours = (timestamp2 - timestamp1).total_seconds() / 3600
-                    
-                    # Se distância > 500km e delta_t < 1 hora, marca como salto GPS
-                    if distance > self.gps_jump_distance_km and delta_t_hours < 1:
-                        df_clean.loc[df_clean.index[i], 'gps_jump'] = True
-                        quality_report['gps_jumps_marked'] += 1
+            df_clean['gps_jump'] = detect_gps_jumps(
+                df_clean['lat'], df_clean['lon'], df_clean['timestamp'],
+                max_distance_km=self.gps_jump_distance_km,
+                max_implied_speed_kmh=self.gps_jump_max_implied_speed_kmh
+            )
+            quality_report['gps_jumps_marked'] += int(df_clean['gps_jump'].sum())
         
         # 4. velocidade calculada > 220 km/h → marcar como outlier
         if 'speed' in df_clean.columns:
@@ -355,13 +340,15 @@ class TelemetryProcessor:
         processor.trip_speed_threshold = self.trip_speed_threshold
         processor.trip_min_duration_s = self.trip_min_duration_s
         processor.gps_jump_distance_km = self.gps_jump_distance_km
+        processor.gps_jump_max_implied_speed_kmh = self.gps_jump_max_implied_speed_kmh
         processor.periodos_operacionais = self.periodos_operacionais
         return processor.calculate_distance_and_speed(df)
 
-    def detect_trips(self, df: pd.DataFrame) -> List[Dict]:
+    def detect_trips(self, df: pd.DataFrame, group_col: Optional[str] = None) -> List[Dict]:
         """
         Detecta viagens (trips) e calcula métricas por viagem.
         Delegado para utils.CSVProcessor para reaproveitar a implementação testada.
+        Com `group_col` (ex.: 'vehicle_id') processa vários veículos de uma vez.
         """
         processor = CSVProcessor()
         # Alinha parâmetros de configuração para consistência entre classes
@@ -369,8 +356,9 @@ class TelemetryProcessor:
         processor.trip_speed_threshold = self.trip_speed_threshold
         processor.trip_min_duration_s = self.trip_min_duration_s
         processor.gps_jump_distance_km = self.gps_jump_distance_km
+        processor.gps_jump_max_implied_speed_kmh = self.gps_jump_max_implied_speed_kmh
         processor.periodos_operacionais = self.periodos_operacionais
-        return processor.detect_trips(df)
+        return processor.detect_trips(df, group_col)
 
     def process_csv_file(self, file_path: str) -> Dict:
         """
@@ -438,25 +426,35 @@ class TelemetryProcessor:
         Returns:
             DataFrame pandas com os dados
         """
-        # Tenta diferentes encodings
-        encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-        df = None
+        # Detecta o encoding uma única vez a partir de uma amostra do arquivo
+        encoding = detect_file_encoding(file_path)
         
-        for encoding in encodings:
-            try:
-                df = pd.read_csv(file_path, sep=';', encoding=encoding)
-                break
-            except UnicodeDecodeError:
-                continue
-        
-        if df is None:
-            raise ValueError(f"Não foi possível ler o arquivo {file_path} com nenhum encoding")
+        try:
+            df = pd.read_csv(file_path, sep=';', encoding=encoding)
+        except UnicodeDecodeError:
+            # Amostra não representativa: latin-1 aceita qualquer sequência de bytes
+            df = pd.read_csv(file_path, sep=';', encoding='latin-1')
         
         # Limpa os nomes das colunas
         df.columns = df.columns.str.strip()
         
         return df
     
+    def iter_csv_chunks(self, file_path: str, chunksize: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        Lê arquivo CSV em blocos de tamanho fixo (memória limitada ao bloco).
+        Delegado para utils.CSVProcessor.
+        
+        Args:
+            file_path: Caminho para o arquivo CSV
+            chunksize: Linhas por bloco (padrão: csv_chunk_size)
+            
+        Returns:
+            Iterador de DataFrames
+        """
+        processor = CSVProcessor()
+        return processor.iter_csv_chunks(file_path, chunksize or self.csv_chunk_size)
+    
     def _calculate_general_metrics(self, df: pd.DataFrame) -> Dict:
         """
         Calcula métricas gerais do DataFrame
@@ -521,7 +519,8 @@ class TelemetryProcessor:
                 'speed_outlier_threshold': self.speed_outlier_threshold,
                 'trip_speed_threshold': self.trip_speed_threshold,
                 'trip_min_duration_s': self.trip_min_duration_s,
-                'gps_jump_distance_km': self.gps_jump_distance_km
+                'gps_jump_distance_km': self.gps_jump_distance_km,
+                'gps_jump_max_implied_speed_kmh': self.gps_jump_max_implied_speed_kmh
             },
             'checksum': self._calculate_checksum(clean_df)
         }
@@ -582,6 +581,7 @@ class TelemetryProcessor:
                 session.commit()
             
             # Processa cada linha do DataFrame
+            gravados = []
             for _, row in df.iterrows():
                 # Busca ou cria veículo
                 vehicle_id = row.get('vehicle_id', row.get('placa', 'Unknown'))
@@ -623,8 +623,17 @@ class TelemetryProcessor:
                 )
                 
                 session.add(posicao)
+                gravados.append((veiculo.id, posicao.data_evento))
+            
+            # Reagrega só as horas (e dias) tocados pelo lote antes do commit
+            session.flush()
+            if gravados:
+                veiculo_ids, datas = zip(*gravados)
+                refresh_rollups(session, veiculo_ids, datas)
             
             session.commit()
+            if gravados:
+                invalidate_results(veiculo_ids=set(veiculo_ids))
             return True
             
         except Exception as e:
@@ -0,0 +1,72 @@
+# Testes para a gravação em lote de CSVProcessor.save_to_database
+# - Usa um banco SQLite temporário (DATABASE_URL) para não tocar em data/telemetria.db
+# - Verifica criação única de veículos, contagem de posições e conversão de NaN para NULL
+
+from datetime import datetime
+
+import pandas as pd
+import numpy as np
+
+from app.models import Veiculo, PosicaoHistorica, get_session
+from app.utils import CSVProcessor
+
+
+def _cleaned_frame(n: int = 10) -> pd.DataFrame:
+    """DataFrame no formato produzido por clean_and_parse_data."""
+    placas = ['ABC-1234', 'XYZ-9876']
+    return pd.DataFrame({
+        'Cliente': ['JANDAIA'] * n,
+        'Placa': [placas[i % 2] for i in range(n)],
+        'Ativo': ['A1'] * n,
+        'Data': pd.date_range('2025-09-01 08:00', periods=n, freq='30s'),
+        'Data (GPRS)': pd.date_range('2025-09-01 08:00', periods=n, freq='30s'),
+        'Velocidade (Km)': np.arange(n, dtype=float),
+        'Ignição': ['LM'] * n,
+        'Motorista': ['João'] * n,
+        'GPS': [True] * n,
+        'Gprs': [True] * n,
+        'Latitude': [-15.78] * (n - 1) + [np.nan],
+        'Longitude': [-47.93] * (n - 1) + [np.nan],
+        'Endereço': ['Rua A'] * n,
+        'Odometro_Periodo_Km': np.linspace(0, 5, n),
+        'Bloqueado': [False] * n,
+    })
+
+
+def test_bulk_save_creates_vehicles_once_and_all_positions(temp_db):
+    processor = CSVProcessor()
+    processor.db_chunk_size = 3  # força múltiplos lotes
+
+    assert processor.save_to_database(_cleaned_frame(10), 'JANDAIA') is True
+    assert processor.last_save_stats['rows'] == 10
+    assert processor.last_save_stats['rows_per_s'] > 0
+
+    # Segunda carga reaproveita os veículos existentes
+    assert processor.save_to_database(_cleaned_frame(4), 'JANDAIA') is True
+
+    session = get_session()
+    try:
+        assert session.query(Veiculo).count() == 2
+        assert session.query(PosicaoHistorica).count() == 14
+        sem_coordenada = session.query(PosicaoHistorica).filter(PosicaoHistorica.latitude.is_(None)).count()
+        assert sem_coordenada == 2
+        primeira = session.query(PosicaoHistorica).order_by(PosicaoHistorica.id).first()
+        assert primeira.motorista == 'João'
+        assert primeira.velocidade_kmh == 0
+        assert primeira.data_evento == datetime(2025, 9, 1, 8, 0)
+        assert primeira.created_at is not None
+    finally:
+        session.close()
+
+
+def test_bulk_save_missing_required_column_returns_false(temp_db):
+    processor = CSVProcessor()
+    df = _cleaned_frame(4).drop(columns=['Ignição'])
+
+    assert processor.save_to_database(df, 'JANDAIA') is False
+
+    session = get_session()
+    try:
+        assert session.query(PosicaoHistorica).count() == 0
+    finally:
+        session.close()
@@ -0,0 +1,87 @@
+# Testes para o cache de gráficos dos relatórios PDF (app/chart_cache.py)
+# - Gráfico de desempenho montado uma vez para entradas iguais, em relatórios diferentes
+# - Drawing expandido gera o mesmo PDF que o gráfico original; cada uso recebe sua cópia
+# - Descarte LRU pelo tamanho estimado das entradas
+
+import io
+
+import pytest
+from reportlab.graphics.shapes import UserNode
+from reportlab.platypus import SimpleDocTemplate
+
+from app import reports
+from app.chart_cache import ChartCache, chart_key
+from app.reports import PDFReportGenerator
+
+
+def _metrics(manha: int = 12) -> dict:
+    return {
+        'operacao': {'km_total': 120.0},
+        'periodos': {'operacional_manha': manha, 'operacional_meio_dia': 5, 'operacional_tarde': 9,
+                     'fora_horario_manha': 3, 'fora_horario_tarde': 2, 'final_semana': 7},
+    }
+
+
+def _pdf(flowable) -> bytes:
+    saida = io.BytesIO()
+    SimpleDocTemplate(saida, invariant=1).build([flowable])
+    return saida.getvalue()
+
+
+@pytest.fixture
+def chart_cache(monkeypatch):
+    """Cache vazio no lugar do cache do processo"""
+    cache = ChartCache(max_bytes=10 * 1024 * 1024)
+    monkeypatch.setattr(reports, 'get_chart_cache', lambda: cache)
+    return cache
+
+
+def test_identical_charts_render_once(chart_cache, monkeypatch):
+    renderizados = []
+    original = PDFReportGenerator._draw_performance_chart
+    monkeypatch.setattr(PDFReportGenerator, '_draw_performance_chart',
+                        staticmethod(lambda valores: renderizados.append(valores) or original(valores)))
+
+    # Relatório por veículo e consolidado com os mesmos números: uma única montagem
+    primeiro = PDFReportGenerator()._create_performance_chart(_metrics())
+    segundo = PDFReportGenerator()._create_performance_chart(_metrics())
+    assert len(renderizados) == 1 and chart_cache.hits == 1
+    assert primeiro is not segundo and primeiro.contents is segundo.contents
+
+    PDFReportGenerator()._create_performance_chart(_metrics(manha=13))
+    assert len(renderizados) == 2 and len(chart_cache) == 2
+
+    # Sem dados de períodos: nada é montado nem guardado
+    assert PDFReportGenerator()._create_performance_chart({'operacao': {}, 'periodos': {}}) is None
+    assert len(chart_cache) == 2
+
+
+def test_cached_drawing_matches_original(chart_cache):
+    valores = list(_metrics()['periodos'].values())
+    em_cache = PDFReportGenerator()._create_performance_chart(_metrics())
+
+    def widgets(node):
+        return isinstance(node, UserNode) or any(widgets(f) for f in getattr(node, 'contents', []))
+
+    assert not widgets(em_cache)
+    assert _pdf(em_cache) == _pdf(PDFReportGenerator._draw_performance_chart(valores))
+    # A mesma entrada usada em dois documentos seguidos
+    assert _pdf(PDFReportGenerator()._create_performance_chart(_metrics())) == _pdf(em_cache)
+
+
+def test_eviction_by_size():
+    cache = ChartCache(max_bytes=1000)
+    for nome in 'abc':
+        cache.get_or_render('png', nome, lambda: b'x' * 400)
+    # 'a' (o mais antigo) sai para caber 'c'
+    assert len(cache) == 2 and cache.size_bytes == 800
+
+    cache.get_or_render('png', 'b', lambda: pytest.fail('deveria estar em cache'))
+    cache.get_or_render('png', 'd', lambda: b'x' * 400)  # descarta 'c', usado há mais tempo que 'b'
+    assert cache.get_or_render('png', 'b', lambda: b'') == b'x' * 400
+    assert cache.get_or_render('png', 'c', lambda: b'y') == b'y'
+
+    # Maior que o limite: retornado, mas não guardado
+    assert cache.get_or_render('png', 'grande', lambda: b'x' * 2000) == b'x' * 2000
+    assert chart_key('png', 'grande') not in cache._entries
+    assert chart_key('png', [1, 2]) != chart_key('png', [2, 1])
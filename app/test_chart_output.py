@@ -0,0 +1,85 @@
+# Testes para os formatos de saída dos gráficos Plotly e a compressão das respostas
+# - 'json' e 'div' não embutem o plotly.js; 'html' mantém o formato original
+# - GZip nas respostas, exceto nos eventos SSE
+# - plotly.js servido da memória, com cache permanente no navegador
+
+import asyncio
+import gzip
+
+import pandas as pd
+
+from app.main import PLOTLY_JS_URL, CompressionMiddleware, app as main_app
+from app.services import CHART_FORMATS, TelemetryAnalyzer, plotly_js_bundle
+
+
+def _df(n: int = 500) -> pd.DataFrame:
+    return pd.DataFrame({
+        'data_evento': pd.date_range('2025-09-01 06:00', periods=n, freq='1min'),
+        'velocidade_kmh': [i % 90 for i in range(n)],
+        'periodo_operacional': ['manha' if i % 3 else 'fora_horario' for i in range(n)],
+        'ignicao': ['LM' if i % 4 else 'D' for i in range(n)],
+    })
+
+
+def test_chart_formats_do_not_embed_plotly_js():
+    analyzer = TelemetryAnalyzer()
+    df = _df()
+    assert CHART_FORMATS == ('json', 'div', 'html')
+
+    html = analyzer.create_speed_chart(df, 'html')
+    div = analyzer.create_speed_chart(df, 'div')
+    figura = analyzer.create_speed_chart(df, 'json')
+
+    assert len(html) > len(plotly_js_bundle())
+    assert 'id="speed_chart"' in div and len(div) * 50 < len(html)
+    assert set(figura) >= {'data', 'layout'} and figura['data'][0]['type'] == 'scatter'
+    assert figura['layout']['title']['text'] == 'Velocidade ao Longo do Tempo'
+    assert [a['text'] for a in figura['layout']['annotations']][0] == 'Limite de Velocidade'
+
+    # Demais gráficos seguem o mesmo parâmetro; o padrão continua sendo o HTML completo
+    assert analyzer.create_operational_periods_chart(df, 'json')['data'][0]['type'] == 'pie'
+    assert analyzer.create_ignition_status_chart(df, 'json')['data'][0]['type'] == 'bar'
+    assert len(analyzer.create_ignition_status_chart(df)) > len(plotly_js_bundle())
+
+
+def _get(app, path: str):
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'headers': [(b'accept-encoding', b'gzip')],
+             'query_string': b'', 'root_path': '', 'scheme': 'http', 'server': ('testserver', 80)}
+    mensagens = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        mensagens.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    headers = dict(mensagens[0]['headers'])
+    return headers, [m.get('body', b'') for m in mensagens[1:]]
+
+
+def test_compression_skips_event_streams():
+    corpo = b'{"dados": "' + b'x' * 5000 + b'"}'
+
+    async def inner(scope, receive, send):
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [(b'content-type', b'application/json')]})
+        # Dois blocos, como um StreamingResponse
+        await send({'type': 'http.response.body', 'body': corpo, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': corpo, 'more_body': False})
+
+    app = CompressionMiddleware(inner, minimum_size=1024)
+
+    headers, blocos = _get(app, '/api/analise/ABC-1234')
+    assert headers[b'content-encoding'] == b'gzip'
+    assert gzip.decompress(b''.join(blocos)) == corpo * 2
+
+    # Eventos SSE: cada bloco é entregue como foi enviado
+    headers, blocos = _get(app, '/api/uploads/abc/eventos')
+    assert b'content-encoding' not in headers
+    assert blocos == [corpo, corpo]
+
+
+def test_plotly_js_served_from_memory():
+    headers, blocos = _get(main_app, PLOTLY_JS_URL)
+    assert PLOTLY_JS_URL.startswith('/vendor/plotly-') and b'immutable' in headers[b'cache-control']
+    assert gzip.decompress(b''.join(blocos)).decode('utf-8') == plotly_js_bundle()
@@ -0,0 +1,59 @@
+# Testes para a execução de handlers bloqueantes fora do event loop (app/concurrency.py)
+# - O event loop continua respondendo enquanto um handler bloqueia
+# - Limites independentes para trabalho leve e pesado
+
+import asyncio
+import inspect
+import threading
+import time
+
+import app.concurrency as concurrency
+from app.concurrency import offload, run_blocking
+
+
+def test_offload_keeps_event_loop_responsive():
+    @offload(heavy=True)
+    def analise(placa: str, dias: int = 1):
+        time.sleep(0.3)
+        return placa, dias, threading.current_thread() is threading.main_thread()
+
+    # O FastAPI enxerga a assinatura original
+    assert list(inspect.signature(analise).parameters) == ['placa', 'dias']
+
+    async def cenario():
+        tarefa = asyncio.create_task(analise('ABC-1234', dias=7))
+        inicio = time.perf_counter()
+        await asyncio.sleep(0.05)
+        atraso = time.perf_counter() - inicio
+        return await tarefa, atraso
+
+    resultado, atraso = asyncio.run(cenario())
+    assert resultado == ('ABC-1234', 7, False)
+    assert atraso < 0.2
+
+
+def test_heavy_limit_does_not_block_light_work(monkeypatch):
+    monkeypatch.setattr(concurrency, 'BLOCKING_HEAVY_WORKERS', 1)
+    liberar = threading.Event()
+    ativos, pico = [0], [0]
+    trava = threading.Lock()
+
+    def pesado():
+        with trava:
+            ativos[0] += 1
+            pico[0] = max(pico[0], ativos[0])
+        liberar.wait(5)
+        with trava:
+            ativos[0] -= 1
+
+    async def cenario():
+        pesados = [asyncio.create_task(run_blocking(pesado, heavy=True)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        # Com a vaga pesada ocupada, o trabalho leve ainda roda
+        leve = await asyncio.wait_for(run_blocking(lambda: 'ok'), timeout=1)
+        liberar.set()
+        await asyncio.gather(*pesados)
+        return leve
+
+    assert asyncio.run(cenario()) == 'ok'
+    assert pico[0] == 1
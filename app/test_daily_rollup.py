@@ -0,0 +1,140 @@
+# Testes para o resumo diário pré-agregado (app/rollups.py)
+# - Atualização incremental na ingestão e reconstrução completa
+# - Mesmos números que as agregações feitas sobre as posições brutas
+# - Bordas parciais da janela e resumo incompleto (banco anterior à tabela)
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.models import ResumoDiario, get_session
+from app.rollups import daily_stats_from_positions, daily_stats_from_rollups, load_daily_rollups, rebuild_daily_rollups
+from app.services import PeriodAggregator, TelemetryAnalyzer
+from app.utils import CSVProcessor
+
+
+def _telemetria(inicio: str, n: int, placas, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    velocidade = rng.choice([0, 0, 20, 45, 70, 95], size=n).astype(float)
+    return pd.DataFrame({
+        'Cliente': ['JANDAIA'] * n,
+        'Placa': [placas[i % len(placas)] for i in range(n)],
+        'Ativo': ['A1'] * n,
+        'Data': pd.date_range(inicio, periods=n, freq='37min'),
+        'Velocidade (Km)': velocidade,
+        'Ignição': rng.choice(['LM', 'D', 'LP', 'L'], size=n),
+        'GPS': [True] * n,
+        'Gprs': [True] * n,
+        'Latitude': rng.choice([-15.78, 0.0], size=n, p=[0.95, 0.05]),
+        'Longitude': rng.choice([-47.93, 0.0], size=n, p=[0.95, 0.05]),
+        'Endereço': ['Rua A'] * n,
+        'Bloqueado': [False] * n,
+        'Odometro_Periodo_Km': np.round(np.cumsum(rng.choice([0.0, 0.4, 1.3], size=n)), 1),
+    })
+
+
+def _daily_stats_raw(df: pd.DataFrame):
+    """Cálculo original de generate_complete_analysis sobre as posições"""
+    df = df.assign(date=df['data_evento'].dt.date)
+    stats = []
+    for day, g in df.groupby('date'):
+        g = g.sort_values('data_evento', kind='stable')
+        diffs = g['odometro_periodo_km'].diff().fillna(0).clip(lower=0)
+        valid = (diffs > 0) & (g['velocidade_kmh'] > 0)
+        stats.append({
+            'date': day.isoformat(),
+            'km': float(diffs[valid].sum()),
+            'avg_speed': float(g.loc[valid, 'velocidade_kmh'].mean()) if valid.any() else 0.0,
+            'max_speed': float(g.loc[valid, 'velocidade_kmh'].max()) if valid.any() else 0.0,
+        })
+    return stats
+
+
+def _assert_same(a, b):
+    if isinstance(a, dict):
+        assert a.keys() == b.keys()
+        for key in a:
+            _assert_same(a[key], b[key])
+    elif isinstance(a, list):
+        assert len(a) == len(b)
+        for x, y in zip(a, b):
+            _assert_same(x, y)
+    elif isinstance(a, (float, np.floating)):
+        assert a == pytest.approx(b)
+    else:
+        assert a == b
+
+
+@pytest.fixture
+def populated_db(temp_db):
+    """Banco SQLite temporário com ~77 dias de posições de dois veículos."""
+    assert CSVProcessor().save_to_database(_telemetria('2025-08-25 00:10', 3000, ['ABC-1234', 'XYZ-9876']), 'JANDAIA')
+    yield
+
+
+def _rollup_rows():
+    session = get_session()
+    try:
+        return sorted(
+            (r.veiculo_id, r.data, r.periodo_operacional, r.total_registros, round(r.km_deslocamento, 6),
+             r.registros_validos, round(r.km_movimento, 6), r.velocidade_max, r.alertas_velocidade)
+            for r in session.query(ResumoDiario)
+        )
+    finally:
+        session.close()
+
+
+def test_rollup_matches_raw_aggregations(populated_db):
+    analyzer = TelemetryAnalyzer()
+    inicio, fim = datetime(2025, 8, 25), datetime(2025, 11, 15, 23, 59, 59)
+    df = analyzer.get_vehicle_data('ABC-1234', inicio, fim)
+    resumo = analyzer.get_daily_rollups('ABC-1234', inicio, fim)
+
+    assert int(resumo['total_registros'].sum()) == len(df) == 1500
+    _assert_same(daily_stats_from_rollups(resumo), _daily_stats_raw(df))
+    _assert_same(daily_stats_from_positions(df), _daily_stats_raw(df))
+    _assert_same(PeriodAggregator.aggregate_weekly_from_rollup(resumo), PeriodAggregator.aggregate_weekly(df))
+
+
+def test_partial_window_edges_are_aggregated_from_positions(populated_db):
+    analyzer = TelemetryAnalyzer()
+    inicio, fim = datetime(2025, 9, 2, 13, 30), datetime(2025, 9, 20, 9, 15)
+    df = analyzer.get_vehicle_data('XYZ-9876', inicio, fim)
+    resumo = analyzer.get_daily_rollups('XYZ-9876', inicio, fim)
+
+    assert int(resumo['total_registros'].sum()) == len(df)
+    _assert_same(daily_stats_from_rollups(resumo), _daily_stats_raw(df))
+    _assert_same(PeriodAggregator.aggregate_weekly_from_rollup(resumo), PeriodAggregator.aggregate_weekly(df))
+
+
+def test_ingest_refreshes_touched_days_and_rebuild_matches(populated_db):
+    # Lote atrasado no meio do histórico: só os dias tocados são recalculados
+    assert CSVProcessor().save_to_database(_telemetria('2025-09-10 02:03', 60, ['ABC-1234'], seed=7), 'JANDAIA')
+    incremental = _rollup_rows()
+
+    assert rebuild_daily_rollups() == len(incremental)
+    assert _rollup_rows() == incremental
+
+    analyzer = TelemetryAnalyzer()
+    dia = datetime(2025, 9, 10)
+    df = analyzer.get_vehicle_data('ABC-1234', dia, dia)
+    _assert_same(daily_stats_from_rollups(analyzer.get_daily_rollups('ABC-1234', dia, dia)), _daily_stats_raw(df))
+
+
+def test_incomplete_rollup_falls_back_to_positions(populated_db):
+    session = get_session()
+    try:
+        session.query(ResumoDiario).filter(ResumoDiario.data == datetime(2025, 9, 5).date()).delete()
+        session.commit()
+    finally:
+        session.close()
+
+    analyzer = TelemetryAnalyzer()
+    inicio, fim = datetime(2025, 9, 1), datetime(2025, 9, 7, 23, 59, 59)
+    df = analyzer.get_vehicle_data('ABC-1234', inicio, fim)
+    resumo = load_daily_rollups('ABC-1234', inicio, fim)
+
+    assert int(resumo['total_registros'].sum()) == len(df)
+    _assert_same(daily_stats_from_rollups(resumo), _daily_stats_raw(df))
@@ -0,0 +1,41 @@
+# Testes para o engine único por processo e a fábrica de sessões (app/models.py)
+# - create_database_engine reaproveita o engine enquanto a URL não muda
+# - PRAGMAs de desempenho aplicados em cada conexão SQLite
+# - Fábrica de sessões criada junto com o engine e descartada com ele
+
+from app.models import create_database_engine, dispose_engines, get_session
+
+
+def test_engine_is_reused_per_database_url(temp_db, monkeypatch):
+    engine = create_database_engine()
+    assert create_database_engine() is engine
+    assert get_session().get_bind() is engine
+
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{temp_db / 'outro.db'}")
+    assert create_database_engine() is not engine
+
+
+def test_sqlite_pragmas_applied_on_connect(temp_db):
+    with create_database_engine().connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == 'wal'
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert conn.exec_driver_sql("PRAGMA cache_size").scalar() == -65536
+        assert conn.exec_driver_sql("PRAGMA mmap_size").scalar() > 0
+
+
+def test_session_factory_follows_engine(temp_db):
+    engine = create_database_engine()
+    sessoes = [get_session() for _ in range(2)]
+    try:
+        assert all(s.get_bind() is engine for s in sessoes)
+    finally:
+        for s in sessoes:
+            s.close()
+
+    dispose_engines()
+    session = get_session()
+    try:
+        # Novo engine e nova fábrica após o descarte
+        assert session.get_bind() is create_database_engine() is not engine
+    finally:
+        session.close()
@@ -0,0 +1,48 @@
+# Testes para os índices de posicoes_historicas e a rotina de atualização de bancos existentes
+# - ensure_indexes cria os índices que faltam em um banco criado por versão anterior
+# - As consultas por placa + período passam a usar o índice composto
+
+from sqlalchemy import create_engine, inspect, text
+
+from app.models import Base, PosicaoHistorica, ensure_indexes
+
+
+def _legacy_engine(tmp_path):
+    """Banco com o schema antigo: tabelas sem índices em posicoes_historicas."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'telemetria_antiga.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for index in PosicaoHistorica.__table__.indexes:
+            conn.execute(text(f"DROP INDEX {index.name}"))
+    return engine
+
+
+def test_ensure_indexes_upgrades_existing_database(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    assert inspect(engine).get_indexes('posicoes_historicas') == []
+
+    criados = ensure_indexes(engine)
+
+    assert sorted(criados) == ['ix_posicoes_data_evento', 'ix_posicoes_veiculo_data']
+    indices = {idx['name']: idx['column_names'] for idx in inspect(engine).get_indexes('posicoes_historicas')}
+    assert indices['ix_posicoes_veiculo_data'] == ['veiculo_id', 'data_evento']
+    assert indices['ix_posicoes_data_evento'] == ['data_evento']
+
+    # Idempotente
+    assert ensure_indexes(engine) == []
+
+
+def test_vehicle_period_query_uses_composite_index(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    ensure_indexes(engine)
+
+    with engine.connect() as conn:
+        plano = conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM posicoes_historicas "
+            "WHERE veiculo_id = 1 AND data_evento BETWEEN '2025-09-01' AND '2025-09-30' "
+            "ORDER BY data_evento"
+        )).fetchall()
+
+    detalhes = ' '.join(str(linha[-1]) for linha in plano)
+    assert 'ix_posicoes_veiculo_data' in detalhes
+    assert 'TEMP B-TREE' not in detalhes
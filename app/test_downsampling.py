@@ -0,0 +1,127 @@
+# Testes para a redução de séries dos gráficos (app/downsampling.py)
+# - LTTB igual à implementação de referência ponto a ponto
+# - Saída limitada a max_points; picos acima do limite e máximo global mantidos por balde
+# - Gráfico de velocidade reduzido por padrão e configurável por chamada
+# - Gráfico semanal: uma única seleção de semanas, com o máximo de cada série
+
+import numpy as np
+import pandas as pd
+
+from app.downsampling import downsample_indices, excursion_peaks, lttb_indices, merge_peaks
+from app.services import TelemetryAnalyzer
+
+
+def _lttb_referencia(x, y, n_out):
+    """LTTB como descrito por Steinarsson (2013), ponto a ponto."""
+    n = len(x)
+    every = (n - 2) / (n_out - 2)
+    escolhidos, a = [0], 0
+    for i in range(n_out - 2):
+        inicio, fim = int(i * every) + 1, int((i + 1) * every) + 1
+        prox_inicio, prox_fim = fim, min(int((i + 2) * every) + 1, n)
+        if i == n_out - 3:
+            prox_inicio, prox_fim = n - 1, n
+        media_x = np.mean(x[prox_inicio:prox_fim])
+        media_y = np.mean(y[prox_inicio:prox_fim])
+        melhor, area_max = inicio, -1.0
+        for j in range(inicio, fim):
+            area = abs((x[a] - media_x) * (y[j] - y[a]) - (x[a] - x[j]) * (media_y - y[a]))
+            if area > area_max:
+                melhor, area_max = j, area
+        escolhidos.append(melhor)
+        a = melhor
+    escolhidos.append(n - 1)
+    return escolhidos
+
+
+def test_lttb_matches_reference():
+    rng = np.random.default_rng(7)
+    x = np.cumsum(rng.integers(20, 40, size=1001)).astype(float)
+    y = np.abs(np.cumsum(rng.normal(0, 5, size=1001)))
+
+    for n_out in (3, 10, 97, 500):
+        indices = lttb_indices(x, y, n_out)
+        assert len(indices) == n_out
+        assert indices.tolist() == _lttb_referencia(x, y, n_out)
+
+    assert lttb_indices(x, y, 5000).tolist() == list(range(1001))
+
+
+def test_speed_peaks_survive_downsampling():
+    rng = np.random.default_rng(3)
+    n = 90_000
+    x = np.arange(n, dtype=float) * 30
+    y = np.clip(rng.normal(45, 12, size=n), 0, 79)
+    # Excursões curtas acima de 80 km/h (uma amostra ou poucas) espalhadas pela série
+    picos = rng.choice(n, size=40, replace=False)
+    y[picos] = rng.uniform(81, 130, size=40)
+    y[picos[:5] + 1] = 85.0  # trechos de duas amostras: o pico é a maior delas
+    y[12345] = 150.0
+
+    indices = downsample_indices(x, y, 2000, limite=80)
+    assert len(indices) == 2000
+    assert np.all(np.diff(indices) > 0)
+    assert 12345 in indices
+    # Todo pico acima do limite aparece no seu balde, por ele ou por um pico mais alto
+    limites = np.linspace(1, n - 1, 1999).astype(np.int64)
+    baldes = np.searchsorted(limites, indices, side='right')
+    for pico in excursion_peaks(y, 80):
+        assert y[indices[baldes == np.searchsorted(limites, pico, side='right')]].max() >= y[pico]
+
+    # Limite oscilando a cada amostra: um trecho por amostra, saída continua limitada
+    alternado = np.where(np.arange(n) % 2, 81.0, 79.0)
+    indices = downsample_indices(x, alternado, 500, limite=80)
+    assert len(indices) == 500 and alternado[indices[1:-1]].min() == 81.0
+
+    # Série curta ou redução desligada: todos os pontos
+    assert len(downsample_indices(x[:500], y[:500], 2000, limite=80)) == 500
+    assert len(downsample_indices(x, y, 0)) == n
+
+
+def test_speed_chart_point_budget():
+    n = 20_000
+    df = pd.DataFrame({
+        'data_evento': pd.date_range('2025-09-01', periods=n, freq='30s'),
+        'velocidade_kmh': (np.sin(np.arange(n) / 50) * 50 + 45).round(),
+    })
+    analyzer = TelemetryAnalyzer()
+
+    figura = analyzer.create_speed_chart(df, 'json', max_points=1000)
+    pontos = len(figura['data'][0]['x'])
+    assert pontos == 1000
+    # A média da anotação continua sendo a de todos os pontos
+    assert figura['layout']['annotations'][1]['text'] == f"Velocidade Média: {df['velocidade_kmh'].mean():.1f} km/h"
+
+    assert len(analyzer.create_speed_chart(df, 'json', max_points=0)['data'][0]['x']) == n
+
+
+def test_weekly_chart_point_budget():
+    n = 600
+    semanas = [{
+        'semana': f"S{i:03d}",
+        'operacao': {'km_total': 700 + 200 * np.sin(i / 15), 'velocidade_maxima': 80.0,
+                     'velocidade_media': 40.0, 'alertas': 1},
+        'combustivel': {'fuel_consumed_liters': 70.0},
+    } for i in range(n)]
+    semanas[101]['operacao']['velocidade_maxima'] = 140.0
+    semanas[402]['operacao']['alertas'] = 40
+
+    figura = TelemetryAnalyzer().create_weekly_performance_chart(semanas, 'json', max_points=50)
+    plotadas = figura['data'][0]['x']
+    assert len(plotadas) <= 50
+    assert all(len(serie['x']) == len(plotadas) for serie in figura['data'])
+    assert plotadas == sorted(plotadas)
+    # O máximo de cada série sobrevive à redução guiada pela quilometragem
+    assert 'S101' in plotadas and 'S402' in plotadas
+
+
+def test_merge_peaks_keeps_size_and_priority():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 40)
+    base = lttb_indices(x, y, 20)
+
+    indices = merge_peaks(base, [500, 501, 0, 999, 3], 1000)
+    assert len(indices) == 20 and np.all(np.diff(indices) > 0)
+    # 500 e 501 caem no mesmo balde: vale o primeiro
+    assert 500 in indices and 501 not in indices and 3 in indices
+    assert merge_peaks(base, [], 1000).tolist() == base.tolist()
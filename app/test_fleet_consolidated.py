@@ -0,0 +1,174 @@
+# Testes para o relatório consolidado da frota (ReportGenerator.generate_consolidated_report)
+# - Métricas por veículo, por dia/período e por período iguais ao cálculo por veículo
+# - Uma única consulta de posições para toda a frota
+# - Lotes em ProcessPoolExecutor (opcional, spawn, pool único): mesmo resultado e ordem; workers somente leitura
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+import app.services as services
+from app.models import create_database_engine, get_session
+from app.services import CONSISTENT_SPEED_KM_ONLY, ReportGenerator, TelemetryAnalyzer, _init_fleet_worker
+from app.utils import CSVProcessor
+
+PLACAS = ['AAA-0001', 'BBB-0002', 'CCC-0003']
+# Nome exibido no consolidado -> rótulo de periodo_operacional
+PERIODOS = {
+    'Manhã Operacional': 'operacional_manha', 'Meio-dia Operacional': 'operacional_meio_dia',
+    'Tarde Operacional': 'operacional_tarde', 'Fora Horário Manhã': 'fora_horario_manha',
+    'Fora Horário Tarde': 'fora_horario_tarde', 'Fora Horário Noite': 'fora_horario_noite',
+    'Final de Semana': 'final_semana',
+}
+
+
+def _telemetria(placas, n: int, seed: int = 1) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Cliente': ['JANDAIA'] * n,
+        'Placa': [placas[i % len(placas)] for i in range(n)],
+        'Ativo': ['A1'] * n,
+        'Data': pd.date_range('2025-09-01 00:10', periods=n, freq='11min'),
+        'Velocidade (Km)': rng.choice([0, 0, 20, 45, 70, 105], size=n).astype(float),
+        'Ignição': rng.choice(['LM', 'D', 'LP', 'L'], size=n),
+        'GPS': [True] * n,
+        'Gprs': [True] * n,
+        'Latitude': [-15.78] * n,
+        'Longitude': [-47.93] * n,
+        'Endereço': ['Rua A'] * n,
+        'Bloqueado': [False] * n,
+        'Odometro_Periodo_Km': np.round(np.cumsum(rng.choice([0.0, 0.4, 1.3], size=n)), 1),
+    })
+
+
+def _period_km(df: pd.DataFrame, consistent: bool = True):
+    """Cálculo original por subconjunto filtrado (veículo, dia, período)"""
+    diffs = df['odometro_periodo_km'].diff().fillna(0).clip(lower=0)
+    valid = (diffs > 0) & (df['velocidade_kmh'] > 0) if consistent else (diffs > 0)
+    return float(diffs[valid].sum()), float(df.loc[valid, 'velocidade_kmh'].max()) if valid.any() else 0.0
+
+
+@pytest.fixture
+def populated_db(temp_db):
+    """Banco SQLite temporário com três veículos com dados e um sem posições no período."""
+    assert CSVProcessor().save_to_database(_telemetria(PLACAS, 3000), 'JANDAIA')
+    sem_periodo = _telemetria(['ZZZ-9999'], 10).assign(Data=pd.date_range('2024-01-01', periods=10, freq='h'))
+    assert CSVProcessor().save_to_database(sem_periodo, 'JANDAIA')
+    yield
+
+
+def test_consolidated_matches_per_vehicle_metrics(populated_db):
+    inicio, fim = datetime(2025, 9, 2, 13, 0), datetime(2025, 9, 12, 9, 0)
+    resultado = ReportGenerator().generate_consolidated_report(inicio, fim)
+    assert resultado['success']
+    dados = resultado['data']
+
+    analyzer = TelemetryAnalyzer()
+    detalhes = {}
+    for placa in PLACAS:
+        df = analyzer.get_vehicle_data(placa, inicio, fim)
+        detalhes[placa] = df
+        metrics = analyzer.generate_summary_metrics(df, placa)
+        resumo = next(v for v in dados['desempenho_periodo'] if v['placa'] == placa)
+        assert resumo['km_total'] == pytest.approx(metrics['operacao']['km_total'])
+        assert resumo['velocidade_maxima'] == metrics['operacao']['velocidade_maxima']
+        assert resumo['combustivel'] == metrics['combustivel']['fuel_consumed_liters']
+
+    assert dados['resumo_geral']['total_veiculos'] == len(PLACAS)
+    assert list(dados['periodos_diarios']) == [f'2025-09-{d:02d}' for d in range(2, 13)]
+
+    for dia, periodos in dados['periodos_diarios'].items():
+        for nome, bloco in periodos.items():
+            chave = PERIODOS[nome]
+            grupos = {p: df[(df['data_evento'].dt.strftime('%Y-%m-%d') == dia) & (df['periodo_operacional'] == chave)]
+                      for p, df in detalhes.items()}
+            assert [v['placa'] for v in bloco['veiculos']] == [p for p in PLACAS if not grupos[p].empty]
+            for veiculo in bloco['veiculos']:
+                km, vel_max = _period_km(grupos[veiculo['placa']])
+                assert veiculo['km_periodo'] == pytest.approx(km)
+                assert veiculo['vel_max_periodo'] == vel_max
+
+    for nome, bloco in dados['periodos'].items():
+        chave = PERIODOS[nome]
+        for veiculo in bloco['veiculos']:
+            df = detalhes[veiculo['placa']]
+            grupo = df[df['periodo_operacional'] == chave]
+            km, vel_max = _period_km(grupo, CONSISTENT_SPEED_KM_ONLY)
+            assert veiculo['km_periodo'] == pytest.approx(km)
+            assert veiculo['vel_max_periodo'] == vel_max
+
+
+def test_consolidated_reads_positions_once(populated_db):
+    consultas = []
+    engine = create_database_engine()
+    contador = lambda conn, cursor, statement, *args: consultas.append(statement)
+    event.listen(engine, 'before_cursor_execute', contador)
+    try:
+        resultado = ReportGenerator().generate_consolidated_report(datetime(2025, 9, 1), datetime(2025, 9, 20))
+    finally:
+        event.remove(engine, 'before_cursor_execute', contador)
+
+    assert resultado['success']
+    assert len([sql for sql in consultas if 'FROM posicoes_historicas' in sql]) == 1
+    assert len([sql for sql in consultas if 'FROM veiculos' in sql]) == 1
+
+
+def test_process_pool_matches_single_process(populated_db, monkeypatch):
+    inicio, fim = datetime(2025, 9, 1), datetime(2025, 9, 20)
+    # Padrão: tudo no próprio processo, sem pool
+    assert services.FLEET_REPORT_WORKERS == 1
+    serial = ReportGenerator().generate_consolidated_report(inicio, fim)
+    assert services._fleet_pool is None
+
+    monkeypatch.setattr(services, 'FLEET_REPORT_WORKERS', 2)
+    monkeypatch.setattr(services, 'FLEET_REPORT_BATCH', 1)
+    try:
+        paralelo = ReportGenerator().generate_consolidated_report(inicio, fim)
+        pool = services._fleet_pool
+        # Processos iniciados por spawn (nunca fork a partir das threads do servidor), pool reaproveitado
+        assert pool is not None and pool._mp_context.get_start_method() == 'spawn'
+        assert ReportGenerator().generate_consolidated_report(inicio, fim) == paralelo
+        assert services._fleet_pool is pool
+    finally:
+        services.shutdown_fleet_pool(wait=True)
+
+    assert paralelo['success']
+    assert paralelo == serial
+    assert 'dataframe' not in paralelo['data']['desempenho_periodo'][0]
+
+
+def _try_write():
+    session = get_session()
+    try:
+        session.execute(text("UPDATE veiculos SET ativo = 0"))
+        session.commit()
+        return 'gravou'
+    except OperationalError:
+        return 'somente leitura'
+    finally:
+        session.close()
+
+
+def test_fleet_workers_use_read_only_connections(populated_db):
+    with ProcessPoolExecutor(max_workers=1, initializer=_init_fleet_worker) as pool:
+        assert pool.submit(_try_write).result() == 'somente leitura'
+
+
+def test_fleet_metrics_sum_per_vehicle_metrics(populated_db):
+    inicio, fim = datetime(2025, 9, 1), datetime(2025, 9, 20)
+    frota = ReportGenerator().generate_fleet_metrics(inicio, fim)
+
+    analyzer = TelemetryAnalyzer()
+    por_veiculo = [analyzer.generate_summary_metrics(analyzer.get_vehicle_data(p, inicio, fim), p) for p in PLACAS]
+    for campo in ('total_registros', 'tempo_total_ligado', 'tempo_em_movimento', 'tempo_parado_ligado', 'tempo_desligado'):
+        assert frota['operacao'][campo] == sum(m['operacao'][campo] for m in por_veiculo)
+    assert frota['operacao']['km_total'] == pytest.approx(sum(m['operacao']['km_total'] for m in por_veiculo))
+    assert frota['operacao']['velocidade_maxima'] == max(m['operacao']['velocidade_maxima'] for m in por_veiculo)
+    assert frota['periodos'] == {p: sum(m['periodos'][p] for m in por_veiculo) for p in por_veiculo[0]['periodos']}
+    assert frota['combustivel']['fuel_consumed_liters'] == pytest.approx(
+        sum(m['combustivel']['fuel_consumed_liters'] for m in por_veiculo))
@@ -0,0 +1,99 @@
+# Testes para o módulo de cálculos geográficos vetorizados (app/geo.py)
+# - Equivalência com a fórmula escalar de haversine e com geopy.distance.geodesic
+# - Tratamento de coordenadas ausentes e de fronteiras entre grupos (placas)
+
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+from geopy.distance import geodesic
+
+from app.geo import consecutive_distances, detect_gps_jumps, geodesic_km, haversine_km, path_length_by_group
+
+LATS = [-15.7801, -15.7850, -15.7920, -16.6869, -23.5505]
+LONS = [-47.9292, -47.9310, -47.9400, -49.2648, -46.6333]
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Fórmula escalar de referência (math), em km"""
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+
+def test_haversine_km_matches_scalar_formula():
+    vetorizado = haversine_km(LATS[:-1], LONS[:-1], LATS[1:], LONS[1:])
+    escalar = [haversine(LATS[i], LONS[i], LATS[i + 1], LONS[i + 1]) for i in range(len(LATS) - 1)]
+    np.testing.assert_allclose(vetorizado, escalar, rtol=1e-12)
+
+
+def test_geodesic_km_matches_geopy():
+    vetorizado = geodesic_km(LATS[:-1], LONS[:-1], LATS[1:], LONS[1:])
+    referencia = [geodesic((LATS[i], LONS[i]), (LATS[i + 1], LONS[i + 1])).kilometers for i in range(len(LATS) - 1)]
+    # Lambert: erro de poucos metros em centenas de km
+    np.testing.assert_allclose(vetorizado, referencia, rtol=1e-4)
+    assert geodesic_km([-15.78], [-47.93], [-15.78], [-47.93])[0] == 0.0
+
+
+def test_consecutive_distances_missing_coordinates_and_groups():
+    lat = [-15.78, np.nan, -15.79, -15.80, -15.81]
+    lon = [-47.93, -47.93, -47.94, -47.95, -47.96]
+    placas = ['A', 'A', 'A', 'B', 'B']
+
+    distancias = consecutive_distances(lat, lon, groups=placas)
+
+    assert distancias[0] == 0.0
+    assert distancias[1] == 0.0 and distancias[2] == 0.0  # pares com NaN
+    assert distancias[3] == 0.0  # primeira linha da placa B
+    assert distancias[4] == pytest.approx(haversine(-15.80, -47.95, -15.81, -47.96))
+    assert len(consecutive_distances([], [])) == 0
+
+
+def test_path_length_by_group_sorts_by_plate_and_time():
+    df = pd.DataFrame({
+        'placa': ['B', 'A', 'B', 'A'],
+        'ts': pd.to_datetime(['2025-09-01 08:01', '2025-09-01 08:01', '2025-09-01 08:00', '2025-09-01 08:00']),
+        'lat': [-15.80, -15.79, -15.81, -15.78],
+        'lon': [-47.95, -47.94, -47.96, -47.93],
+    })
+
+    totais = path_length_by_group(df, 'placa', time_col='ts')
+
+    assert totais['A'] == pytest.approx(haversine(-15.78, -47.93, -15.79, -47.94))
+    assert totais['B'] == pytest.approx(haversine(-15.81, -47.96, -15.80, -47.95))
+
+
+def test_detect_gps_jumps_distance_rule_and_implied_speed():
+    timestamps = pd.to_datetime(['2025-09-01 08:00', '2025-09-01 08:10', '2025-09-01 08:20',
+                                 '2025-09-01 10:20', '2025-09-01 10:30'])
+    # Brasília → São Paulo (~870 km) em 10 min, volta em 2 h, depois ~29 km em 10 min
+    lat = [-15.78, -23.55, -23.55, -15.78, -15.55]
+    lon = [-47.93, -46.63, -46.63, -47.93, -47.80]
+
+    legado = detect_gps_jumps(lat, lon, timestamps)
+    assert legado.tolist() == [False, True, False, False, False]
+
+    # Com limite de velocidade implícita: 870 km em 2 h (435 km/h) e ~175 km/h também são saltos
+    com_limite = detect_gps_jumps(lat, lon, timestamps, max_implied_speed_kmh=150)
+    assert com_limite.tolist() == [False, True, False, True, True]
+
+    # Fronteira entre placas não é comparada
+    por_placa = detect_gps_jumps(lat, lon, timestamps, groups=['A', 'B', 'B', 'B', 'B'])
+    assert por_placa.tolist() == [False, False, False, False, False]
+
+
+def test_apply_quality_rules_marks_gps_jumps_vectorized():
+    from app.utils import CSVProcessor
+
+    df = pd.DataFrame({
+        'timestamp': pd.date_range('2025-09-01 08:00', periods=4, freq='10min'),
+        'lat': [-15.78, -23.55, -23.55, -23.551],
+        'lon': [-47.93, -46.63, -46.63, -46.631],
+    })
+    processor = CSVProcessor()
+    clean, report = processor.apply_quality_rules(df)
+
+    assert report['gps_jumps_marked'] == 1
+    assert clean['gps_jump'].tolist() == [False, True, False, False]
@@ -0,0 +1,88 @@
+# Testes para o resumo horário (app/rollups.py)
+# - resumo_diario é a soma das linhas horárias de cada dia e período
+# - Lote atrasado (backfill GPRS) reagrega só as horas tocadas e a hora seguinte do dia
+# - resumo_diario derivado das horas continua igual à reconstrução completa
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.models import ResumoDiario, ResumoHorario, get_session
+from app.rollups import rebuild_daily_rollups
+from app.utils import CSVProcessor
+
+
+def _telemetria(inicio: str, n: int, placa: str, freq: str = '7min', seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Cliente': ['JANDAIA'] * n,
+        'Placa': [placa] * n,
+        'Ativo': ['A1'] * n,
+        'Data': pd.date_range(inicio, periods=n, freq=freq),
+        'Velocidade (Km)': rng.choice([0, 0, 25, 60, 90], size=n).astype(float),
+        'Ignição': rng.choice(['LM', 'D', 'LP', 'L'], size=n),
+        'GPS': [True] * n,
+        'Gprs': [True] * n,
+        'Latitude': [-15.78] * n,
+        'Longitude': [-47.93] * n,
+        'Endereço': ['Rua A'] * n,
+        'Bloqueado': [False] * n,
+        'Odometro_Periodo_Km': np.round(np.cumsum(rng.choice([0.0, 0.5, 1.1], size=n)) + 100 * seed, 1),
+    })
+
+
+def _rows(modelo, coluna):
+    session = get_session()
+    try:
+        return {
+            (r.veiculo_id, getattr(r, coluna), r.periodo_operacional):
+                (r.id, r.total_registros, round(r.km_deslocamento, 6), r.registros_validos,
+                 round(r.km_movimento, 6), r.velocidade_max, r.registros_ligado)
+            for r in session.query(modelo)
+        }
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def populated_db(temp_db):
+    """Banco SQLite temporário com três dias de posições de um veículo."""
+    assert CSVProcessor().save_to_database(_telemetria('2025-09-01 00:03', 600, 'ABC-1234'), 'JANDAIA')
+    yield
+
+
+def test_daily_rollup_is_sum_of_hours(populated_db):
+    horario, diario = _rows(ResumoHorario, 'hora'), _rows(ResumoDiario, 'data')
+    assert sum(v[1] for v in horario.values()) == sum(v[1] for v in diario.values()) == 600
+
+    # Cada linha diária soma (ou maximiza, velocidade_max) as horas do dia e período
+    somas = {}
+    for (veiculo_id, hora, periodo), valores in horario.items():
+        atual = somas.setdefault((veiculo_id, hora.date(), periodo), [0, 0.0, 0, 0.0, 0, 0])
+        for i, valor in enumerate(valores[1:]):
+            atual[i] = max(atual[i], valor) if i == 4 else atual[i] + valor
+    assert somas.keys() == diario.keys()
+    for chave, valores in diario.items():
+        assert somas[chave] == pytest.approx(list(valores[1:]))
+
+
+def test_late_backfill_reaggregates_only_touched_hours(populated_db):
+    antes = _rows(ResumoHorario, 'hora')
+
+    # Posições de 2025-09-02 entre 10:05 e 11:55 chegam atrasadas
+    atrasadas = _telemetria('2025-09-02 10:05', 12, 'ABC-1234', freq='10min', seed=3)
+    assert CSVProcessor().save_to_database(atrasadas, 'JANDAIA')
+
+    depois = _rows(ResumoHorario, 'hora')
+    regravadas = {chave[1] for chave in depois if chave not in antes or depois[chave][0] != antes[chave][0]}
+    # Horas tocadas + hora seguinte do mesmo dia (delta de odômetro da sua primeira posição)
+    assert regravadas == {datetime(2025, 9, 2, 10), datetime(2025, 9, 2, 11), datetime(2025, 9, 2, 12)}
+
+    # Incremental == reconstrução completa (horário e diário)
+    diario = _rows(ResumoDiario, 'data')
+    rebuild_daily_rollups()
+    sem_id = lambda linhas: {k: v[1:] for k, v in linhas.items()}
+    assert sem_id(_rows(ResumoHorario, 'hora')) == sem_id(depois)
+    assert sem_id(_rows(ResumoDiario, 'data')) == sem_id(diario)
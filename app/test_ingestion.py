@@ -0,0 +1,131 @@
+# Testes para a ingestão assíncrona de uploads (app/ingestion.py)
+# - Lote com vários arquivos processados em paralelo, sem corrida na criação de veículos
+# - Andamento por arquivo (registros lidos e gravados), modo em blocos e erros por arquivo
+# - Falha no meio do modo em blocos: o lote informa a ingestão parcial
+# - Endpoint de upload: arquivo aceito que já falhou não vira 503 de fila cheia
+
+import asyncio
+import io
+import time
+
+from fastapi import UploadFile
+
+from app import main
+from app.ingestion import CONCLUIDO, ERRO, start_upload_batch
+from app.models import PosicaoHistorica, Veiculo, get_session
+from app.utils import CSVProcessor
+
+
+def _csv(dia: int, n: int) -> bytes:
+    """CSV diário no formato padrão de exportação (separador ';'), sempre com as mesmas duas placas."""
+    colunas = CSVProcessor().required_columns
+    linhas = [';'.join(colunas)]
+    for i in range(n):
+        valores = {
+            'Cliente': 'JANDAIA',
+            'Placa': 'ABC-1234' if i % 2 == 0 else 'XYZ-9876',
+            'Ativo': 'A1',
+            'Data': f"{dia:02d}/09/2025 08:{i // 60:02d}:{i % 60:02d}",
+            'Velocidade (Km)': str(i % 80),
+            'Ignição': 'LM',
+            'GPS': '1',
+            'Gprs': '1',
+            'Localização': '"-15.78,-47.93"',
+            'Endereço': 'Rua São José',
+            'Tipo do Evento': 'Posição',
+            'Bloqueado': '0',
+        }
+        linhas.append(';'.join(valores.get(col, '') for col in colunas))
+    return ('\n'.join(linhas) + '\n').encode('latin-1')
+
+
+def _upload(nome: str, conteudo: bytes) -> UploadFile:
+    return UploadFile(file=io.BytesIO(conteudo), filename=nome)
+
+
+def _wait(lote, timeout: float = 30.0):
+    limite = time.monotonic() + timeout
+    while not lote.finished:
+        assert time.monotonic() < limite, 'lote não terminou'
+        time.sleep(0.02)
+    return lote.to_dict()
+
+
+def test_batch_ingests_files_in_parallel(tmp_path, temp_db):
+    arquivos = [_upload(f"2025-09-{dia:02d}.csv", _csv(dia, 25)) for dia in range(1, 9)]
+    arquivos.append(_upload('leia-me.txt', b'nada'))
+
+    lote = asyncio.run(start_upload_batch(arquivos, 'JANDAIA', tmp_path, streaming_threshold=10 ** 9))
+    estado = _wait(lote)
+
+    assert estado['status'] == CONCLUIDO and estado['progresso'] == 100
+    assert estado['total_arquivos'] == 8 and estado['concluidos'] == 8 and estado['com_erro'] == 0
+    assert estado['ignorados'] == ['leia-me.txt']
+    assert estado['registros_lidos'] == estado['registros_gravados'] == 200
+    assert all(a['resultado']['records_processed'] == 25 for a in estado['arquivos'])
+
+    session = get_session()
+    try:
+        # Os oito arquivos trazem as mesmas placas: cada veículo é criado uma única vez
+        assert session.query(Veiculo).count() == 2
+        assert session.query(PosicaoHistorica).count() == 200
+    finally:
+        session.close()
+    # Arquivos temporários removidos após a ingestão
+    assert not list(tmp_path.glob('*.csv'))
+
+
+def test_streaming_progress_and_per_file_errors(tmp_path, temp_db):
+    arquivos = [_upload('grande.csv', _csv(1, 40)), _upload('quebrado.csv', b'\xff\xfe\x00;;\n\x00')]
+
+    # Limite zero: todo arquivo segue o caminho em blocos
+    lote = asyncio.run(start_upload_batch(arquivos, 'JANDAIA', tmp_path, streaming_threshold=0))
+    estado = _wait(lote)
+
+    grande, quebrado = estado['arquivos']
+    assert grande['status'] == CONCLUIDO
+    assert grande['registros_lidos'] == grande['registros_gravados'] == 40
+    assert grande['resultado']['streaming']['rows_written'] == 40
+    assert quebrado['status'] == ERRO and quebrado['erro']
+    assert estado['status'] == CONCLUIDO and estado['com_erro'] == 1
+
+
+def test_partial_streaming_ingest_is_reported(tmp_path, temp_db, monkeypatch):
+    gravar = CSVProcessor.save_to_database
+    chamadas = []
+
+    def falha_no_segundo_bloco(self, df, client_name=None):
+        chamadas.append(len(df))
+        return len(chamadas) < 2 and gravar(self, df, client_name)
+
+    original_init = CSVProcessor.__init__
+
+    def blocos_pequenos(self):
+        original_init(self)
+        self.csv_chunk_size = 15
+
+    monkeypatch.setattr(CSVProcessor, '__init__', blocos_pequenos)
+    monkeypatch.setattr(CSVProcessor, 'save_to_database', falha_no_segundo_bloco)
+
+    lote = asyncio.run(start_upload_batch([_upload('dia.csv', _csv(1, 40))], 'JANDAIA', tmp_path, streaming_threshold=0))
+    arquivo = _wait(lote)['arquivos'][0]
+
+    assert arquivo['status'] == ERRO and 'linha de dados 16' in arquivo['erro']
+    assert arquivo['parcial'] == {'registros_gravados': 15, 'bloco_falha': 2, 'linha_falha': 16}
+
+
+def test_upload_endpoint_accepts_batch_that_already_failed(tmp_path, temp_db, monkeypatch):
+    async def lote_ja_terminado(*args, **kwargs):
+        # Garante que o único arquivo já terminou com erro antes da resposta do endpoint
+        lote = await start_upload_batch(*args, **kwargs)
+        _wait(lote)
+        return lote
+
+    monkeypatch.setattr(main, 'UPLOAD_DIR', tmp_path)
+    monkeypatch.setattr(main, 'start_upload_batch', lote_ja_terminado)
+
+    resposta = asyncio.run(main.upload_csv(files=[_upload('quebrado.csv', b'\xff\xfe\x00;;\n\x00')],
+                                           cliente_nome='JANDAIA'))
+
+    assert resposta['lote_id'] and resposta['arquivos'] == ['quebrado.csv']
+    assert main.get_upload_batch(resposta['lote_id']).to_dict()['com_erro'] == 1
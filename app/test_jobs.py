@@ -0,0 +1,130 @@
+# Testes para a fila de relatórios em segundo plano (app/jobs.py)
+# - Deduplicação de pedidos idênticos em andamento
+# - Concorrência limitada e fila cheia
+# - Resultado, download_url e erros expostos pelo estado da tarefa
+# - Etapas da geração do PDF repassadas ao andamento da tarefa
+
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from app.jobs import CONCLUIDO, ERRO, PENDENTE, JobQueue, JobQueueFull
+from app.reports import generate_consolidated_vehicle_report
+from app.utils import CSVProcessor
+
+
+def _wait(job, timeout: float = 5.0):
+    limite = time.monotonic() + timeout
+    while not job.finished:
+        assert time.monotonic() < limite, 'tarefa não terminou'
+        time.sleep(0.01)
+    return job
+
+
+@pytest.fixture
+def queue():
+    fila = JobQueue(max_workers=2, max_pending=3, history=10)
+    yield fila
+    fila.shutdown(wait=True)
+
+
+def test_identical_requests_share_one_job(queue):
+    liberar = threading.Event()
+    chamadas = []
+
+    def gerar(job):
+        chamadas.append(job.id)
+        liberar.wait(5)
+        return {'success': True, 'download_url': '/api/download/r.pdf'}
+
+    primeiro = queue.submit('relatorio_pdf', ('ABC-1234', '2025-09-01', '2025-09-30'), gerar)
+    segundo = queue.submit('relatorio_pdf', ('ABC-1234', '2025-09-01', '2025-09-30'), gerar)
+    outro = queue.submit('relatorio_pdf', ('XYZ-9876', '2025-09-01', '2025-09-30'), gerar)
+    assert segundo is primeiro
+    assert outro is not primeiro
+
+    liberar.set()
+    estado = _wait(primeiro).to_dict()
+    _wait(outro)
+    assert len(chamadas) == 2
+    assert estado['status'] == CONCLUIDO and estado['progresso'] == 100
+    assert estado['download_url'] == '/api/download/r.pdf'
+    assert queue.get(primeiro.id) is primeiro
+
+    # Concluída a tarefa, o mesmo pedido gera uma nova
+    novo = queue.submit('relatorio_pdf', ('ABC-1234', '2025-09-01', '2025-09-30'), gerar)
+    assert novo is not primeiro
+    _wait(novo)
+
+
+def test_bounded_concurrency_and_full_queue(queue):
+    liberar = threading.Event()
+    ativos, pico = [0], [0]
+    trava = threading.Lock()
+
+    def gerar(job):
+        with trava:
+            ativos[0] += 1
+            pico[0] = max(pico[0], ativos[0])
+        liberar.wait(5)
+        with trava:
+            ativos[0] -= 1
+        return {'success': True}
+
+    jobs = [queue.submit('relatorio_pdf', (i,), gerar) for i in range(5)]
+    time.sleep(0.1)
+    # 2 executando + 3 aguardando: a próxima é recusada
+    assert sum(job.status == PENDENTE for job in jobs) == 3
+    with pytest.raises(JobQueueFull):
+        queue.submit('relatorio_pdf', (99,), gerar)
+
+    liberar.set()
+    for job in jobs:
+        _wait(job)
+    assert pico[0] == 2
+
+
+def test_failures_are_reported(queue):
+    def falha(job):
+        raise RuntimeError('ReportLab indisponível')
+
+    job = _wait(queue.submit('relatorio_pdf', ('A',), falha))
+    assert job.to_dict()['status'] == ERRO and job.to_dict()['erro'] == 'ReportLab indisponível'
+
+    job = _wait(queue.submit('relatorio_pdf', ('B',), lambda job: {'success': False, 'error': 'Sem dados'}))
+    assert job.status == ERRO and job.erro == 'Sem dados'
+    assert 'download_url' not in job.to_dict()
+
+
+def test_report_generation_reports_stages(temp_db, tmp_path):
+    n = 96
+    dados = pd.DataFrame({
+        'Cliente': ['JANDAIA'] * n,
+        'Placa': ['ABC-1234'] * n,
+        'Ativo': ['A1'] * n,
+        'Data': pd.date_range('2025-09-01', periods=n, freq='15min'),
+        'Velocidade (Km)': [40.0] * n,
+        'Ignição': ['LM'] * n,
+        'GPS': [True] * n,
+        'Gprs': [True] * n,
+        'Latitude': [-15.78] * n,
+        'Longitude': [-47.93] * n,
+        'Endereço': ['Rua A'] * n,
+        'Bloqueado': [False] * n,
+        'Odometro_Periodo_Km': [float(i) for i in range(n)],
+    })
+    assert CSVProcessor().save_to_database(dados, 'JANDAIA')
+
+    etapas = []
+    resultado = generate_consolidated_vehicle_report(
+        datetime(2025, 9, 1), datetime(2025, 9, 1, 23, 59), str(tmp_path / 'relatorios'),
+        vehicle_filter='ABC-1234', on_progress=lambda progresso, etapa: etapas.append((progresso, etapa))
+    )
+    assert resultado['success']
+    # Consulta, agregação e gravação do PDF, em ordem crescente de progresso
+    assert [e for _, e in etapas] == ['Consultando posições', 'Calculando métricas', 'Agregando por período',
+                                      'Montando relatório', 'Gravando PDF']
+    assert [p for p, _ in etapas] == sorted(p for p, _ in etapas)
@@ -0,0 +1,71 @@
+# Testes para o motor único de agregação de PeriodAggregator (app/services.py)
+# - Validação de consistência aplicada uma vez (sem NameError em frames não vazios)
+# - Métricas diárias/horárias e quebra semanal dentro de cada mês
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services import DataQualityRules, PeriodAggregator
+
+
+def _frame():
+    """Quatro registros por dia em 2025-09-29 (segunda), 2025-09-30 e 2025-10-01."""
+    datas = pd.to_datetime([
+        f"{dia} {hora}" for dia in ['2025-09-29', '2025-09-30', '2025-10-01']
+        for hora in ['08:00:00', '08:05:00', '09:00:00', '09:05:00']
+    ])
+    n = len(datas)
+    velocidade = np.array([0, 40, 90, 30] * 3, dtype=float)
+    return pd.DataFrame({
+        'data_evento': datas,
+        'velocidade_kmh': velocidade,
+        'odometro_periodo_km': np.where(velocidade > 0, 2.0, 0.0),
+        'ignicao': ['L', 'LM', 'LM', 'LM'] * 3,
+        'em_movimento': velocidade > 0,
+        'ligado': [True] * n,
+        'latitude': [-15.78] * n,
+        'longitude': [-47.93] * n,
+        'periodo_operacional': ['fora_horario_manha'] * n,
+    })
+
+
+def test_validate_telemetry_consistency_applies_all_rules():
+    df = _frame()
+    df.loc[0, 'odometro_periodo_km'] = 1.0   # KM > 0 parado
+    df.loc[4, ['latitude', 'longitude']] = 0  # coordenada nula
+
+    limpo = DataQualityRules.validate_telemetry_consistency(df)
+
+    assert len(limpo) == len(df) - 2
+
+
+def test_aggregate_daily_metrics_and_hourly_breakdown():
+    diario = PeriodAggregator.aggregate_daily(_frame())
+
+    dia = diario[pd.Timestamp('2025-09-30').date()]
+    assert dia['total_registros'] == 4
+    assert dia['km_total'] == pytest.approx(6.0)
+    assert dia['velocidade_max'] == 90
+    assert dia['velocidade_media'] == pytest.approx(160 / 3)
+    assert dia['tempo_movimento_horas'] == pytest.approx(15 / 60)
+    assert dia['alertas_velocidade'] == 1
+    assert dia['periodos_operacionais'] == {'fora_horario_manha': 4}
+    assert dia['hourly_breakdown'][8] == {'km': 2.0, 'avg_speed': 40.0, 'alerts': 0, 'movement_hours': 5 / 60}
+
+
+def test_aggregate_all_splits_weeks_by_month():
+    resultado = PeriodAggregator.aggregate_all(_frame())
+
+    assert set(resultado) == {'daily', 'weekly', 'biweekly', 'monthly'}
+    assert list(resultado['weekly']) == ['2025-09-29 a 2025-10-05']
+    assert resultado['weekly']['2025-09-29 a 2025-10-05']['dias_operacao'] == 3
+
+    setembro = resultado['monthly']['09/2025']
+    outubro = resultado['monthly']['10/2025']
+    assert setembro['weekly_breakdown']['2025-09-29 a 2025-10-05']['dias_operacao'] == 2
+    assert outubro['weekly_breakdown']['2025-09-29 a 2025-10-05']['km_total'] == pytest.approx(6.0)
+    assert outubro['performance_graph_data'] == [
+        {'week': '2025-09-29 a 2025-10-05', 'km': 6.0, 'avg_speed': pytest.approx(160 / 3), 'alerts': 1}
+    ]
+    assert resultado['monthly'] == PeriodAggregator.aggregate_monthly(_frame())
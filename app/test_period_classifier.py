@@ -0,0 +1,97 @@
+# Testes para o classificador compilado de períodos operacionais (app/periods.py)
+# - Janelas que cruzam a meia-noite, prioridade e fim inclusivo/semiaberto
+# - Final de semana e retorno categórico
+# - Cache por cliente e invalidação quando os perfis mudam (inclusive durante a compilação)
+
+from datetime import datetime, time
+
+import pandas as pd
+import pytest
+
+from app.models import Cliente, PerfilHorario, get_session
+from app.periods import ANALYZER_CLASSIFIER, PeriodClassifier, get_client_classifier, invalidate_period_cache
+from app.utils import CSVProcessor
+
+
+def test_classifier_windows_priority_and_midnight():
+    classifier = PeriodClassifier(
+        [('noite', time(22, 0), time(2, 0)), ('manha', time(4, 0), time(7, 0)), ('largo', time(6, 0), time(12, 0))],
+        default_label='fora_horario',
+    )
+    # 2025-09-01 é segunda-feira
+    datas = pd.to_datetime([
+        '2025-09-01 23:30:00', '2025-09-02 01:59:59', '2025-09-02 02:00:00', '2025-09-02 02:00:01',
+        '2025-09-01 06:30:00', '2025-09-01 07:00:30', '2025-09-01 13:00:00', '2025-09-06 05:00:00',
+    ])
+
+    resultado = classifier.classify(datas)
+
+    assert resultado.dtype == 'category'
+    assert resultado.tolist() == ['noite', 'noite', 'noite', 'fora_horario',
+                                  'manha', 'largo', 'fora_horario', 'final_semana']
+    assert set(resultado.cat.categories) == set(resultado.tolist())
+
+
+def test_analyzer_classifier_half_open_windows():
+    assert ANALYZER_CLASSIFIER.classify_one(datetime(2025, 9, 1, 6, 59, 59)) == 'operacional_manha'
+    assert ANALYZER_CLASSIFIER.classify_one(datetime(2025, 9, 1, 7, 0)) == 'fora_horario_manha'
+    assert ANALYZER_CLASSIFIER.classify_one(datetime(2025, 9, 1, 3, 0)) == 'fora_horario_noite'
+    assert ANALYZER_CLASSIFIER.classify_one(datetime(2025, 9, 7, 12, 0)) == 'final_semana'
+
+
+@pytest.fixture
+def cliente_db(temp_db):
+    """Banco SQLite isolado com um cliente e um perfil operacional."""
+    session = get_session()
+    try:
+        cliente = Cliente(nome='JANDAIA')
+        session.add(cliente)
+        session.flush()
+        session.add(PerfilHorario(cliente_id=cliente.id, nome='Manhã', hora_inicio=time(4, 0),
+                                  hora_fim=time(7, 0), tipo_periodo='operacional'))
+        session.commit()
+        cliente_id = cliente.id
+    finally:
+        session.close()
+    invalidate_period_cache()
+    yield cliente_id
+    invalidate_period_cache()
+
+
+def test_client_classifier_cached_until_invalidated(cliente_db):
+    cliente_id = cliente_db
+    instante = datetime(2025, 9, 1, 5, 0)
+    assert CSVProcessor().classify_operational_period(instante, cliente_id) == 'manhã'
+
+    session = get_session()
+    try:
+        session.query(PerfilHorario).update({'hora_inicio': time(5, 30)})
+        session.commit()
+    finally:
+        session.close()
+
+    # Ainda compilado com o perfil antigo
+    assert CSVProcessor().classify_operational_period(instante, cliente_id) == 'manhã'
+
+    invalidate_period_cache(cliente_id)
+    assert CSVProcessor().classify_operational_period(instante, cliente_id) == 'fora_horario'
+
+
+def test_invalidation_during_build_is_not_overwritten():
+    invalidate_period_cache()
+    antigo = PeriodClassifier([('manhã', time(4, 0), time(7, 0))], default_label='fora_horario')
+    novo = PeriodClassifier([('manhã', time(5, 30), time(7, 0))], default_label='fora_horario')
+
+    def compila_e_invalida():
+        # Perfis alterados enquanto o classificador antigo era compilado
+        invalidate_period_cache(42)
+        return antigo
+
+    assert get_client_classifier(42, compila_e_invalida) is antigo
+    assert get_client_classifier(42, lambda: novo) is novo
+    assert get_client_classifier(42, lambda: antigo) is novo
+
+    # Invalidação global também descarta a compilação em andamento
+    get_client_classifier(7, lambda: invalidate_period_cache() or antigo)
+    assert get_client_classifier(7, lambda: novo) is novo
+    invalidate_period_cache()
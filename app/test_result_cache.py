@@ -0,0 +1,133 @@
+# Testes para o cache de resultados por veículo (app/result_cache.py)
+# - Acerto enquanto dados e perfis não mudam; nova ingestão ou perfil muda a chave
+# - LRU em memória (entradas e tamanho estimado) com camada em disco e invalidação por veículo/cliente
+
+from datetime import datetime, time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.models import PerfilHorario, Veiculo, get_session
+from app.result_cache import ResultCache, ResultKey, cached_result, get_result_cache, invalidate_results, result_key
+from app.utils import CSVProcessor
+
+
+def _telemetria(inicio: str, n: int, placa: str = 'ABC-1234') -> pd.DataFrame:
+    rng = np.random.default_rng(2)
+    return pd.DataFrame({
+        'Cliente': ['JANDAIA'] * n,
+        'Placa': [placa] * n,
+        'Ativo': ['A1'] * n,
+        'Data': pd.date_range(inicio, periods=n, freq='10min'),
+        'Velocidade (Km)': rng.choice([0, 30, 60], size=n).astype(float),
+        'Ignição': rng.choice(['LM', 'D'], size=n),
+        'GPS': [True] * n,
+        'Gprs': [True] * n,
+        'Latitude': [-15.78] * n,
+        'Longitude': [-47.93] * n,
+        'Endereço': ['Rua A'] * n,
+        'Bloqueado': [False] * n,
+    })
+
+
+def _key(i: int) -> ResultKey:
+    return ResultKey(tipo='analise', placa=f'P-{i}', veiculo_id=i, cliente_id=7, inicio='2025-09-01T00:00:00',
+                     fim='2025-09-02T00:00:00', perfis=(0, 'None', 'None'), marca_dagua=(10, 10 + i))
+
+
+@pytest.fixture
+def populated_db(temp_db):
+    """Banco SQLite temporário com dois dias de posições de um veículo e cache vazio."""
+    invalidate_results()
+    assert CSVProcessor().save_to_database(_telemetria('2025-09-01 00:05', 288), 'JANDAIA')
+    yield
+    invalidate_results()
+
+
+def test_cached_until_data_or_profiles_change(populated_db):
+    chamadas = []
+
+    def calcular():
+        chamadas.append(1)
+        return {'success': True, 'n': len(chamadas)}
+
+    inicio, fim = datetime(2025, 9, 1), datetime(2025, 9, 1, 12, 0)
+    assert cached_result('analise', 'ABC-1234', inicio, fim, calcular) == {'success': True, 'n': 1}
+    # Mesmo dia: a janela normalizada é o dia inteiro
+    assert cached_result('analise', 'ABC-1234', inicio, datetime(2025, 9, 1, 23, 0), calcular)['n'] == 1
+
+    # Posições fora da janela não mudam a marca d'água; um lote atrasado dentro dela muda
+    chave = result_key('analise', 'ABC-1234', inicio, fim)
+    assert CSVProcessor().save_to_database(_telemetria('2025-09-05 00:05', 10), 'JANDAIA')
+    assert result_key('analise', 'ABC-1234', inicio, fim) == chave
+    assert CSVProcessor().save_to_database(_telemetria('2025-09-01 10:03', 3), 'JANDAIA')
+    assert result_key('analise', 'ABC-1234', inicio, fim) != chave
+    assert cached_result('analise', 'ABC-1234', inicio, fim, calcular)['n'] == 2
+
+    # Perfil de horário gravado por outro processo (sem invalidação explícita)
+    session = get_session()
+    try:
+        cliente_id = session.query(Veiculo.cliente_id).filter_by(placa='ABC-1234').scalar()
+        session.add(PerfilHorario(cliente_id=cliente_id, nome='Manhã', hora_inicio=time(4, 0),
+                                  hora_fim=time(7, 0), tipo_periodo='operacional'))
+        session.commit()
+    finally:
+        session.close()
+    assert cached_result('analise', 'ABC-1234', inicio, fim, calcular)['n'] == 3
+    assert cached_result('analise', 'ABC-1234', inicio, fim, calcular)['n'] == 3
+
+    # Falhas não são guardadas; veículo inexistente não tem chave
+    assert result_key('analise', 'XXX-0000', inicio, fim) is None
+    assert cached_result('relatorio_pdf', 'ABC-1234', inicio, fim, lambda: {'success': False})['success'] is False
+    assert cached_result('relatorio_pdf', 'ABC-1234', inicio, fim, calcular)['n'] == 4
+
+
+def test_ingest_invalidates_vehicle_entries(populated_db):
+    inicio, fim = datetime(2025, 9, 1), datetime(2025, 9, 2)
+    cached_result('analise', 'ABC-1234', inicio, fim, lambda: {'success': True})
+    assert len(get_result_cache()) == 1
+
+    assert CSVProcessor().save_to_database(_telemetria('2025-09-10 00:05', 5), 'JANDAIA')
+    assert len(get_result_cache()) == 0
+
+
+def test_lru_with_disk_tier(tmp_path):
+    cache = ResultCache(max_entries=2, disk_dir=str(tmp_path / 'cache'))
+    chaves = [_key(i) for i in range(3)]
+    for i, chave in enumerate(chaves):
+        cache.put(chave, {'success': True, 'i': i})
+
+    assert len(cache) == 2
+    # Saiu da memória, volta do disco
+    assert cache.get(chaves[0]) == {'success': True, 'i': 0}
+    assert ResultCache(disk_dir=str(tmp_path / 'cache')).get(chaves[2]) == {'success': True, 'i': 2}
+
+    cache.invalidate(veiculo_ids=[chaves[0].veiculo_id])
+    assert cache.get(chaves[0]) is None
+    assert cache.get(chaves[1]) is not None
+
+    cache.invalidate(cliente_id=7)
+    assert cache.get(chaves[1]) is None and cache.get(chaves[2]) is None
+    assert ResultCache(disk_dir=str(tmp_path / 'cache')).get(chaves[2]) is None
+
+
+
+def test_memory_bounded_by_estimated_size():
+    cache = ResultCache(max_entries=100, max_bytes=100_000)
+    resultado = lambda i: {'success': True, 'charts': {'speed_chart': 'x' * 30_000}, 'i': i}
+    chaves = [_key(i) for i in range(4)]
+    for i, chave in enumerate(chaves):
+        cache.put(chave, resultado(i))
+
+    # Cabem três resultados de ~30 KB: o mais antigo sai
+    assert len(cache) == 3 and cache.size_bytes <= 100_000
+    assert cache.get(chaves[0]) is None and cache.get(chaves[3])['i'] == 3
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Maior que o limite: não fica em memória
+    cache.put(_key(9), {'success': True, 'html': 'x' * 200_000})
+    assert cache.get(_key(9)) is None and len(cache) == 3
+
+    cache.invalidate()
+    assert len(cache) == 0 and cache.size_bytes == 0
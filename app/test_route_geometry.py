@@ -0,0 +1,166 @@
+# Testes para a API de geometria da rota (app/route_geometry.py e GET /api/analise/{placa}/rota)
+# - Polilinha codificada no formato do Google (exemplo da especificação e ida e volta)
+# - Trechos contíguos por período operacional, ligados entre si; GeoJSON equivalente
+# - Páginas por janela de tempo cobrem o período sem repetir nem perder posições,
+#   com a mesma tolerância e ligadas entre si
+# - Sessões dos analisadores usados pela rota são fechadas a cada requisição
+
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from app import main
+from app.main import obter_rota
+from app.models import Cliente, PosicaoHistorica, Veiculo, get_session
+from app.periods import ANALYZER_CLASSIFIER
+from app.route_geometry import PERIOD_COLORS, encode_polyline, period_segments, route_geometry
+from app.services import TelemetryAnalyzer
+
+
+def _decode(texto: str):
+    """Decodificação de referência da polilinha (5 casas decimais)"""
+    valores, atual, deslocamento = [], 0, 0
+    for caractere in texto:
+        bloco = ord(caractere) - 63
+        atual |= (bloco & 0x1f) << deslocamento
+        deslocamento += 5
+        if bloco < 0x20:
+            valores.append(~(atual >> 1) if atual & 1 else atual >> 1)
+            atual, deslocamento = 0, 0
+    return (np.cumsum(np.array(valores).reshape(-1, 2), axis=0) / 1e5).tolist()
+
+
+def test_encode_polyline():
+    # Exemplo da documentação do Encoded Polyline Algorithm Format
+    assert encode_polyline([38.5, 40.7, 43.252], [-120.2, -120.95, -126.453]) == '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+
+    rng = np.random.default_rng(2)
+    lat = np.round(-15.78 + rng.normal(0, 0.5, 300), 5)
+    lon = np.round(-47.93 + rng.normal(0, 0.5, 300), 5)
+    assert np.allclose(_decode(encode_polyline(lat, lon)), np.column_stack([lat, lon]), atol=1e-9)
+    assert encode_polyline([], []) == ''
+
+
+def _df(n: int = 2000) -> pd.DataFrame:
+    rng = np.random.default_rng(8)
+    rumo = np.cumsum(rng.normal(0, 0.05, n))
+    df = pd.DataFrame({
+        'data_evento': pd.date_range('2025-09-05 03:00', periods=n, freq='1min'),
+        'latitude': -15.78 + np.cumsum(0.001 * np.sin(rumo)),
+        'longitude': -47.93 + np.cumsum(0.001 * np.cos(rumo)),
+        'velocidade_kmh': rng.integers(0, 100, n),
+    })
+    df['periodo_operacional'] = ANALYZER_CLASSIFIER.classify(df['data_evento'])
+    return df
+
+
+def test_segments_follow_operational_periods():
+    df = _df()
+    segmentos = period_segments(df, 1e-4)
+
+    # Um trecho por sequência contígua de período, na ordem, cobrindo todas as posições
+    periodos = df['periodo_operacional'].astype(str)
+    sequencias = periodos[periodos != periodos.shift()].tolist()
+    assert [s['periodo'] for s in segmentos] == sequencias
+    assert sum(s['pontos'] for s in segmentos) == len(df)
+    assert all(s['cor'] == PERIOD_COLORS.get(s['periodo'], 'gray') for s in segmentos)
+
+    # Trechos ligados: cada um termina no primeiro ponto do seguinte
+    for atual, seguinte in zip(segmentos[:-1], segmentos[1:]):
+        assert (atual['lat'][-1], atual['lon'][-1]) == (seguinte['lat'][0], seguinte['lon'][0])
+
+    polilinhas = route_geometry(df, 'polyline', 1000)
+    geojson = route_geometry(df, 'geojson', 1000)
+    assert polilinhas['pontos_originais'] == len(df)
+    assert polilinhas['pontos_simplificados'] == geojson['pontos_simplificados'] < len(df) / 4
+    assert geojson['type'] == 'FeatureCollection'
+    for segmento, feature in zip(polilinhas['segmentos'], geojson['features']):
+        coordenadas = [[lat, lon] for lon, lat in feature['geometry']['coordinates']]
+        assert np.allclose(_decode(segmento['polyline']), coordenadas)
+        assert feature['properties']['periodo'] == segmento['periodo']
+
+    # Última sequência com uma única posição: ponto em vez de linha
+    um_ponto = _df(3).assign(periodo_operacional=['final_semana', 'final_semana', 'operacional_manha'])
+    assert route_geometry(um_ponto, 'geojson', 1000)['features'][-1]['geometry']['type'] == 'Point'
+
+
+def _rota(data_inicio, data_fim, formato='polyline', janela_horas=24, tolerancia=None):
+    return asyncio.run(obter_rota('abc-1234', data_inicio, data_fim, formato=formato,
+                                  janela_horas=janela_horas, resolucao=8000, tolerancia=tolerancia))
+
+
+def test_route_pages_cover_period(temp_db):
+    inicio = datetime(2025, 9, 1)
+    # Uma posição a cada 10 minutos por 3 dias, inclusive exatamente nas fronteiras das páginas
+    datas = [inicio + timedelta(minutes=10 * i) for i in range(3 * 144 + 1)]
+    session = get_session()
+    try:
+        veiculo = Veiculo(placa='ABC-1234', ativo='A1', cliente=Cliente(nome='JANDAIA'))
+        session.add_all(PosicaoHistorica(veiculo=veiculo, data_evento=d, velocidade_kmh=i % 90,
+                                         latitude=-15.78 + i * 1e-3, longitude=-47.93 + (i % 7) * 1e-3)
+                        for i, d in enumerate(datas))
+        session.add(PosicaoHistorica(veiculo=veiculo, data_evento=inicio, velocidade_kmh=0))  # sem coordenadas
+        session.commit()
+    finally:
+        session.close()
+
+    paginas = [_rota(inicio.isoformat(), datas[-1].isoformat())]
+    while paginas[-1]['proxima_pagina']:
+        proxima = paginas[-1]['proxima_pagina']
+        paginas.append(_rota(**proxima))
+
+    assert len(paginas) == 3
+    assert [p['data_inicio'] for p in paginas] == [(inicio + timedelta(days=d)).isoformat() for d in range(3)]
+    # A última página inclui data_fim
+    assert sum(p['pontos_originais'] for p in paginas) == len(datas)
+    assert all(p['success'] and p['segmentos'] for p in paginas)
+    # Uma tolerância para o período inteiro, repassada em proxima_pagina
+    assert len({p['tolerancia'] for p in paginas}) == 1 and paginas[0]['tolerancia'] > 0
+    # Páginas ligadas: a última linha de cada uma termina no primeiro ponto da seguinte
+    for atual, seguinte in zip(paginas[:-1], paginas[1:]):
+        assert _decode(atual['segmentos'][-1]['polyline'])[-1] == _decode(seguinte['segmentos'][0]['polyline'])[0]
+
+    geojson = _rota(inicio.isoformat(), datas[-1].isoformat(), formato='geojson', janela_horas=6)
+    assert geojson['type'] == 'FeatureCollection' and geojson['pontos_originais'] == 36
+    assert geojson['proxima_pagina']['data_inicio'] == (inicio + timedelta(hours=6)).isoformat()
+
+    with pytest.raises(HTTPException) as erro:
+        _rota(inicio.isoformat(), datas[-1].isoformat(), formato='kml')
+    assert erro.value.status_code == 400
+
+
+def test_route_closes_analyzer_sessions(temp_db, monkeypatch):
+    inicio = datetime(2025, 10, 1)
+    session = get_session()
+    try:
+        veiculo = Veiculo(placa='ABC-1234', ativo='A1', cliente=Cliente(nome='JANDAIA'))
+        session.add_all(PosicaoHistorica(veiculo=veiculo, data_evento=inicio + timedelta(hours=i), velocidade_kmh=40,
+                                         latitude=-15.78 + i * 1e-3, longitude=-47.93)
+                        for i in range(48))
+        session.commit()
+    finally:
+        session.close()
+
+    abertas = set()
+
+    class AnalyzerRastreado(TelemetryAnalyzer):
+        def __init__(self):
+            super().__init__()
+            fechar = self.session.close
+            abertas.add(id(self))
+
+            def close():
+                abertas.discard(id(self))
+                fechar()
+            self.session.close = close
+
+    monkeypatch.setattr(main, 'TelemetryAnalyzer', AnalyzerRastreado)
+    # Sem tolerância: a extensão do período também abre um analisador
+    pagina = _rota(inicio.isoformat(), (inicio + timedelta(hours=47)).isoformat())
+
+    assert pagina['success'] and pagina['proxima_pagina']
+    assert not abertas
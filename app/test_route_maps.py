@@ -0,0 +1,117 @@
+# Testes para a simplificação de rotas e o agrupamento de marcadores dos mapas
+# - Douglas-Peucker: extremos mantidos, desvio dentro da tolerância, retas e trajetos de ida e volta
+# - Mapas sem um CircleMarker/popup por posição; popup carregado de /api/posicoes/{id}
+
+import asyncio
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from app.geo import route_tolerance, simplify_route
+from app.main import obter_posicao
+from app.models import Cliente, PosicaoHistorica, Veiculo, get_session
+from app.periods import ANALYZER_CLASSIFIER
+from app.services import TelemetryAnalyzer
+
+
+def _desvio_maximo(lat, lon, indices):
+    """Maior distância (graus) de um ponto descartado à polilinha simplificada, ponto a ponto"""
+    escala = np.cos(np.radians(np.mean(lat)))
+    x, y = np.asarray(lon) * escala, np.asarray(lat)
+    maior = 0.0
+    for a, b in zip(indices[:-1], indices[1:]):
+        dx, dy = x[b] - x[a], y[b] - y[a]
+        for j in range(a + 1, b):
+            t = 0.0 if dx == dy == 0 else min(max(((x[j] - x[a]) * dx + (y[j] - y[a]) * dy) / (dx * dx + dy * dy), 0), 1)
+            maior = max(maior, float(np.hypot(x[j] - x[a] - t * dx, y[j] - y[a] - t * dy)))
+    return maior
+
+
+def _trajeto(n: int, semente: int = 11):
+    """Trajeto suave (rumo variando aos poucos, ~100 a 200 m por posição) com ruído de GPS de ~2 m"""
+    rng = np.random.default_rng(semente)
+    rumo = np.cumsum(rng.normal(0, 0.05, n))
+    passo = 0.002 * rng.uniform(0.2, 1, n)
+    lat = -15.78 + np.cumsum(passo * np.sin(rumo)) + rng.normal(0, 2e-5, n)
+    lon = -47.93 + np.cumsum(passo * np.cos(rumo)) + rng.normal(0, 2e-5, n)
+    return lat, lon
+
+
+def test_simplify_route_within_tolerance():
+    lat, lon = _trajeto(5000)
+
+    tolerancia = route_tolerance(lat, lon, 500)
+    indices = simplify_route(lat, lon, tolerancia)
+    assert indices[0] == 0 and indices[-1] == len(lat) - 1
+    assert np.all(np.diff(indices) > 0)
+    assert len(indices) < len(lat) / 5
+    assert _desvio_maximo(lat, lon, indices) <= tolerancia
+
+    # Reta com pontos repetidos: só os extremos
+    reta = np.linspace(0, 0.1, 1000)
+    assert simplify_route(-15.78 + reta, -47.93 + reta, 1e-6).tolist() == [0, 999]
+    # Ida e volta ao ponto de partida: o retorno é mantido
+    ida_volta = np.concatenate([reta, reta[::-1]])
+    assert 999 in simplify_route(-15.78 + ida_volta, -47.93 + ida_volta, 1e-4)
+    # Tolerância zero ou rota curta: todos os pontos
+    assert len(simplify_route(lat[:50], lon[:50], 0)) == 50
+
+
+def _df_mapa(n: int = 3000) -> pd.DataFrame:
+    rng = np.random.default_rng(5)
+    lat, lon = _trajeto(n, 5)
+    df = pd.DataFrame({
+        'id': np.arange(1, n + 1),
+        'data_evento': pd.date_range('2025-09-01', periods=n, freq='30s'),
+        'latitude': lat,
+        'longitude': lon,
+        'velocidade_kmh': rng.integers(0, 110, n),
+        'ignicao': 'LM',
+        'endereco': 'Rua A, 123',
+    })
+    df['periodo_operacional'] = ANALYZER_CLASSIFIER.classify(df['data_evento'])
+    return df
+
+
+def test_maps_cluster_markers_and_lazy_popups():
+    analyzer = TelemetryAnalyzer()
+    df = _df_mapa()
+
+    detalhado = analyzer.create_detailed_route_map(df)
+    assert detalhado.count('L.circleMarker') == 1  # um único callback para todos os marcadores
+    assert 'markerClusterGroup' in detalhado and '/api/posicoes/' in detalhado
+    assert 'Rua A, 123' not in detalhado  # endereço só no popup carregado sob demanda
+
+    rota = analyzer.create_route_map(df)
+    assert 'markerClusterGroup' in rota
+    # Polilinha simplificada: bem menos vértices que posições
+    coords = json.loads(rota.split('L.polyline(\n', 1)[1].split(',\n', 1)[0])
+    assert 2 <= len(coords) < len(df) / 3
+
+
+def test_position_popup_endpoint(temp_db):
+    session = get_session()
+    try:
+        cliente = Cliente(nome='JANDAIA')
+        veiculo = Veiculo(placa='ABC-1234', ativo='A1', cliente=cliente)
+        posicao = PosicaoHistorica(veiculo=veiculo, data_evento=datetime(2025, 9, 1, 5, 30),
+                                   velocidade_kmh=72, ignicao='LM', endereco='Avenida ' + 'X' * 60)
+        session.add(posicao)
+        session.commit()
+        posicao_id = posicao.id
+    finally:
+        session.close()
+
+    dados = asyncio.run(obter_posicao(posicao_id))
+    assert dados['placa'] == 'ABC-1234' and dados['velocidade_kmh'] == 72
+    assert dados['data_hora'] == '01/09/2025 05:30'
+    assert dados['periodo_operacional'] == ANALYZER_CLASSIFIER.classify_one(datetime(2025, 9, 1, 5, 30))
+    assert len(dados['endereco']) == 53 and dados['endereco'].endswith('...')
+
+    with pytest.raises(HTTPException) as erro:
+        asyncio.run(obter_posicao(posicao_id + 1))
+    assert erro.value.status_code == 404
@@ -0,0 +1,157 @@
+# Testes para a leitura em blocos de CSVProcessor
+# - Detecção de encoding feita uma única vez a partir de uma amostra
+# - iter_csv_chunks entrega blocos de tamanho limitado com colunas normalizadas
+# - process_csv_streaming grava todas as linhas válidas em um banco temporário
+# - Relatórios de trajeto (várias seções) lidos em blocos com memória limitada
+# - Encoding errado na amostra: arquivo todo lido em latin-1, sem U+FFFD nem linhas repetidas
+# - Falha no meio da gravação em blocos informa o bloco e a linha (ingestão parcial)
+
+import tracemalloc
+
+import pytest
+
+from app.models import Veiculo, PosicaoHistorica, get_session
+from app.utils import CSVProcessor, PartialIngestError, detect_file_encoding
+
+
+def _write_csv(path, n: int, encoding: str = 'latin-1'):
+    """Grava um CSV no formato padrão de exportação (separador ';')."""
+    colunas = CSVProcessor().required_columns
+    linhas = [';'.join(colunas)]
+    for i in range(n):
+        valores = {
+            'Cliente': 'JANDAIA',
+            'Placa': 'ABC-1234' if i % 2 == 0 else 'XYZ-9876',
+            'Ativo': 'A1',
+            'Data': f"01/09/2025 08:{i // 60:02d}:{i % 60:02d}",
+            'Data (GPRS)': f"01/09/2025 08:{i // 60:02d}:{i % 60:02d}",
+            'Velocidade (Km)': str(i % 80),
+            'Ignição': 'LM',
+            'Motorista': 'João',
+            'GPS': '1',
+            'Gprs': '1',
+            'Localização': '"-15.78,-47.93"',
+            'Endereço': 'Rua São José',
+            'Tipo do Evento': 'Posição',
+            'Bloqueado': '0',
+        }
+        linhas.append(';'.join(valores.get(col, '') for col in colunas))
+    # Linha com data inválida deve ser descartada na limpeza
+    linhas.append(linhas[1].replace('01/09/2025 08:00:00', 'invalida', 1))
+    path.write_text('\n'.join(linhas) + '\n', encoding=encoding)
+    return path
+
+
+def test_detect_file_encoding(tmp_path):
+    assert detect_file_encoding(str(_write_csv(tmp_path / 'latin.csv', 3, 'latin-1'))) == 'latin-1'
+    assert detect_file_encoding(str(_write_csv(tmp_path / 'utf8.csv', 3, 'utf-8'))) == 'utf-8'
+
+
+def test_iter_csv_chunks_respects_chunksize(tmp_path):
+    path = _write_csv(tmp_path / 'dados.csv', 25)
+    processor = CSVProcessor()
+
+    chunks = list(processor.iter_csv_chunks(str(path), chunksize=10))
+
+    assert [len(c) for c in chunks] == [10, 10, 6]
+    assert 'Ignição' in chunks[0].columns
+    assert chunks[0]['Endereço'].iloc[0] == 'Rua São José'
+
+
+def test_process_csv_streaming_saves_all_valid_rows(tmp_path, temp_db):
+    path = _write_csv(tmp_path / 'dados.csv', 25)
+    processor = CSVProcessor()
+
+    stats = processor.process_csv_streaming(str(path), 'JANDAIA', chunksize=7)
+
+    assert stats['chunks'] == 4
+    assert stats['rows_read'] == 26
+    assert stats['rows_written'] == 25
+
+    session = get_session()
+    try:
+        assert session.query(Veiculo).count() == 2
+        assert session.query(PosicaoHistorica).count() == 25
+        assert session.query(PosicaoHistorica).filter(PosicaoHistorica.latitude.is_(None)).count() == 0
+    finally:
+        session.close()
+
+
+def _write_multi_section_csv(path, n: int):
+    """Relatório com seção de resumo seguida da seção de dados (mais larga)."""
+    colunas = [f'Campo {i}' for i in range(13)]
+    linhas = ['Placa;Período;Tempo total ligado;Km', 'ABC-1234;01/09/2025;10:00:00;120', '']
+    linhas.append(';'.join(colunas))
+    for i in range(n):
+        linhas.append(';'.join(str(i * 13 + j) for j in range(13)))
+        if i == 2:
+            linhas.append('Subtotal;;;')  # linha de outra seção no meio dos dados
+    path.write_text('\n'.join(linhas), encoding='utf-8')
+    return path
+
+
+def test_multi_section_csv_reads_only_data_section(tmp_path):
+    path = _write_multi_section_csv(tmp_path / 'trajeto.csv', 12)
+    processor = CSVProcessor()
+
+    df = processor.read_csv_file(str(path))
+    assert list(df.columns) == [f'Campo {i}' for i in range(13)]
+    assert len(df) == 12
+    assert df['Campo 0'].tolist() == [i * 13 for i in range(12)]
+
+    chunks = list(processor.iter_csv_chunks(str(path), chunksize=5))
+    assert [len(c) for c in chunks] == [5, 5, 2]
+
+
+def test_multi_section_chunks_use_bounded_memory(tmp_path):
+    path = _write_multi_section_csv(tmp_path / 'trajeto_grande.csv', 100_000)
+    tamanho = path.stat().st_size
+    processor = CSVProcessor()
+
+    tracemalloc.start()
+    try:
+        linhas = sum(len(chunk) for chunk in processor.iter_csv_chunks(str(path), chunksize=2000))
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert linhas == 100_000
+    # A seção de dados não é copiada para a memória: o pico acompanha o bloco, não o arquivo
+    assert pico < tamanho / 4
+
+
+def test_encoding_fallback_after_sample(tmp_path):
+    # Início só com ASCII (amostra "utf-8"), acentos em latin-1 bem depois dos 64 KB
+    linhas = ['Linha;Placa;Motorista;Endereco']
+    linhas += [f"{i};ABC-1234;{nome};Rua Sao Jose, {i}"
+               for i, nome in enumerate(['Joao'] * 4000 + ['Jo\xe3o'] * 1000)]
+    # Campos entre aspas com quebra de linha e linhas em branco: linhas físicas != registros
+    for i in range(0, 5000, 250):
+        linhas[i + 1] = f'{i};ABC-1234;Joao;"Rua Sao Jose,\n{i}"\n'.replace('Joao', 'Jo\xe3o' if i >= 4000 else 'Joao')
+    path = tmp_path / 'misto.csv'
+    path.write_bytes(('\n'.join(linhas) + '\n').encode('latin-1'))
+    assert detect_file_encoding(str(path)) == 'utf-8'
+
+    chunks = list(CSVProcessor().iter_csv_chunks(str(path), chunksize=500))
+    assert [n for c in chunks for n in c['Linha'].tolist()] == list(range(5000))
+    motoristas = [m for c in chunks for m in c['Motorista'].tolist()]
+    assert motoristas.count('Joao') == 4000 and motoristas.count('Jo\xe3o') == 1000
+
+
+def test_streaming_failure_reports_partial_ingest(tmp_path, temp_db, monkeypatch):
+    path = _write_csv(tmp_path / 'dados.csv', 30)
+    processor = CSVProcessor()
+    gravar = processor.save_to_database
+    chamadas = []
+
+    def falha_no_segundo_bloco(df, client_name=None):
+        chamadas.append(len(df))
+        return len(chamadas) < 2 and gravar(df, client_name)
+
+    monkeypatch.setattr(processor, 'save_to_database', falha_no_segundo_bloco)
+    with pytest.raises(PartialIngestError) as erro:
+        processor.process_csv_streaming(str(path), 'JANDAIA', chunksize=10)
+
+    assert erro.value.stats['rows_written'] == 10
+    assert erro.value.stats['failed_chunk'] == 2 and erro.value.stats['failed_row'] == 11
+    assert 'linha de dados 11' in str(erro.value)
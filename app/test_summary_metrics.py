@@ -0,0 +1,92 @@
+# Testes para o núcleo de métricas de TelemetryAnalyzer.generate_summary_metrics
+# - Contadores de período e de ignição (bincount) conferidos com filtros explícitos
+# - vehicle_info injetável: análises por grupo fazem uma única consulta ao banco
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import event
+
+from app.models import create_database_engine
+from app.periods import ANALYZER_CLASSIFIER
+from app.services import TelemetryAnalyzer
+from app.utils import CSVProcessor
+
+
+def _frame(n: int = 2000) -> pd.DataFrame:
+    rng = np.random.default_rng(4)
+    df = pd.DataFrame({
+        'data_evento': pd.date_range('2025-09-01', periods=n, freq='13min'),
+        'velocidade_kmh': rng.choice([0, 0, 30, 90], size=n),
+        'odometro_periodo_km': np.cumsum(rng.choice([0.0, 0.5], size=n)),
+        'ignicao': rng.choice(['L', 'LP', 'LM', 'D'], size=n),
+        'gps_status': rng.choice([True, False], size=n),
+        'gprs_status': [True] * n,
+        'tipo_evento': [''] * n,
+    })
+    df['periodo_operacional'] = ANALYZER_CLASSIFIER.classify(df['data_evento'])
+    df['em_movimento'] = df['ignicao'].isin(['LM'])
+    df['ligado'] = df['ignicao'].isin(['L', 'LP', 'LM'])
+    return df
+
+
+def test_summary_counters_match_explicit_filters():
+    df = _frame()
+    info = {'cliente': 'JANDAIA', 'consumo_medio_kmL': 10.0}
+    metrics = TelemetryAnalyzer().generate_summary_metrics(df, 'ABC-1234', vehicle_info=info)
+
+    periodos = metrics['periodos']
+    for label in ANALYZER_CLASSIFIER.labels:
+        assert periodos[label] == int((df['periodo_operacional'] == label).sum())
+    assert periodos['total_operacional'] == int(df['periodo_operacional'].astype(str).str.startswith('operacional').sum())
+    assert periodos['total_fora_horario'] == int(df['periodo_operacional'].astype(str).str.startswith('fora_horario').sum())
+
+    operacao = metrics['operacao']
+    assert operacao['tempo_total_ligado'] == int(df['ligado'].sum())
+    assert operacao['tempo_em_movimento'] == int(df['em_movimento'].sum())
+    assert operacao['tempo_parado_ligado'] == int((df['ligado'] & ~df['em_movimento']).sum())
+    assert operacao['tempo_desligado'] == int((~df['ligado']).sum())
+    assert metrics['veiculo']['cliente'] == 'JANDAIA'
+
+
+@pytest.fixture
+def populated_db(temp_db):
+    """Banco SQLite temporário com 30 dias de posições de um veículo."""
+    n = 30 * 48
+    df = pd.DataFrame({
+        'Cliente': ['JANDAIA'] * n,
+        'Placa': ['ABC-1234'] * n,
+        'Ativo': ['A1'] * n,
+        'Data': pd.date_range('2025-09-01', periods=n, freq='30min'),
+        'Velocidade (Km)': [40.0] * n,
+        'Ignição': ['LM'] * n,
+        'GPS': [True] * n,
+        'Gprs': [True] * n,
+        'Latitude': [-15.78] * n,
+        'Longitude': [-47.93] * n,
+        'Endereço': ['Rua A'] * n,
+        'Bloqueado': [False] * n,
+    })
+    assert CSVProcessor().save_to_database(df, 'JANDAIA')
+    yield
+
+
+def test_daily_analysis_looks_up_vehicle_once(populated_db):
+    analyzer = TelemetryAnalyzer()
+    df = analyzer.get_vehicle_data('ABC-1234', datetime(2025, 9, 1), datetime(2025, 10, 1))
+
+    consultas = []
+    engine = create_database_engine()
+    contador = lambda conn, cursor, statement, *args: consultas.append(statement)
+    event.listen(engine, 'before_cursor_execute', contador)
+    try:
+        resultado = analyzer.generate_daily_analysis(df, 'ABC-1234')
+    finally:
+        event.remove(engine, 'before_cursor_execute', contador)
+
+    assert resultado['total_days'] == 30
+    assert all(dia['veiculo']['cliente'] == 'JANDAIA' for dia in resultado['daily_metrics'])
+    consultas_veiculo = [sql for sql in consultas if 'FROM veiculos' in sql]
+    assert len(consultas_veiculo) == 1
@@ -0,0 +1,65 @@
+# Testes para a detecção de viagens por run-length encoding (CSVProcessor.detect_trips)
+# - Início no primeiro ponto em movimento, fim no primeiro ponto parado seguinte
+# - Filtros de duração mínima e deslocamento mínimo (> 100 m)
+# - Vários veículos de uma vez com group_col
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.utils import CSVProcessor
+
+
+def _frame(speeds, start='2025-09-01 08:00', freq='30s', placa=None):
+    n = len(speeds)
+    df = pd.DataFrame({
+        'timestamp': pd.date_range(start, periods=n, freq=freq),
+        'speed': speeds,
+        'lat': -15.78 + np.arange(n) * 0.001,  # ~111 m por ponto
+        'lon': [-47.93] * n,
+    })
+    if placa is not None:
+        df['placa'] = placa
+    return df
+
+
+def test_detect_trips_single_vehicle_metrics():
+    df = _frame([0, 10, 40, np.nan, 60, 0, 0, 20, 0])
+
+    trips = CSVProcessor().detect_trips(df)
+
+    # Segunda sequência em movimento dura só 30 s (< trip_min_duration_s)
+    assert len(trips) == 1
+    trip = trips[0]
+    assert trip['start_time'] == pd.Timestamp('2025-09-01 08:00:30')
+    assert trip['end_time'] == pd.Timestamp('2025-09-01 08:02:30')
+    assert trip['duration'] == 120.0
+    assert trip['distance_km'] == pytest.approx(0.4448, rel=1e-3)
+    assert trip['avg_speed_moving'] == pytest.approx((10 + 40 + 60) / 3)
+    assert trip['max_speed_trip'] == 60
+
+
+def test_detect_trips_prefers_odometer_and_drops_open_trip():
+    df = _frame([0, 30, 30, 30, 0, 50, 50, 50])
+    df['odometer'] = [100.0, 100.0, 100.5, 101.0, 101.2, 101.3, 101.8, 102.0]
+
+    trips = CSVProcessor().detect_trips(df)
+
+    # A última sequência não termina parada e é descartada
+    assert len(trips) == 1
+    assert trips[0]['distance_km'] == pytest.approx(1.2)
+
+
+def test_detect_trips_multiple_vehicles_with_group_col():
+    frota = pd.concat([
+        _frame([0, 30, 30, 30, 0], placa='ABC-1234'),
+        _frame([50, 50, 50, 0, 40, 40, 40, 0], placa='XYZ-9876'),
+    ]).sample(frac=1, random_state=1)
+
+    trips = CSVProcessor().detect_trips(frota, group_col='placa')
+
+    assert [t['placa'] for t in trips] == ['ABC-1234', 'XYZ-9876', 'XYZ-9876']
+    # Viagem de cada placa idêntica à detecção isolada
+    isolada = CSVProcessor().detect_trips(_frame([50, 50, 50, 0, 40, 40, 40, 0]))
+    assert [t['start_time'] for t in trips[1:]] == [t['start_time'] for t in isolada]
+    assert [t['distance_km'] for t in trips[1:]] == pytest.approx([t['distance_km'] for t in isolada])
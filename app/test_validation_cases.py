@@ -12,8 +12,8 @@ from typing import Dict, List, Any
 import tempfile
 import os
 
-from professional_reports import FleetReportProcessor
-from pdf_generator import gerar_relatorio_pdf_completo
+from app.professional_reports import FleetReportProcessor
+from app.pdf_generator import gerar_relatorio_pdf_completo
 
 logger = logging.getLogger(__name__)
 
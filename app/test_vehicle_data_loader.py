@@ -0,0 +1,70 @@
+# Testes para o carregamento projetado de TelemetryAnalyzer.get_vehicle_data
+# - Mesmo conteúdo do carregamento via ORM para as colunas padrão
+# - Lista opcional de colunas (data_evento sempre incluída)
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.models import PosicaoHistorica, Veiculo, get_session
+from app.services import TelemetryAnalyzer
+from app.utils import CSVProcessor
+
+
+@pytest.fixture
+def populated_db(temp_db):
+    """Banco SQLite temporário com posições de dois veículos."""
+    n = 12
+    df = pd.DataFrame({
+        'Cliente': ['JANDAIA'] * n,
+        'Placa': ['ABC-1234', 'XYZ-9876'] * (n // 2),
+        'Ativo': ['A1'] * n,
+        'Data': pd.date_range('2025-09-01 08:00', periods=n, freq='10min'),
+        'Velocidade (Km)': np.arange(n, dtype=float),
+        'Ignição': ['LM', 'D', 'LP'] * (n // 3),
+        'GPS': [True] * n,
+        'Gprs': [False, True] * (n // 2),
+        'Latitude': [-15.78] * n,
+        'Longitude': [-47.93] * n,
+        'Endereço': ['Rua A'] * n,
+        'Bloqueado': [False] * n,
+    })
+    assert CSVProcessor().save_to_database(df, 'JANDAIA')
+    yield
+
+
+def test_get_vehicle_data_matches_orm_rows(populated_db):
+    analyzer = TelemetryAnalyzer()
+    df = analyzer.get_vehicle_data('ABC-1234', datetime(2025, 9, 1), datetime(2025, 9, 2))
+
+    session = get_session()
+    try:
+        registros = session.query(PosicaoHistorica).join(Veiculo).filter(
+            Veiculo.placa == 'ABC-1234'
+        ).order_by(PosicaoHistorica.data_evento).all()
+    finally:
+        session.close()
+
+    assert len(df) == len(registros) == 6
+    assert list(df.columns[:len(TelemetryAnalyzer.VEHICLE_DATA_COLUMNS)]) == TelemetryAnalyzer.VEHICLE_DATA_COLUMNS
+    assert df['data_evento'].tolist() == [r.data_evento for r in registros]
+    assert df['velocidade_kmh'].tolist() == [r.velocidade_kmh for r in registros]
+    # Endereço fica fora do carregamento padrão (popups buscam em /api/posicoes/{id})
+    assert 'endereco' not in df.columns
+    assert df['em_movimento'].tolist() == [r.ignicao == 'LM' for r in registros]
+    assert pd.api.types.is_datetime64_any_dtype(df['data_evento'])
+
+
+def test_get_vehicle_data_with_column_subset(populated_db):
+    analyzer = TelemetryAnalyzer()
+    df = analyzer.get_vehicle_data('XYZ-9876', datetime(2025, 9, 1), datetime(2025, 9, 2),
+                                   columns=['velocidade_kmh', 'latitude'])
+
+    assert list(df.columns) == ['data_evento', 'velocidade_kmh', 'latitude', 'periodo_operacional']
+    assert len(df) == 6
+
+    # Coluna inexistente: erro tratado, DataFrame vazio
+    assert analyzer.get_vehicle_data('XYZ-9876', datetime(2025, 9, 1), datetime(2025, 9, 2),
+                                     columns=['nao_existe']).empty
@@ -5,12 +5,20 @@ Utilitários para leitura, limpeza e processamento de arquivos CSV de telemetria
 import pandas as pd
 import numpy as np
 from datetime import datetime, time
-from typing import Dict, List, Tuple, Optional, Any
+from typing import Callable, Dict, List, Tuple, Optional, Any, Iterator
+import codecs
+from contextlib import nullcontext
+import io
 import re
 import os
+import time as time_module
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from .models import Cliente, Veiculo, PosicaoHistorica, get_session
-from math import radians, sin, cos, asin, sqrt
+from .geo import consecutive_distances, detect_gps_jumps, haversine_km
+from .periods import PeriodClassifier, get_client_classifier, profile_windows
+from .rollups import refresh_rollups
+from .result_cache import invalidate_results
 
 def convert_numpy_types(obj: Any) -> Any:
     """
@@ -22,6 +30,8 @@ def convert_numpy_types(obj: Any) -> Any:
         return float(obj)
     elif isinstance(obj, np.ndarray):
         return obj.tolist()
+    elif isinstance(obj, (pd.Timestamp, datetime)):
+        return obj.isoformat()
     elif isinstance(obj, dict):
         return {key: convert_numpy_types(value) for key, value in obj.items()}
     elif isinstance(obj, list):
@@ -30,16 +40,104 @@ def convert_numpy_types(obj: Any) -> Any:
         return None
     return obj
 
-def haversine(lat1, lon1, lat2, lon2):
+# Encodings aceitos nos CSVs de telemetria, em ordem de preferência
+CSV_ENCODINGS = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
+
+def detect_file_encoding(file_path: str, sample_size: int = 64 * 1024,
+                         encodings: Optional[List[str]] = None) -> str:
+    """
+    Detecta o encoding do arquivo a partir de uma amostra dos primeiros bytes,
+    evitando reler o arquivo inteiro a cada tentativa
+    """
+    encodings = encodings or CSV_ENCODINGS
+    with open(file_path, 'rb') as file:
+        sample = file.read(sample_size)
+    
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    
+    for encoding in encodings:
+        try:
+            # final=False tolera um caractere multibyte cortado no fim da amostra
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except (UnicodeDecodeError, LookupError):
+            continue
+    
+    # latin-1 decodifica qualquer sequência de bytes
+    return 'latin-1'
+
+def confirm_file_encoding(file_path: str, encoding: str, block_size: int = 64 * 1024) -> str:
     """
-    Calcula a distância entre dois pontos usando a fórmula de Haversine
+    Confirma que o arquivo inteiro decodifica no encoding detectado pela amostra,
+    lendo-o em blocos de bytes (sem parsear); caso contrário retorna latin-1
     """
-    R = 6371.0  # raio da Terra em km
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    a = sin(dlat/2)**2 + cos(radians(lat1))*cos(radians(lat2))*sin(dlon/2)**2
-    c = 2 * asin(sqrt(a))
-    return R * c  # distância em km
+    decoder = codecs.getincrementaldecoder(encoding)()
+    try:
+        with open(file_path, 'rb') as file:
+            for bloco in iter(lambda: file.read(block_size), b''):
+                decoder.decode(bloco)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return 'latin-1'
+    return encoding
+
+class PartialIngestError(Exception):
+    """
+    Falha no meio de uma ingestão em blocos: os blocos anteriores continuam gravados
+    (cada um em sua transação). `stats` traz os registros gravados e o bloco e a
+    linha de dados (failed_chunk, failed_row) em que a ingestão parou.
+    """
+    
+    def __init__(self, mensagem: str, stats: Dict):
+        super().__init__(mensagem)
+        self.stats = stats
+
+class _LineFilterReader:
+    """
+    Arquivo de texto somente leitura com as linhas selecionadas de outro arquivo,
+    lidas sob demanda: o pandas consome a seção sem que ela seja copiada para a memória
+    """
+    
+    def __init__(self, file_path: str, encoding: str, keep: Callable[[int, str], bool]):
+        self._file = open(file_path, 'r', encoding=encoding)
+        self._lines = (line if line.endswith('\n') else line + '\n'
+                       for i, line in enumerate(self._file) if keep(i, line))
+        self._buffer = ''
+    
+    def read(self, size: int = -1) -> str:
+        if size is None or size < 0:
+            dados, self._buffer = self._buffer + ''.join(self._lines), ''
+            return dados
+        partes, total = [self._buffer], len(self._buffer)
+        while total < size:
+            linha = next(self._lines, None)
+            if linha is None:
+                break
+            partes.append(linha)
+            total += len(linha)
+        dados = ''.join(partes)
+        self._buffer = dados[size:]
+        return dados[:size]
+    
+    def readline(self) -> str:
+        if self._buffer:
+            fim = self._buffer.find('\n') + 1 or len(self._buffer)
+            linha, self._buffer = self._buffer[:fim], self._buffer[fim:]
+            return linha
+        return next(self._lines, '')
+    
+    def __iter__(self):
+        return iter(self.readline, '')
+    
+    def close(self) -> None:
+        self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
 
 class CSVProcessor:
     """Classe para processar arquivos CSV de telemetria veicular"""
@@ -67,7 +165,16 @@ class CSVProcessor:
         self.trip_speed_threshold = 3  # km/h
         self.trip_min_duration_s = 60  # segundos
         self.gps_jump_distance_km = 500  # km
+        self.gps_jump_max_implied_speed_kmh = None  # km/h (None = apenas a regra de 500 km/1 h)
         self.aggregation_rule_days_for_summary = 7  # dias
+        self.db_chunk_size = 5000  # linhas por lote de inserção
+        self.csv_chunk_size = 100000  # linhas por bloco na leitura em streaming
+        
+        # Estatísticas da última gravação (linhas, segundos, linhas/s)
+        self.last_save_stats = {}
+        
+        # Trava opcional em torno da gravação (ingestão de vários arquivos em paralelo)
+        self.write_lock = None
     
     def detect_schema(self, df: pd.DataFrame) -> Dict:
         """
@@ -255,18 +362,8 @@ class CSVProcessor:
         if 'lat' not in df.columns or 'lon' not in df.columns:
             return pd.Series([0] * len(df))
         
-        distances = [0]  # Primeiro ponto tem distância 0
-        for i in range(1, len(df)):
-            lat1, lon1 = df.iloc[i-1]['lat'], df.iloc[i-1]['lon']
-            lat2, lon2 = df.iloc[i]['lat'], df.iloc[i]['lon']
-            
-            if pd.notna(lat1) and pd.notna(lon1) and pd.notna(lat2) and pd.notna(lon2):
-                dist = haversine(lat1, lon1, lat2, lon2)
-                distances.append(dist)
-            else:
-                distances.append(0)
-        
-        return pd.Series(distances)
+        # Primeiro ponto e pares sem coordenada têm distância 0
+        return pd.Series(consecutive_distances(df['lat'], df['lon']))
     
     def _calculate_instant_speed(self, df: pd.DataFrame) -> pd.Series:
         """
@@ -337,23 +434,15 @@ class CSVProcessor:
             quality_report['duplicates_removed'] += duplicates.sum()
             df_clean = df_clean[~duplicates]
         
-        # 3. deslocamento entre pontos > 500 km em Δt pequeno → possível salto GPS
+        # 3. deslocamento entre pontos > 500 km em Δt pequeno (ou velocidade implícita
+        #    acima do limite configurado) → possível salto GPS
         if 'lat' in df_clean.columns and 'lon' in df_clean.columns and 'timestamp' in df_clean.columns:
-            df_clean['gps_jump'] = False
-            for i in range(1, len(df_clean)):
-                lat1, lon1 = df_clean.iloc[i-1]['lat'], df_clean.iloc[i-1]['lon']
-                lat2, lon2 = df_clean.iloc[i]['lat'], df_clean.iloc[i]['lon']
-                timestamp1 = df_clean.iloc[i-1]['timestamp']
-                timestamp2 = df_clean.iloc[i]['timestamp']
-                
-                if all(pd.notna([lat1, lon1, lat2, lon2, timestamp1, timestamp2])):
-                    distance = haversine(lat1, lon1, lat2, lon2)
-                    delta_t_hours = (timestamp2 - timestamp1).total_seconds() / 3600
-                    
-                    # Se distância > 500km e delta_t < 1 hora, marca como salto GPS
-                    if distance > self.gps_jump_distance_km and delta_t_hours < 1:
-                        df_clean.loc[df_clean.index[i], 'gps_jump'] = True
-                        quality_report['gps_jumps_marked'] += 1
+            df_clean['gps_jump'] = detect_gps_jumps(
+                df_clean['lat'], df_clean['lon'], df_clean['timestamp'],
+                max_distance_km=self.gps_jump_distance_km,
+                max_implied_speed_kmh=self.gps_jump_max_implied_speed_kmh
+            )
+            quality_report['gps_jumps_marked'] += int(df_clean['gps_jump'].sum())
         
         # 4. velocidade calculada > 220 km/h → marcar como outlier
         if 'speed' in df_clean.columns:
@@ -406,14 +495,9 @@ class CSVProcessor:
         
         # Se odometer não disponível ou não plausível, calcular via haversine
         if 'lat' in df.columns and 'lon' in df.columns and len(df) > 1:
-            total_km_haversine = 0
             valid_points = df[['lat', 'lon']].dropna()
-            for i in range(1, len(valid_points)):
-                lat1, lon1 = valid_points.iloc[i-1]['lat'], valid_points.iloc[i-1]['lon']
-                lat2, lon2 = valid_points.iloc[i]['lat'], valid_points.iloc[i]['lon']
-                if all(pd.notna([lat1, lon1, lat2, lon2])):
-                    total_km_haversine += haversine(lat1, lon1, lat2, lon2)
-            metrics['total_km_haversine'] = total_km_haversine
+            total_km_haversine = consecutive_distances(valid_points['lat'], valid_points['lon']).sum()
+            metrics['total_km_haversine'] = float(total_km_haversine)
         else:
             metrics['total_km_haversine'] = 0
         
@@ -448,21 +532,17 @@ class CSVProcessor:
         if metrics.get('max_speed_raw', 0) == 0:
             # Calcular velocidades instantâneas
             instant_speeds = []
-            for i in range(1, len(df)):
-                if 'timestamp' in df.columns and 'lat' in df.columns and 'lon' in df.columns:
-                    timestamp1 = pd.to_datetime(df.iloc[i-1]['timestamp'])
-                    timestamp2 = pd.to_datetime(df.iloc[i]['timestamp'])
-                    lat1, lon1 = df.iloc[i-1]['lat'], df.iloc[i-1]['lon']
-                    lat2, lon2 = df.iloc[i]['lat'], df.iloc[i]['lon']
-                    
-                    if all(pd.notna([timestamp1, timestamp2, lat1, lon1, lat2, lon2])):
-                        distance = haversine(lat1, lon1, lat2, lon2)
-                        delta_t_hours = (timestamp2 - timestamp1).total_seconds() / 3600
-                        if delta_t_hours > 0:
-                            speed = distance / delta_t_hours
-                            instant_speeds.append(speed)
+            if 'timestamp' in df.columns and 'lat' in df.columns and 'lon' in df.columns and len(df) > 1:
+                lat = df['lat'].to_numpy(dtype=float)
+                lon = df['lon'].to_numpy(dtype=float)
+                timestamps = pd.to_datetime(df['timestamp'])
+                distance = haversine_km(lat[:-1], lon[:-1], lat[1:], lon[1:])
+                delta_t_hours = timestamps.diff().dt.total_seconds().to_numpy()[1:] / 3600
+                
+                valid = ~np.isnan(distance) & ~np.isnan(delta_t_hours) & (delta_t_hours > 0)
+                instant_speeds = distance[valid] / delta_t_hours[valid]
             
-            if instant_speeds:
+            if len(instant_speeds) > 0:
                 # Usar o percentil 95 (ou 99) de inst_speed como max_speed_estimada
                 metrics['max_speed_instant_95'] = np.percentile(instant_speeds, 95)
                 metrics['max_speed_instant_99'] = np.percentile(instant_speeds, 99)
@@ -493,129 +573,116 @@ class CSVProcessor:
         
         return metrics
     
-    def detect_trips(self, df: pd.DataFrame) -> List[Dict]:
+    def detect_trips(self, df: pd.DataFrame, group_col: Optional[str] = None) -> List[Dict]:
         """
-        Detecta viagens (trips) e calcula métricas por viagem
+        Detecta viagens (trips) e calcula métricas por viagem.
+        
+        Uma viagem começa no primeiro ponto com speed > trip_speed_threshold e termina no
+        primeiro ponto parado seguinte. As sequências em movimento/parado são obtidas por
+        run-length encoding e as métricas por reduções agrupadas, sem laço por linha.
+        Com `group_col` (ex.: placa) processa vários veículos de uma vez; cada viagem
+        recebe a chave do seu grupo.
         """
         trips = []
-        if len(df) < 2:
+        if len(df) < 2 or 'speed' not in df.columns or 'timestamp' not in df.columns:
             return trips
         
-        # Converter timestamps
-        if 'timestamp' in df.columns:
-            df = df.copy()
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df = df.sort_values('timestamp').reset_index(drop=True)
+        df = df.copy()
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        sort_cols = ([group_col] if group_col else []) + ['timestamp']
+        df = df.sort_values(sort_cols, kind='stable').reset_index(drop=True)
         
-        # Detectar início e fim de viagens
-        in_trip = False
-        trip_start_idx = None
+        groups = df[group_col] if group_col else pd.Series(0, index=df.index)
+        speed = pd.to_numeric(df['speed'], errors='coerce')
         
-        for i in range(len(df)):
-            speed = df.iloc[i]['speed'] if 'speed' in df.columns else 0
-            timestamp = df.iloc[i]['timestamp'] if 'timestamp' in df.columns else None
-            
-            if not in_trip and speed > self.trip_speed_threshold:
-                # Potencial início de viagem
-                in_trip = True
-                trip_start_idx = i
-            elif in_trip and speed <= self.trip_speed_threshold:
-                # Potencial fim de viagem
-                if trip_start_idx is not None and i > trip_start_idx:
-                    # Verificar duração mínima
-                    start_time = df.iloc[trip_start_idx]['timestamp']
-                    end_time = df.iloc[i]['timestamp']
-
-                    duration = (end_time - start_time).total_seconds()
-                    
-                    if duration >= self.trip_min_duration_s:
-                        # Calcular distância da viagem
-                        odo_delta = None
-                        hav_cum = None
-                        # 1) Calcular delta de odômetro, quando disponível e plausível
-                        if 'odometer' in df.columns:
-                            odo_start = df.iloc[trip_start_idx].get('odometer')
-                            odo_end = df.iloc[i].get('odometer')
-                            if pd.notna(odo_start) and pd.notna(odo_end):
-                                delta = float(odo_end) - float(odo_start)
-                                if delta >= 0:
-                                    odo_delta = delta
-                        # 2) Calcular haversine cumulativo
-                        if 'lat' in df.columns and 'lon' in df.columns:
-                            cumulative = 0.0
-                            for j in range(trip_start_idx + 1, i + 1):
-                                lat1 = df.iloc[j-1]['lat']
-                                lon1 = df.iloc[j-1]['lon']
-                                lat2 = df.iloc[j]['lat']
-                                lon2 = df.iloc[j]['lon']
-                                if all(pd.notna([lat1, lon1, lat2, lon2])):
-                                    cumulative += haversine(lat1, lon1, lat2, lon2)
-                            hav_cum = cumulative
-                        # 3) Escolher fonte
-                        if odo_delta is not None and odo_delta >= 0:
-                            distance_km = odo_delta
-                            distance_source = 'odometer'
-                        elif hav_cum is not None:
-                            distance_km = hav_cum
-                            distance_source = 'haversine'
-                        else:
-                            distance_km = 0.0
-                            distance_source = 'unknown'
-                        # Aplicar threshold mínimo de deslocamento (> 100m)
-                        if distance_km * 1000 > 100:
-                            # Criar trip
-                            trip = {
-                                'start_time': start_time,
-                                'end_time': end_time,
-                                'duration': duration,
-                                'distance_km': distance_km,
-                                'avg_speed_moving': self._calculate_avg_moving_speed(df, trip_start_idx, i),
-                                'max_speed_trip': self._calculate_max_speed_trip(df, trip_start_idx, i)
-                            }
-                            trips.append(trip)
-                
-                in_trip = False
-                trip_start_idx = None
+        # Estado por ponto: 1 = em movimento, 0 = parado; velocidade ausente mantém o estado anterior
+        state = pd.Series(np.where(speed > self.trip_speed_threshold, 1.0,
+                                   np.where(speed <= self.trip_speed_threshold, 0.0, np.nan)))
+        state = state.groupby(groups).ffill().fillna(0).to_numpy()
+        previous = pd.Series(state).groupby(groups).shift(1).fillna(0).to_numpy()
+        
+        starts = np.flatnonzero((state == 1) & (previous == 0))
+        ends = np.flatnonzero((state == 0) & (previous == 1))
+        if len(ends) == 0:
+            return trips
+        
+        # Cada fim pertence à sequência iniciada imediatamente antes (viagens abertas no fim são descartadas)
+        run_id = np.cumsum((state == 1) & (previous == 0))
+        trip_starts = starts[run_id[ends] - 1]
+        trip_ends = ends
+        
+        timestamps = df['timestamp']
+        durations = (timestamps.iloc[trip_ends].to_numpy() - timestamps.iloc[trip_starts].to_numpy()) / np.timedelta64(1, 's')
+        
+        # Distância: delta de odômetro quando plausível, senão haversine acumulado
+        distance_km = np.zeros(len(trip_ends))
+        if 'lat' in df.columns and 'lon' in df.columns:
+            cumulative_km = np.cumsum(consecutive_distances(df['lat'], df['lon'], groups=groups))
+            distance_km = cumulative_km[trip_ends] - cumulative_km[trip_starts]
+        if 'odometer' in df.columns:
+            odometer = pd.to_numeric(df['odometer'], errors='coerce').to_numpy(dtype=float)
+            odo_delta = odometer[trip_ends] - odometer[trip_starts]
+            use_odometer = ~np.isnan(odo_delta) & (odo_delta >= 0)
+            distance_km = np.where(use_odometer, odo_delta, distance_km)
+        
+        # Reduções por viagem sobre os pontos [início, fim]
+        membership = np.zeros(len(df) + 1, dtype=int)
+        np.add.at(membership, trip_starts, 1)
+        np.add.at(membership, trip_ends + 1, -1)
+        in_trip = np.cumsum(membership[:-1]) > 0
+        trip_label = np.cumsum(np.isin(np.arange(len(df)), trip_starts)) - 1
+        
+        trip_points = pd.DataFrame({
+            'trip': trip_label[in_trip],
+            'speed': speed.to_numpy()[in_trip],
+        })
+        moving = trip_points['speed'].where(trip_points['speed'] > self.trip_speed_threshold)
+        per_trip = pd.DataFrame({
+            'max_speed': trip_points.groupby('trip')['speed'].max(),
+            'avg_moving': moving.groupby(trip_points['trip']).mean(),
+        }).reindex(range(len(trip_starts))).fillna(0)
+        
+        valid = (durations >= self.trip_min_duration_s) & (distance_km * 1000 > 100)
+        for k in np.flatnonzero(valid):
+            trip = {
+                'start_time': timestamps.iloc[trip_starts[k]],
+                'end_time': timestamps.iloc[trip_ends[k]],
+                'duration': float(durations[k]),
+                'distance_km': float(distance_km[k]),
+                'avg_speed_moving': float(per_trip['avg_moving'].iloc[k]),
+                'max_speed_trip': float(per_trip['max_speed'].iloc[k])
+            }
+            if group_col:
+                trip[group_col] = groups.iloc[trip_starts[k]]
+            trips.append(trip)
         
         return trips
     
-    def _calculate_avg_moving_speed(self, df: pd.DataFrame, start_idx: int, end_idx: int) -> float:
-        """Calcula velocidade média apenas em pontos com speed > 3"""
-        speeds = []
-        for i in range(start_idx, end_idx + 1):
-            speed = df.iloc[i]['speed'] if 'speed' in df.columns else 0
-            if speed > self.trip_speed_threshold:
-                speeds.append(speed)
-        return np.mean(speeds) if speeds else 0
-    
-    def _calculate_max_speed_trip(self, df: pd.DataFrame, start_idx: int, end_idx: int) -> float:
-        """Calcula velocidade máxima na viagem"""
-        speeds = []
-        for i in range(start_idx, end_idx + 1):
-            speed = df.iloc[i]['speed'] if 'speed' in df.columns else 0
-            speeds.append(speed)
-        return max(speeds) if speeds else 0
-    
     def read_csv_file(self, file_path: str) -> pd.DataFrame:
         """
         Lê arquivo CSV e retorna DataFrame limpo e padronizado
         Lida com arquivos que têm múltiplas seções com estruturas diferentes
         """
         try:
-            # Primeiro, tenta ler o arquivo normalmente
-            encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
+            # Detecta o encoding uma única vez a partir de uma amostra
+            encoding = detect_file_encoding(file_path)
             df = None
             
-            for encoding in encodings:
+            try:
+                df = pd.read_csv(file_path, sep=';', encoding=encoding)
+            except UnicodeDecodeError:
+                # Amostra não representativa: recorre ao latin-1, que aceita qualquer byte
+                encoding = 'latin-1'
                 try:
                     df = pd.read_csv(file_path, sep=';', encoding=encoding)
-                    break
-                except (UnicodeDecodeError, pd.errors.ParserError):
-                    continue
+                except pd.errors.ParserError:
+                    df = None
+            except pd.errors.ParserError:
+                df = None
             
             # Se falhou com erro de parser, tenta estratégia de múltiplas seções
             if df is None:
-                df = self._read_multi_section_csv(file_path, encodings)
+                df = self._read_multi_section_csv(file_path, [encoding])
             
             if df is None:
                 raise ValueError(f"Não foi possível ler o arquivo {file_path} com nenhum encoding")
@@ -633,55 +700,146 @@ class CSVProcessor:
         except Exception as e:
             raise Exception(f"Erro ao ler arquivo CSV {file_path}: {str(e)}")
     
+    def iter_csv_chunks(self, file_path: str, chunksize: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        Lê o CSV em blocos de até `chunksize` linhas, mantendo o uso de memória
+        limitado ao tamanho do bloco em vez do tamanho do arquivo
+        """
+        chunksize = chunksize or self.csv_chunk_size
+        encoding = detect_file_encoding(file_path)
+        if encoding != 'latin-1':
+            # A amostra pode não representar o arquivo (ex.: início ASCII, acentos em
+            # latin-1 adiante): confirma antes de entregar o primeiro bloco
+            confirmado = confirm_file_encoding(file_path, encoding)
+            if confirmado != encoding:
+                print(f"Aviso: {file_path} não é {encoding} além da amostra; lendo em {confirmado}")
+                encoding = confirmado
+        
+        if self._looks_multi_section(file_path, encoding):
+            # Relatórios de trajeto: apenas a seção de dados vai para o parser
+            section = self._extract_data_section(file_path, encoding)
+            if section is None:
+                raise ValueError(f"Não foi possível ler o arquivo {file_path}")
+            with section, pd.read_csv(section, sep=';', chunksize=chunksize) as reader:
+                for chunk in reader:
+                    chunk.columns = chunk.columns.str.strip()
+                    yield chunk
+            return
+        
+        with pd.read_csv(file_path, sep=';', encoding=encoding, chunksize=chunksize) as reader:
+            for chunk in reader:
+                chunk.columns = chunk.columns.str.strip()
+                yield chunk
+    
+    def _looks_multi_section(self, file_path: str, encoding: str, sample_lines: int = 50) -> bool:
+        """
+        Verifica nas primeiras linhas se o arquivo tem seções com estruturas diferentes
+        (cabeçalho com menos campos que as linhas de dados)
+        """
+        with open(file_path, 'r', encoding=encoding, errors='replace') as file:
+            field_counts = []
+            for line in file:
+                if line.strip():
+                    field_counts.append(len(line.split(';')))
+                if len(field_counts) >= sample_lines:
+                    break
+        
+        if not field_counts:
+            return False
+        return max(field_counts) > 11 and field_counts[0] < max(field_counts)
+    
+    def process_csv_streaming(self, file_path: str, client_name: str = None,
+                              chunksize: Optional[int] = None,
+                              on_progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Lê, limpa e grava o CSV bloco a bloco, sem materializar o arquivo inteiro.
+        Cada bloco é gravado em sua própria transação; on_progress(stats) é chamado
+        após cada bloco lido e após cada bloco gravado. Uma falha depois de algum
+        bloco gravado levanta PartialIngestError, com o bloco e a linha em que a
+        ingestão parou.
+        """
+        stats = {'chunks': 0, 'rows_read': 0, 'rows_written': 0}
+        inicio = time_module.perf_counter()
+        chunks = self.iter_csv_chunks(file_path, chunksize)
+        
+        while True:
+            offset = stats['rows_read']
+            try:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                stats['chunks'] += 1
+                stats['rows_read'] += len(chunk)
+                if on_progress:
+                    on_progress(stats)
+                
+                chunk_clean = self.clean_and_parse_data(chunk)
+                if chunk_clean is None or chunk_clean.empty:
+                    continue
+                
+                if not self.save_to_database(chunk_clean, client_name):
+                    raise Exception("falha na gravação no banco de dados")
+                stats['rows_written'] += self.last_save_stats.get('rows', 0)
+                if on_progress:
+                    on_progress(stats)
+            except Exception as e:
+                if not stats['rows_written']:
+                    raise
+                stats['failed_chunk'] = stats['chunks'] if offset < stats['rows_read'] else stats['chunks'] + 1
+                stats['failed_row'] = offset + 1
+                raise PartialIngestError(
+                    f"Falha no bloco {stats['failed_chunk']} (a partir da linha de dados {stats['failed_row']}) "
+                    f"de {file_path}: {e}. {stats['rows_written']} registros dos blocos anteriores já estão gravados",
+                    stats
+                ) from e
+        
+        elapsed = time_module.perf_counter() - inicio
+        stats['seconds'] = round(elapsed, 3)
+        stats['rows_per_s'] = round(stats['rows_written'] / elapsed, 1) if elapsed > 0 else float(stats['rows_written'])
+        print(f"Streaming: {stats['rows_written']} registros em {stats['chunks']} blocos ({stats['seconds']}s)")
+        return stats
+    
     def _read_multi_section_csv(self, file_path: str, encodings: List[str]) -> pd.DataFrame:
         """
         Lê arquivos CSV com múltiplas seções (como relatórios de trajeto)
         """
         for encoding in encodings:
             try:
-                # Lê o arquivo linha por linha para identificar seções
-                with open(file_path, 'r', encoding=encoding) as file:
-                    lines = file.readlines()
-                
-                # Identifica onde começam os dados detalhados
-                # Procura pela linha que tem mais campos (seção de dados)
-                max_fields = 0
-                data_start_line = 0
-                
-                for i, line in enumerate(lines):
-                    field_count = len(line.split(';'))
-                    if field_count > max_fields:
-                        max_fields = field_count
-                        data_start_line = i
-                
-                # Se encontrou uma seção com mais campos, usa apenas essa seção
-                if data_start_line > 0 and max_fields > 11:
-                    # Cria um arquivo temporário apenas com a seção de dados
-                    import tempfile
-                    with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False, encoding=encoding) as temp_file:
-                        # Escreve o cabeçalho da seção de dados
-                        temp_file.write(lines[data_start_line])
-                        # Escreve os dados
-                        for line in lines[data_start_line + 1:]:
-                            if line.strip() and len(line.split(';')) == max_fields:
-                                temp_file.write(line)
-                        
-                        temp_path = temp_file.name
-                    
-                    try:
-                        # Lê o arquivo temporário
-                        df = pd.read_csv(temp_path, sep=';', encoding=encoding)
-                        os.unlink(temp_path)  # Remove arquivo temporário
-                        return df
-                    except Exception:
-                        os.unlink(temp_path)  # Remove arquivo temporário em caso de erro
-                        continue
-                
+                section = self._extract_data_section(file_path, encoding)
+                if section is not None:
+                    with section:
+                        return pd.read_csv(section, sep=';')
             except Exception:
                 continue
         
         return None
     
+    def _extract_data_section(self, file_path: str, encoding: str) -> Optional[_LineFilterReader]:
+        """
+        Seção com mais campos (cabeçalho + linhas com o mesmo número de campos), em
+        duas passadas: a primeira só localiza o cabeçalho e conta os campos; a segunda
+        é um leitor que entrega as linhas da seção sob demanda. A memória não cresce
+        com o tamanho do arquivo.
+        """
+        max_fields = 0
+        data_start_line = 0
+        
+        with open(file_path, 'r', encoding=encoding) as file:
+            for i, line in enumerate(file):
+                field_count = line.count(';') + 1
+                if field_count > max_fields:
+                    max_fields = field_count
+                    data_start_line = i
+        
+        # Só trata como multi-seção se os dados não começam na primeira linha
+        if data_start_line == 0 or max_fields <= 11:
+            return None
+        
+        return _LineFilterReader(
+            file_path, encoding,
+            lambda i, line: i >= data_start_line and line.count(';') + 1 == max_fields and bool(line.strip())
+        )
+    
     def clean_and_parse_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Limpa e padroniza os dados do DataFrame
@@ -725,6 +883,24 @@ class CSVProcessor:
             df_clean['GPS'] = df_clean['GPS'].astype(str).map({'1': True, '0': False}).fillna(True)
         if 'Gprs' in df_clean.columns:
             df_clean['Gprs'] = df_clean['Gprs'].astype(str).map({'1': True, '0': False}).fillna(True)
+        
+        # Limpa dados de bateria
+        if 'Bateria' in df_clean.columns:
+            df_clean['Bateria_Pct'] = df_clean['Bateria'].astype(str).str.extract(r'(\d+)', expand=False).astype(float)
+        
+        # Limpa tensão
+        if 'Tensão' in df_clean.columns:
+            df_clean['Tensao_V'] = pd.to_numeric(df_clean['Tensão'], errors='coerce')
+        
+        # Converte bloqueado para booleano
+        if 'Bloqueado' in df_clean.columns:
+            df_clean['Bloqueado'] = df_clean['Bloqueado'].astype(str).map({'1': True, '0': False}).fillna(False)
+        
+        # Remove linhas com data inválida
+        if 'Data' in df_clean.columns:
+            df_clean = df_clean.dropna(subset=['Data'])
+        
+        return df_clean
     
     def _clean_trajeto_percorrido_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -851,22 +1027,6 @@ class CSVProcessor:
             return 0.0
         except (ValueError, AttributeError):
             return 0.0
-        
-        # Limpa dados de bateria
-        if 'Bateria' in df_clean.columns:
-            df_clean['Bateria_Pct'] = df_clean['Bateria'].str.extract(r'(\d+)').astype(float)
-        
-        # Limpa tensão
-        if 'Tensão' in df_clean.columns:
-            df_clean['Tensao_V'] = pd.to_numeric(df_clean['Tensão'], errors='coerce')
-        
-        # Converte bloqueado para booleano
-        df_clean['Bloqueado'] = df_clean['Bloqueado'].astype(str).map({'1': True, '0': False}).fillna(False)
-        
-        # Remove linhas com data inválida
-        df_clean = df_clean.dropna(subset=['Data'])
-        
-        return df_clean
     
     def load_perfis_cliente(self, cliente_id: int) -> Dict:
         """Carrega perfis de horário personalizados do cliente"""
@@ -901,55 +1061,28 @@ class CSVProcessor:
             print(f"Erro ao carregar perfis do cliente {cliente_id}: {e}")
             return {}
 
-    def classify_operational_period(self, timestamp: datetime, cliente_id: Optional[int] = None) -> str:
+    def get_period_classifier(self, cliente_id: Optional[int] = None) -> PeriodClassifier:
         """
-        Classifica um timestamp em período operacional usando perfis personalizados do cliente
+        Retorna o classificador compilado (tabela por minuto da semana) dos perfis do
+        cliente; sem cliente ou sem perfis, usa os períodos operacionais padrão.
+        O classificador de cada cliente fica em cache até os perfis serem alterados.
         """
-        if timestamp.weekday() >= 5:  # Sábado=5, Domingo=6
-            return 'final_semana'
-        
-        current_time = timestamp.time()
-        
-        # Tenta usar perfis personalizados do cliente
-        if cliente_id:
-            perfis_cliente = self.load_perfis_cliente(cliente_id)
+        def _build() -> PeriodClassifier:
+            perfis_cliente = self.load_perfis_cliente(cliente_id) if cliente_id else {}
             if perfis_cliente:
-                # Verifica períodos operacionais personalizados
-                for nome_perfil, config in perfis_cliente.items():
-                    if config['tipo'] == 'operacional':
-                        inicio = config['inicio']
-                        fim = config['fim']
-                        
-                        # Trata horário que cruza meia-noite (ex: 19:00 - 04:00)
-                        if inicio <= fim:
-                            if inicio <= current_time <= fim:
-                                return nome_perfil
-                        else:
-                            if current_time >= inicio or current_time <= fim:
-                                return nome_perfil
-                
-                # Se não encontrou período operacional, verifica outros tipos
-                for nome_perfil, config in perfis_cliente.items():
-                    if config['tipo'] in ['fora_horario', 'especial']:
-                        inicio = config['inicio']
-                        fim = config['fim']
-                        
-                        if inicio <= fim:
-                            if inicio <= current_time <= fim:
-                                return nome_perfil
-                        else:
-                            if current_time >= inicio or current_time <= fim:
-                                return nome_perfil
-                
-                # Se não encontrou nenhum período, é fora do horário
-                return 'fora_horario'
-        
-        # Fallback para períodos padrão se não houver perfis personalizados
-        for periodo, (inicio, fim) in self.periodos_operacionais.items():
-            if inicio <= current_time <= fim:
-                return periodo
+                return PeriodClassifier(profile_windows(perfis_cliente), default_label='fora_horario')
+            padrao = [(periodo, inicio, fim) for periodo, (inicio, fim) in self.periodos_operacionais.items()]
+            return PeriodClassifier(padrao, default_label='fora_horario')
         
-        return 'fora_horario'
+        if not cliente_id:
+            return _build()
+        return get_client_classifier(cliente_id, _build)
+    
+    def classify_operational_period(self, timestamp: datetime, cliente_id: Optional[int] = None) -> str:
+        """
+        Classifica um timestamp em período operacional usando perfis personalizados do cliente
+        """
+        return self.get_period_classifier(cliente_id).classify_one(timestamp)
     
     def calculate_metrics(self, df: pd.DataFrame) -> Dict:
         """
@@ -994,7 +1127,7 @@ class CSVProcessor:
             except Exception as e:
                 print(f"Erro ao buscar cliente_id: {e}")
         
-        df['periodo_operacional'] = df['Data'].apply(lambda x: self.classify_operational_period(x, cliente_id))
+        df['periodo_operacional'] = self.get_period_classifier(cliente_id).classify(df['Data'])
         periodo_stats = df['periodo_operacional'].value_counts()
         
         metrics['registros_manha'] = int(periodo_stats.get('manha', 0))
@@ -1016,77 +1149,150 @@ class CSVProcessor:
     
     def save_to_database(self, df: pd.DataFrame, client_name: str = None) -> bool:
         """
-        Salva dados do DataFrame no banco de dados
+        Salva dados do DataFrame no banco de dados em lote.
+
+        Resolve todas as placas em uma única consulta, cria os veículos
+        ausentes de uma vez e grava as posições em lotes (executemany) a
+        partir das colunas do DataFrame. Os resumos horário e diário das
+        horas tocadas são recalculados na mesma transação. As estatísticas de
+        vazão ficam em ``self.last_save_stats``.
         """
-        session = get_session()
-        
-        try:
-            # Busca ou cria cliente
-            if client_name:
-                cliente = session.query(Cliente).filter_by(nome=client_name).first()
-            else:
-                cliente = session.query(Cliente).filter_by(nome=df['Cliente'].iloc[0]).first()
-            
-            if not cliente:
-                cliente = Cliente(
-                    nome=client_name or df['Cliente'].iloc[0],
-                    consumo_medio_kmL=12.0,
-                    limite_velocidade=80
-                )
-                session.add(cliente)
-                session.commit()
+        with self.write_lock or nullcontext():
+            session = get_session()
+            inicio = time_module.perf_counter()
             
-            # Processa cada linha do DataFrame
-            for _, row in df.iterrows():
-                # Busca ou cria veículo
-                veiculo = session.query(Veiculo).filter_by(placa=row['Placa']).first()
-                if not veiculo:
-                    veiculo = Veiculo(
-                        placa=row['Placa'],
-                        ativo=row['Ativo'],
-                        cliente_id=cliente.id
+            try:
+                # Busca ou cria cliente
+                if client_name:
+                    cliente = session.query(Cliente).filter_by(nome=client_name).first()
+                else:
+                    cliente = session.query(Cliente).filter_by(nome=df['Cliente'].iloc[0]).first()
+                
+                if not cliente:
+                    cliente = Cliente(
+                        nome=client_name or df['Cliente'].iloc[0],
+                        consumo_medio_kmL=12.0,
+                        limite_velocidade=80
                     )
-                    session.add(veiculo)
+                    session.add(cliente)
                     session.commit()
                 
-                # Cria registro de posição
-                posicao = PosicaoHistorica(
-                    veiculo_id=veiculo.id,
-                    data_evento=row['Data'],
-                    data_gprs=row.get('Data (GPRS)'),
-                    velocidade_kmh=int(row['Velocidade (Km)']),
-                    ignicao=row['Ignição'],
-                    motorista=row.get('Motorista', ''),
-                    gps_status=row['GPS'],
-                    gprs_status=row['Gprs'],
-                    latitude=row.get('Latitude'),
-                    longitude=row.get('Longitude'),
-                    endereco=row.get('Endereço', ''),
-                    tipo_evento=row.get('Tipo do Evento', ''),
-                    saida=row.get('Saida', ''),
-                    entrada=row.get('Entrada', ''),
-                    pacote=row.get('Pacote', ''),
-                    odometro_periodo_km=row.get('Odometro_Periodo_Km', 0),
-                    odometro_embarcado_km=row.get('Odometro_Embarcado_Km', 0),
-                    horimetro_periodo=row.get('Horímetro do período', ''),
-                    horimetro_embarcado=row.get('Horímetro embarcado', ''),
-                    bateria_pct=row.get('Bateria_Pct'),
-                    tensao_v=row.get('Tensao_V'),
-                    bloqueado=row['Bloqueado'],
-                    imagem=row.get('Imagem', '')
-                )
+                # Resolve (e cria) todos os veículos do arquivo de uma só vez
+                veiculo_ids = self._resolve_vehicle_ids(session, df, cliente.id)
                 
-                session.add(posicao)
-            
-            session.commit()
-            return True
-            
-        except Exception as e:
-            session.rollback()
-            print(f"Erro ao salvar no banco: {str(e)}")
-            return False
-        finally:
-            session.close()
+                # Monta as colunas da tabela de posições e grava em lotes
+                posicoes = self._build_position_columns(df, veiculo_ids)
+                total_gravado = self._bulk_insert_positions(session, posicoes)
+                
+                # Reagrega só as horas (e dias) tocados pelo lote, na mesma transação
+                refresh_rollups(session, posicoes['veiculo_id'], posicoes['data_evento'])
+                
+                session.commit()
+                invalidate_results(veiculo_ids=veiculo_ids.values())
+                
+                elapsed = time_module.perf_counter() - inicio
+                self.last_save_stats = {
+                    'rows': total_gravado,
+                    'seconds': elapsed,
+                    'rows_per_s': total_gravado / elapsed if elapsed > 0 else float(total_gravado)
+                }
+                print(f"Gravados {total_gravado} registros em {elapsed:.2f}s "
+                      f"({self.last_save_stats['rows_per_s']:,.0f} linhas/s)")
+                return True
+                
+            except Exception as e:
+                session.rollback()
+                print(f"Erro ao salvar no banco: {str(e)}")
+                return False
+            finally:
+                session.close()
+    
+    def _resolve_vehicle_ids(self, session: Session, df: pd.DataFrame, cliente_id: int) -> Dict[Any, int]:
+        """
+        Retorna o mapa placa -> veiculo_id, criando em lote os veículos ausentes
+        """
+        primeiros = df.drop_duplicates(subset=['Placa'])
+        placas = primeiros['Placa'].tolist()
+        
+        def _buscar_ids(lista_placas: List) -> Dict[Any, int]:
+            encontrados = {}
+            # Lotes para respeitar o limite de parâmetros do SQLite
+            for start in range(0, len(lista_placas), 500):
+                lote = lista_placas[start:start + 500]
+                for placa, veiculo_id in session.query(Veiculo.placa, Veiculo.id).filter(Veiculo.placa.in_(lote)):
+                    encontrados[placa] = veiculo_id
+            return encontrados
+        
+        veiculo_ids = _buscar_ids(placas)
+        
+        novos = [
+            {'placa': placa, 'ativo': ativo, 'cliente_id': cliente_id}
+            for placa, ativo in zip(primeiros['Placa'], primeiros['Ativo'])
+            if placa not in veiculo_ids
+        ]
+        if novos:
+            session.execute(insert(Veiculo), novos)
+            veiculo_ids.update(_buscar_ids([v['placa'] for v in novos]))
+        
+        return veiculo_ids
+    
+    def _build_position_columns(self, df: pd.DataFrame, veiculo_ids: Dict[Any, int]) -> pd.DataFrame:
+        """
+        Converte o DataFrame limpo nas colunas da tabela posicoes_historicas
+        """
+        def _col(nome: str, padrao: Any = None) -> pd.Series:
+            if nome in df.columns:
+                return df[nome]
+            return pd.Series(padrao, index=df.index, dtype=object)
+        
+        posicoes = pd.DataFrame({
+            'veiculo_id': df['Placa'].map(veiculo_ids),
+            'data_evento': df['Data'],
+            'data_gprs': _col('Data (GPRS)'),
+            'velocidade_kmh': pd.to_numeric(df['Velocidade (Km)'], errors='coerce').fillna(0).astype('int64'),
+            'ignicao': df['Ignição'],
+            'motorista': _col('Motorista', ''),
+            'gps_status': df['GPS'],
+            'gprs_status': df['Gprs'],
+            'latitude': _col('Latitude'),
+            'longitude': _col('Longitude'),
+            'endereco': _col('Endereço', ''),
+            'tipo_evento': _col('Tipo do Evento', ''),
+            'saida': _col('Saida', ''),
+            'entrada': _col('Entrada', ''),
+            'pacote': _col('Pacote', ''),
+            'odometro_periodo_km': _col('Odometro_Periodo_Km', 0),
+            'odometro_embarcado_km': _col('Odometro_Embarcado_Km', 0),
+            'horimetro_periodo': _col('Horímetro do período', ''),
+            'horimetro_embarcado': _col('Horímetro embarcado', ''),
+            'bateria_pct': _col('Bateria_Pct'),
+            'tensao_v': _col('Tensao_V'),
+            'bloqueado': df['Bloqueado'],
+            'imagem': _col('Imagem', '')
+        })
+        
+        if posicoes['veiculo_id'].isna().any():
+            raise ValueError("Não foi possível resolver o veículo de todas as linhas")
+        
+        return posicoes
+    
+    def _bulk_insert_positions(self, session: Session, posicoes: pd.DataFrame) -> int:
+        """
+        Grava as posições em lotes de ``self.db_chunk_size`` via executemany
+        """
+        if posicoes.empty:
+            return 0
+        
+        chunk_size = max(1, int(self.db_chunk_size))
+        total = 0
+        for start in range(0, len(posicoes), chunk_size):
+            bloco = posicoes.iloc[start:start + chunk_size]
+            # NaN/NaT -> None para o driver, só no bloco da vez
+            registros = bloco.astype(object).where(bloco.notna(), None).to_dict('records')
+            session.execute(insert(PosicaoHistorica), registros)
+            total += len(registros)
+        
+        return total
 
 def process_csv_files(directory_path: str) -> Dict:
     """
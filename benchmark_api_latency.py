@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latência da API: GET /api/clientes enquanto análises completas
+(GET /api/analise/{placa}) rodam ao mesmo tempo.
+
+Uso:
+    python benchmark_api_latency.py [analises] [consultas]
+
+Compara o caminho atual (handlers em threads limitadas, app/concurrency.py) com
+a execução direta no event loop, como os handlers `async def` faziam antes.
+As requisições são entregues direto à aplicação ASGI, em um banco SQLite
+temporário; o resultado é a latência p50/p99 das consultas leves.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add the project directory to the path
+sys.path.append('.')
+
+
+async def asgi_get(app, path: str, query: str = '') -> int:
+    """Executa um GET na aplicação ASGI e retorna o status HTTP"""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+        'root_path': '', 'headers': [(b'host', b'benchmark')], 'client': ('127.0.0.1', 0),
+        'server': ('benchmark', 80),
+    }
+    status = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+async def scenario(app, placas, analises: int, consultas: int):
+    """Dispara as análises e, em paralelo, uma consulta leve a cada 20 ms"""
+    latencias = []
+
+    async def analise(i: int):
+        # Janelas diferentes: nenhuma análise vem do cache de resultados
+        placa = placas[i % len(placas)]
+        return await asgi_get(app, f'/api/analise/{placa}',
+                              f'data_inicio=2025-09-01&data_fim=2025-09-{10 + i:02d}')
+
+    async def consulta(agendada: float):
+        # Latência medida desde o instante agendado: inclui a espera pelo event loop
+        assert await asgi_get(app, '/api/clientes') == 200
+        latencias.append(time.perf_counter() - agendada)
+
+    async def consultas_periodicas():
+        tarefas = []
+        for i in range(consultas):
+            agendada = inicio + i * 0.02
+            await asyncio.sleep(max(0.0, agendada - time.perf_counter()))
+            tarefas.append(asyncio.create_task(consulta(agendada)))
+        await asyncio.gather(*tarefas)
+
+    inicio = time.perf_counter()
+    status = await asyncio.gather(*(analise(i) for i in range(analises)), consultas_periodicas())
+    total = time.perf_counter() - inicio
+    assert all(s == 200 for s in status[:-1]), status
+    return np.array(latencias) * 1000, total
+
+
+def main():
+    analises = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    consultas = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'benchmark.db')}"
+
+    from benchmark_ingestion import build_frame
+    from app.models import create_tables
+    from app.utils import CSVProcessor
+    from app.result_cache import invalidate_results
+    import app.concurrency as concurrency
+    from app.main import app
+
+    create_tables()
+    placas_n = 2
+    CSVProcessor().save_to_database(build_frame(40000, placas_n), 'BENCHMARK')
+    placas = [f"BEN-{i:04d}" for i in range(placas_n)]
+
+    async def inline(func, *args, heavy=False, **kwargs):
+        # Como antes: o trabalho roda direto no event loop
+        return func(*args, **kwargs)
+
+    print(f"{analises} análises simultâneas + {consultas} GET /api/clientes (1 a cada 20 ms)")
+    atual = concurrency.run_blocking
+    for nome, executor in (('event loop (antes)', inline), ('threads limitadas', atual)):
+        concurrency.run_blocking = executor
+        invalidate_results()
+        latencias, total = asyncio.run(scenario(app, placas, analises, consultas))
+        print(f"  {nome:<20} /api/clientes p50 {np.percentile(latencias, 50):8.1f} ms  "
+              f"p99 {np.percentile(latencias, 99):8.1f} ms   total {total:.2f}s")
+    concurrency.run_blocking = atual
+
+
+if __name__ == "__main__":
+    main()
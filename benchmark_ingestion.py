@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark da gravação de posições no banco: caminho legado (ORM linha a linha)
+versus gravação em lote de CSVProcessor.save_to_database.
+
+Uso:
+    python benchmark_ingestion.py [linhas] [placas]
+
+Cada caminho roda em um banco SQLite temporário próprio; o resultado é
+reportado em linhas/s.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Add the project directory to the path
+sys.path.append('.')
+
+
+def build_frame(rows: int, plates: int) -> pd.DataFrame:
+    """Gera um DataFrame sintético no formato de clean_and_parse_data"""
+    rng = np.random.default_rng(42)
+    placas = [f"BEN-{i:04d}" for i in range(plates)]
+    datas = pd.date_range('2025-09-01', periods=rows, freq='30s')
+    return pd.DataFrame({
+        'Cliente': 'BENCHMARK',
+        'Placa': [placas[i % plates] for i in range(rows)],
+        'Ativo': 'BENCH',
+        'Data': datas,
+        'Data (GPRS)': datas,
+        'Velocidade (Km)': rng.integers(0, 110, rows).astype(float),
+        'Ignição': rng.choice(['D', 'LP', 'LM'], rows),
+        'Motorista': '',
+        'GPS': True,
+        'Gprs': True,
+        'Latitude': -15.78 + rng.normal(0, 0.01, rows),
+        'Longitude': -47.93 + rng.normal(0, 0.01, rows),
+        'Endereço': 'Rua Benchmark, 100',
+        'Tipo do Evento': 'Posição',
+        'Odometro_Periodo_Km': np.cumsum(rng.random(rows)),
+        'Odometro_Embarcado_Km': np.cumsum(rng.random(rows)),
+        'Bloqueado': False,
+    })
+
+
+def legacy_save(df: pd.DataFrame, client_name: str) -> None:
+    """Reproduz o caminho anterior: lookup de veículo e objeto ORM por linha"""
+    from app.models import Cliente, Veiculo, PosicaoHistorica, get_session
+
+    session = get_session()
+    try:
+        cliente = session.query(Cliente).filter_by(nome=client_name).first()
+        if not cliente:
+            cliente = Cliente(nome=client_name, consumo_medio_kmL=12.0, limite_velocidade=80)
+            session.add(cliente)
+            session.commit()
+
+        for _, row in df.iterrows():
+            veiculo = session.query(Veiculo).filter_by(placa=row['Placa']).first()
+            if not veiculo:
+                veiculo = Veiculo(placa=row['Placa'], ativo=row['Ativo'], cliente_id=cliente.id)
+                session.add(veiculo)
+                session.commit()
+
+            session.add(PosicaoHistorica(
+                veiculo_id=veiculo.id,
+                data_evento=row['Data'],
+                data_gprs=row.get('Data (GPRS)'),
+                velocidade_kmh=int(row['Velocidade (Km)']),
+                ignicao=row['Ignição'],
+                motorista=row.get('Motorista', ''),
+                gps_status=row['GPS'],
+                gprs_status=row['Gprs'],
+                latitude=row.get('Latitude'),
+                longitude=row.get('Longitude'),
+                endereco=row.get('Endereço', ''),
+                tipo_evento=row.get('Tipo do Evento', ''),
+                odometro_periodo_km=row.get('Odometro_Periodo_Km', 0),
+                odometro_embarcado_km=row.get('Odometro_Embarcado_Km', 0),
+                bloqueado=row['Bloqueado'],
+            ))
+        session.commit()
+    finally:
+        session.close()
+
+
+def run(label: str, func, df: pd.DataFrame) -> float:
+    """Executa uma estratégia em um banco temporário e retorna linhas/s"""
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        from app.models import create_tables
+        create_tables()
+
+        start = time.perf_counter()
+        func(df)
+        elapsed = time.perf_counter() - start
+
+    rows_per_s = len(df) / elapsed if elapsed > 0 else float(len(df))
+    print(f"{label:<28} {len(df):>9} linhas  {elapsed:8.2f}s  {rows_per_s:>12,.0f} linhas/s")
+    return rows_per_s
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    plates = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    from app.utils import CSVProcessor
+
+    print("📊 Benchmark de ingestão de posições")
+    print("=" * 70)
+    df = build_frame(rows, plates)
+
+    legacy = run("Legado (ORM por linha)", lambda d: legacy_save(d, 'BENCHMARK'), df)
+    bulk = run("Lote (executemany)", lambda d: CSVProcessor().save_to_database(d, 'BENCHMARK'), df)
+
+    print("-" * 70)
+    print(f"Ganho: {bulk / legacy:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -470,39 +470,39 @@ class TelemetriaApp {
                 }
             });
             
-            const data = response.data;
+            // A ingestão roda em segundo plano: acompanha o lote mostrando o andamento por arquivo
+            const lote = await this.waitForUpload(response.data.status_url, (estado) => {
+                resultDiv.innerHTML = this.renderUploadProgress(estado);
+            });
             
-            if (data.success) {
-                let html = '<div class="alert alert-success">Arquivos processados com sucesso!</div>';
-                
-                Object.entries(data.results).forEach(([filename, result]) => {
-                    if (result.success) {
-                        html += `
-                            <div class="border rounded p-2 mb-2">
-                                <strong>${filename}</strong>
-                                <br><small>Registros: ${result.records_processed}</small>
-                            </div>
-                        `;
-                    } else {
-                        html += `
-                            <div class="border border-danger rounded p-2 mb-2">
-                                <strong>${filename}</strong>
-                                <br><small class="text-danger">Erro: ${result.error}</small>
-                            </div>
-                        `;
-                    }
-                });
-                
-                resultDiv.innerHTML = html;
-                
-                // Reset form and reload data
-                form.reset();
-                await this.loadDashboard();
-                await this.loadVeiculos();
-                
-            } else {
-                throw new Error(data.message || 'Erro no processamento');
-            }
+            let html = lote.com_erro
+                ? `<div class="alert alert-warning">${lote.concluidos} de ${lote.total_arquivos} arquivo(s) processado(s)</div>`
+                : '<div class="alert alert-success">Arquivos processados com sucesso!</div>';
+            
+            lote.arquivos.forEach((arquivo) => {
+                if (arquivo.status === 'concluido') {
+                    html += `
+                        <div class="border rounded p-2 mb-2">
+                            <strong>${arquivo.arquivo}</strong>
+                            <br><small>Registros: ${arquivo.resultado.records_processed}</small>
+                        </div>
+                    `;
+                } else {
+                    html += `
+                        <div class="border border-danger rounded p-2 mb-2">
+                            <strong>${arquivo.arquivo}</strong>
+                            <br><small class="text-danger">Erro: ${arquivo.erro}</small>
+                        </div>
+                    `;
+                }
+            });
+            
+            resultDiv.innerHTML = html;
+            
+            // Reset form and reload data
+            form.reset();
+            await this.loadDashboard();
+            await this.loadVeiculos();
             
         } catch (error) {
             resultDiv.innerHTML = `<div class="alert alert-danger">Erro: ${error.message}</div>`;
@@ -520,7 +520,10 @@ class TelemetriaApp {
         
         try {
             const response = await axios.post(`/api/relatorio/${formData.get('placa')}`, formData);
-            const data = response.data;
+            // A geração roda em segundo plano: acompanha a tarefa até concluir
+            const data = await this.waitForJob(response.data.status_url, (job) => {
+                this.setLoadingMessage(`${job.etapa} (${job.progresso}%)`);
+            });
             
             if (data.success) {
                 this.showSuccess(`Relatório gerado com sucesso! Tamanho: ${data.file_size_mb} MB`);
@@ -542,6 +545,56 @@ class TelemetriaApp {
         }
     }
     
+    // Consulta o lote de upload até concluir, repassando cada estado a onProgress
+    async waitForUpload(statusUrl, onProgress, intervalMs = 1000) {
+        while (true) {
+            const lote = (await axios.get(statusUrl)).data;
+            onProgress(lote);
+            if (lote.status === 'concluido') {
+                return lote;
+            }
+            await new Promise(resolve => setTimeout(resolve, intervalMs));
+        }
+    }
+    
+    // Andamento de um lote de upload: uma barra por arquivo com registros lidos/gravados
+    renderUploadProgress(lote) {
+        let html = `<div class="mb-2"><small>${lote.concluidos + lote.com_erro} de ${lote.total_arquivos} arquivo(s) - ${lote.registros_gravados} registro(s) gravado(s)</small></div>`;
+        lote.arquivos.forEach((arquivo) => {
+            const cor = arquivo.status === 'erro' ? 'bg-danger' : (arquivo.status === 'concluido' ? 'bg-success' : '');
+            html += `
+                <div class="mb-2">
+                    <small><strong>${arquivo.arquivo}</strong> - ${arquivo.etapa} (${arquivo.registros_lidos} lidos, ${arquivo.registros_gravados} gravados)</small>
+                    <div class="progress" style="height: 6px;">
+                        <div class="progress-bar ${cor}" style="width: ${arquivo.progresso}%"></div>
+                    </div>
+                </div>
+            `;
+        });
+        return html;
+    }
+    
+    // Consulta a tarefa de geração até concluir (ou esgotar timeoutMs); retorna o resultado
+    async waitForJob(statusUrl, onProgress = null, intervalMs = 1000, timeoutMs = 10 * 60 * 1000) {
+        const limite = Date.now() + timeoutMs;
+        while (true) {
+            const job = (await axios.get(statusUrl)).data;
+            if (job.status === 'concluido') {
+                return job.resultado;
+            }
+            if (job.status === 'erro') {
+                throw new Error(job.erro || 'Erro na geração');
+            }
+            if (onProgress) {
+                onProgress(job);
+            }
+            if (Date.now() >= limite) {
+                throw new Error(`Tempo esgotado aguardando a geração (${job.etapa}, ${job.progresso}%)`);
+            }
+            await new Promise(resolve => setTimeout(resolve, intervalMs));
+        }
+    }
+    
     // Handle análise
     async handleAnalise() {
         const form = document.getElementById('analise-form');
@@ -559,7 +612,9 @@ class TelemetriaApp {
             const response = await axios.get(`/api/analise/${placa}`, {
                 params: {
                     data_inicio: dataInicio + 'T00:00:00',
-                    data_fim: dataFim + 'T23:59:59'
+                    data_fim: dataFim + 'T23:59:59',
+                    graficos: 'json',
+                    mapa: false
                 }
             });
             
@@ -567,6 +622,7 @@ class TelemetriaApp {
             
             if (data.success) {
                 this.renderAnalysisResults(data, resultDiv);
+                this.renderRouteMap('analise-route-map', placa, dataInicio + 'T00:00:00', dataFim + 'T23:59:59');
             } else {
                 throw new Error(data.message || 'Erro na análise');
             }
@@ -630,17 +686,102 @@ class TelemetriaApp {
             });
         }
         
-        // Charts
+        // Charts (figuras Plotly em JSON; o plotly.js é carregado uma vez pela página)
         if (data.charts) {
             if (data.charts.speed_chart) {
-                html += '<div class="chart-container">' + data.charts.speed_chart + '</div>';
+                html += '<div class="chart-container" id="analise-speed-chart"></div>';
             }
             if (data.charts.route_map) {
                 html += '<div class="chart-container">' + data.charts.route_map + '</div>';
+            } else {
+                html += '<div class="chart-container"><div class="route-map" id="analise-route-map"></div>'
+                    + '<div class="small text-muted mt-2" id="analise-route-map-status"></div></div>';
             }
         }
         
         container.innerHTML = html;
+        
+        if (data.charts && data.charts.speed_chart) {
+            this.renderPlotlyChart('analise-speed-chart', data.charts.speed_chart);
+        }
+    }
+    
+    // Mapa da rota (Leaflet): trechos por período operacional vindos de /api/analise/{placa}/rota,
+    // página a página, todos no mesmo mapa
+    async renderRouteMap(elementId, placa, dataInicio, dataFim) {
+        const element = document.getElementById(elementId);
+        const status = document.getElementById(elementId + '-status');
+        if (!window.L || !element) return;
+        
+        const map = L.map(element);
+        L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+            maxZoom: 19,
+            attribution: '&copy; OpenStreetMap'
+        }).addTo(map);
+        const bounds = L.latLngBounds([]);
+        let pagina = { data_inicio: dataInicio, data_fim: dataFim };
+        let pontos = 0, simplificados = 0;
+        
+        try {
+            while (pagina) {
+                const response = await axios.get(`/api/analise/${placa}/rota`, {
+                    // proxima_pagina traz a tolerância da primeira página: mesma simplificação em todas
+                    params: { ...pagina, formato: 'polyline' }
+                });
+                const data = response.data;
+                data.segmentos.forEach(segmento => {
+                    const linha = L.polyline(this.decodePolyline(segmento.polyline), {
+                        color: segmento.cor, weight: 4, opacity: 0.8
+                    }).bindPopup(`Período: ${segmento.periodo}<br>Posições: ${segmento.pontos}<br>`
+                        + `Vel. máxima: ${segmento.velocidade_max} km/h`).addTo(map);
+                    bounds.extend(linha.getBounds());
+                });
+                pontos += data.pontos_originais;
+                simplificados += data.pontos_simplificados;
+                if (status) {
+                    status.textContent = `${pontos} posições (${simplificados} pontos no mapa)`;
+                }
+                // Reenquadra a cada página, conforme a rota cresce
+                if (bounds.isValid()) {
+                    map.fitBounds(bounds);
+                }
+                pagina = data.proxima_pagina;
+            }
+            if (!bounds.isValid()) {
+                map.setView([-15.78, -47.93], 4);
+                if (status) status.textContent = 'Dados de localização não disponíveis para gerar mapa.';
+            }
+        } catch (error) {
+            if (status) status.textContent = `Erro ao carregar a rota: ${error.message}`;
+        }
+    }
+    
+    // Decodifica uma polilinha codificada (algoritmo do Google, 5 casas decimais) em [lat, lon]
+    decodePolyline(texto) {
+        const coordenadas = [];
+        let indice = 0, lat = 0, lon = 0;
+        const proximo = () => {
+            let resultado = 0, deslocamento = 0, byte;
+            do {
+                byte = texto.charCodeAt(indice++) - 63;
+                resultado |= (byte & 0x1f) << deslocamento;
+                deslocamento += 5;
+            } while (byte >= 0x20);
+            return (resultado & 1) ? ~(resultado >> 1) : (resultado >> 1);
+        };
+        while (indice < texto.length) {
+            lat += proximo();
+            lon += proximo();
+            coordenadas.push([lat / 1e5, lon / 1e5]);
+        }
+        return coordenadas;
+    }
+    
+    // Desenha uma figura Plotly (data/layout) no elemento indicado
+    renderPlotlyChart(elementId, figure) {
+        if (window.Plotly && figure) {
+            Plotly.newPlot(elementId, figure.data, figure.layout, { responsive: true });
+        }
     }
     
     // Carregar lista de relatórios
@@ -710,12 +851,21 @@ class TelemetriaApp {
     // Utility methods
     showLoading(show) {
         if (show) {
+            this.setLoadingMessage('Processando...');
             this.loadingModal.show();
         } else {
             this.loadingModal.hide();
         }
     }
     
+    // Texto exibido no modal de carregamento (ex.: etapa da tarefa em andamento)
+    setLoadingMessage(texto) {
+        const mensagem = document.querySelector('#loadingModal .modal-body p');
+        if (mensagem) {
+            mensagem.textContent = texto;
+        }
+    }
+    
     showSuccess(message) {
         this.showAlert(message, 'success');
     }